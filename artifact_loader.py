@@ -0,0 +1,39 @@
+# artifact_loader.py - فتح نتائج المعالجة الدفعية (batch_process.py) من لوحات التحكم
+import streamlit as st
+
+from shipping_core.artifacts import get_artifacts_root, list_runs, read_table
+from shipping_core.pipeline import refresh_city_aliases
+
+# مصدر البيانات المسجل عند فتح نتائج دفعية
+ARTIFACT_SOURCE = "دفعي"
+
+
+def _run_label(run):
+    """وصف مختصر للتشغيل في قائمة الاختيار"""
+    created_at = run.get('created_at', '').replace('T', ' ')
+    return f"{run['run_name']} - {created_at} ({run.get('rows', 0):,} شحنة)"
+
+
+def select_artifact_run(carrier, key):
+    """عرض التشغيلات الدفعية المتاحة وإرجاع جداول التشغيل المختار عند الضغط على فتح"""
+    # بدون ذاكرة مؤقتة: قراءة المجلد سريعة والتشغيلات الجديدة تظهر مباشرة
+    runs = list_runs(carrier, get_artifacts_root())
+    if not runs:
+        return None
+
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        index = st.selectbox(
+            "📂 أو افتح نتائج المعالجة الدفعية",
+            range(len(runs)),
+            format_func=lambda i: _run_label(runs[i]),
+            key=f"{key}_run"
+        )
+    with col2:
+        open_clicked = st.button("فتح", key=f"{key}_open", use_container_width=True)
+
+    if not open_clicked:
+        return None
+
+    run = runs[index]
+    return refresh_city_aliases(carrier, run, {table: read_table(run['path'], table) for table in run['tables']})
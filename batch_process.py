@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# batch_process.py - معالجة ملفات الشحن دفعياً بدون متصفح وكتابة النتائج كملفات Parquet
+"""
+مثال:
+    python batch_process.py --aramex aramex_*.xlsx --aramex-sla sla.xlsx \
+        --smsa smsa.xlsx --smsa-sla smsa_sla.xlsx \
+        --niceone orders.csv --niceone-branches branches/*.xlsx \
+        --output artifacts --workers 4
+    python batch_process.py --aramex aramex.xlsx --trace traces/batch.json
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from shipping_core.artifacts import get_artifacts_root
+from shipping_core.instrumentation import finish_run, span, start_run
+from shipping_core.pipeline import CARRIERS, process_file, process_file_traced, publish_run_summary, read_sla_file
+from shipping_core.tracing import default_trace_path, tracing_enabled, write_chrome_trace
+
+logger = logging.getLogger('batch_process')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="معالجة ملفات Aramex و Samsa و NiceOne وكتابة مؤشرات الأداء")
+    parser.add_argument('--aramex', nargs='+', default=[], help="ملفات بيانات Aramex")
+    parser.add_argument('--aramex-sla', help="ملف اتفاقية SLA لـ Aramex")
+    parser.add_argument('--smsa', nargs='+', default=[], help="ملفات بيانات Samsa")
+    parser.add_argument('--smsa-sla', help="ملف اتفاقية SLA لـ Samsa")
+    parser.add_argument('--niceone', nargs='+', default=[], help="ملفات NiceOne الرئيسية")
+    parser.add_argument('--niceone-branches', nargs='+', default=[], help="ملفات فروع NiceOne")
+    parser.add_argument('--output', default=get_artifacts_root(), help="مجلد النتائج")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="عدد العمليات المتوازية")
+    parser.add_argument('--trace', nargs='?', const='', metavar='PATH',
+                        help="كتابة مراحل التنفيذ بصيغة Chrome trace (الافتراضي traces/batch_<وقت>.json أو SHIPPING_TRACE=1)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="عرض تفاصيل أكثر")
+    return parser.parse_args(argv)
+
+
+def build_jobs(args):
+    """تجهيز قائمة المهام (شركة، ملف، مرجع) مع قراءة ملفات SLA مرة واحدة"""
+    references = {
+        'aramex': (read_sla_file(args.aramex_sla) if args.aramex_sla else None, args.aramex_sla),
+        'smsa': (read_sla_file(args.smsa_sla, flexible=True) if args.smsa_sla else None, args.smsa_sla),
+        'niceone': (args.niceone_branches or None, ', '.join(args.niceone_branches) or None),
+    }
+
+    jobs = []
+    for carrier in CARRIERS:
+        reference, reference_name = references[carrier]
+        for path in getattr(args, carrier):
+            jobs.append((carrier, path, reference, reference_name))
+    return jobs
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s %(levelname)s %(message)s'
+    )
+
+    trace_path = args.trace if args.trace is not None else ('' if tracing_enabled() else None)
+    trace_run = start_run('batch_process') if trace_path is not None else None
+    worker_records = []
+
+    with span('build_jobs', 'ingestion'):
+        jobs = build_jobs(args)
+    if not jobs:
+        logger.error("لم يتم تحديد أي ملفات للمعالجة")
+        return 2
+
+    start = time.perf_counter()
+    failures = 0
+    workers = max(1, min(args.workers, len(jobs)))
+    worker = process_file_traced if trace_run else process_file
+    run_dirs = {}
+
+    with span('process_pool', 'pipeline'), ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(worker, carrier, path, args.output, reference, reference_name, False): index
+            for index, (carrier, path, reference, reference_name) in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            carrier, path = jobs[index][:2]
+            try:
+                run_dir = future.result()
+                if trace_run:
+                    run_dir, records = run_dir
+                    worker_records.extend(records)
+                run_dirs[index] = run_dir
+                logger.info("✅ %s: %s ← %s", carrier, path, run_dir)
+            except Exception:
+                failures += 1
+                logger.exception("❌ فشل معالجة %s: %s", carrier, path)
+
+    with span('publish_summaries', 'output'):
+        publish_summaries(jobs, run_dirs)
+
+    logger.info("تمت معالجة %d ملف (%d فشل) خلال %.1f ثانية", len(jobs) - failures, failures, time.perf_counter() - start)
+
+    if trace_run:
+        finish_run(trace_run)
+        write_trace(trace_path or default_trace_path('batch'), trace_run.records(), worker_records)
+    return 1 if failures else 0
+
+
+def publish_summaries(jobs, run_dirs):
+    """ملخص الصفحة الرئيسية لكل شركة من آخر ملف ناجح بترتيب سطر الأوامر (نفس نتيجة --workers 1)
+    بدلاً من آخر ملف انتهت معالجته"""
+    latest = {}
+    for index, (carrier, *_) in enumerate(jobs):
+        if index in run_dirs:
+            latest[carrier] = run_dirs[index]
+    for carrier, run_dir in latest.items():
+        publish_run_summary(run_dir)
+    return latest
+
+
+def write_trace(path, main_records, worker_records):
+    """دمج مراحل العملية الرئيسية والعمليات العاملة في ملف Chrome trace واحد"""
+    process_names = {os.getpid(): 'batch_process'}
+    for record in worker_records:
+        process_names.setdefault(record['pid'], f"worker {len(process_names)}")
+    write_chrome_trace(main_records + worker_records, path, process_names)
+    logger.info("🧭 ملف التتبع: %s", path)
+    return path
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# benchmark.py - قياس زمن وذاكرة كل مرحلة من مراحل المعالجة على بيانات مولدة بأحجام مختلفة
+"""
+مثال:
+    python benchmark.py --rows 10k 100k --output benchmarks/latest.json
+    python benchmark.py --rows 10k 100k --baseline benchmarks/baseline.json
+    python benchmark.py --rows 10k 100k --save-baseline
+    python benchmark.py --check
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from shipping_core import aramex, niceone, sla, smsa, synthetic
+
+logger = logging.getLogger('benchmark')
+
+BENCHMARKS_DIR = 'benchmarks'
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+DEFAULT_BUDGETS = os.path.join(BENCHMARKS_DIR, 'budgets.json')
+DEFAULT_SCALES = ['10k', '100k']
+
+
+class BenchmarkData:
+    """بيانات مولدة لحجم واحد - كل مرحلة تأخذ مدخلاتها الجاهزة من المراحل السابقة"""
+
+    def __init__(self, rows, work_dir, seed=0):
+        self.rows = rows
+        self.seed = seed
+        self.work_dir = work_dir
+
+    @cached_property
+    def aramex_raw(self):
+        return synthetic.generate_aramex(self.rows, seed=self.seed)
+
+    @cached_property
+    def aramex_sla(self):
+        return sla.process_sla_data(synthetic.generate_sla(seed=self.seed))
+
+    @cached_property
+    def aramex_processed(self):
+        return aramex.process_aramex_data(self.aramex_raw.copy())
+
+    @cached_property
+    def aramex_with_sla(self):
+        df = aramex.add_sla_and_fds_columns(self.aramex_processed, self.aramex_sla)
+        return df[~df['للاستثناء']]
+
+    @cached_property
+    def smsa_raw(self):
+        return synthetic.generate_smsa(self.rows, seed=self.seed)
+
+    @cached_property
+    def smsa_sla(self):
+        return sla.process_sla_data(synthetic.generate_sla(seed=self.seed + 1), flexible=True)
+
+    @cached_property
+    def smsa_processed(self):
+        return smsa.process_samsa_data(self.smsa_raw.copy(), self.smsa_sla)
+
+    @cached_property
+    def niceone_main(self):
+        return niceone.prepare_main_data(synthetic.generate_niceone(self.rows, seed=self.seed))
+
+    @cached_property
+    def niceone_branch_files(self):
+        branch_dir = os.path.join(self.work_dir, f"branches_{self.rows}")
+        os.makedirs(branch_dir, exist_ok=True)
+        paths = []
+        for name, branch_df in synthetic.generate_niceone_branches(self.niceone_main, seed=self.seed).items():
+            paths.append(synthetic.write_export(branch_df, os.path.join(branch_dir, name)))
+        return paths
+
+    @cached_property
+    def niceone_branches(self):
+        return niceone.load_branch_data(self.niceone_branch_files)[0]
+
+
+# (اسم المرحلة، دالة تجهيز المدخلات، الدالة المقاسة)
+STAGES = [
+    ('process_aramex_data', lambda d: (d.aramex_raw,), aramex.process_aramex_data),
+    ('add_sla_and_fds_columns', lambda d: (d.aramex_processed, d.aramex_sla), aramex.add_sla_and_fds_columns),
+    ('analyze_weekly_trends_enhanced', lambda d: (d.aramex_with_sla,), aramex.analyze_weekly_trends_enhanced),
+    ('analyze_cities_performance_enhanced', lambda d: (d.aramex_with_sla,), aramex.analyze_cities_performance_enhanced),
+    ('analyze_delayed_shipments', lambda d: (d.aramex_with_sla, d.aramex_sla), aramex.analyze_delayed_shipments),
+    ('process_samsa_data', lambda d: (d.smsa_raw, d.smsa_sla), smsa.process_samsa_data),
+    ('calculate_performance_metrics', lambda d: (d.smsa_processed, d.smsa_sla), smsa.calculate_performance_metrics),
+    ('analyze_attempts', lambda d: (d.niceone_main,), niceone.analyze_attempts),
+    ('load_branch_data', lambda d: (d.niceone_branch_files,), niceone.load_branch_data),
+    ('merge_with_branches', lambda d: (d.niceone_main, d.niceone_branches), niceone.merge_with_branches),
+]
+
+STAGE_NAMES = [name for name, _, _ in STAGES]
+
+
+def _copy_args(args):
+    """نسخ المدخلات قبل كل تشغيل لأن بعض المراحل تعدل الجدول مباشرة"""
+    return tuple(arg.copy() if isinstance(arg, (pd.DataFrame, list)) else arg for arg in args)
+
+
+def measure_stage(func, args, repeat=3):
+    """قياس أفضل زمن من عدة تشغيلات ثم ذروة الذاكرة في تشغيل منفصل (tracemalloc يبطئ التنفيذ)"""
+    timings = []
+    for _ in range(repeat):
+        call_args = _copy_args(args)
+        gc.collect()
+        start = time.perf_counter()
+        func(*call_args)
+        timings.append(time.perf_counter() - start)
+
+    call_args = _copy_args(args)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func(*call_args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return min(timings), float(np.median(timings)), peak
+
+
+def run_benchmarks(scales, stages=None, repeat=3, seed=0):
+    """تشغيل المراحل المحددة على كل حجم - يرجع قائمة النتائج"""
+    selected = [stage for stage in STAGES if stages is None or stage[0] in stages]
+    results = []
+
+    with tempfile.TemporaryDirectory(prefix='shipping_bench_') as work_dir:
+        for rows in scales:
+            data = BenchmarkData(rows, work_dir, seed=seed)
+            for name, prepare, func in selected:
+                args = prepare(data)
+                best, median, peak = measure_stage(func, args, repeat=repeat)
+                result = {
+                    'stage': name,
+                    'rows': rows,
+                    'wall_s': round(best, 4),
+                    'median_s': round(median, 4),
+                    'peak_mb': round(peak / (1024 * 1024), 2),
+                    'rows_per_s': round(rows / best) if best > 0 else None,
+                    'repeat': repeat,
+                }
+                results.append(result)
+                logger.info("%-38s %10s صف  %8.3f ث  %9.1f MB  %12s صف/ث",
+                            name, f"{rows:,}", best, result['peak_mb'], f"{result['rows_per_s']:,}")
+    return results
+
+
+def build_report(results):
+    """تقرير JSON مع معلومات البيئة"""
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_report(report, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def compare_reports(current, baseline):
+    """مقارنة النتائج الحالية مع خط الأساس لكل (مرحلة، حجم) موجود في الاثنين"""
+    baseline_index = {(r['stage'], r['rows']): r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        base = baseline_index.get((result['stage'], result['rows']))
+        if base is None:
+            continue
+        rows.append({
+            'stage': result['stage'],
+            'rows': result['rows'],
+            'baseline_s': base['wall_s'],
+            'current_s': result['wall_s'],
+            'time_change_pct': round((result['wall_s'] / base['wall_s'] - 1) * 100, 1) if base['wall_s'] else None,
+            'baseline_mb': base['peak_mb'],
+            'current_mb': result['peak_mb'],
+            'memory_change_pct': round((result['peak_mb'] / base['peak_mb'] - 1) * 100, 1) if base['peak_mb'] else None,
+        })
+    return pd.DataFrame(rows)
+
+
+def run_budget_check(budgets, repeat=3, seed=0):
+    """تشغيل المراحل بالأحجام المحددة في الحدود ومقارنتها - يرجع (جدول_المقارنة, النتائج)"""
+    stages_by_rows = {}
+    for budget in budgets:
+        stages_by_rows.setdefault(budget['rows'], []).append(budget['stage'])
+
+    results = []
+    for rows, stages in stages_by_rows.items():
+        results.extend(run_benchmarks([rows], stages, repeat=repeat, seed=seed))
+
+    return check_budgets(results, budgets), results
+
+
+BUDGET_COLUMNS = ['stage', 'rows', 'current_s', 'max_s', 'time_used_pct', 'current_mb', 'max_mb', 'memory_used_pct',
+                  'status']
+
+
+def check_budgets(results, budgets):
+    """مقارنة النتائج بحدود الزمن والذاكرة لكل مرحلة"""
+    results_index = {(r['stage'], r['rows']): r for r in results}
+    rows = []
+    for budget in budgets:
+        result = results_index.get((budget['stage'], budget['rows']))
+        if result is None:
+            # مرحلة غير معروفة أو لم تُقس - فشل بدلاً من تجاهل الحد
+            rows.append({'stage': budget['stage'], 'rows': budget['rows'], 'max_s': budget['max_s'],
+                         'max_mb': budget['max_mb'], 'status': '❌ لا توجد نتيجة'})
+            continue
+        time_ok = result['wall_s'] <= budget['max_s']
+        memory_ok = result['peak_mb'] <= budget['max_mb']
+        rows.append({
+            'stage': budget['stage'],
+            'rows': budget['rows'],
+            'current_s': result['wall_s'],
+            'max_s': budget['max_s'],
+            'time_used_pct': round(result['wall_s'] / budget['max_s'] * 100, 1),
+            'current_mb': result['peak_mb'],
+            'max_mb': budget['max_mb'],
+            'memory_used_pct': round(result['peak_mb'] / budget['max_mb'] * 100, 1),
+            'status': '✅' if time_ok and memory_ok else '❌ ' + ' + '.join(
+                label for label, ok in (('زمن', time_ok), ('ذاكرة', memory_ok)) if not ok
+            ),
+        })
+    return pd.DataFrame(rows, columns=BUDGET_COLUMNS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس أداء مراحل المعالجة")
+    parser.add_argument('--rows', nargs='+', default=DEFAULT_SCALES, help="أحجام البيانات (10k, 100k, 1m ...)")
+    parser.add_argument('--stages', nargs='+', choices=STAGE_NAMES, help="المراحل المطلوب قياسها (الافتراضي: الكل)")
+    parser.add_argument('--repeat', type=int, default=3, help="عدد مرات التشغيل لكل مرحلة")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=os.path.join(BENCHMARKS_DIR, 'latest.json'), help="ملف نتائج JSON")
+    parser.add_argument('--baseline', help="ملف خط أساس للمقارنة")
+    parser.add_argument('--save-baseline', action='store_true', help=f"حفظ النتائج كخط أساس في {DEFAULT_BASELINE}")
+    parser.add_argument('--check', nargs='?', const=DEFAULT_BUDGETS, metavar='BUDGETS',
+                        help=f"فحص الحدود المسموحة لكل مرحلة (الافتراضي {DEFAULT_BUDGETS}) والفشل عند تجاوزها")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.check:
+        budgets = load_report(args.check)['budgets']
+        if args.stages:
+            budgets = [budget for budget in budgets if budget['stage'] in args.stages]
+        comparison, results = run_budget_check(budgets, repeat=args.repeat, seed=args.seed)
+        save_report(build_report(results), args.output)
+        print(comparison.to_string(index=False))
+
+        failed = comparison[comparison['status'] != '✅']
+        if len(failed) > 0:
+            logger.error("❌ %d مرحلة تجاوزت الحدود المسموحة", len(failed))
+            return 1
+        logger.info("✅ جميع المراحل ضمن الحدود")
+        return 0
+
+    scales = [synthetic.parse_scale(value) for value in args.rows]
+    report = build_report(run_benchmarks(scales, args.stages, repeat=args.repeat, seed=args.seed))
+    logger.info("تم حفظ النتائج في %s", save_report(report, args.output))
+
+    if args.save_baseline:
+        logger.info("تم حفظ خط الأساس في %s", save_report(report, DEFAULT_BASELINE))
+
+    if args.baseline:
+        comparison = compare_reports(report, load_report(args.baseline))
+        if comparison.empty:
+            logger.warning("لا توجد مراحل مشتركة مع خط الأساس")
+        else:
+            print(comparison.to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+# chart_cache.py - ذاكرة مؤقتة لمخططات Plotly مفهرسة ببصمة البيانات المجمعة
+import base64
+
+import numpy as np
+import plotly.graph_objects as go
+
+from shipping_core.cache import fingerprint, get_table, invalidate
+from shipping_core.instrumentation import span
+
+# الحد الأقصى لعدد المخططات المحفوظة في العملية
+MAX_CACHED_FIGURES = 256
+
+# namespace المخططات في shipping_core.cache
+CHARTS_NAMESPACE = 'charts'
+
+_figure_specs = get_table(CHARTS_NAMESPACE, 'figure_specs', max_entries=MAX_CACHED_FIGURES)
+
+
+def _decode_arrays(value):
+    """إعادة المصفوفات المرمزة base64 في to_plotly_json ({'dtype', 'bdata'}) إلى مصفوفات numpy"""
+    if isinstance(value, dict):
+        if 'bdata' in value and 'dtype' in value and set(value) <= {'bdata', 'dtype', 'shape'}:
+            array = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype'])
+            if 'shape' in value:
+                array = array.reshape([int(size) for size in str(value['shape']).split(',')])
+            return array
+        return {key: _decode_arrays(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode_arrays(item) for item in value]
+    return value
+
+
+def get_cached_figure(chart_name, builder, *data, **options):
+    """إرجاع المخطط من المواصفات المحفوظة أو بناؤه وحفظ مواصفاته (قاموس to_plotly_json)
+
+    عند الإصابة يُبنى Figure من نسخة القاموس بدون إعادة التحقق من الخصائص (تحققت عند البناء الأول).
+    """
+    with span(chart_name, 'chart', cached=True) as s:
+        cache_key = f"{chart_name}:{fingerprint(*data, **options)}"
+
+        found, spec = _figure_specs.get(cache_key)
+        if found:
+            return go.Figure(spec, _validate=False)
+
+        s.cache = 'miss'
+        fig = builder(*data, **options)
+        if fig is None:
+            return None
+
+        _figure_specs.put(cache_key, _decode_arrays(fig.to_plotly_json()))
+        return fig
+
+
+def get_chart_cache_stats():
+    """إحصائيات ذاكرة المخططات المؤقتة"""
+    stats = _figure_specs.stats()
+    return {key: stats[key] for key in ('hits', 'misses', 'evictions', 'entries', 'bytes')}
+
+
+def clear_chart_cache():
+    """مسح جميع المخططات المحفوظة"""
+    invalidate(CHARTS_NAMESPACE)
@@ -0,0 +1,186 @@
+# chart_data.py - طبقة بيانات الرسوم البيانية: تقليص الفئات وWebGL وحد حجم الحمولة
+import pandas as pd
+import plotly.graph_objects as go
+
+# عدد النقاط الذي يتم بعده التحويل إلى WebGL
+WEBGL_POINT_THRESHOLD = 1000
+
+# الحد الأقصى للفئات المعروضة على محور فئوي (مع فئة "أخرى")
+MAX_CATEGORIES = 20
+
+# الحد الأقصى لحجم مواصفات المخطط (JSON) لكل مخطط
+MAX_PAYLOAD_BYTES = 1_000_000
+
+OTHER_LABEL = 'أخرى'
+
+# الخصائص التي يمكن تقليصها بالتساوي مع نقاط المخطط
+_POINT_ARRAYS = ('x', 'y', 'text', 'customdata', 'hovertext')
+_MARKER_ARRAYS = ('size', 'color')
+
+
+def limit_categories(df, category_col, sort_col, max_categories=MAX_CATEGORIES,
+                     sum_cols=(), ratio_cols=None, include_other=True, other_label=OTHER_LABEL):
+    """إبقاء أكبر الفئات وتجميع الباقي في فئة "أخرى" على الخادم
+
+    ratio_cols: قاموس {عمود_النسبة: (عمود_البسط, عمود_المقام)} لإعادة حساب النسب
+    بدقة لفئة "أخرى" بدلاً من جمع النسب.
+    """
+    ratio_cols = ratio_cols or {}
+    report = {'categories_before': len(df), 'categories_after': len(df)}
+
+    if len(df) <= max_categories:
+        return df, report
+
+    ordered = df.sort_values(sort_col, ascending=False)
+
+    if not include_other:
+        limited = ordered.head(max_categories)
+        report['categories_after'] = len(limited)
+        return limited, report
+
+    head = ordered.head(max_categories - 1)
+    tail = ordered.iloc[max_categories - 1:]
+
+    other_row = {category_col: f"{other_label} ({len(tail):,})"}
+    for col in sum_cols:
+        other_row[col] = tail[col].sum()
+    for col, (numerator, denominator) in ratio_cols.items():
+        total = tail[denominator].sum()
+        other_row[col] = round(tail[numerator].sum() / total * 100, 2) if total > 0 else 0.0
+
+    limited = pd.concat([head, pd.DataFrame([other_row])], ignore_index=True)
+    report['categories_after'] = len(limited)
+    return limited, report
+
+
+def _trace_point_count(trace):
+    """عدد النقاط في مسار واحد"""
+    for attr in ('x', 'y', 'values', 'labels'):
+        values = getattr(trace, attr, None)
+        if values is not None and not isinstance(values, str):
+            try:
+                return len(values)
+            except TypeError:
+                continue
+    return 0
+
+
+def count_points(fig):
+    """إجمالي عدد النقاط في المخطط"""
+    return sum(_trace_point_count(trace) for trace in fig.data)
+
+
+def _to_webgl(fig, threshold):
+    """تحويل مسارات Scatter الكبيرة إلى Scattergl"""
+    converted = 0
+    traces = []
+    for trace in fig.data:
+        if isinstance(trace, go.Scatter) and _trace_point_count(trace) > threshold:
+            trace_spec = trace.to_plotly_json()
+            trace_spec.pop('type', None)
+            traces.append(go.Scattergl(trace_spec, skip_invalid=True))
+            converted += 1
+        else:
+            traces.append(trace)
+
+    if converted:
+        fig.data = ()
+        for trace in traces:
+            fig.add_trace(trace)
+    return converted
+
+
+def _decimate_trace(trace, step):
+    """أخذ كل نقطة رقم step من مسار خطي أو نقطي"""
+    length = _trace_point_count(trace)
+    for attr in _POINT_ARRAYS:
+        values = getattr(trace, attr, None)
+        if values is not None and not isinstance(values, str) and len(values) == length:
+            trace[attr] = list(values)[::step]
+    marker = getattr(trace, 'marker', None)
+    if marker is not None:
+        for attr in _MARKER_ARRAYS:
+            values = getattr(marker, attr, None)
+            if values is not None and not isinstance(values, (str, int, float)) and len(values) == length:
+                marker[attr] = list(values)[::step]
+
+
+def _payload_bytes(fig):
+    """حجم مواصفات المخطط بعد التسلسل"""
+    return len(fig.to_json())
+
+
+def optimize_figure(fig, webgl_threshold=WEBGL_POINT_THRESHOLD, max_payload_bytes=MAX_PAYLOAD_BYTES):
+    """تطبيق WebGL وحد حجم الحمولة على المخطط وتسجيل مقدار التقليص فيه"""
+    if fig is None:
+        return None
+
+    points_before = count_points(fig)
+    bytes_before = _payload_bytes(fig)
+
+    webgl_traces = _to_webgl(fig, webgl_threshold)
+
+    # تقليص النقاط تدريجياً للمسارات الخطية حتى يصبح الحجم ضمن الحد
+    payload = _payload_bytes(fig) if webgl_traces else bytes_before
+    step = 1
+    while payload > max_payload_bytes:
+        reducible = [trace for trace in fig.data
+                     if isinstance(trace, (go.Scatter, go.Scattergl)) and _trace_point_count(trace) > 2]
+        if not reducible:
+            break
+        step *= 2
+        for trace in reducible:
+            _decimate_trace(trace, 2)
+        payload = _payload_bytes(fig)
+
+    report = {
+        'points_before': points_before,
+        'points_after': count_points(fig),
+        'bytes_before': bytes_before,
+        'bytes_after': payload,
+        'webgl_traces': webgl_traces,
+        'decimation_step': step,
+        # المسارات غير الخطية (Bar و Box و Heatmap...) لا تُقلص هنا - تُقلص فئاتها قبل البناء بـ limit_categories
+        'max_payload_bytes': max_payload_bytes,
+        'payload_limited': payload <= max_payload_bytes,
+    }
+
+    meta = fig.layout.meta if isinstance(fig.layout.meta, dict) else {}
+    meta = dict(meta)
+    meta['chart_data'] = report
+    fig.update_layout(meta=meta)
+    return fig
+
+
+def get_reduction_report(fig):
+    """استرجاع تقرير التقليص المحفوظ في المخطط"""
+    if fig is None or not isinstance(fig.layout.meta, dict):
+        return None
+    return fig.layout.meta.get('chart_data')
+
+
+def format_reduction_report(fig, categories_report=None):
+    """نص مختصر يوضح مقدار التقليص إن وجد"""
+    parts = []
+
+    if categories_report and categories_report['categories_after'] < categories_report['categories_before']:
+        parts.append(f"عرض {categories_report['categories_after']:,} من {categories_report['categories_before']:,} فئة")
+
+    report = get_reduction_report(fig)
+    if report:
+        if report['webgl_traces']:
+            parts.append(f"WebGL لـ {report['webgl_traces']} مسار")
+        if report['points_after'] < report['points_before']:
+            parts.append(f"النقاط {report['points_before']:,} ← {report['points_after']:,}")
+        if report['bytes_after'] < report['bytes_before']:
+            parts.append(f"الحجم {report['bytes_before'] / 1024:,.0f} ← {report['bytes_after'] / 1024:,.0f} KB")
+
+    warning = None
+    if report and not report.get('payload_limited', True):
+        warning = (f"⚠️ حجم المخطط {report['bytes_after'] / 1024:,.0f} KB يتجاوز الحد "
+                   f"{report['max_payload_bytes'] / 1024:,.0f} KB")
+
+    if not parts:
+        return warning
+    text = "⚡ تم تقليص المخطط: " + " | ".join(parts)
+    return f"{text} | {warning}" if warning else text
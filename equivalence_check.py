@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# equivalence_check.py - مقارنة نتائج التنفيذ الأصلي والمسارات السريعة على بيانات مولدة وعشوائية
+"""
+يشغل كل دالة مرتين (SHIPPING_FAST_PATHS معطل ثم مفعل) على نسختين من نفس المدخلات
+ويتأكد من تطابق الجداول الناتجة تماماً: القيم والأنواع والترتيب والفهرس.
+
+مثال:
+    python equivalence_check.py
+    python equivalence_check.py --rows 50k --cases 50 --kernels analyze_attempts
+"""
+import argparse
+import logging
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from shipping_core import aramex, kernels, niceone, sla, smsa, synthetic
+
+logger = logging.getLogger('equivalence_check')
+
+
+# ==================== توليد الحالات ====================
+
+def _inject_nan(rng, df, column, rate):
+    """وضع قيم مفقودة عشوائية في عمود"""
+    if column in df.columns:
+        df.loc[rng.random(len(df)) < rate, column] = np.nan
+    return df
+
+
+def aramex_sla_cases(rng, rows):
+    """مدخلات add_sla_and_fds_columns: بيانات مولدة مع تعديلات عشوائية على الأيام وملف SLA"""
+    seed = int(rng.integers(0, 1_000_000))
+    df = aramex.process_aramex_data(synthetic.generate_aramex(rows, seed=seed))
+    sla_df = sla.process_sla_data(synthetic.generate_sla(seed=seed))
+
+    variant = rng.integers(0, 6)
+    if variant == 1:
+        sla_df = None
+    elif variant == 2:
+        # مدن بدون SLA وقيم SLA كسرية
+        sla_df = sla_df.sample(frac=0.5, random_state=seed)
+        sla_df['SLA_أيام'] = sla_df['SLA_أيام'] + rng.choice([0, 0.5], size=len(sla_df))
+    elif variant == 3:
+        df['أيام_للمحاولة_الأولى'] = rng.integers(-3, 15, size=len(df)).astype(float)
+        _inject_nan(rng, df, 'أيام_للمحاولة_الأولى', 0.2)
+    elif variant == 4:
+        df = df.sample(frac=1, random_state=seed)
+        df.index = rng.permutation(len(df)) * 7
+    elif variant == 5:
+        # فهرس مكرر - يجب أن يعود للتنفيذ الأصلي
+        df.index = np.arange(len(df)) // 2
+    _inject_nan(rng, df, 'المدينة_الوجهة', 0.05)
+    return (df, sla_df)
+
+
+def aramex_weekly_cases(rng, rows):
+    """مدخلات analyze_weekly_trends_enhanced: ناتج add_sla_and_fds_columns مع تواريخ وحالات مفقودة"""
+    df, sla_df = aramex_sla_cases(rng, rows)
+    df = aramex.add_sla_and_fds_columns(df, sla_df)
+    if rng.random() < 0.5:
+        df = df[~df['للاستثناء']].copy()
+    _inject_nan(rng, df, 'تاريخ_الاستلام', 0.1)
+    _inject_nan(rng, df, 'حالة_التسليم', 0.1)
+    return (df,)
+
+
+def _smsa_processed(rng, rows):
+    # process_samsa_data يحتاج شحنة مسلمة واحدة على الأقل لإنشاء أيام_التوصيل
+    rows = max(rows, 50)
+    seed = int(rng.integers(0, 1_000_000))
+    sla_df = sla.process_sla_data(synthetic.generate_sla(seed=seed + 1), flexible=True)
+    if rng.random() < 0.3:
+        sla_df = sla_df.sample(frac=0.6, random_state=seed)
+    df = smsa.process_samsa_data(synthetic.generate_smsa(rows, seed=seed), sla_df)
+
+    variant = rng.integers(0, 5)
+    if variant == 1:
+        _inject_nan(rng, df, 'المدينة_الوجهة', 0.1)
+        _inject_nan(rng, df, 'المنطقة', 0.3)
+    elif variant == 2:
+        df = df.drop(columns=[col for col in ('تسليم_أول_محاولة', 'المنطقة', 'حالة_SLA_محاولة_أولى')
+                              if col in df.columns and rng.random() < 0.5])
+    elif variant == 3:
+        # أسابيع قليلة لإحداث تساوٍ في الأسبوع الأكثر تكراراً
+        df['رقم_الأسبوع'] = pd.Series(rng.integers(1, 4, size=len(df)), index=df.index).astype('UInt32')
+        df.loc[rng.random(len(df)) < 0.1, 'رقم_الأسبوع'] = pd.NA
+    elif variant == 4:
+        df = df.sample(frac=1, random_state=seed)
+    return df, sla_df
+
+
+def smsa_performance_cases(rng, rows):
+    """مدخلات calculate_performance_metrics"""
+    return _smsa_processed(rng, rows)
+
+
+def smsa_weekly_cases(rng, rows):
+    """مدخلات calculate_weekly_metrics"""
+    return (_smsa_processed(rng, rows)[0],)
+
+
+# قيم غير منتظمة تظهر في ملفات NiceOne الفعلية
+_RECEIVE_NOISE = [
+    None, np.nan, 'garbage', '2025-02-30T10:00:00.000Z', '2025-01-05T23:59:59Z', '2025-01-05',
+    '05/01/2025', 45000, 45000.75, 12, pd.Timestamp('2025-01-03 22:00'), '2025-01-05T10:00:00.000+03:00',
+]
+_SHIP_NOISE = [
+    None, np.nan, '5/1/2025', '31/02/2025', '2025-01-05', 'xx/yy/zzzz', '05/01/25', 45000,
+    pd.Timestamp('2025-01-04'), '1/2/3/4', ' 05/01/2025',
+]
+
+
+def niceone_attempts_cases(rng, rows):
+    """مدخلات analyze_attempts: بيانات مولدة مع صيغ تواريخ وحالات مختلطة"""
+    seed = int(rng.integers(0, 1_000_000))
+    df = niceone.prepare_main_data(synthetic.generate_niceone(rows, seed=seed, serial_rate=rng.choice([0, 0.05, 0.5])))
+
+    noise_rate = rng.choice([0, 0.02, 0.3])
+    for column, noise in (('تاريخ استلام الشحنة', _RECEIVE_NOISE), ('تاريخ الشحن', _SHIP_NOISE)):
+        mask = rng.random(len(df)) < noise_rate
+        df[column] = df[column].astype(object)
+        df.loc[mask, column] = pd.Series(
+            [noise[i] for i in rng.integers(0, len(noise), size=mask.sum())], index=df.index[mask], dtype=object
+        )
+
+    variant = rng.integers(0, 4)
+    if variant == 1:
+        _inject_nan(rng, df, 'حالة الطلب', 0.1)
+    elif variant == 2:
+        df['تاريخ استلام الشحنة'] = pd.to_datetime(df['تاريخ استلام الشحنة'], errors='coerce', format='ISO8601', utc=True)
+    elif variant == 3:
+        df['تاريخ الشحن'] = np.nan
+    return (df,)
+
+
+KERNELS = {
+    'add_sla_and_fds_columns': (aramex.add_sla_and_fds_columns, aramex_sla_cases),
+    'analyze_weekly_trends_enhanced': (aramex.analyze_weekly_trends_enhanced, aramex_weekly_cases),
+    'calculate_performance_metrics': (smsa.calculate_performance_metrics, smsa_performance_cases),
+    'calculate_weekly_metrics': (smsa.calculate_weekly_metrics, smsa_weekly_cases),
+    'analyze_attempts': (niceone.analyze_attempts, niceone_attempts_cases),
+}
+
+
+# ==================== المقارنة ====================
+
+def _copy_args(args):
+    return tuple(arg.copy(deep=True) if isinstance(arg, pd.DataFrame) else arg for arg in args)
+
+
+def assert_identical(legacy, fast):
+    """تطابق كامل: assert_frame_equal بدون تسامح + نوع كل قيمة في الأعمدة النصية (None مقابل NaT)"""
+    pd.testing.assert_frame_equal(legacy, fast, check_exact=True)
+    for col in legacy.columns:
+        if legacy[col].dtype == object:
+            legacy_types = legacy[col].map(type)
+            fast_types = fast[col].map(type)
+            mismatch = legacy_types != fast_types
+            if mismatch.any():
+                first = mismatch.idxmax()
+                raise AssertionError(
+                    f"نوع القيم مختلف في العمود {col} عند الفهرس {first}: "
+                    f"{legacy[col].loc[first]!r} مقابل {fast[col].loc[first]!r}"
+                )
+
+
+def run_case(func, args):
+    """تشغيل الدالة بالتنفيذ الأصلي ثم بالمسار السريع - يرجع (النتيجتان, الزمنان)"""
+    legacy_args = _copy_args(args)
+    fast_args = _copy_args(args)
+
+    with kernels.fast_paths(False):
+        start = time.perf_counter()
+        legacy = func(*legacy_args)
+        legacy_s = time.perf_counter() - start
+
+    with kernels.fast_paths(True):
+        start = time.perf_counter()
+        fast = func(*fast_args)
+        fast_s = time.perf_counter() - start
+
+    return legacy, fast, legacy_s, fast_s
+
+
+def check_kernel(name, cases, rows, seed=0):
+    """تشغيل عدد من الحالات لدالة واحدة - يرجع ملخص النتائج"""
+    func, make_case = KERNELS[name]
+    rng = np.random.default_rng(seed)
+    failures = []
+    legacy_total = fast_total = 0.0
+
+    for case in range(cases):
+        case_rows = int(rng.choice([1, 2, 10, 500, rows]))
+        args = make_case(rng, case_rows)
+        legacy, fast, legacy_s, fast_s = run_case(func, args)
+        legacy_total += legacy_s
+        fast_total += fast_s
+        try:
+            assert_identical(legacy, fast)
+        except AssertionError as e:
+            failures.append((case, case_rows, str(e).splitlines()[0]))
+            logger.error("❌ %s حالة %d (%s صف): %s", name, case, f"{case_rows:,}", failures[-1][2])
+
+    return {
+        'kernel': name,
+        'cases': cases,
+        'failures': len(failures),
+        'legacy_s': round(legacy_total, 3),
+        'fast_s': round(fast_total, 3),
+        'speedup': round(legacy_total / fast_total, 1) if fast_total > 0 else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="مقارنة التنفيذ الأصلي والمسارات السريعة")
+    parser.add_argument('--kernels', nargs='+', choices=list(KERNELS), default=list(KERNELS))
+    parser.add_argument('--rows', default='5k', help="الحجم الأكبر للحالات المولدة")
+    parser.add_argument('--cases', type=int, default=20, help="عدد الحالات لكل دالة")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    rows = synthetic.parse_scale(args.rows)
+
+    summary = pd.DataFrame([check_kernel(name, args.cases, rows, args.seed) for name in args.kernels])
+    print(summary.to_string(index=False))
+
+    if summary['failures'].sum() > 0:
+        logger.error("❌ المسارات السريعة لا تطابق التنفيذ الأصلي")
+        return 1
+    logger.info("✅ جميع المسارات السريعة مطابقة للتنفيذ الأصلي")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+# history_view.py - عرض السجل التاريخي للشركة: الاتجاه طويل المدى من السجل العمودي والتفاصيل من مخزن SQLite
+# ومقارنة نسخ البيانات المرفوعة
+from datetime import timedelta
+
+import streamlit as st
+
+from perf_panel import show_table
+from shipping_core.history import get_history_store
+from shipping_core.schema import DELIVERY_STATUSES
+from shipping_core.snapshots import diff_snapshots, list_snapshots, load_snapshot
+from shipping_core.warehouse import get_warehouse
+
+# الفترة الافتراضية عند فتح السجل
+DEFAULT_HISTORY_DAYS = 90
+
+GROUP_LABELS = {
+    'week': 'أسبوع',
+    'day': 'يوم',
+    'month': 'شهر',
+    'city': 'المدينة',
+    'region': 'المنطقة',
+    'branch': 'الفرع',
+    'status': 'حالة التسليم',
+}
+
+_TIME_GROUPS = ('day', 'week', 'month')
+
+# فترات الاتجاه طويل المدى (أيام قبل آخر أسبوع، None = كل السجل)
+TREND_PERIODS = {'سنة': 365, 'سنتان': 730, 'الكل': None}
+
+_KPI_LABELS = {
+    'volume': 'الشحنات',
+    'delivered': 'المسلمة',
+    'pending': 'قيد التوصيل',
+    'returned': 'المرتجعة',
+    'dr': 'DR',
+    'fds': 'FDS',
+    'sla': 'SLA',
+    'pending_rate': 'Pending',
+}
+
+
+def _format_rate(value):
+    return f"{value:.1f}%" if value is not None else "—"
+
+
+def _select_filter(column, label, options, key):
+    options = ['الكل'] + list(options)
+    return column.selectbox(label, options, key=key) if len(options) > 1 else None
+
+
+def _render_trend(carrier, store, last_week):
+    """الاتجاه الأسبوعي لعدة سنوات من السجل العمودي (يقرأ أعمدة المؤشرات فقط)"""
+    st.markdown("#### 📈 الاتجاه طويل المدى")
+    col1, col2 = st.columns(2)
+    period = col1.selectbox("⏳ الفترة", list(TREND_PERIODS), key=f"history_{carrier}_trend_period")
+    days = TREND_PERIODS[period]
+    start = last_week - timedelta(days=days) if days else None
+
+    cities = store.city_kpis(carrier, start=start)
+    city = _select_filter(col2, "🏙️ المدينة", cities.index, f"history_{carrier}_trend_city")
+    weekly = store.weekly_kpis(carrier, start=start, **({'المدينة_الوجهة': city} if city and city != 'الكل' else {}))
+    if weekly.empty:
+        st.info("لا توجد شحنات في هذه الفترة")
+        return
+
+    st.line_chart(weekly.set_index('week_start')[['dr', 'fds', 'sla']].astype(float).rename(columns=_KPI_LABELS))
+    st.caption(f"{int(weekly['volume'].sum()):,} شحنة في {len(weekly)} أسبوع")
+    with st.expander("🏙️ المدن في الفترة"):
+        table = cities[list(_KPI_LABELS)].rename(columns=_KPI_LABELS).sort_values('الشحنات', ascending=False)
+        show_table(f"history:{carrier}:trend_cities", table, use_container_width=True)
+
+
+def _render_warehouse(carrier, warehouse, first_day, last_day):
+    """مؤشرات وتفاصيل أي فترة من مخزن SQLite (الفلاتر والتجميع داخل SQL)"""
+    st.markdown("#### 🗄️ التفاصيل حسب الفترة")
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    default_start = max(first_day, last_day - timedelta(days=DEFAULT_HISTORY_DAYS))
+    date_range = col1.date_input("📅 الفترة", value=(default_start, last_day), min_value=first_day,
+                                 max_value=last_day, key=f"history_{carrier}_range")
+    if not isinstance(date_range, (list, tuple)) or len(date_range) != 2:
+        st.info("اختر بداية ونهاية الفترة")
+        return
+    start, end = date_range
+
+    group = col2.selectbox("📊 التجميع", list(GROUP_LABELS), format_func=GROUP_LABELS.get,
+                           key=f"history_{carrier}_group")
+    filters = {
+        'city': _select_filter(col3, "🏙️ المدينة", warehouse.distinct(carrier, 'city'), f"history_{carrier}_city"),
+        'status': _select_filter(col4, "📦 الحالة", DELIVERY_STATUSES, f"history_{carrier}_status"),
+    }
+    branches = warehouse.distinct(carrier, 'branch')
+    if branches:
+        filters['branch'] = _select_filter(st, "🏢 الفرع", branches, f"history_{carrier}_branch")
+
+    overall = warehouse.kpis(carrier, start, end, **filters).iloc[0]
+    cols = st.columns(5)
+    cols[0].metric("الشحنات", f"{int(overall['volume']):,}")
+    cols[1].metric("DR", _format_rate(overall['dr']))
+    cols[2].metric("FDS", _format_rate(overall['fds']))
+    cols[3].metric("SLA", _format_rate(overall['sla']))
+    cols[4].metric("Pending", _format_rate(overall['pending_rate']))
+    if not overall['volume']:
+        return
+
+    grouped = warehouse.kpis(carrier, start, end, by=group, **filters)
+    if group in _TIME_GROUPS and len(grouped) > 1:
+        st.line_chart(grouped[['dr', 'fds', 'sla']].astype(float).rename(columns=_KPI_LABELS))
+    table = grouped[list(_KPI_LABELS)].rename(columns=_KPI_LABELS)
+    table.index.name = GROUP_LABELS[group]
+    show_table(f"history:{carrier}", table, use_container_width=True)
+
+    awb = st.text_input("🔎 تفاصيل الشحنات (رقم شحنة اختياري)", key=f"history_{carrier}_awb").strip()
+    shipments = warehouse.shipments(carrier, start, end, awb=awb or None, **filters)
+    st.caption(f"آخر {len(shipments):,} شحنة في الفترة")
+    show_table(f"history:{carrier}:shipments", shipments, use_container_width=True, hide_index=True)
+
+
+def _snapshot_label(snapshot):
+    source = f" - {snapshot['source']}" if snapshot.get('source') else ""
+    return f"{snapshot['created_at'].replace('T', ' ')}{source} ({snapshot['rows']:,} شحنة)"
+
+
+def _render_versions(carrier, snapshots):
+    """مقارنة نسختين من البيانات المرفوعة برقم الشحنة"""
+    st.markdown("#### 🕘 نسخ البيانات")
+    col1, col2 = st.columns(2)
+    old = col1.selectbox("النسخة السابقة", snapshots, index=1, format_func=_snapshot_label,
+                         key=f"history_{carrier}_old_version")
+    new = col2.selectbox("النسخة اللاحقة", snapshots, index=0, format_func=_snapshot_label,
+                         key=f"history_{carrier}_new_version")
+    if old['id'] == new['id']:
+        st.info("اختر نسختين مختلفتين للمقارنة")
+        return
+
+    diff = diff_snapshots(load_snapshot(old), load_snapshot(new))
+    cols = st.columns(5)
+    cols[0].metric("مشتركة", f"{diff['matched']:,}")
+    cols[1].metric("جديدة", f"{diff['added']:,}")
+    cols[2].metric("محذوفة", f"{diff['removed']:,}")
+    cols[3].metric("تغيرت حالتها", f"{diff['changed']:,}")
+    cols[4].metric("أصبحت متأخرة", f"{len(diff['newly_delayed']):,}")
+
+    show_table(f"history:{carrier}:version_kpis", diff['kpis'], use_container_width=True, hide_index=True)
+    if not diff['transitions'].empty:
+        st.markdown("**انتقالات الحالة**")
+        show_table(f"history:{carrier}:transitions", diff['transitions'], use_container_width=True, hide_index=True)
+    if not diff['newly_delayed'].empty:
+        with st.expander(f"⏰ الشحنات التي أصبحت متأخرة ({len(diff['newly_delayed']):,})"):
+            show_table(f"history:{carrier}:newly_delayed", diff['newly_delayed'], use_container_width=True,
+                       hide_index=True)
+
+
+def render_history(carrier):
+    """قسم السجل التاريخي للشركة - لا يظهر إذا لم يكن هناك سجل عمودي أو مخزن أو نسختان محفوظتان للشركة"""
+    store = get_history_store()
+    weeks = [part['week_start'] for part in store.partitions(carrier)] if store is not None else []
+    weeks = [week for week in weeks if week is not None]
+
+    warehouse = get_warehouse()
+    first_day, last_day = warehouse.date_range(carrier) if warehouse is not None else (None, None)
+    snapshots = list_snapshots(carrier)
+    if not weeks and first_day is None and len(snapshots) < 2:
+        return
+
+    st.markdown("---")
+    if not st.toggle("📚 السجل التاريخي", key=f"history_{carrier}_show",
+                     help="الاتجاه طويل المدى من السجل العمودي والتفاصيل من المخزن ومقارنة نسخ البيانات"):
+        return
+
+    if weeks:
+        _render_trend(carrier, store, max(weeks).date())
+    if first_day is not None:
+        _render_warehouse(carrier, warehouse, first_day, last_day)
+    if len(snapshots) > 1:
+        _render_versions(carrier, snapshots)
@@ -0,0 +1,75 @@
+# hub_summary.py - كتابة ملخص مؤشرات الشركة عند حفظ بياناتها وعرض مقارنة الشركات في الصفحة الرئيسية
+import logging
+
+import pandas as pd
+import streamlit as st
+
+from shipping_core.instrumentation import span
+from shipping_core.adapters import to_canonical
+from shipping_core.history import append_history
+from shipping_core.snapshots import keep_snapshot
+from shipping_core.summary import canonical_summary, read_summaries, write_summary
+from shipping_core.warehouse import store_history
+
+logger = logging.getLogger(__name__)
+
+# مفتاح الشركة في companies_data بالصفحة الرئيسية
+CARRIER_KEYS = {'niceone': 'NiceOne', 'aramex': 'Aramex', 'smsa': 'SMSA'}
+
+
+def publish_summary(carrier, df, sla_df=None, source=None):
+    """حساب ملخص الشركة من البيانات المحفوظة وكتابته للصفحة الرئيسية وحفظ نسخة من البيانات
+    وإضافتها للمخزن التاريخي والسجل العمودي إن كانا مفعلين - لا يوقف الصفحة عند الفشل"""
+    with span(f"summary:{carrier}", 'output', rows_in=len(df)):
+        try:
+            frame = to_canonical(carrier, df, sla_df)
+            path = write_summary(canonical_summary(carrier, frame), source=source)
+        except Exception as e:
+            logger.warning("تعذر حساب ملخص %s: %s", carrier, e)
+            return None
+    keep_snapshot(carrier, frame, source)
+    store_history(carrier, frame, source)
+    append_history(carrier, frame)
+    return path
+
+
+def _format_rate(value):
+    return f"{value:.1f}%" if value is not None else "—"
+
+
+def _delta(last_week, name):
+    change = (last_week or {}).get(f"{name}_change")
+    return f"{change:+.1f}% آخر أسبوع" if change is not None else None
+
+
+def render_carrier_summary(companies_data):
+    """مقارنة مؤشرات الشركات من ملفات الملخص (بدون تحميل بيانات الشحنات)"""
+    summaries = read_summaries()
+    st.markdown("### 📊 ملخص الشركات")
+    if not summaries:
+        st.info("📋 لا توجد ملخصات بعد - ستظهر هنا بعد رفع أو معالجة بيانات أي شركة")
+        return
+
+    for carrier, summary in summaries.items():
+        company = companies_data.get(CARRIER_KEYS.get(carrier), {})
+        last_week = summary.get('last_week')
+
+        st.markdown(f"#### {company.get('logo', '📦')} {company.get('name', carrier)}")
+        col1, col2, col3, col4, col5 = st.columns(5)
+        col1.metric("الشحنات", f"{summary['volume']:,}",
+                    f"{last_week['volume']:,} آخر أسبوع" if last_week else None, delta_color="off")
+        col2.metric("DR", _format_rate(summary.get('dr')), _delta(last_week, 'dr'))
+        col3.metric("FDS", _format_rate(summary.get('fds')), _delta(last_week, 'fds'))
+        col4.metric("SLA", _format_rate(summary.get('sla')), _delta(last_week, 'sla'))
+        col5.metric("Pending", _format_rate(summary.get('pending')), _delta(last_week, 'pending'),
+                    delta_color="inverse")
+
+        updated_at = str(summary.get('updated_at', '')).replace('T', ' ')
+        week_label = f" | آخر أسبوع: {last_week['week']}" if last_week else ""
+        st.caption(f"🕒 {updated_at} | المصدر: {summary.get('source') or '—'}{week_label}")
+
+    trend_rows = [{'الشركة': CARRIER_KEYS.get(carrier, carrier), **week}
+                  for carrier, summary in summaries.items() for week in summary.get('trend', [])]
+    if trend_rows:
+        with st.expander("📈 اتجاه آخر الأسابيع"):
+            st.dataframe(pd.DataFrame(trend_rows), use_container_width=True, hide_index=True)
@@ -5,6 +5,11 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import os
+from session_memory import render_memory_status
+from perf_panel import render_cache_admin
+from hub_summary import render_carrier_summary
+from shipment_search import render_shipment_search
+from prewarm import start_prewarm, render_prewarm_status
 st.markdown("""
 <style>
     /* إخفاء كل شيء في الهيدر */
@@ -146,6 +151,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# تجهيز آخر نتائج دفعية وتحليلاتها في الخلفية قبل فتح صفحات الشركات
+start_prewarm()
+
 # إضافة زر تسجيل الخروج في الشريط الجانبي
 with st.sidebar:
     st.markdown("### 🔐 تسجيل الخروج")
@@ -419,6 +427,12 @@ for company_id, company in companies_data.items():
 
 st.markdown('</div>', unsafe_allow_html=True)
 
+# مقارنة مؤشرات الشركات من ملفات الملخص الصغيرة
+render_carrier_summary(companies_data)
+
+# بحث فوري عن شحنة في بيانات كل الشركات المحملة
+render_shipment_search(companies_data)
+
 # استيراد مدير البيانات المشتركة مع معالجة الأخطاء
 try:
     from shared_data import get_data_manager, show_data_status
@@ -496,6 +510,9 @@ with st.sidebar:
         st.markdown("### 🔄 نظام البيانات المشتركة")
         st.success("✅ نشط - البيانات محفوظة بين الصفحات")
     
+    render_memory_status()
+    render_prewarm_status()
+    
     # معلومات الاستضافة
     st.markdown("### 🌐 معلومات الاستضافة")
     st.info("""
@@ -504,6 +521,10 @@ with st.sidebar:
     **التحديث:** تلقائي من GitHub
     """)
 
+# إحصائيات الذاكرة المؤقتة للدوال المحفوظة (مشتركة بين جميع المستخدمين)
+with st.expander("🧰 الذاكرة المؤقتة"):
+    render_cache_admin()
+
 # تذييل مع معلومات الحماية
 st.markdown("---")
 st.markdown("""
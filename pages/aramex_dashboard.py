@@ -13,9 +13,21 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import numpy as np
 from datetime import datetime, timedelta
 import os
+from chart_cache import get_cached_figure
+from chart_data import limit_categories, optimize_figure, format_reduction_report
+from artifact_loader import select_artifact_run, ARTIFACT_SOURCE
+from perf_panel import begin_perf_run, cached_stage, timed_stage, show_chart, show_table, render_perf_panel
+from session_memory import track_dataset, use_dataset, untrack_dataset, dataset_size, has_dataset
+from hub_summary import publish_summary
+from history_view import render_history
+from prewarm import adopt_prewarmed
+from shipping_core import aramex as aramex_core
+from shipping_core import sla as sla_core
+from shipping_core.cache import invalidate
+from shipping_core.instrumentation import span
+from shipping_core.memory import format_bytes
 
 # ==================== إعدادات الصفحة ====================
 st.set_page_config(
@@ -25,6 +37,8 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+begin_perf_run('aramex')
+
 # ==================== Session State ====================
 if 'show_upload' not in st.session_state:
     st.session_state.show_upload = False
@@ -40,53 +54,35 @@ def save_sla_data(df, source="manual"):
         'source': source,
         'total_cities': len(df)
     }
+    track_dataset('sla_saved_data')
     st.success(f"تم حفظ بيانات اتفاقية SLA! ({len(df):,} مدينة)")
+    if has_aramex_data():
+        saved_data = get_aramex_data()
+        publish_summary('aramex', saved_data['main_df'], df, saved_data['source'])
 
 def get_sla_data():
     """استرجاع بيانات SLA"""
-    return st.session_state.get('sla_saved_data', None)
+    return use_dataset('sla_saved_data')
 
 def has_sla_data():
     """التحقق من وجود بيانات SLA"""
-    saved_data = get_sla_data()
-    return saved_data is not None and 'sla_df' in saved_data
+    return has_dataset('sla_saved_data', 'sla_df')
 
 def clear_sla_data():
     """مسح بيانات SLA"""
     if 'sla_saved_data' in st.session_state:
         del st.session_state['sla_saved_data']
+        untrack_dataset('sla_saved_data')
         st.success("تم مسح بيانات اتفاقية SLA")
 
-@st.cache_data(show_spinner=False)
+@cached_stage('enrichment', namespace='aramex', show_spinner=False)
 def process_sla_data(df):
     """معالجة بيانات SLA"""
     df.columns = df.columns.str.strip()
-    
-    city_col = None
-    days_col = None
-    
-    for col in df.columns:
-        col_lower = str(col).lower()
-        if any(keyword in col_lower for keyword in ['city', 'مدينة', 'destination']):
-            city_col = col
-        elif any(keyword in col_lower for keyword in ['day', 'يوم', 'أيام', 'sla', 'target']):
-            days_col = col
-    
-    if city_col is None or days_col is None:
-        if len(df.columns) >= 2:
-            city_col = df.columns[0]
-            days_col = df.columns[1]
+    city_col, days_col, _ = sla_core.find_sla_columns(df.columns)
     
     if city_col and days_col:
-        sla_clean = pd.DataFrame({
-            'المدينة': df[city_col].astype(str).str.strip(),
-            'SLA_أيام': pd.to_numeric(df[days_col], errors='coerce')
-        })
-        
-        sla_clean = sla_clean.dropna()
-        sla_clean = sla_clean[sla_clean['المدينة'] != '']
-        
-        return sla_clean
+        return sla_core.build_sla_table(df, city_col, days_col)
     else:
         st.error("لم يتم العثور على اعمدة المدينة والايام في ملف SLA")
         return pd.DataFrame()
@@ -101,608 +97,71 @@ def save_aramex_data(df, source="manual"):
         'total_rows': len(df),
         'total_columns': len(df.columns)
     }
+    track_dataset('aramex_saved_data')
     st.success(f"تم حفظ بيانات Aramex! ({len(df):,} شحنة)")
+    publish_summary('aramex', df, get_sla_data()['sla_df'] if has_sla_data() else None, source)
 
 def get_aramex_data():
     """استرجاع بيانات Aramex"""
-    return st.session_state.get('aramex_saved_data', None)
+    return use_dataset('aramex_saved_data')
 
 def has_aramex_data():
     """التحقق من وجود بيانات Aramex"""
-    saved_data = get_aramex_data()
-    return saved_data is not None and 'main_df' in saved_data
+    return has_dataset('aramex_saved_data', 'main_df')
 
 def clear_aramex_data():
     """مسح بيانات Aramex"""
     if 'aramex_saved_data' in st.session_state:
         del st.session_state['aramex_saved_data']
+        untrack_dataset('aramex_saved_data')
         st.success("تم مسح بيانات Aramex")
 
-def safe_date_conversion(series, column_name):
-    """تحويل آمن وسريع للتواريخ"""
-    if series is None or len(series) == 0:
-        return pd.Series(dtype='datetime64[ns]')
-    
-    # محاولة التحويل المباشر أولاً (الأسرع)
-    try:
-        converted = pd.to_datetime(series, errors='coerce')
-        if not converted.isna().all():
-            return converted
-    except:
-        pass
-    
-    # محاولة معالجة الأرقام (Excel serial dates) - محسن
-    try:
-        numeric_series = pd.to_numeric(series, errors='coerce')
-        valid_mask = (numeric_series >= 1) & (numeric_series <= 50000)  # نطاق أضيق للسرعة
-        if valid_mask.any():
-            converted = pd.to_datetime(numeric_series, errors='coerce', origin='1899-12-30', unit='D')
-            current_year = datetime.now().year
-            reasonable_mask = (converted.dt.year >= 2020) & (converted.dt.year <= current_year + 1)
-            if reasonable_mask.any():
-                return converted
-    except:
-        pass
-    
-    # إرجاع سلسلة فارغة إذا فشلت المحاولات
-    return pd.Series([pd.NaT] * len(series), dtype='datetime64[ns]')
-@st.cache_data(show_spinner=False, max_entries=5, ttl=600)
+@cached_stage('enrichment', namespace='aramex', show_spinner=False, max_entries=5, ttl=600)
 def process_aramex_data(df):
     """معالجة بيانات Aramex الرئيسية مع التصنيف الجديد للحالات"""
-    
-    # خريطة الأعمدة
-    column_mapping = {
-        'AWB': 'رقم_الشحنة',
-        'Status': 'الحالة',
-        'Destination City': 'المدينة_الوجهة',
-        'Origin City': 'المدينة_المنشأ',
-        'Pickup Date (Creation Date)': 'تاريخ_الاستلام',
-        'First Out For Delivery': 'المحاولة_الأولى',
-        '2nd Delivery Attempt': 'المحاولة_الثانية', 
-        '3rd Delivery Attempt': 'المحاولة_الثالثة',
-        'Total Delivery Attempts': 'إجمالي_المحاولات',
-        'Last Attempted Delivery Action Date': 'تاريخ_آخر_محاولة',
-        'Expected Delivery Date': 'التاريخ_المتوقع_للتسليم',
-        'Transit Days': 'أيام_النقل',
-        'Weight': 'الوزن',
-        'COD Value': 'المبلغ_المستحق',
-        'Destination city tier': 'مستوى_المدينة',
-        'Destination Country': 'الدولة_الوجهة',
-        'Consignee Reference 1': 'المرجع_الشحنة_1',
-        'Delivery Date': 'تاريخ_التسليم'
-    }
-    
-    # إعادة تسمية الأعمدة
-    df = df.rename(columns={k: v for k, v in column_mapping.items() if k in df.columns})
-    
-    # معالجة التواريخ المحسنة
-    date_columns = ['تاريخ_الاستلام', 'المحاولة_الأولى', 'المحاولة_الثانية', 'المحاولة_الثالثة', 'تاريخ_التسليم']
-    for col in date_columns:
-        if col in df.columns:
-            df[col] = safe_date_conversion(df[col], col)
-    
-    # معالجة الأرقام
-    numeric_columns = ['إجمالي_المحاولات', 'أيام_النقل', 'الوزن', 'المبلغ_المستحق']
-    for col in numeric_columns:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    # التصنيف الجديد لحالة التسليم
-    if 'الحالة' in df.columns:
-        status_upper = df['الحالة'].astype(str).str.upper().str.strip()
-        
-        # ✅ تم التسليم (Delivered)
-        delivered_statuses = [
-            'DELIVERED', 'SHIPMENT DELIVERED', 'PAID', 'SHIPMENT DELIVERED OK'
-        ]
-
-        # 🚚 جاري التسليم (In Progress)
-        in_progress_statuses = [
-            'EXCEPTION', 'FORWARD TO DELIVERY WAREHOUSE', 'HAL', 'HELD AT CUSTOMS',
-            'HELD FOR PICKUP', 'IN PROGRESS', 'OUT FOR DELIVERY', 'SHIPMENT OUT FOR DELIVERY',
-            'SORTING', 'TRANSIT', 'PENDING', 'PROCESSING', 'IN TRANSIT', 'DEPOSITED',
-            'EXPIRED', 'RECEIVED-INBOUND TEAM', 'LOCKED', 'NOT-DELIVERED', 'NOT-DEPOSITED',
-            'R-WAITING', 'R-DEPOSITED', 'IN-TRANSIT-R', 'PICKED UP', 'AWAITING CONSIGNEE FOR COLLECTION',
-            'NO RESPONSE', 'INCORRECT PHONE', 'AT DESTINATION FACILITY', 'LEFT ORIGIN',
-            'STILL AT ORIGIN', 'AT HUB FACILITY', 'INCORRECT ADDRESS', 'SHIPMENT STORED AT WAREHOUSE',
-            'SHIPMENT CONFISCATED', 'CUSTOMER NOT AVAILABLE', 'CUSTOMER CONTACT ATTEMPTS COMPLETED',
-            'ATTEMPTED TO DELIVER', 'REDIRECT UNDER A NEW SHIPMENT', 'UNDER DELIVERY',
-            'ADDRESS INFORMATION NEEDED, CONTACT DHL', 'ARRIVED AT DELIVERY FACILITY',
-            'AWAITING COLLECTION BY RECIPIENT AS REQUESTED', 'CLEARANCE DELAY CD',
-            'CLEARANCE PROCESSING COMPLETE', 'CLOSED SHIPMENT', 'CUSTOMS STATUS UPDATED',
-            'DELIVERY ARRANGED, NO DETAILS EXPECTED', 'DEPARTED FACILITY',
-            'FORWARDED FOR DELIVERY – DETAILS EXPECTED', 'PROCESSED AT DHL LOCATION',
-            'RECIPIENT REFUSED DELIVERY', 'SCHEDULED FOR DELIVERY AS AGREED',
-            'SCHEDULED FOR DELIVERY ND', 'SHIPMENT HELD – AVAILABLE UPON RECEIPT OF PAYMENT',
-            'SHIPMENT ON HOLD', 'WITH DELIVERY COURIER', 'DATA RECEIVED', 'ARRIVED', 'SHIPPED',
-            'ADDRESS ACQUIRED', 'CUSTOMER NOT ANSWERING'
-        ]
-        
-        # 🔁 مرتجع (Returned)
-        returned_statuses = [
-            'RETURN TO SHIPPER', 'RETURNED', 'REFUSED', 'OTHER FINAL STATUS',
-            'CANCELLED', 'CANCELED', 'NOTRECEIVED', 'SHIPMENT REFUSED',
-            'CUSTOMER HAS REFUSED THE SHIPMENT', 'RETURNED TO SHIPPER SHIPMENT NOT DELIVERED',
-            'UNABLE TO LOCATE', 'TO BE RETURN TO SHIPPER', 'SKELETON RECORD TERMINATED',
-            'TERMINATED'
-        ]
-        
-        # ❌ استرجاع (Lost/Partial Return)
-        lost_statuses = ['LOST', 'PICKUP']
-        
-        # إنشاء الشروط للتصنيف
-        delivered_condition = status_upper.isin(delivered_statuses)
-        in_progress_condition = status_upper.isin(in_progress_statuses)
-        returned_condition = status_upper.isin(returned_statuses)
-        lost_condition = status_upper.isin(lost_statuses)
-        
-        # تطبيق التصنيف
-        df['حالة_التسليم'] = np.select(
-            [delivered_condition, in_progress_condition, returned_condition, lost_condition],
-            ['تم التسليم', 'قيد التوصيل', 'مرتجع', 'استرجاع'],
-            default='أخرى'
-        )
-    
-    # تحديد الشحنات المستثناة
-    if 'المرجع_الشحنة_1' in df.columns:
-        df['للاستثناء'] = df['المرجع_الشحنة_1'].astype(str).str.contains('_return', na=False, case=False)
-    else:
-        df['للاستثناء'] = False
-    
-    # حساب أيام المحاولة الأولى
-    if 'تاريخ_الاستلام' in df.columns and 'المحاولة_الأولى' in df.columns:
-        mask = df['تاريخ_الاستلام'].notna() & df['المحاولة_الأولى'].notna()
-        if mask.sum() > 0:
-            try:
-                days_diff = (df.loc[mask, 'المحاولة_الأولى'] - df.loc[mask, 'تاريخ_الاستلام']).dt.days
-                df['أيام_للمحاولة_الأولى'] = np.nan
-                df.loc[mask, 'أيام_للمحاولة_الأولى'] = days_diff
-                valid_mask = (df['أيام_للمحاولة_الأولى'] >= 0) & (df['أيام_للمحاولة_الأولى'] <= 365)
-                df.loc[~valid_mask, 'أيام_للمحاولة_الأولى'] = np.nan
-            except Exception as e:
-                st.warning("تحذير: لم يتم حساب أيام المحاولة الأولى بسبب مشكلة في التواريخ")
-                df['أيام_للمحاولة_الأولى'] = np.nan
-    
-    return df
+    return aramex_core.process_aramex_data(df)
 
-# ==================== دوال إضافة معلومات SLA والـ FDS ====================
+@timed_stage('enrichment')
 def add_sla_and_fds_columns(df, sla_df=None):
-    """إضافة أعمدة SLA وحسابات FDS"""
-    
-    # نسخ البيانات
-    df_enhanced = df.copy()
-    
-    # إضافة الأعمدة الجديدة
-    df_enhanced['SLA_أيام'] = np.nan
-    df_enhanced['حالة_SLA_محاولة_أولى'] = 'غير محدد'
-    df_enhanced['تسليم_من_أول_محاولة'] = False
-    df_enhanced['ضمن_SLA'] = False
-    df_enhanced['مؤهل_FDS'] = False
-    
-    # إضافة معلومات SLA إذا توفرت
-    if sla_df is not None and len(sla_df) > 0:
-        # دمج بيانات SLA
-        sla_dict = dict(zip(sla_df['المدينة'], sla_df['SLA_أيام']))
-        df_enhanced['SLA_أيام'] = df_enhanced['المدينة_الوجهة'].map(sla_dict)
-    
-    # حساب حالة SLA للمحاولة الأولى
-    if 'أيام_للمحاولة_الأولى' in df_enhanced.columns:
-        for idx, row in df_enhanced.iterrows():
-            days_to_first = row['أيام_للمحاولة_الأولى']
-            sla_days = row['SLA_أيام']
-            
-            if pd.notna(days_to_first):
-                if pd.notna(sla_days):
-                    if days_to_first <= sla_days:
-                        df_enhanced.at[idx, 'حالة_SLA_محاولة_أولى'] = 'في SLA' if days_to_first == sla_days else 'قبل SLA'
-                        df_enhanced.at[idx, 'ضمن_SLA'] = True
-                    else:
-                        df_enhanced.at[idx, 'حالة_SLA_محاولة_أولى'] = 'بعد SLA'
-                else:
-                    # استخدام SLA افتراضي = 2 أيام
-                    default_sla = 2
-                    if days_to_first <= default_sla:
-                        df_enhanced.at[idx, 'حالة_SLA_محاولة_أولى'] = 'ضمن افتراضي'
-                        df_enhanced.at[idx, 'ضمن_SLA'] = True
-                    else:
-                        df_enhanced.at[idx, 'حالة_SLA_محاولة_أولى'] = 'بعد افتراضي'
-    
-    # تحديد الشحنات المُسلمة من أول محاولة
-    if 'تاريخ_التسليم' in df_enhanced.columns and 'المحاولة_الأولى' in df_enhanced.columns:
-        # التحقق من تطابق تاريخ التسليم مع تاريخ المحاولة الأولى (نفس اليوم)
-        delivery_mask = (
-            df_enhanced['حالة_التسليم'] == 'تم التسليم'
-        ) & (
-            df_enhanced['تاريخ_التسليم'].notna()
-        ) & (
-            df_enhanced['المحاولة_الأولى'].notna()
-        ) & (
-            df_enhanced['تاريخ_التسليم'].dt.date == df_enhanced['المحاولة_الأولى'].dt.date
-        )
-        
-        df_enhanced.loc[delivery_mask, 'تسليم_من_أول_محاولة'] = True
-    else:
-        # البديل: استخدام عدد المحاولات = 1
-        if 'إجمالي_المحاولات' in df_enhanced.columns:
-            delivery_mask = (
-                df_enhanced['حالة_التسليم'] == 'تم التسليم'
-            ) & (
-                df_enhanced['إجمالي_المحاولات'] == 1
-            )
-            
-            df_enhanced.loc[delivery_mask, 'تسليم_من_أول_محاولة'] = True
-    
-    # تحديد الشحنات المؤهلة لـ FDS
-    fds_mask = (
-        df_enhanced['تسليم_من_أول_محاولة'] == True
-    ) & (
-        df_enhanced['ضمن_SLA'] == True
-    )
-    
-    df_enhanced.loc[fds_mask, 'مؤهل_FDS'] = True
-    
-    return df_enhanced
-# ==================== دوال التحليل المحدثة مع FDS ====================
-@st.cache_data(show_spinner=False)
-def analyze_delivery_attempts_with_fds(df):
-    """تحليل محاولات التوصيل مع FDS"""
-    analysis = {}
-    
-    if 'حالة_التسليم' not in df.columns:
-        return {}
-    
-    total_shipments = len(df)
-    
-    if total_shipments == 0:
-        return {}
-    
-    # حساب DR (Delivery Rate)
-    delivered_shipments = len(df[df['حالة_التسليم'] == 'تم التسليم'])
-    dr_rate = (delivered_shipments / total_shipments * 100)
-    analysis['DR'] = round(dr_rate, 1)
-    
-    # حساب FDS (مع SLA)
-    if 'مؤهل_FDS' in df.columns:
-        fds_count = len(df[df['مؤهل_FDS'] == True])
-        fds_rate = (fds_count / total_shipments * 100)
-        analysis['FDS'] = round(fds_rate, 1)
-        analysis['عدد_FDS'] = fds_count
-    
-    # حساب SLA Rate الإجمالي
-    if 'ضمن_SLA' in df.columns:
-        sla_compliant_count = len(df[df['ضمن_SLA'] == True])
-        sla_rate = (sla_compliant_count / total_shipments * 100)
-        analysis['SLA_Rate'] = round(sla_rate, 1)
-        analysis['عدد_SLA_ملتزم'] = sla_compliant_count
-    
-    # تحليل حسب عدد المحاولات (للمسلم فقط)
-    delivered_df = df[df['حالة_التسليم'] == 'تم التسليم']
-    
-    if len(delivered_df) > 0 and 'إجمالي_المحاولات' in delivered_df.columns:
-        delivered_df = delivered_df[delivered_df['إجمالي_المحاولات'].notna()]
-        delivered_df = delivered_df[delivered_df['إجمالي_المحاولات'] > 0]
-        
-        total_delivered_shipments = len(delivered_df)
-        
-        if total_delivered_shipments > 0:
-            attempt_counts = delivered_df['إجمالي_المحاولات'].value_counts().sort_index()
-            
-            percentages = {
-                'المحاولة 1': 0, 
-                'المحاولة 2': 0, 
-                'المحاولة 3': 0, 
-                'أكثر من 3 محاولات': 0
-            }
-            
-            for attempt, count in attempt_counts.items():
-                percentage = (count / total_delivered_shipments) * 100
-                
-                if attempt == 1:
-                    percentages['المحاولة 1'] = percentage
-                elif attempt == 2:
-                    percentages['المحاولة 2'] = percentage
-                elif attempt == 3:
-                    percentages['المحاولة 3'] = percentage
-                elif attempt > 3:
-                    percentages['أكثر من 3 محاولات'] += percentage
-            
-            for key, value in percentages.items():
-                analysis[key] = round(value, 1)
-    
-    return analysis
+    """إضافة حالات SLA والـ FDS"""
+    return aramex_core.add_sla_and_fds_columns(df, sla_df)
 
-@st.cache_data(show_spinner=False, ttl=300)
+# ==================== دوال التحليل المحدثة مع FDS ====================
+@cached_stage('analysis', namespace='aramex', show_spinner=False, ttl=300)
 def analyze_weekly_trends_enhanced(df):
     """تحليل الاتجاهات الأسبوعية للأداء مع FDS"""
-    if 'تاريخ_الاستلام' not in df.columns or len(df) == 0:
-        return pd.DataFrame()
-    
-    df_with_dates = df[df['تاريخ_الاستلام'].notna()].copy()
-    
-    if len(df_with_dates) == 0:
-        return pd.DataFrame()
-    
-    try:
-        df_with_dates['تاريخ_الاستلام'] = pd.to_datetime(df_with_dates['تاريخ_الاستلام'])
-        df_with_dates['بداية_الأسبوع'] = df_with_dates['تاريخ_الاستلام'].dt.to_period('W').dt.start_time
-        df_with_dates['رقم_الأسبوع'] = df_with_dates['تاريخ_الاستلام'].dt.isocalendar().week
-    except Exception as e:
-        return pd.DataFrame()
-    
-    weekly_analysis = []
-    
-    for week_start, week_data in df_with_dates.groupby('بداية_الأسبوع'):
-        total_shipments = len(week_data)
-        
-        if total_shipments == 0:
-            continue
-        
-        # DR Rate
-        delivered_count = (week_data['حالة_التسليم'] == 'تم التسليم').sum() if 'حالة_التسليم' in week_data.columns else 0
-        dr_rate = (delivered_count / total_shipments * 100)
-        
-        # FDS
-        fds_count = 0
-        if 'مؤهل_FDS' in week_data.columns:
-            fds_count = (week_data['مؤهل_FDS'] == True).sum()
-        fds_rate = (fds_count / total_shipments * 100)
-        
-        # SLA Rate
-        sla_count = 0
-        if 'ضمن_SLA' in week_data.columns:
-            sla_count = (week_data['ضمن_SLA'] == True).sum()
-        sla_rate = (sla_count / total_shipments * 100)
-        
-        # Pending Rate
-        pending_count = (week_data['حالة_التسليم'] == 'قيد التوصيل').sum() if 'حالة_التسليم' in week_data.columns else 0
-        pending_rate = (pending_count / total_shipments * 100)
-        
-        week_number = week_data['رقم_الأسبوع'].iloc[0] if len(week_data) > 0 else 0
-        week_label = f"W{week_number}-{week_start.year}"
-        
-        weekly_analysis.append({
-            'الأسبوع': week_label,
-            'رقم_الأسبوع_الرقمي': week_number,
-            'تاريخ_البداية': week_start,
-            'إجمالي_الشحنات': total_shipments,
-            'DR': round(dr_rate, 1),
-            'FDS': round(fds_rate, 1),
-            'SLA_Rate': round(sla_rate, 1),
-            'Pending': round(pending_rate, 1)
-        })
-    
-    result_df = pd.DataFrame(weekly_analysis)
-    
-    if len(result_df) > 0:
-        result_df = result_df.sort_values('تاريخ_البداية').reset_index(drop=True)
-    
-    return result_df
+    return aramex_core.analyze_weekly_trends_enhanced(df)
 
-@st.cache_data(show_spinner=False, ttl=300)
+@cached_stage('analysis', namespace='aramex', show_spinner=False, ttl=300)
 def analyze_cities_performance_enhanced(df, city_filter=None, country_filter=None):
     """تحليل أداء المدن مع FDS"""
-    if 'المدينة_الوجهة' not in df.columns or len(df) == 0:
-        return pd.DataFrame()
-    
-    df_filtered = df.copy()
-    if city_filter and city_filter != 'الكل':
-        df_filtered = df_filtered[df_filtered['المدينة_الوجهة'] == city_filter]
-    if country_filter and country_filter != 'الكل' and 'الدولة_الوجهة' in df.columns:
-        df_filtered = df_filtered[df_filtered['الدولة_الوجهة'] == country_filter]
-    
-    if len(df_filtered) == 0:
-        return pd.DataFrame()
-    
-    # تجميع البيانات حسب المدينة
-    city_stats = []
-    
-    for city, city_data in df_filtered.groupby('المدينة_الوجهة'):
-        total_shipments = len(city_data)
-        
-        if total_shipments == 0:
-            continue
-        
-        # حساب المؤشرات
-        delivered_count = (city_data['حالة_التسليم'] == 'تم التسليم').sum() if 'حالة_التسليم' in city_data.columns else 0
-        dr_rate = (delivered_count / total_shipments * 100)
-        
-        # FDS
-        fds_count = (city_data['مؤهل_FDS'] == True).sum() if 'مؤهل_FDS' in city_data.columns else 0
-        fds_rate = (fds_count / total_shipments * 100)
-        
-        # SLA Rate
-        sla_count = 0
-        if 'ضمن_SLA' in city_data.columns:
-            sla_count = (city_data['ضمن_SLA'] == True).sum()
-        sla_rate = (sla_count / total_shipments * 100)
-        
-        # Pending Rate
-        pending_count = (city_data['حالة_التسليم'] == 'قيد التوصيل').sum() if 'حالة_التسليم' in city_data.columns else 0
-        pending_rate = (pending_count / total_shipments * 100)
-        
-        # متوسط الأيام
-        avg_days = city_data['أيام_للمحاولة_الأولى'].mean() if 'أيام_للمحاولة_الأولى' in city_data.columns else 0
-        
-        # متوسط المحاولات
-        avg_attempts = city_data['إجمالي_المحاولات'].mean() if 'إجمالي_المحاولات' in city_data.columns else 0
-        
-        # SLA المحدد للمدينة
-        city_sla = city_data['SLA_أيام'].iloc[0] if 'SLA_أيام' in city_data.columns and city_data['SLA_أيام'].notna().any() else 'غير محدد'
-        
-        # الدولة
-        country = city_data['الدولة_الوجهة'].iloc[0] if 'الدولة_الوجهة' in city_data.columns else 'غير محدد'
-        
-        city_stats.append({
-            'المدينة': city,
-            'الدولة': country,
-            'إجمالي_الشحنات': total_shipments,
-            'SLA_أيام': city_sla,
-            'DR': round(dr_rate, 1),
-            'FDS': round(fds_rate, 1),
-            'SLA_Rate': round(sla_rate, 1),
-            'Pending': round(pending_rate, 1),
-            'متوسط_الأيام': round(avg_days, 1) if pd.notna(avg_days) else 0,
-            'متوسط_المحاولات': round(avg_attempts, 1) if pd.notna(avg_attempts) else 0
-        })
-    
-    result_df = pd.DataFrame(city_stats)
-    
-    if len(result_df) > 0:
-        result_df = result_df.sort_values('إجمالي_الشحنات', ascending=False)
-    
-    return result_df
+    return aramex_core.analyze_cities_performance_enhanced(df, city_filter, country_filter)
 
-# ==================== دالة عرض الحالات الأخرى ====================
-def analyze_other_statuses(df):
-    """تحليل الحالات غير المصنفة"""
-    if 'حالة_التسليم' not in df.columns or 'الحالة' not in df.columns:
-        return pd.DataFrame()
-    
-    other_shipments = df[df['حالة_التسليم'] == 'أخرى'].copy()
-    
-    if len(other_shipments) == 0:
-        return pd.DataFrame()
-    
-    status_analysis = other_shipments['الحالة'].value_counts().reset_index()
-    status_analysis.columns = ['الحالة_الأصلية', 'عدد_الشحنات']
-    status_analysis['النسبة_المئوية'] = (status_analysis['عدد_الشحنات'] / len(other_shipments) * 100).round(2)
-    
-    return status_analysis
-
-@st.cache_data(show_spinner=False, ttl=300)
+@cached_stage('analysis', namespace='aramex', show_spinner=False, ttl=300)
 def analyze_delayed_shipments(df, sla_df=None):
     """تحليل الشحنات المتأخرة مع SLA"""
-    if len(df) == 0:
-        return pd.DataFrame()
-    
-    # تصفية الشحنات قيد التوصيل فقط
-    pending_shipments = df[df['حالة_التسليم'] == 'قيد التوصيل'].copy() if 'حالة_التسليم' in df.columns else df.copy()
-    
-    if len(pending_shipments) == 0:
-        return pd.DataFrame()
-    
-    # تصفية الشحنات التي لها تاريخ استلام
-    pending_shipments = pending_shipments[pending_shipments['تاريخ_الاستلام'].notna()].copy()
-    
-    if len(pending_shipments) == 0:
-        return pd.DataFrame()
-    
-    # حساب الأيام منذ الاستلام
-    today = datetime.now()
-    pending_shipments['أيام_منذ_الاستلام'] = (today - pending_shipments['تاريخ_الاستلام']).dt.days
-    
-    # تصفية الشحنات التي مضى عليها أكثر من 0 أيام
-    pending_shipments = pending_shipments[pending_shipments['أيام_منذ_الاستلام'] >= 0]
-    
-    if len(pending_shipments) == 0:
-        return pd.DataFrame()
-    
-    # إضافة معلومات SLA إذا توفرت
-    if sla_df is not None and len(sla_df) > 0:
-        # دمج بيانات SLA
-        sla_dict = dict(zip(sla_df['المدينة'], sla_df['SLA_أيام']))
-        pending_shipments['SLA_أيام'] = pending_shipments['المدينة_الوجهة'].map(sla_dict)
-        
-        # تحديد الشحنات المتأخرة (تجاوزت SLA)
-        pending_shipments['متأخر'] = (
-            pending_shipments['SLA_أيام'].notna() & 
-            (pending_shipments['أيام_منذ_الاستلام'] > pending_shipments['SLA_أيام'])
-        )
-        
-        # تصفية الشحنات المتأخرة فقط
-        delayed_shipments = pending_shipments[pending_shipments['متأخر']].copy()
-        
-        if len(delayed_shipments) > 0:
-            # حساب أيام التأخير
-            delayed_shipments['أيام_التأخير'] = (
-                delayed_shipments['أيام_منذ_الاستلام'] - delayed_shipments['SLA_أيام']
-            )
-    else:
-        # إذا لم تتوفر بيانات SLA، اعتبر الشحنات متأخرة بعد 3 أيام (افتراضي)
-        default_sla = 3
-        pending_shipments['SLA_أيام'] = default_sla
-        pending_shipments['متأخر'] = pending_shipments['أيام_منذ_الاستلام'] > default_sla
-        
-        delayed_shipments = pending_shipments[pending_shipments['متأخر']].copy()
-        
-        if len(delayed_shipments) > 0:
-            delayed_shipments['أيام_التأخير'] = (
-                delayed_shipments['أيام_منذ_الاستلام'] - default_sla
-            )
-    
-    if len(delayed_shipments) == 0:
-        return pd.DataFrame()
-    
-    # إضافة تصنيف شدة التأخير
-    def classify_delay_severity(days):
-        if days <= 2:
-            return 'تأخير بسيط'
-        elif days <= 5:
-            return 'تأخير متوسط'
-        elif days <= 10:
-            return 'تأخير شديد'
-        else:
-            return 'تأخير حرج'
-    
-    delayed_shipments['شدة_التأخير'] = delayed_shipments['أيام_التأخير'].apply(classify_delay_severity)
-    
-    # تحديد الأعمدة المطلوبة للعرض مع إضافة عمود أيام التأخير عن SLA
-    display_columns = ['رقم_الشحنة', 'المدينة_الوجهة', 'الدولة_الوجهة', 'تاريخ_الاستلام', 
-                      'أيام_منذ_الاستلام', 'SLA_أيام', 'أيام_التأخير_عن_SLA', 'أيام_التأخير', 'شدة_التأخير', 'الحالة']
-    
-    # إضافة عمود أيام التأخير عن SLA (الحساب الصحيح)
-    if len(delayed_shipments) > 0:
-        # حساب تاريخ انتهاء SLA (تاريخ الاستلام + عدد أيام SLA)
-        today = datetime.now()
-        
-        # حساب الأيام التي تجاوزت SLA
-        delayed_shipments['تاريخ_انتهاء_SLA'] = delayed_shipments['تاريخ_الاستلام'] + pd.to_timedelta(delayed_shipments['SLA_أيام'], unit='D')
-        delayed_shipments['أيام_التأخير_عن_SLA'] = (today - delayed_shipments['تاريخ_انتهاء_SLA']).dt.days
-        
-        # التأكد من أن القيم موجبة فقط (للشحنات المتأخرة فعلاً)
-        delayed_shipments['أيام_التأخير_عن_SLA'] = delayed_shipments['أيام_التأخير_عن_SLA'].clip(lower=0)
-    
-    # التأكد من وجود الأعمدة
-    available_columns = [col for col in display_columns if col in delayed_shipments.columns]
-    
-    result = delayed_shipments[available_columns].copy()
-    
-    # ترتيب حسب أيام التأخير (الأكثر تأخيراً أولاً)
-    result = result.sort_values('أيام_التأخير', ascending=False)
-    
-    return result
+    return aramex_core.analyze_delayed_shipments(df, sla_df)
+
+@timed_stage('analysis')
+def analyze_other_statuses(df):
+    """تحليل الحالات الأخرى"""
+    return aramex_core.analyze_other_statuses(df)
 
+@timed_stage('analysis')
 def analyze_delay_summary(delayed_df):
-    """تحليل ملخص الشحنات المتأخرة"""
-    if len(delayed_df) == 0:
-        return {}
-    
-    summary = {
-        'إجمالي_المتأخرة': len(delayed_df),
-        'متوسط_أيام_التأخير': delayed_df['أيام_التأخير'].mean(),
-        'أقصى_تأخير': delayed_df['أيام_التأخير'].max(),
-        'أقل_تأخير': delayed_df['أيام_التأخير'].min()
-    }
-    
-    # تحليل حسب شدة التأخير
-    if 'شدة_التأخير' in delayed_df.columns:
-        severity_counts = delayed_df['شدة_التأخير'].value_counts()
-        for severity, count in severity_counts.items():
-            summary[f'عدد_{severity}'] = count
-            summary[f'نسبة_{severity}'] = (count / len(delayed_df) * 100)
-    
-    # تحليل حسب المدن
-    if 'المدينة_الوجهة' in delayed_df.columns:
-        city_counts = delayed_df['المدينة_الوجهة'].value_counts()
-        summary['أكثر_المدن_تأخيراً'] = city_counts.head(5).to_dict()
-    
-    return summary
+    """ملخص الشحنات المتأخرة"""
+    return aramex_core.analyze_delay_summary(delayed_df)
+
 # ==================== دوال العرض والرسوم البيانية المحدثة ====================
 def create_fds_performance_chart(analysis_data):
     """إنشاء مخطط أداء FDS"""
     if not analysis_data or 'FDS' not in analysis_data:
         return None
-    
+
+    return get_cached_figure('aramex_fds_performance', _build_fds_performance_chart, analysis_data)
+
+def _build_fds_performance_chart(analysis_data):
+    """بناء مخطط أداء FDS من المؤشرات المجمعة"""
     categories = ['معدل التسليم (DR)', 'FDS (مع SLA)', 'SLA Rate']
     values = [
         analysis_data.get('DR', 0),
@@ -740,7 +199,11 @@ def create_weekly_performance_chart(weekly_df):
     """إنشاء مخطط الأداء الأسبوعي مع FDS"""
     if len(weekly_df) == 0:
         return None
-    
+
+    return get_cached_figure('aramex_weekly_performance', _build_weekly_performance_chart, weekly_df)
+
+def _build_weekly_performance_chart(weekly_df):
+    """بناء مخطط الأداء الأسبوعي من الجدول الأسبوعي المجمع"""
     fig = go.Figure()
     
     colors = {
@@ -788,7 +251,40 @@ def create_weekly_performance_chart(weekly_df):
     
     fig.update_yaxes(range=[0, 100])
     
-    return fig
+    return optimize_figure(fig)
+
+def _build_top_cities_chart(top_cities, metric_column, color, title):
+    """بناء مخطط أعلى المدن لمؤشر واحد من الجدول المقلص"""
+    axis_title = 'FDS (%)' if metric_column == 'FDS' else metric_column.replace('_', ' ') + ' (%)'
+    
+    fig = px.bar(
+        x=top_cities[metric_column],
+        y=top_cities['المدينة'],
+        orientation='h',
+        text=[f'{x:.1f}%' for x in top_cities[metric_column]],
+        color_discrete_sequence=[color] * len(top_cities),
+        title=title
+    )
+    
+    fig.update_traces(
+        textposition='inside',
+        textfont_size=13,
+        textfont_color='white',
+        textfont_weight='bold'
+    )
+    
+    fig.update_layout(
+        height=350,
+        font=dict(family='Cairo', size=11),
+        xaxis_title=axis_title,
+        yaxis_title='',
+        showlegend=False,
+        xaxis=dict(range=[0, 100]),
+        plot_bgcolor='rgba(248,249,250,0.8)',
+        paper_bgcolor='white'
+    )
+    
+    return optimize_figure(fig)
 
 def create_delay_severity_chart(delayed_df):
     """إنشاء مخطط شدة التأخير"""
@@ -796,7 +292,11 @@ def create_delay_severity_chart(delayed_df):
         return None
     
     severity_counts = delayed_df['شدة_التأخير'].value_counts()
-    
+
+    return get_cached_figure('aramex_delay_severity', _build_delay_severity_chart, severity_counts)
+
+def _build_delay_severity_chart(severity_counts):
+    """بناء مخطط شدة التأخير من أعداد الشحنات لكل مستوى"""
     # ألوان مختلفة لكل مستوى تأخير
     color_map = {
         'تأخير بسيط': '#f39c12',
@@ -835,10 +335,11 @@ def create_delay_severity_chart(delayed_df):
     
     return fig
 
-def display_delayed_shipments_section(df, sla_df=None):
-    """عرض قسم الشحنات المتأخرة"""
-    delayed_shipments = analyze_delayed_shipments(df, sla_df)
-    
+# أقسام العرض كـ fragments: تغيير فلاتر القسم يعيد تشغيل القسم نفسه فقط
+@st.fragment
+@timed_stage('section')
+def display_delayed_shipments_section(delayed_shipments, delay_summary, total_pending):
+    """عرض قسم الشحنات المتأخرة - التحليل محسوب مسبقاً حتى لا تعيده فلاتر الجدول"""
     if len(delayed_shipments) == 0:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
         st.markdown('<h3 class="chart-title">✅ لا توجد شحنات متأخرة</h3>', unsafe_allow_html=True)
@@ -846,9 +347,6 @@ def display_delayed_shipments_section(df, sla_df=None):
         st.markdown('</div>', unsafe_allow_html=True)
         return
     
-    # ملخص الشحنات المتأخرة
-    delay_summary = analyze_delay_summary(delayed_shipments)
-    
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
     st.markdown('<h3 class="chart-title">⏰ الشحنات المتأخرة</h3>', unsafe_allow_html=True)
     
@@ -867,14 +365,13 @@ def display_delayed_shipments_section(df, sla_df=None):
         st.metric("أقصى تأخير", f"{max_delay} يوم")
     
     with delay_col4:
-        total_pending = len(df[df['حالة_التسليم'] == 'قيد التوصيل']) if 'حالة_التسليم' in df.columns else 0
         delay_rate = (delay_summary.get('إجمالي_المتأخرة', 0) / total_pending * 100) if total_pending > 0 else 0
         st.metric("نسبة التأخير", f"{delay_rate:.1f}%")
     
     # مخطط شدة التأخير
     delay_chart = create_delay_severity_chart(delayed_shipments)
     if delay_chart:
-        st.plotly_chart(delay_chart, use_container_width=True)
+        show_chart('delay_chart', delay_chart, use_container_width=True)
     
     # جدول الشحنات المتأخرة
     st.markdown("### 📋 جدول الشحنات المتأخرة")
@@ -957,7 +454,8 @@ def display_delayed_shipments_section(df, sla_df=None):
         if 'تاريخ الاستلام' in display_delayed.columns:
             display_delayed['تاريخ الاستلام'] = display_delayed['تاريخ الاستلام'].dt.strftime('%Y-%m-%d')
         
-        st.dataframe(
+        show_table(
+            'delayed_shipments',
             display_delayed, 
             use_container_width=True, 
             height=500, 
@@ -1003,6 +501,8 @@ def display_delayed_shipments_section(df, sla_df=None):
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+@st.fragment
+@timed_stage('section')
 def display_other_statuses_section(df):
     """عرض قسم الحالات الأخرى"""
     other_analysis = analyze_other_statuses(df)
@@ -1065,7 +565,7 @@ def display_other_statuses_section(df):
         'النسبة_المئوية': 'النسبة المئوية (%)'
     })
     
-    st.dataframe(display_df, use_container_width=True, height=400, hide_index=True)
+    show_table('other_statuses', display_df, use_container_width=True, height=400, hide_index=True)
     
     if len(filtered_analysis) > 1:
         st.markdown("### 📈 أكثر الحالات الأخرى شيوعاً")
@@ -1101,7 +601,7 @@ def display_other_statuses_section(df):
             paper_bgcolor='white'
         )
         
-        st.plotly_chart(fig_other, use_container_width=True)
+        show_chart('fig_other', fig_other, use_container_width=True)
     
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
@@ -1125,6 +625,187 @@ def display_other_statuses_section(df):
     """)
     
     st.markdown('</div>', unsafe_allow_html=True)
+
+@st.fragment
+@timed_stage('section')
+def display_weekly_trends_section(weekly_trends):
+    """عرض قسم الاتجاهات الأسبوعية مع الجدول والملخص"""
+    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+    st.markdown('<h3 class="chart-title">📈 اتجاه الأداء الأسبوعي</h3>', unsafe_allow_html=True)
+    
+    if len(weekly_trends) > 0:
+        weekly_chart = create_weekly_performance_chart(weekly_trends)
+        if weekly_chart:
+            show_chart('weekly_chart', weekly_chart, use_container_width=True)
+            
+            reduction_note = format_reduction_report(weekly_chart)
+            if reduction_note:
+                st.caption(reduction_note)
+        
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col2:
+            if st.button("📊 تحميل البيانات الأسبوعية (CSV)", use_container_width=True):
+                csv_data = weekly_trends.to_csv(index=False, encoding='utf-8-sig')
+                st.download_button(
+                    label="💾 تحميل CSV",
+                    data=csv_data,
+                    file_name=f"weekly_performance_{datetime.now().strftime('%Y%m%d')}.csv",
+                    mime="text/csv",
+                    use_container_width=True
+                )
+        
+        st.markdown("### 📋 جدول الأداء الأسبوعي")
+        
+        weekly_col1, weekly_col2 = st.columns(2)
+        with weekly_col1:
+            weeks_to_show = st.selectbox("عدد الأسابيع للعرض", [5, 10, 15, 20, "الكل"], index=1, key="weekly_rows_filter")
+        
+        with weekly_col2:
+            sort_by = st.selectbox("ترتيب حسب", ["الأسبوع", "DR", "FDS", "SLA Rate"], key="weekly_sort")
+        
+        display_weekly = weekly_trends.copy()
+        
+        if sort_by == "الأسبوع":
+            display_weekly = display_weekly.sort_values('تاريخ_البداية', ascending=False)
+        elif sort_by == "DR":
+            display_weekly = display_weekly.sort_values('DR', ascending=False)
+        elif sort_by == "FDS":
+            display_weekly = display_weekly.sort_values('FDS', ascending=False)
+        elif sort_by == "SLA Rate":
+            display_weekly = display_weekly.sort_values('SLA_Rate', ascending=False)
+        
+        if weeks_to_show != "الكل":
+            display_weekly = display_weekly.head(int(weeks_to_show))
+        
+        # عرض الجدول الأسبوعي
+        display_df = display_weekly[['الأسبوع', 'إجمالي_الشحنات', 'DR', 'FDS', 'SLA_Rate']].copy()
+        display_df = display_df.rename(columns={
+            'الأسبوع': 'الأسبوع',
+            'إجمالي_الشحنات': 'إجمالي الشحنات',
+            'DR': 'DR (%)',
+            'FDS': 'FDS (%)',
+            'SLA_Rate': 'SLA Rate (%)'
+        })
+        
+        show_table('weekly_trends', display_df, use_container_width=True, height=400, hide_index=True)
+        
+        st.markdown("### 📊 ملخص الاتجاهات")
+        trend_col1, trend_col2, trend_col3 = st.columns(3)
+        
+        if len(weekly_trends) >= 2:
+            latest_week = weekly_trends.iloc[-1]
+            previous_week = weekly_trends.iloc[-2]
+            
+            dr_change = latest_week['DR'] - previous_week['DR']
+            fds_change = latest_week['FDS'] - previous_week['FDS']
+            sla_change = latest_week['SLA_Rate'] - previous_week['SLA_Rate']
+            
+            with trend_col1:
+                st.metric("DR", f"{latest_week['DR']:.1f}%", f"{dr_change:+.1f}%")
+            with trend_col2:
+                st.metric("FDS", f"{latest_week['FDS']:.1f}%", f"{fds_change:+.1f}%")
+            with trend_col3:
+                st.metric("SLA Rate", f"{latest_week['SLA_Rate']:.1f}%", f"{sla_change:+.1f}%")
+        else:
+            st.info("نحتاج لبيانات أسبوعين على الأقل لعرض الاتجاهات")
+    else:
+        st.markdown("""
+        <div class="warning-message">
+            <h4>ℹ️ لا توجد بيانات كافية لإنشاء التقرير الأسبوعي</h4>
+            <p><strong>للحصول على تقرير أسبوعي تأكد من أن البيانات تغطي عدة أسابيع وأن التواريخ صحيحة.</strong></p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@st.fragment
+@timed_stage('section')
+def display_cities_section(cities_analysis):
+    """عرض قسم أداء المدن مع FDS"""
+    if len(cities_analysis) == 0:
+        return
+    
+    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
+    st.markdown('<h3 class="chart-title">🏙️ أداء المدن مع FDS</h3>', unsafe_allow_html=True)
+    
+    table_filter_col1, table_filter_col2 = st.columns(2)
+    
+    with table_filter_col1:
+        table_cities = ['الكل'] + sorted(cities_analysis['المدينة'].tolist())
+        selected_table_city = st.selectbox("ابحث عن مدينة", table_cities, key="table_city_filter")
+    
+    with table_filter_col2:
+        rows_options = ['10', '20', '50', '100', 'الكل']
+        selected_rows = st.selectbox("عدد الصفوف", rows_options, key="table_rows_filter", index=1)
+    
+    filtered_cities_analysis = cities_analysis.copy()
+    
+    if selected_table_city != 'الكل':
+        filtered_cities_analysis = filtered_cities_analysis[filtered_cities_analysis['المدينة'] == selected_table_city]
+    
+    if selected_rows == 'الكل':
+        display_cities = filtered_cities_analysis
+    else:
+        num_rows = int(selected_rows)
+        display_cities = filtered_cities_analysis.head(num_rows)
+    
+    # إعادة تسمية الأعمدة للعرض
+    display_cities_renamed = display_cities.copy()
+    display_cities_renamed = display_cities_renamed.rename(columns={
+        'المدينة': 'المدينة',
+        'الدولة': 'الدولة',
+        'إجمالي_الشحنات': 'إجمالي الشحنات',
+        'SLA_أيام': 'SLA (أيام)',
+        'DR': 'DR (%)',
+        'FDS': 'FDS (%)',
+        'SLA_Rate': 'SLA Rate (%)',
+        'متوسط_الأيام': 'متوسط الأيام',
+        'متوسط_المحاولات': 'متوسط المحاولات'
+    })
+    
+    show_table('display_cities_renamed', display_cities_renamed, use_container_width=True, height=400, hide_index=True)
+    
+    # رسوم بيانية للمدن مع FDS
+    city_col1, city_col2 = st.columns(2)
+    
+    with city_col1:
+        if len(cities_analysis) > 0:
+            top_cities_fds, fds_categories = limit_categories(
+                cities_analysis[['المدينة', 'FDS']], 'المدينة', 'FDS',
+                max_categories=8, include_other=False
+            )
+            
+            if len(top_cities_fds) > 0:
+                fig_fds = get_cached_figure(
+                    'aramex_top_cities', _build_top_cities_chart, top_cities_fds,
+                    metric_column='FDS', color='#1f77b4', title='🎯 أعلى 8 مدن FDS (مع SLA)'
+                )
+                show_chart('fig_fds', fig_fds, use_container_width=True)
+                
+                reduction_note = format_reduction_report(fig_fds, fds_categories)
+                if reduction_note:
+                    st.caption(reduction_note)
+    
+    with city_col2:
+        if len(cities_analysis) > 0:
+            top_cities_sla, sla_categories = limit_categories(
+                cities_analysis[['المدينة', 'SLA_Rate']], 'المدينة', 'SLA_Rate',
+                max_categories=8, include_other=False
+            )
+            
+            if len(top_cities_sla) > 0:
+                fig_sla = get_cached_figure(
+                    'aramex_top_cities', _build_top_cities_chart, top_cities_sla,
+                    metric_column='SLA_Rate', color='#9467bd', title='⏱️ أعلى 8 مدن SLA Rate'
+                )
+                show_chart('fig_sla', fig_sla, use_container_width=True)
+                
+                reduction_note = format_reduction_report(fig_sla, sla_categories)
+                if reduction_note:
+                    st.caption(reduction_note)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
 # ==================== CSS ====================
 st.markdown("""
 <style>
@@ -1303,6 +984,14 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# ==================== آخر نتائج دفعية مجهزة من الصفحة الرئيسية ====================
+if not has_aramex_data():
+    prewarmed_tables = adopt_prewarmed('aramex')
+    if prewarmed_tables:
+        if prewarmed_tables.get('sla') is not None and not has_sla_data():
+            save_sla_data(prewarmed_tables['sla'], ARTIFACT_SOURCE)
+        save_aramex_data(prewarmed_tables['processed'], ARTIFACT_SOURCE)
+
 # ==================== شريط التحكم ====================
 col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 1, 1])
 
@@ -1318,7 +1007,8 @@ with col2:
 
 with col3:
     if st.button("🔄 تحديث البيانات", use_container_width=True):
-        st.cache_data.clear()
+        # مسح نتائج Aramex فقط بدون التأثير على باقي الصفحات
+        invalidate('aramex')
         st.rerun()
 
 with col4:
@@ -1357,7 +1047,9 @@ if st.session_state.show_upload or st.session_state.show_sla_upload:
                         sheet_name = 'Detailed Data' if 'Detailed Data' in excel_file.sheet_names else excel_file.sheet_names[0]
                         
                         progress_bar.progress(40)
-                        df = pd.read_excel(uploaded_file, sheet_name=sheet_name)
+                        with span('read_excel', 'ingestion') as read_span:
+                            df = pd.read_excel(uploaded_file, sheet_name=sheet_name)
+                            read_span.set_output(df)
                         
                         progress_bar.progress(60)
                         df = df.dropna(how='all')
@@ -1386,6 +1078,14 @@ if st.session_state.show_upload or st.session_state.show_sla_upload:
                         </ul>
                     </div>
                     """, unsafe_allow_html=True)
+            
+            artifact_tables = select_artifact_run('aramex', key="aramex_artifacts")
+            if artifact_tables:
+                save_aramex_data(artifact_tables['processed'], ARTIFACT_SOURCE)
+                if artifact_tables.get('sla') is not None:
+                    save_sla_data(artifact_tables['sla'], ARTIFACT_SOURCE)
+                st.session_state.show_upload = False
+                st.rerun()
             st.markdown('</div>', unsafe_allow_html=True)
             
         elif st.session_state.show_sla_upload:
@@ -1400,7 +1100,9 @@ if st.session_state.show_upload or st.session_state.show_sla_upload:
             if uploaded_sla:
                 try:
                     with st.spinner("معالجة SLA..."):
-                        sla_df = pd.read_excel(uploaded_sla)
+                        with span('read_sla_excel', 'ingestion') as read_span:
+                            sla_df = pd.read_excel(uploaded_sla)
+                            read_span.set_output(sla_df)
                         sla_processed = process_sla_data(sla_df)
                         
                         if len(sla_processed) > 0:
@@ -1434,8 +1136,8 @@ if has_aramex_data():
     # إضافة حالات SLA والـ FDS
     df_with_sla = add_sla_and_fds_columns(df, sla_data)
     
-    file_size_mb = len(df_with_sla) * len(df_with_sla.columns) * 8 / (1024 * 1024)
-    st.info(f"📈 تم تحميل {len(df_with_sla):,} شحنة | الحجم: ~{file_size_mb:.1f} MB | آخر تحديث: {saved_data['save_time'].strftime('%Y-%m-%d %H:%M')}")
+    memory_size = format_bytes(dataset_size('aramex_saved_data') or 0)
+    st.info(f"📈 تم تحميل {len(df_with_sla):,} شحنة | الذاكرة: {memory_size} | آخر تحديث: {saved_data['save_time'].strftime('%Y-%m-%d %H:%M')}")
     
     if len(df_with_sla) > 50000:
         st.warning("⚠️ ملف كبير - قد تحتاج المعالجة وقتاً أطول")
@@ -1558,7 +1260,7 @@ if has_aramex_data():
                     margin=dict(t=20, b=20, l=20, r=20)
                 )
                 
-                st.plotly_chart(fig_status, use_container_width=True)
+                show_chart('fig_status', fig_status, use_container_width=True)
             else:
                 st.info("لا توجد بيانات كافية لعرض مخطط حالات الشحنات بعد التصفية.")
         
@@ -1576,7 +1278,7 @@ if has_aramex_data():
         
         performance_chart = create_fds_performance_chart(analysis_data)
         if performance_chart:
-            st.plotly_chart(performance_chart, use_container_width=True)
+            show_chart('performance_chart', performance_chart, use_container_width=True)
         else:
             st.info("لا توجد بيانات كافية لعرض مؤشرات الأداء.")
         
@@ -1591,209 +1293,18 @@ if has_aramex_data():
             display_other_statuses_section(df_filtered)
 
     # تقرير الاتجاهات الأسبوعية المحدث
-    st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-    st.markdown('<h3 class="chart-title">📈 اتجاه الأداء الأسبوعي</h3>', unsafe_allow_html=True)
-    
     weekly_trends = analyze_weekly_trends_enhanced(df_filtered)
-    
-    if len(weekly_trends) > 0:
-        weekly_chart = create_weekly_performance_chart(weekly_trends)
-        if weekly_chart:
-            st.plotly_chart(weekly_chart, use_container_width=True)
-        
-        col1, col2, col3 = st.columns([1, 2, 1])
-        with col2:
-            if st.button("📊 تحميل البيانات الأسبوعية (CSV)", use_container_width=True):
-                csv_data = weekly_trends.to_csv(index=False, encoding='utf-8-sig')
-                st.download_button(
-                    label="💾 تحميل CSV",
-                    data=csv_data,
-                    file_name=f"weekly_performance_{datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
-        
-        st.markdown("### 📋 جدول الأداء الأسبوعي")
-        
-        weekly_col1, weekly_col2 = st.columns(2)
-        with weekly_col1:
-            weeks_to_show = st.selectbox("عدد الأسابيع للعرض", [5, 10, 15, 20, "الكل"], index=1, key="weekly_rows_filter")
-        
-        with weekly_col2:
-            sort_by = st.selectbox("ترتيب حسب", ["الأسبوع", "DR", "FDS", "SLA Rate"], key="weekly_sort")
-        
-        display_weekly = weekly_trends.copy()
-        
-        if sort_by == "الأسبوع":
-            display_weekly = display_weekly.sort_values('تاريخ_البداية', ascending=False)
-        elif sort_by == "DR":
-            display_weekly = display_weekly.sort_values('DR', ascending=False)
-        elif sort_by == "FDS":
-            display_weekly = display_weekly.sort_values('FDS', ascending=False)
-        elif sort_by == "SLA Rate":
-            display_weekly = display_weekly.sort_values('SLA_Rate', ascending=False)
-        
-        if weeks_to_show != "الكل":
-            display_weekly = display_weekly.head(int(weeks_to_show))
-        
-        # عرض الجدول الأسبوعي
-        display_df = display_weekly[['الأسبوع', 'إجمالي_الشحنات', 'DR', 'FDS', 'SLA_Rate']].copy()
-        display_df = display_df.rename(columns={
-            'الأسبوع': 'الأسبوع',
-            'إجمالي_الشحنات': 'إجمالي الشحنات',
-            'DR': 'DR (%)',
-            'FDS': 'FDS (%)',
-            'SLA_Rate': 'SLA Rate (%)'
-        })
-        
-        st.dataframe(display_df, use_container_width=True, height=400, hide_index=True)
-        
-        st.markdown("### 📊 ملخص الاتجاهات")
-        trend_col1, trend_col2, trend_col3 = st.columns(3)
-        
-        if len(weekly_trends) >= 2:
-            latest_week = weekly_trends.iloc[-1]
-            previous_week = weekly_trends.iloc[-2]
-            
-            dr_change = latest_week['DR'] - previous_week['DR']
-            fds_change = latest_week['FDS'] - previous_week['FDS']
-            sla_change = latest_week['SLA_Rate'] - previous_week['SLA_Rate']
-            
-            with trend_col1:
-                st.metric("DR", f"{latest_week['DR']:.1f}%", f"{dr_change:+.1f}%")
-            with trend_col2:
-                st.metric("FDS", f"{latest_week['FDS']:.1f}%", f"{fds_change:+.1f}%")
-            with trend_col3:
-                st.metric("SLA Rate", f"{latest_week['SLA_Rate']:.1f}%", f"{sla_change:+.1f}%")
-        else:
-            st.info("نحتاج لبيانات أسبوعين على الأقل لعرض الاتجاهات")
-    else:
-        st.markdown("""
-        <div class="warning-message">
-            <h4>ℹ️ لا توجد بيانات كافية لإنشاء التقرير الأسبوعي</h4>
-            <p><strong>للحصول على تقرير أسبوعي تأكد من أن البيانات تغطي عدة أسابيع وأن التواريخ صحيحة.</strong></p>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    st.markdown('</div>', unsafe_allow_html=True)
+    display_weekly_trends_section(weekly_trends)
 
     # عرض الشحنات المتأخرة
-    display_delayed_shipments_section(df_filtered, sla_data)
+    delayed_shipments = analyze_delayed_shipments(df_filtered, sla_data)
+    delay_summary = analyze_delay_summary(delayed_shipments) if len(delayed_shipments) > 0 else {}
+    total_pending = (int((df_filtered['حالة_التسليم'] == 'قيد التوصيل').sum())
+                     if 'حالة_التسليم' in df_filtered.columns else 0)
+    display_delayed_shipments_section(delayed_shipments, delay_summary, total_pending)
 
     # تحليل المدن مع FDS
-    if len(cities_analysis) > 0:
-        st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        st.markdown('<h3 class="chart-title">🏙️ أداء المدن مع FDS</h3>', unsafe_allow_html=True)
-        
-        table_filter_col1, table_filter_col2 = st.columns(2)
-        
-        with table_filter_col1:
-            table_cities = ['الكل'] + sorted(cities_analysis['المدينة'].tolist())
-            selected_table_city = st.selectbox("ابحث عن مدينة", table_cities, key="table_city_filter")
-        
-        with table_filter_col2:
-            rows_options = ['10', '20', '50', '100', 'الكل']
-            selected_rows = st.selectbox("عدد الصفوف", rows_options, key="table_rows_filter", index=1)
-        
-        filtered_cities_analysis = cities_analysis.copy()
-        
-        if selected_table_city != 'الكل':
-            filtered_cities_analysis = filtered_cities_analysis[filtered_cities_analysis['المدينة'] == selected_table_city]
-        
-        if selected_rows == 'الكل':
-            display_cities = filtered_cities_analysis
-        else:
-            num_rows = int(selected_rows)
-            display_cities = filtered_cities_analysis.head(num_rows)
-        
-        # إعادة تسمية الأعمدة للعرض
-        display_cities_renamed = display_cities.copy()
-        display_cities_renamed = display_cities_renamed.rename(columns={
-            'المدينة': 'المدينة',
-            'الدولة': 'الدولة',
-            'إجمالي_الشحنات': 'إجمالي الشحنات',
-            'SLA_أيام': 'SLA (أيام)',
-            'DR': 'DR (%)',
-            'FDS': 'FDS (%)',
-            'SLA_Rate': 'SLA Rate (%)',
-            'متوسط_الأيام': 'متوسط الأيام',
-            'متوسط_المحاولات': 'متوسط المحاولات'
-        })
-        
-        st.dataframe(display_cities_renamed, use_container_width=True, height=400, hide_index=True)
-        
-        # رسوم بيانية للمدن مع FDS
-        city_col1, city_col2 = st.columns(2)
-        
-        with city_col1:
-            if len(cities_analysis) > 0:
-                top_cities_fds = cities_analysis.nlargest(8, 'FDS')
-                
-                if len(top_cities_fds) > 0:
-                    fig_fds = px.bar(
-                        x=top_cities_fds['FDS'],
-                        y=top_cities_fds['المدينة'],
-                        orientation='h',
-                        text=[f'{x:.1f}%' for x in top_cities_fds['FDS']],
-                        color_discrete_sequence=['#1f77b4'] * len(top_cities_fds),
-                        title='🎯 أعلى 8 مدن FDS (مع SLA)'
-                    )
-                    
-                    fig_fds.update_traces(
-                        textposition='inside',
-                        textfont_size=13,
-                        textfont_color='white',
-                        textfont_weight='bold'
-                    )
-                    
-                    fig_fds.update_layout(
-                        height=350,
-                        font=dict(family='Cairo', size=11),
-                        xaxis_title='FDS (%)',
-                        yaxis_title='',
-                        showlegend=False,
-                        xaxis=dict(range=[0, 100]),
-                        plot_bgcolor='rgba(248,249,250,0.8)',
-                        paper_bgcolor='white'
-                    )
-                    
-                    st.plotly_chart(fig_fds, use_container_width=True)
-        
-        with city_col2:
-            if len(cities_analysis) > 0:
-                top_cities_sla = cities_analysis.nlargest(8, 'SLA_Rate')
-                
-                if len(top_cities_sla) > 0:
-                    fig_sla = px.bar(
-                        x=top_cities_sla['SLA_Rate'],
-                        y=top_cities_sla['المدينة'],
-                        orientation='h',
-                        text=[f'{x:.1f}%' for x in top_cities_sla['SLA_Rate']],
-                        color_discrete_sequence=['#9467bd'] * len(top_cities_sla),
-                        title='⏱️ أعلى 8 مدن SLA Rate'
-                    )
-                    
-                    fig_sla.update_traces(
-                        textposition='inside',
-                        textfont_size=13,
-                        textfont_color='white',
-                        textfont_weight='bold'
-                    )
-                    
-                    fig_sla.update_layout(
-                        height=350,
-                        font=dict(family='Cairo', size=11),
-                        xaxis_title='SLA Rate (%)',
-                        yaxis_title='',
-                        showlegend=False,
-                        xaxis=dict(range=[0, 100]),
-                        plot_bgcolor='rgba(248,249,250,0.8)',
-                        paper_bgcolor='white'
-                    )
-                    
-                    st.plotly_chart(fig_sla, use_container_width=True)
-        
-        st.markdown('</div>', unsafe_allow_html=True)
+    display_cities_section(cities_analysis)
 
 else:
     # عرض رسالة عدم وجود بيانات
@@ -1805,6 +1316,9 @@ else:
     </div>
     """, unsafe_allow_html=True)
 
+# السجل التاريخي من المخزن (إن كان مفعلاً)
+render_history('aramex')
+
 # ==================== الشريط الجانبي ====================
 add_logout_button()
 
@@ -1846,3 +1360,5 @@ st.markdown("""
     مع FDS (تسليم أول محاولة + ضمن SLA) و SLA Rate الإجمالي
 </div>
 """, unsafe_allow_html=True)
+
+render_perf_panel()
@@ -11,14 +11,24 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import numpy as np
 from datetime import datetime, timedelta
-import re
 import os
-import glob
 import time
 from pathlib import Path
-import hashlib
+from chart_cache import get_cached_figure
+from chart_data import limit_categories, optimize_figure, format_reduction_report
+from artifact_loader import select_artifact_run, ARTIFACT_SOURCE
+from perf_panel import begin_perf_run, cached_stage, timed_stage, show_chart, show_table, render_perf_panel
+from session_memory import track_dataset, use_dataset, untrack_dataset, has_dataset
+from hub_summary import publish_summary
+from history_view import render_history
+from prewarm import adopt_prewarmed
+from shipping_core import niceone as niceone_core
+from shipping_core.instrumentation import span
+from shipping_core.common import get_file_hash, find_latest_files
+from shipping_core.niceone import prepare_main_data, read_main_file, merge_with_branches, create_sample_data
+
+begin_perf_run('niceone')
 
 
 # 🔧 دوال حفظ البيانات البسيطة - مُحسّنة للسرعة
@@ -35,24 +45,26 @@ def save_company_data(company_name, df, branch_files=None, source="manual"):
         'total_rows': len(df),
         'total_columns': len(df.columns)
     }
+    track_dataset(data_key)
+    publish_summary(company_name.lower(), df, source=source)
     
     # رسالة نجاح سريعة
     st.success(f"✅ تم حفظ بيانات {company_name}! ({len(df):,} سجل)")
 def get_company_data(company_name):
     """استرجاع البيانات من session_state"""
     data_key = f"{company_name.lower()}_saved_data"
-    return st.session_state.get(data_key, None)
+    return use_dataset(data_key)
 
 def has_saved_data(company_name):
     """تحقق من وجود بيانات محفوظة"""
-    saved_data = get_company_data(company_name)
-    return saved_data is not None and 'main_df' in saved_data
+    return has_dataset(f"{company_name.lower()}_saved_data", 'main_df')
 
 def clear_company_data(company_name):
     """مسح البيانات المحفوظة"""
     data_key = f"{company_name.lower()}_saved_data"
     if data_key in st.session_state:
         del st.session_state[data_key]
+        untrack_dataset(data_key)
         st.success(f"✅ تم مسح بيانات {company_name}")
 
 def show_saved_data_info(company_name):
@@ -293,143 +305,17 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # دوال المساعدة
-def fix_duplicate_columns(df):
-    columns = df.columns.tolist()
-    new_columns = []
-    column_counts = {}
-    
-    for col in columns:
-        clean_col = str(col).strip()
-        if clean_col in column_counts:
-            column_counts[clean_col] += 1
-            new_col_name = f"{clean_col}_{column_counts[clean_col]}"
-        else:
-            column_counts[clean_col] = 0
-            new_col_name = clean_col
-        new_columns.append(new_col_name)
-    
-    df.columns = new_columns
-    return df
-
-def process_column_names(df):
-    if len(df.columns) > 0 and (df.columns[0] == '#' or 'Unnamed' in str(df.columns[0])):
-        df = df.drop(df.columns[0], axis=1)
-    
-    expected_columns = [
-        'رقم الطلب', 'رقم التتبع', 'اسم العميل', 'هاتف العميل',
-        'موقع العميل', 'المطلوب تحصيله', 'السبب', 'حالة الطلب',
-        'رقم ورقة التشغيل', 'الرقم التعريفي', 'اسم المندوب',
-        'تاريخ استلام الشحنة', 'تاريخ الشحن'
-    ]
-    
-    current_columns = df.columns.tolist()
-    new_column_names = {}
-    
-    for i, col in enumerate(current_columns):
-        if i < len(expected_columns):
-            new_column_names[col] = expected_columns[i]
-    
-    df = df.rename(columns=new_column_names)
-    return df
-
+@cached_stage('enrichment', namespace='niceone', show_spinner=False, max_entries=5, ttl=600)
 def analyze_attempts(df):
     try:
-        if 'تاريخ استلام الشحنة' in df.columns and 'تاريخ الشحن' in df.columns:
-            
-            def convert_receive_date(date_val):
-                try:
-                    if pd.isna(date_val):
-                        return None
-                    if isinstance(date_val, pd.Timestamp) or hasattr(date_val, 'date'):
-                        return pd.to_datetime(date_val).date()
-                    elif isinstance(date_val, (int, float)) and date_val > 40000:
-                        excel_epoch = pd.Timestamp('1899-12-30')
-                        return (excel_epoch + pd.Timedelta(days=date_val)).date()
-                    else:
-                        return pd.to_datetime(date_val, errors='coerce').date()
-                except:
-                    return None
-            
-            def convert_ship_date(date_val):
-                try:
-                    if pd.isna(date_val):
-                        return None
-                    if isinstance(date_val, str) and '/' in date_val:
-                        parts = date_val.split('/')
-                        if len(parts) == 3:
-                            return pd.to_datetime(f"{parts[2]}-{parts[1]}-{parts[0]}", errors='coerce').date()
-                    return pd.to_datetime(date_val, errors='coerce').date()
-                except:
-                    return None
-            
-            df['تاريخ_استلام_محول'] = df['تاريخ استلام الشحنة'].apply(convert_receive_date)
-            df['تاريخ_شحن_محول'] = df['تاريخ الشحن'].apply(convert_ship_date)
-            
-            def determine_attempt_type(row):
-                try:
-                    status = str(row.get('حالة الطلب', '')).strip()
-                    if not ('Delivered' in status and 'Confirmed' in status):
-                        return 'غير مسلم'
-                    
-                    receive_date = row['تاريخ_استلام_محول']
-                    ship_date = row['تاريخ_شحن_محول']
-                    
-                    if pd.isna(receive_date) or pd.isna(ship_date):
-                        return 'تاريخ مفقود'
-                    
-                    if receive_date == ship_date:
-                        return 'المحاولة الأولى'
-                    elif ship_date > receive_date:
-                        return 'محاولة إضافية'
-                    else:
-                        return 'تاريخ شحن قبل الاستلام'
-                        
-                except:
-                    return 'خطأ في المعالجة'
-            
-            df['نوع_المحاولة'] = df.apply(determine_attempt_type, axis=1)
-            df['حالة_مسلم'] = df['حالة الطلب'].astype(str).apply(
-                lambda x: 'مسلم' if 'Delivered' in x and 'Confirmed' in x else 'غير مسلم'
-            )
-            
-        else:
-            df['نوع_المحاولة'] = 'عمود التاريخ مفقود'
-            df['حالة_مسلم'] = 'غير محدد'
-            
-        return df
-        
+        return niceone_core.analyze_attempts(df)
     except Exception as e:
         st.error(f"خطأ في تحليل المحاولات: {str(e)}")
         df['نوع_المحاولة'] = 'خطأ في التحليل'
         df['حالة_مسلم'] = 'خطأ'
         return df
 
-def get_file_hash(file_path):
-    """حساب hash للملف لتتبع التغييرات"""
-    try:
-        with open(file_path, 'rb') as f:
-            file_hash = hashlib.md5(f.read()).hexdigest()
-        return file_hash
-    except:
-        return None
-
-def find_latest_files(folder_path, pattern="*.xlsx"):
-    """البحث عن أحدث الملفات في المجلد"""
-    try:
-        files = glob.glob(os.path.join(folder_path, pattern))
-        if not files:
-            files = glob.glob(os.path.join(folder_path, "*.xls"))
-        if not files:
-            files = glob.glob(os.path.join(folder_path, "*.csv"))
-        
-        if files:
-            # ترتيب حسب تاريخ التعديل
-            files.sort(key=os.path.getmtime, reverse=True)
-            return files
-        return []
-    except:
-        return []
-
+@timed_stage('ingestion')
 def auto_load_data(main_folder=None, branch_folder=None):
     """تحميل البيانات تلقائياً من المجلدات المحددة"""
     main_df = None
@@ -441,17 +327,9 @@ def auto_load_data(main_folder=None, branch_folder=None):
         if main_files:
             latest_main = main_files[0]
             try:
-                if latest_main.endswith('.csv'):
-                    main_df = pd.read_csv(latest_main, encoding='utf-8')
-                else:
-                    main_df = pd.read_excel(latest_main)
-                
-                main_df = fix_duplicate_columns(main_df)
-                main_df = process_column_names(main_df)
-                main_df = main_df.dropna(how='all')
-                
-                if 'المطلوب تحصيله' in main_df.columns:
-                    main_df['المطلوب تحصيله'] = pd.to_numeric(main_df['المطلوب تحصيله'], errors='coerce').fillna(0)
+                with span('read_main_file', 'ingestion') as read_span:
+                    main_df = read_main_file(latest_main)
+                    read_span.set_output(main_df)
                 
                 st.session_state.current_main_file = latest_main
                 st.session_state.main_file_hash = get_file_hash(latest_main)
@@ -481,89 +359,15 @@ def auto_load_data(main_folder=None, branch_folder=None):
     
     return main_df, branch_files
 
-@st.cache_data(show_spinner=False)  # إضافة show_spinner=False لتقليل الرسائل
+@cached_stage('ingestion', stage='read_branch_files', namespace='niceone', show_spinner=False)  # إضافة show_spinner=False لتقليل الرسائل
+def _read_branch_files(branch_files):
+    return niceone_core.load_branch_data(branch_files)
+
 def load_branch_data(branch_files):
-    all_branch_data = []
-    
     if not branch_files:
         return pd.DataFrame()
     
-    # إضافة معالجة أخطاء محسنة
-    success_count = 0
-    error_files = []
-    
-    for file in branch_files:
-        try:
-            # محاولة قراءة الملف بطرق مختلفة
-            df_branch = None
-            
-            if hasattr(file, '_file_path'):
-                file_path = file._file_path
-                file_name = file.name
-            else:
-                file_name = file.name if hasattr(file, 'name') else str(file)
-                
-            # محاولة قراءة الملف
-            try:
-                if hasattr(file, '_file_path'):
-                    # للتحديث التلقائي
-                    if file_name.endswith('.xlsx'):
-                        df_branch = pd.read_excel(file_path, engine='openpyxl')
-                    elif file_name.endswith('.xls'):
-                        # محاولة قراءة ملف xls قديم
-                        try:
-                            df_branch = pd.read_excel(file_path, engine='xlrd')
-                        except:
-                            # إذا فشل xlrd، جرب openpyxl
-                            df_branch = pd.read_excel(file_path, engine='openpyxl')
-                    else:
-                        df_branch = pd.read_excel(file_path)
-                else:
-                    # للرفع اليدوي
-                    if file_name.endswith('.xlsx'):
-                        df_branch = pd.read_excel(file, engine='openpyxl')
-                    elif file_name.endswith('.xls'):
-                        # محاولة قراءة ملف xls قديم
-                        try:
-                            df_branch = pd.read_excel(file, engine='xlrd')
-                        except:
-                            # إذا فشل xlrd، جرب openpyxl
-                            df_branch = pd.read_excel(file, engine='openpyxl')
-                    else:
-                        df_branch = pd.read_excel(file)
-                        
-            except Exception as read_error:
-                error_files.append(f"{file_name}: {str(read_error)}")
-                continue
-            
-            # معالجة البيانات إذا تم قراءة الملف بنجاح
-            if df_branch is not None and not df_branch.empty:
-                branch_number = re.search(r'(\d+)', file_name)
-                branch_id = branch_number.group(1) if branch_number else 'unknown'
-                
-                # معالجة أعمدة الملف
-                if len(df_branch.columns) >= 3:
-                    # التعامل مع أعمدة مختلفة
-                    if len(df_branch.columns) >= 4:
-                        df_branch.columns = ['#', 'Reference_ID', 'Branch_Name', 'Branch_Date']
-                        if df_branch.columns[0] == '#':
-                            df_branch = df_branch.drop(df_branch.columns[0], axis=1)
-                            df_branch.columns = ['Reference_ID', 'Branch_Name', 'Branch_Date']
-                    else:
-                        df_branch.columns = ['Reference_ID', 'Branch_Name', 'Branch_Date']
-                    
-                    df_branch['Branch_ID'] = branch_id
-                    df_branch = df_branch.dropna(subset=['Reference_ID'])
-                    
-                    # تنظيف البيانات
-                    df_branch['Reference_ID'] = df_branch['Reference_ID'].astype(str)
-                    df_branch['Branch_Date'] = pd.to_datetime(df_branch['Branch_Date'], errors='coerce')
-                    
-                    all_branch_data.append(df_branch)
-                    success_count += 1
-                    
-        except Exception as e:
-            error_files.append(f"{file_name}: خطأ عام - {str(e)}")
+    latest_branches, success_count, error_files = _read_branch_files(branch_files)
     
     # عرض نتائج المعالجة
     if success_count > 0:
@@ -581,84 +385,245 @@ def load_branch_data(branch_files):
             st.markdown("4. لحل مشكلة xlrd، استخدم الأمر:")
             st.code("pip install xlrd openpyxl")
     
-    # دمج البيانات
-    if all_branch_data:
-        try:
-            combined_branches = pd.concat(all_branch_data, ignore_index=True)
-            combined_branches = combined_branches.sort_values(['Reference_ID', 'Branch_Date'], ascending=[True, False])
-            latest_branches = combined_branches.groupby('Reference_ID').first().reset_index()
-            
-            st.info(f"📊 تم معالجة {len(latest_branches)} رقم تتبع من ملفات الفروع")
-            return latest_branches
-        except Exception as e:
-            st.error(f"خطأ في دمج بيانات الفروع: {str(e)}")
-    
-    return pd.DataFrame()
-
-def merge_with_branches(main_df, branch_df):
-    if branch_df.empty:
-        main_df['فرع_الشحنة'] = 'WH'
-        main_df['تاريخ_الفرع'] = None
-        return main_df
-    
-    main_df['رقم التتبع_str'] = main_df['رقم التتبع'].astype(str)
-    branch_df['Reference_ID_str'] = branch_df['Reference_ID'].astype(str)
-    
-    merged_df = main_df.merge(
-        branch_df[['Reference_ID_str', 'Branch_Name', 'Branch_Date', 'Branch_ID']], 
-        left_on='رقم التتبع_str', 
-        right_on='Reference_ID_str', 
-        how='left'
+    if not latest_branches.empty:
+        st.info(f"📊 تم معالجة {len(latest_branches)} رقم تتبع من ملفات الفروع")
+    
+    return latest_branches
+
+# دوال بناء الرسوم البيانية - تُستدعى عبر ذاكرة المخططات المؤقتة
+def _build_status_pie_chart(status_counts):
+    """بناء مخطط توزيع حالات الطلبات"""
+    fig = px.pie(
+        values=status_counts.values,
+        names=status_counts.index,
+        color_discrete_map={
+            'تم التسليم': '#27ae60',
+            'قيد التوصيل': '#f39c12',
+            'فشل التسليم': '#e74c3c',
+            'أخرى': '#95a5a6'
+        },
+        hole=0.4
     )
     
-    merged_df['فرع_الشحنة'] = merged_df['Branch_Name'].fillna('WH')
-    merged_df['تاريخ_الفرع'] = merged_df['Branch_Date']
+    fig.update_traces(
+        textposition='inside',
+        textinfo='percent+label',
+        textfont_size=14,
+        marker=dict(line=dict(color='#FFFFFF', width=2))
+    )
     
-    columns_to_drop = ['رقم التتبع_str', 'Reference_ID_str', 'Branch_Name', 'Branch_Date', 'Branch_ID']
-    merged_df = merged_df.drop([col for col in columns_to_drop if col in merged_df.columns], axis=1)
+    fig.update_layout(
+        showlegend=True,
+        height=400,
+        font=dict(size=12, family='Cairo'),
+        margin=dict(t=20, b=20, l=20, r=20),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.2,
+            xanchor="center",
+            x=0.5
+        )
+    )
     
-    return merged_df
+    return fig
 
-def create_sample_data():
-    np.random.seed(42)
+def _build_attempts_pie_chart(attempt_data):
+    """بناء مخطط تحليل محاولات التسليم"""
+    fig = px.pie(
+        values=list(attempt_data.values()),
+        names=list(attempt_data.keys()),
+        color_discrete_map={
+            'المحاولة الأولى': '#3498db',
+            'محاولة إضافية': '#9b59b6'
+        },
+        hole=0.4
+    )
     
-    names = ['أحمد محمد', 'فاطمة علي', 'خالد سعد', 'نور الهدى', 'عمر يوسف']
-    cities = ['الرياض', 'جدة', 'الدمام', 'مكة', 'المدينة']
-    drivers = ['أحمد عادل', 'محمد خالد', 'مرسال أمين', 'سعد الدوسري', 'فهد العتيبي']
-    statuses = ['Delivered Confirmed', 'In Progress', 'Failed Delivery']
+    fig.update_traces(
+        textposition='inside',
+        textinfo='percent+label+value',
+        textfont_size=14,
+        marker=dict(line=dict(color='#FFFFFF', width=2))
+    )
     
-    data = []
-    base_date = datetime.now() - timedelta(days=30)
+    fig.update_layout(
+        showlegend=True,
+        height=400,
+        font=dict(size=12, family='Cairo'),
+        margin=dict(t=20, b=20, l=20, r=20),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.2,
+            xanchor="center",
+            x=0.5
+        )
+    )
     
-    for i in range(200):
-        receive_date = base_date + timedelta(days=np.random.randint(0, 30))
-        
-        if np.random.random() < 0.7:
-            ship_date = receive_date
-        else:
-            ship_date = receive_date + timedelta(days=np.random.randint(1, 5))
-        
-        status = np.random.choice(statuses, p=[0.8, 0.15, 0.05])
-        
-        record = {
-            'رقم الطلب': f'960037{64000 + i}',
-            'رقم التتبع': f'273{19000 + i}',
-            'اسم العميل': np.random.choice(names),
-            'هاتف العميل': f'96656{np.random.randint(1000000, 9999999)}',
-            'موقع العميل': f'{np.random.choice(cities)}, المملكة العربية السعودية',
-            'المطلوب تحصيله': round(np.random.uniform(50, 800), 2),
-            'السبب': 'Order Purchase',
-            'حالة الطلب': status,
-            'رقم ورقة التشغيل': f'611511{4 + i % 3}',
-            'الرقم التعريفي': np.random.randint(700, 900),
-            'اسم المندوب': np.random.choice(drivers),
-            'تاريخ استلام الشحنة': receive_date.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
-            'تاريخ الشحن': ship_date.strftime('%d/%m/%Y'),
-            'فرع_الشحنة': np.random.choice(['WH', 'Aqiq', 'Labn', 'Naseem', 'Tabuk'])
-        }
-        data.append(record)
+    return fig
+
+def _build_branch_compare_chart(branch_rates):
+    """بناء مخطط مقارنة أداء الفروع"""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        name='نسبة التسليم الكلية (%)',
+        x=branch_rates['فرع_الشحنة'],
+        y=branch_rates['نسبة التسليم الكلية (%)'],
+        marker_color='#3498db',
+        text=branch_rates['نسبة التسليم الكلية (%)'].apply(lambda x: f"{x:.2f}"),
+        textposition='auto'
+    ))
+    fig.add_trace(go.Bar(
+        name='نسبة التسليم من المحاولة الأولى (%)',
+        x=branch_rates['فرع_الشحنة'],
+        y=branch_rates['نسبة التسليم من المحاولة الأولى (%)'],
+        marker_color='#e74c3c',
+        text=branch_rates['نسبة التسليم من المحاولة الأولى (%)'].apply(lambda x: f"{x:.2f}"),
+        textposition='auto'
+    ))
+    
+    fig.update_layout(
+        barmode='group',
+        height=400,
+        font=dict(family='Cairo', size=12),
+        yaxis_title='النسبة المئوية (%)',
+        xaxis_title='الفرع'
+    )
     
-    return pd.DataFrame(data)
+    return optimize_figure(fig)
+
+def _build_branch_distribution_chart(branch_totals):
+    """بناء مخطط توزيع الطلبات حسب الفروع"""
+    fig = px.pie(
+        branch_totals,
+        values='إجمالي الطلبات',
+        names='فرع_الشحنة',
+        color_discrete_sequence=px.colors.qualitative.Set3,
+        hole=0.4
+    )
+    
+    fig.update_traces(
+        textposition='inside',
+        textinfo='percent+label',
+        textfont_size=12
+    )
+    
+    fig.update_layout(
+        height=400,
+        font=dict(family='Cairo', size=12),
+        showlegend=True,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.2,
+            xanchor="center",
+            x=0.5
+        )
+    )
+    
+    return optimize_figure(fig)
+
+def _build_drivers_bar_chart(drivers_df, color_column, color_scale, title):
+    """بناء مخطط أعمدة لأداء مجموعة من المناديب"""
+    fig = px.bar(
+        drivers_df,
+        x='اسم المندوب',
+        y='نسبة التوصيل (%)',
+        color=color_column,
+        color_continuous_scale=color_scale,
+        title=title,
+        text='نسبة التوصيل (%)'
+    )
+    fig.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
+    fig.update_layout(height=400, font=dict(family='Cairo', size=12))
+    return optimize_figure(fig)
+
+def _build_drivers_mixed_chart(chart_drivers):
+    """بناء الرسم المختلط لنسبة التوصيل وعدد التحميل"""
+    fig = go.Figure()
+    
+    # إضافة الأعمدة لنسبة التوصيل
+    fig.add_trace(go.Bar(
+        x=chart_drivers['اسم المندوب'],
+        y=chart_drivers['نسبة التوصيل (%)'],
+        name='نسبة التوصيل (%)',
+        marker=dict(
+            color=chart_drivers['نسبة التوصيل (%)'],
+            colorscale='RdYlGn',
+            cmin=60,
+            cmax=100,
+            showscale=True,
+            colorbar=dict(title="نسبة التوصيل (%)", x=1.02)
+        ),
+        text=chart_drivers['نسبة التوصيل (%)'].apply(lambda x: f"{x:.2f}"),
+        texttemplate='%{text}%',
+        textposition='outside',
+        yaxis='y'
+    ))
+    
+    # تطبيع عدد التحميل لجعله مناسب لوضعه كنقاط
+    max_delivery_rate = chart_drivers['نسبة التوصيل (%)'].max()
+    normalized_loading = (chart_drivers['عدد التحميل'] / chart_drivers['عدد التحميل'].max()) * (max_delivery_rate * 0.8)
+    
+    # إضافة النقاط لعدد التحميل
+    fig.add_trace(go.Scatter(
+        x=chart_drivers['اسم المندوب'],
+        y=normalized_loading,
+        mode='markers+text',
+        name='عدد التحميل',
+        marker=dict(
+            size=chart_drivers['عدد التحميل'] / chart_drivers['عدد التحميل'].max() * 40 + 10,
+            color='darkblue',
+            opacity=0.7,
+            line=dict(width=2, color='white')
+        ),
+        text=chart_drivers['عدد التحميل'],
+        textposition='middle center',
+        textfont=dict(color='white', size=10),
+        yaxis='y2'
+    ))
+    
+    # تحديث التخطيط
+    fig.update_layout(
+        title=dict(
+            text='تحليل مختلط: نسبة التوصيل وعدد التحميل للمناديب',
+            x=0.5,
+            font=dict(size=16, family='Cairo')
+        ),
+        xaxis=dict(
+            title='اسم المندوب',
+            tickangle=45,
+            title_font=dict(family='Cairo', size=14)
+        ),
+        yaxis=dict(
+            title='نسبة التوصيل (%)',
+            side='left',
+            range=[0, max_delivery_rate * 1.1],
+            title_font=dict(family='Cairo', size=14)
+        ),
+        yaxis2=dict(
+            title='عدد التحميل (مطبع)',
+            side='right',
+            overlaying='y',
+            range=[0, max_delivery_rate * 1.1],
+            showgrid=False,
+            title_font=dict(family='Cairo', size=14)
+        ),
+        height=600,
+        font=dict(family='Cairo', size=12),
+        legend=dict(
+            x=0.02,
+            y=0.98,
+            bgcolor="rgba(255,255,255,0.8)",
+            bordercolor="rgba(0,0,0,0.2)",
+            borderwidth=1
+        ),
+        plot_bgcolor='rgba(240,240,240,0.3)',
+        showlegend=True
+    )
+    
+    return optimize_figure(fig)
 
 # التحقق من المكتبات المطلوبة
 def check_required_libraries():
@@ -968,10 +933,22 @@ if st.session_state.show_upload:
         if st.button("❌", help="إغلاق"):
             st.session_state.show_upload = False
             st.rerun()
+    
+    artifact_tables = select_artifact_run('niceone', key="niceone_artifacts")
+    if artifact_tables:
+        save_company_data("niceone", artifact_tables['processed'], [], ARTIFACT_SOURCE)
+        st.session_state.show_upload = False
+        st.rerun()
 else:
     uploaded_file = None
     branch_files_manual = []
 
+# آخر نتائج دفعية مجهزة من الصفحة الرئيسية
+if not uploaded_file and not has_saved_data("niceone"):
+    prewarmed_tables = adopt_prewarmed('niceone')
+    if prewarmed_tables:
+        save_company_data("niceone", prewarmed_tables['processed'], [], ARTIFACT_SOURCE)
+
 # تحديد مصدر البيانات - مُحسّن للسرعة
 # أولاً: فحص البيانات المحفوظة بسرعة
 saved_data = get_company_data("niceone") if not uploaded_file else None
@@ -989,20 +966,17 @@ elif uploaded_file:
     # تحميل يدوي مُحسّن
     try:
         # إظهار تقدم التحميل
-        with st.spinner("🔄 جاري قراءة الملف..."):
+        with st.spinner("🔄 جاري قراءة الملف..."), span('read_upload', 'ingestion') as read_span:
             if uploaded_file.name.endswith('.csv'):
                 df = pd.read_csv(uploaded_file, encoding='utf-8')
             else:
                 df = pd.read_excel(uploaded_file)
+            read_span.set_output(df)
         
         # معالجة سريعة للبيانات
-        with st.spinner("📊 جاري معالجة البيانات..."):
-            df = fix_duplicate_columns(df)
-            df = process_column_names(df)
-            df = df.dropna(how='all')
-            
-            if 'المطلوب تحصيله' in df.columns:
-                df['المطلوب تحصيله'] = pd.to_numeric(df['المطلوب تحصيله'], errors='coerce').fillna(0)
+        with st.spinner("📊 جاري معالجة البيانات..."), span('prepare_main_data', 'enrichment', rows_in=len(df)) as prepare_span:
+            df = prepare_main_data(df)
+            prepare_span.set_output(df)
         
         branch_files = branch_files_manual if branch_files_manual else []
         data_source = "يدوي"
@@ -1036,8 +1010,11 @@ if df is not None and len(df) > 0:
     # معالجة بيانات الفروع
     if branch_files:
         branch_data = load_branch_data(branch_files)
-        df = merge_with_branches(df, branch_data)
-    else:
+        with span('merge_with_branches', 'enrichment', rows_in=len(df)) as merge_span:
+            df = merge_with_branches(df, branch_data)
+            merge_span.set_output(df)
+    elif not (saved_data and saved_data['source'] == ARTIFACT_SOURCE):
+        # نتائج المعالجة الدفعية تحتوي على الفروع مسبقاً
         df['فرع_الشحنة'] = 'WH'
     
     df = analyze_attempts(df)
@@ -1094,7 +1071,12 @@ if df is not None and len(df) > 0:
     
     if selected_status != 'الكل':
         filtered_df = filtered_df[filtered_df['حالة_مترجمة'] == selected_status]
-    
+
+    # التحقق من وجود بيانات بعد الفلترة (مثل نتائج دفعية خارج نطاق التاريخ الافتراضي)
+    if len(filtered_df) == 0:
+        st.warning("⚠️ لا توجد بيانات بعد تطبيق الفلاتر المحددة - جرب تغيير نطاق التاريخ")
+        st.stop()
+
     # حساب المؤشرات
     total_orders = len(filtered_df)
     delivered_orders = len(filtered_df[filtered_df['حالة_مسلم'] == 'مسلم'])
@@ -1158,40 +1140,9 @@ if df is not None and len(df) > 0:
         
         status_counts = filtered_df['حالة_مترجمة'].value_counts()
         
-        fig_status = px.pie(
-            values=status_counts.values,
-            names=status_counts.index,
-            color_discrete_map={
-                'تم التسليم': '#27ae60',
-                'قيد التوصيل': '#f39c12',
-                'فشل التسليم': '#e74c3c',
-                'أخرى': '#95a5a6'
-            },
-            hole=0.4
-        )
-        
-        fig_status.update_traces(
-            textposition='inside',
-            textinfo='percent+label',
-            textfont_size=14,
-            marker=dict(line=dict(color='#FFFFFF', width=2))
-        )
-        
-        fig_status.update_layout(
-            showlegend=True,
-            height=400,
-            font=dict(size=12, family='Cairo'),
-            margin=dict(t=20, b=20, l=20, r=20),
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=-0.2,
-                xanchor="center",
-                x=0.5
-            )
-        )
+        fig_status = get_cached_figure('niceone_status_pie', _build_status_pie_chart, status_counts)
         
-        st.plotly_chart(fig_status, use_container_width=True)
+        show_chart('fig_status', fig_status, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with col2:
@@ -1208,38 +1159,9 @@ if df is not None and len(df) > 0:
                 'محاولة إضافية': failed_first_attempt
             }
             
-            fig_attempts = px.pie(
-                values=list(attempt_data.values()),
-                names=list(attempt_data.keys()),
-                color_discrete_map={
-                    'المحاولة الأولى': '#3498db',
-                    'محاولة إضافية': '#9b59b6'
-                },
-                hole=0.4
-            )
-            
-            fig_attempts.update_traces(
-                textposition='inside',
-                textinfo='percent+label+value',
-                textfont_size=14,
-                marker=dict(line=dict(color='#FFFFFF', width=2))
-            )
+            fig_attempts = get_cached_figure('niceone_attempts_pie', _build_attempts_pie_chart, attempt_data)
             
-            fig_attempts.update_layout(
-                showlegend=True,
-                height=400,
-                font=dict(size=12, family='Cairo'),
-                margin=dict(t=20, b=20, l=20, r=20),
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=-0.2,
-                    xanchor="center",
-                    x=0.5
-                )
-            )
-            
-            st.plotly_chart(fig_attempts, use_container_width=True)
+            show_chart('fig_attempts', fig_attempts, use_container_width=True)
         else:
             st.info("📊 لا توجد بيانات محاولات التسليم")
         
@@ -1249,48 +1171,50 @@ if df is not None and len(df) > 0:
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
     st.markdown('<h3 class="chart-title">🏢 تحليل مفصل للفروع والأداء</h3>', unsafe_allow_html=True)
     
-    # إحصائيات شاملة للفروع
-    branch_detailed = filtered_df.groupby('فرع_الشحنة').agg({
-        'رقم الطلب': 'count',
-        'حالة_مسلم': lambda x: (x == 'مسلم').sum()
-    })
-    
-    # تسطيح الأعمدة
-    branch_detailed.columns = ['إجمالي الطلبات', 'تم التسليم']
-    branch_detailed['لم تُسلم'] = branch_detailed['إجمالي الطلبات'] - branch_detailed['تم التسليم']
-    branch_detailed['نسبة التسليم الكلية (%)'] = (branch_detailed['تم التسليم'] / branch_detailed['إجمالي الطلبات'] * 100).round(2)
-    
-    # حساب محاولات التسليم لكل فرع بالطريقة الصحيحة
-    branch_detailed['المحاولة الأولى'] = 0
-    branch_detailed['الشحنات الأولى'] = 0
-    branch_detailed['نسبة التسليم من المحاولة الأولى (%)'] = 0.0
-    
-    for idx, row in branch_detailed.iterrows():
-        branch_name = idx  # اسم الفرع هو index
-        branch_data = filtered_df[filtered_df['فرع_الشحنة'] == branch_name]
-        
-        # حساب الشحنات التي خرجت لأول مرة لهذا الفرع
-        branch_first_time = len(branch_data[
-            (branch_data['تاريخ_استلام_محول'] == branch_data['تاريخ_شحن_محول']) & 
-            (pd.notna(branch_data['تاريخ_استلام_محول'])) & 
-            (pd.notna(branch_data['تاريخ_شحن_محول']))
-        ]) if 'تاريخ_استلام_محول' in branch_data.columns and 'تاريخ_شحن_محول' in branch_data.columns else 0
-        
-        # حساب المسلم من المحاولة الأولى لهذا الفرع
-        branch_first_attempt = len(branch_data[branch_data['نوع_المحاولة'] == 'المحاولة الأولى'])
-        
-        # تحديث القيم
-        branch_detailed.loc[idx, 'المحاولة الأولى'] = branch_first_attempt
-        branch_detailed.loc[idx, 'الشحنات الأولى'] = branch_first_time
-        
-        # حساب معدل المحاولة الأولى
-        if branch_first_time > 0:
-            branch_detailed.loc[idx, 'نسبة التسليم من المحاولة الأولى (%)'] = round((branch_first_attempt / branch_first_time * 100), 2)
-        else:
-            branch_detailed.loc[idx, 'نسبة التسليم من المحاولة الأولى (%)'] = 0.0
+    with span('branch_analysis', 'analysis', rows_in=len(filtered_df)) as branch_span:
+        # إحصائيات شاملة للفروع
+        branch_detailed = filtered_df.groupby('فرع_الشحنة').agg({
+            'رقم الطلب': 'count',
+            'حالة_مسلم': lambda x: (x == 'مسلم').sum()
+        })
     
-    branch_detailed = branch_detailed.reset_index()
-    branch_detailed = branch_detailed.sort_values('إجمالي الطلبات', ascending=False)
+        # تسطيح الأعمدة
+        branch_detailed.columns = ['إجمالي الطلبات', 'تم التسليم']
+        branch_detailed['لم تُسلم'] = branch_detailed['إجمالي الطلبات'] - branch_detailed['تم التسليم']
+        branch_detailed['نسبة التسليم الكلية (%)'] = (branch_detailed['تم التسليم'] / branch_detailed['إجمالي الطلبات'] * 100).round(2)
+    
+        # حساب محاولات التسليم لكل فرع بالطريقة الصحيحة
+        branch_detailed['المحاولة الأولى'] = 0
+        branch_detailed['الشحنات الأولى'] = 0
+        branch_detailed['نسبة التسليم من المحاولة الأولى (%)'] = 0.0
+    
+        for idx, row in branch_detailed.iterrows():
+            branch_name = idx  # اسم الفرع هو index
+            branch_data = filtered_df[filtered_df['فرع_الشحنة'] == branch_name]
+        
+            # حساب الشحنات التي خرجت لأول مرة لهذا الفرع
+            branch_first_time = len(branch_data[
+                (branch_data['تاريخ_استلام_محول'] == branch_data['تاريخ_شحن_محول']) & 
+                (pd.notna(branch_data['تاريخ_استلام_محول'])) & 
+                (pd.notna(branch_data['تاريخ_شحن_محول']))
+            ]) if 'تاريخ_استلام_محول' in branch_data.columns and 'تاريخ_شحن_محول' in branch_data.columns else 0
+        
+            # حساب المسلم من المحاولة الأولى لهذا الفرع
+            branch_first_attempt = len(branch_data[branch_data['نوع_المحاولة'] == 'المحاولة الأولى'])
+        
+            # تحديث القيم
+            branch_detailed.loc[idx, 'المحاولة الأولى'] = branch_first_attempt
+            branch_detailed.loc[idx, 'الشحنات الأولى'] = branch_first_time
+        
+            # حساب معدل المحاولة الأولى
+            if branch_first_time > 0:
+                branch_detailed.loc[idx, 'نسبة التسليم من المحاولة الأولى (%)'] = round((branch_first_attempt / branch_first_time * 100), 2)
+            else:
+                branch_detailed.loc[idx, 'نسبة التسليم من المحاولة الأولى (%)'] = 0.0
+    
+        branch_detailed = branch_detailed.reset_index()
+        branch_detailed = branch_detailed.sort_values('إجمالي الطلبات', ascending=False)
+        branch_span.set_output(branch_detailed)
     
     # عرض الجدول مع تنسيق النسب المئوية
     st.markdown("**📊 جدول تفصيلي لأداء الفروع:**")
@@ -1319,99 +1243,71 @@ if df is not None and len(df) > 0:
     display_branch['نسبة التسليم من المحاولة الأولى (%)'] = display_branch['نسبة التسليم من المحاولة الأولى (%)'].apply(lambda x: f"{x:.2f}")
     
     styled_branch = display_branch.style.apply(highlight_performance)
-    st.dataframe(styled_branch, use_container_width=True)
+    show_table('styled_branch', styled_branch, use_container_width=True)
     
     st.markdown('</div>', unsafe_allow_html=True)
     
-    # رسوم بيانية مفصلة للفروع
+    # رسوم بيانية مفصلة للفروع - الفروع الصغيرة تُجمع في فئة "أخرى"
+    branch_chart_data, branch_categories = limit_categories(
+        branch_detailed, 'فرع_الشحنة', 'إجمالي الطلبات',
+        sum_cols=['إجمالي الطلبات', 'تم التسليم', 'المحاولة الأولى', 'الشحنات الأولى'],
+        ratio_cols={
+            'نسبة التسليم الكلية (%)': ('تم التسليم', 'إجمالي الطلبات'),
+            'نسبة التسليم من المحاولة الأولى (%)': ('المحاولة الأولى', 'الشحنات الأولى')
+        }
+    )
+    
     branch_col1, branch_col2 = st.columns(2)
     
     with branch_col1:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
         st.markdown('<h3 class="chart-title">📈 مقارنة أداء الفروع</h3>', unsafe_allow_html=True)
         
-        fig_branch_compare = go.Figure()
-        fig_branch_compare.add_trace(go.Bar(
-            name='نسبة التسليم الكلية (%)',
-            x=branch_detailed['فرع_الشحنة'],
-            y=branch_detailed['نسبة التسليم الكلية (%)'],
-            marker_color='#3498db',
-            text=branch_detailed['نسبة التسليم الكلية (%)'].apply(lambda x: f"{x:.2f}"),
-            textposition='auto'
-        ))
-        fig_branch_compare.add_trace(go.Bar(
-            name='نسبة التسليم من المحاولة الأولى (%)',
-            x=branch_detailed['فرع_الشحنة'],
-            y=branch_detailed['نسبة التسليم من المحاولة الأولى (%)'],
-            marker_color='#e74c3c',
-            text=branch_detailed['نسبة التسليم من المحاولة الأولى (%)'].apply(lambda x: f"{x:.2f}"),
-            textposition='auto'
-        ))
-        
-        fig_branch_compare.update_layout(
-            barmode='group',
-            height=400,
-            font=dict(family='Cairo', size=12),
-            yaxis_title='النسبة المئوية (%)',
-            xaxis_title='الفرع'
-        )
+        branch_rates = branch_chart_data[['فرع_الشحنة', 'نسبة التسليم الكلية (%)', 'نسبة التسليم من المحاولة الأولى (%)']]
+        fig_branch_compare = get_cached_figure('niceone_branch_compare', _build_branch_compare_chart, branch_rates)
+        
+        show_chart('fig_branch_compare', fig_branch_compare, use_container_width=True)
         
-        st.plotly_chart(fig_branch_compare, use_container_width=True)
+        reduction_note = format_reduction_report(fig_branch_compare, branch_categories)
+        if reduction_note:
+            st.caption(reduction_note)
         st.markdown('</div>', unsafe_allow_html=True)
     
     with branch_col2:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
         st.markdown('<h3 class="chart-title">📦 توزيع الطلبات حسب الفروع</h3>', unsafe_allow_html=True)
         
-        fig_branch_distribution = px.pie(
-            branch_detailed,
-            values='إجمالي الطلبات',
-            names='فرع_الشحنة',
-            color_discrete_sequence=px.colors.qualitative.Set3,
-            hole=0.4
-        )
-        
-        fig_branch_distribution.update_traces(
-            textposition='inside',
-            textinfo='percent+label',
-            textfont_size=12
-        )
+        branch_totals = branch_chart_data[['فرع_الشحنة', 'إجمالي الطلبات']]
+        fig_branch_distribution = get_cached_figure('niceone_branch_distribution', _build_branch_distribution_chart, branch_totals)
         
-        fig_branch_distribution.update_layout(
-            height=400,
-            font=dict(family='Cairo', size=12),
-            showlegend=True,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=-0.2,
-                xanchor="center",
-                x=0.5
-            )
-        )
+        show_chart('fig_branch_distribution', fig_branch_distribution, use_container_width=True)
         
-        st.plotly_chart(fig_branch_distribution, use_container_width=True)
+        reduction_note = format_reduction_report(fig_branch_distribution, branch_categories)
+        if reduction_note:
+            st.caption(reduction_note)
         st.markdown('</div>', unsafe_allow_html=True)
     
     # أداء المناديب المحسّن والمفصل
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
     st.markdown('<h3 class="chart-title">👥 تحليل شامل لأداء المناديب</h3>', unsafe_allow_html=True)
     
-    # إحصائيات المناديب مع التركيز على عدد التحميل
-    driver_performance = filtered_df.groupby('اسم المندوب').agg({
-        'رقم الطلب': 'count',  # عدد التحميل (إجمالي الطلبات المحملة)
-        'حالة_مسلم': lambda x: (x == 'مسلم').sum(),
-        'نوع_المحاولة': lambda x: (x == 'المحاولة الأولى').sum()
-    }).reset_index()
+    with span('driver_performance', 'analysis', rows_in=len(filtered_df)) as driver_span:
+        # إحصائيات المناديب مع التركيز على عدد التحميل
+        driver_performance = filtered_df.groupby('اسم المندوب').agg({
+            'رقم الطلب': 'count',  # عدد التحميل (إجمالي الطلبات المحملة)
+            'حالة_مسلم': lambda x: (x == 'مسلم').sum(),
+            'نوع_المحاولة': lambda x: (x == 'المحاولة الأولى').sum()
+        }).reset_index()
     
-    driver_performance['نسبة التوصيل (%)'] = (driver_performance['حالة_مسلم'] / driver_performance['رقم الطلب'] * 100).round(2)
-    driver_performance['نسبة التسليم من المحاولة الأولى (%)'] = (driver_performance['نوع_المحاولة'] / driver_performance['حالة_مسلم'] * 100).round(2).fillna(0)
+        driver_performance['نسبة التوصيل (%)'] = (driver_performance['حالة_مسلم'] / driver_performance['رقم الطلب'] * 100).round(2)
+        driver_performance['نسبة التسليم من المحاولة الأولى (%)'] = (driver_performance['نوع_المحاولة'] / driver_performance['حالة_مسلم'] * 100).round(2).fillna(0)
     
-    # إعادة تسمية الأعمدة
-    driver_performance.columns = ['اسم المندوب', 'عدد التحميل', 'تم التسليم', 'المحاولة الأولى', 'نسبة التوصيل (%)', 'نسبة التسليم من المحاولة الأولى (%)']
+        # إعادة تسمية الأعمدة
+        driver_performance.columns = ['اسم المندوب', 'عدد التحميل', 'تم التسليم', 'المحاولة الأولى', 'نسبة التوصيل (%)', 'نسبة التسليم من المحاولة الأولى (%)']
     
-    # ترتيب المناديب حسب نسبة التوصيل
-    driver_performance = driver_performance.sort_values('نسبة التوصيل (%)', ascending=False)
+        # ترتيب المناديب حسب نسبة التوصيل
+        driver_performance = driver_performance.sort_values('نسبة التوصيل (%)', ascending=False)
+        driver_span.set_output(driver_performance)
     
     # تحديد أفضل وأسوأ وأنشط المناديب
     top_5_drivers = driver_performance.head(5)
@@ -1487,7 +1383,7 @@ if df is not None and len(df) > 0:
             lambda val: color_driver_performance(val), 
             subset=['نسبة التوصيل (%)', 'نسبة التسليم من المحاولة الأولى (%)']
         )
-        st.dataframe(styled_display, use_container_width=True, height=400)
+        show_table('styled_display', styled_display, use_container_width=True, height=400)
         
         # إحصائيات عامة
         avg_delivery_rate = driver_performance['نسبة التوصيل (%)'].mean()
@@ -1505,18 +1401,15 @@ if df is not None and len(df) > 0:
         st.markdown("**🏆 أفضل 5 مناديب في الأداء:**")
         
         # رسم بياني لأفضل 5
-        fig_top5 = px.bar(
+        fig_top5 = get_cached_figure(
+            'niceone_drivers_bar',
+            _build_drivers_bar_chart,
             top_5_drivers,
-            x='اسم المندوب',
-            y='نسبة التوصيل (%)',
-            color='نسبة التسليم من المحاولة الأولى (%)',
-            color_continuous_scale='Greens',
-            title='أفضل 5 مناديب',
-            text='نسبة التوصيل (%)'
+            color_column='نسبة التسليم من المحاولة الأولى (%)',
+            color_scale='Greens',
+            title='أفضل 5 مناديب'
         )
-        fig_top5.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
-        fig_top5.update_layout(height=400, font=dict(family='Cairo', size=12))
-        st.plotly_chart(fig_top5, use_container_width=True)
+        show_chart('fig_top5', fig_top5, use_container_width=True)
         
         # جدول أفضل 5 مع تنسيق النسب
         display_top5 = top_5_drivers.copy()
@@ -1527,24 +1420,21 @@ if df is not None and len(df) > 0:
             lambda val: color_driver_performance(val), 
             subset=['نسبة التوصيل (%)', 'نسبة التسليم من المحاولة الأولى (%)']
         )
-        st.dataframe(styled_top5, use_container_width=True)
+        show_table('styled_top5', styled_top5, use_container_width=True)
     
     with tab3:
         st.markdown("**⚠️ أقل 5 مناديب في الأداء (يحتاجون تحسين):**")
         
         # رسم بياني لأقل 5
-        fig_bottom5 = px.bar(
+        fig_bottom5 = get_cached_figure(
+            'niceone_drivers_bar',
+            _build_drivers_bar_chart,
             bottom_5_drivers,
-            x='اسم المندوب',
-            y='نسبة التوصيل (%)',
-            color='نسبة التوصيل (%)',
-            color_continuous_scale='Reds',
-            title='أقل 5 مناديب في الأداء',
-            text='نسبة التوصيل (%)'
+            color_column='نسبة التوصيل (%)',
+            color_scale='Reds',
+            title='أقل 5 مناديب في الأداء'
         )
-        fig_bottom5.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
-        fig_bottom5.update_layout(height=400, font=dict(family='Cairo', size=12))
-        st.plotly_chart(fig_bottom5, use_container_width=True)
+        show_chart('fig_bottom5', fig_bottom5, use_container_width=True)
         
         # جدول أقل 5 مع تنسيق النسب
         display_bottom5 = bottom_5_drivers.copy()
@@ -1555,7 +1445,7 @@ if df is not None and len(df) > 0:
             lambda val: color_driver_performance(val), 
             subset=['نسبة التوصيل (%)', 'نسبة التسليم من المحاولة الأولى (%)']
         )
-        st.dataframe(styled_bottom5, use_container_width=True)
+        show_table('styled_bottom5', styled_bottom5, use_container_width=True)
         
         # توصيات للتحسين
         st.markdown("**💡 توصيات للتحسين:**")
@@ -1572,89 +1462,9 @@ if df is not None and len(df) > 0:
         chart_drivers = driver_performance.head(15)
         
         # إنشاء الرسم المختلط
-        fig_mixed = go.Figure()
-        
-        # إضافة الأعمدة لنسبة التوصيل
-        fig_mixed.add_trace(go.Bar(
-            x=chart_drivers['اسم المندوب'],
-            y=chart_drivers['نسبة التوصيل (%)'],
-            name='نسبة التوصيل (%)',
-            marker=dict(
-                color=chart_drivers['نسبة التوصيل (%)'],
-                colorscale='RdYlGn',
-                cmin=60,
-                cmax=100,
-                showscale=True,
-                colorbar=dict(title="نسبة التوصيل (%)", x=1.02)
-            ),
-            text=chart_drivers['نسبة التوصيل (%)'].apply(lambda x: f"{x:.2f}"),
-            texttemplate='%{text}%',
-            textposition='outside',
-            yaxis='y'
-        ))
-        
-        # تطبيع عدد التحميل لجعله مناسب لوضعه كنقاط
-        max_delivery_rate = chart_drivers['نسبة التوصيل (%)'].max()
-        normalized_loading = (chart_drivers['عدد التحميل'] / chart_drivers['عدد التحميل'].max()) * (max_delivery_rate * 0.8)
-        
-        # إضافة النقاط لعدد التحميل
-        fig_mixed.add_trace(go.Scatter(
-            x=chart_drivers['اسم المندوب'],
-            y=normalized_loading,
-            mode='markers+text',
-            name='عدد التحميل',
-            marker=dict(
-                size=chart_drivers['عدد التحميل'] / chart_drivers['عدد التحميل'].max() * 40 + 10,
-                color='darkblue',
-                opacity=0.7,
-                line=dict(width=2, color='white')
-            ),
-            text=chart_drivers['عدد التحميل'],
-            textposition='middle center',
-            textfont=dict(color='white', size=10),
-            yaxis='y2'
-        ))
-        
-        # تحديث التخطيط
-        fig_mixed.update_layout(
-            title=dict(
-                text='تحليل مختلط: نسبة التوصيل وعدد التحميل للمناديب',
-                x=0.5,
-                font=dict(size=16, family='Cairo')
-            ),
-            xaxis=dict(
-                title='اسم المندوب',
-                tickangle=45,
-                title_font=dict(family='Cairo', size=14)
-            ),
-            yaxis=dict(
-                title='نسبة التوصيل (%)',
-                side='left',
-                range=[0, max_delivery_rate * 1.1],
-                title_font=dict(family='Cairo', size=14)
-            ),
-            yaxis2=dict(
-                title='عدد التحميل (مطبع)',
-                side='right',
-                overlaying='y',
-                range=[0, max_delivery_rate * 1.1],
-                showgrid=False,
-                title_font=dict(family='Cairo', size=14)
-            ),
-            height=600,
-            font=dict(family='Cairo', size=12),
-            legend=dict(
-                x=0.02,
-                y=0.98,
-                bgcolor="rgba(255,255,255,0.8)",
-                bordercolor="rgba(0,0,0,0.2)",
-                borderwidth=1
-            ),
-            plot_bgcolor='rgba(240,240,240,0.3)',
-            showlegend=True
-        )
+        fig_mixed = get_cached_figure('niceone_drivers_mixed', _build_drivers_mixed_chart, chart_drivers)
         
-        st.plotly_chart(fig_mixed, use_container_width=True)
+        show_chart('fig_mixed', fig_mixed, use_container_width=True)
         
         # شرح الرسم
         st.markdown("""
@@ -1673,7 +1483,7 @@ if df is not None and len(df) > 0:
         })
         
         st.markdown("**📋 مقارنة سريعة:**")
-        st.dataframe(comparison_data, use_container_width=True)
+        show_table('comparison_data', comparison_data, use_container_width=True)
     
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -1904,7 +1714,7 @@ if df is not None and len(df) > 0:
                 return [''] * len(row)
         
         styled_exec = exec_df.style.apply(style_exec_table, axis=1)
-        st.dataframe(styled_exec, use_container_width=True, height=500)
+        show_table('styled_exec', styled_exec, use_container_width=True, height=500)
         
         # توصيات سريعة
         st.markdown("### 💡 توصيات سريعة:")
@@ -2000,6 +1810,9 @@ else:
     </div>
     """, unsafe_allow_html=True)
 
+# السجل التاريخي من المخزن (إن كان مفعلاً)
+render_history('niceone')
+
 # عرض دليل المساعدة في الشريط الجانبي - مع إضافة معلومات حفظ البيانات
 add_logout_button()
 
@@ -2116,3 +1929,5 @@ st.markdown(f"""
     </p>
 </div>
 """, unsafe_allow_html=True)
+
+render_perf_panel()
@@ -0,0 +1,177 @@
+# perf_panel.py - قياس مراحل كل تشغيل للصفحة وعرضها في لوحة "الأداء" الجانبية
+import functools
+import os
+
+import pandas as pd
+import streamlit as st
+
+from shipping_core.cache import cache_stats, cached, invalidate, namespaces
+from shipping_core.instrumentation import (
+    append_jsonl, count_rows, finish_run, get_perf_log_path, mark_cache_miss, span, start_run
+)
+from shipping_core.tracing import export_run, tracing_enabled
+
+# التشغيل الحالي للصفحة في session state
+PERF_RUN_KEY = '_perf_run'
+
+
+def trace_requested():
+    """التتبع مفعل بمعامل الرابط ?trace=1 أو بمتغير البيئة SHIPPING_TRACE"""
+    return tracing_enabled(st.query_params.get('trace')) or tracing_enabled()
+
+
+def _record_run(run):
+    """إنهاء التشغيل وإضافته للسجل وكتابة ملف trace عند تفعيل التتبع - يرجع (مسار_السجل, مسار_trace)"""
+    finish_run(run)
+    log_path = append_jsonl(run)
+    trace_path = export_run(run) if trace_requested() else None
+    return log_path, trace_path
+
+
+def begin_perf_run(page):
+    """بدء قياس تشغيل جديد للصفحة
+
+    إذا توقف التشغيل السابق قبل عرض اللوحة (st.stop أو خطأ) يتم تسجيله أولاً.
+    """
+    previous = st.session_state.get(PERF_RUN_KEY)
+    if previous is not None:
+        _record_run(previous)
+    st.session_state[PERF_RUN_KEY] = start_run(page)
+
+
+def _rows_in(args):
+    return count_rows(args[0]) if args else None
+
+
+def cached_stage(category='analysis', stage=None, namespace='default', show_spinner=False, max_entries=None, ttl=None):
+    """بديل @st.cache_data يحفظ النتيجة في namespace من shipping_core.cache ويسجل زمن الدالة
+    وهل النتيجة من الذاكرة المؤقتة (hit) أو محسوبة (miss)"""
+    def decorator(func):
+        name = stage or func.__name__
+
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            mark_cache_miss()
+            if show_spinner:
+                with st.spinner(f"جاري تنفيذ {name}..."):
+                    return func(*args, **kwargs)
+            return func(*args, **kwargs)
+
+        cached_func = cached(namespace, func.__qualname__, max_entries=max_entries, ttl=ttl)(compute)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, category, rows_in=_rows_in(args), cached=True) as s:
+                result = cached_func(*args, **kwargs)
+                s.set_output(result)
+            return result
+
+        wrapper.clear = cached_func.clear
+        return wrapper
+    return decorator
+
+
+def timed_stage(category='analysis', stage=None):
+    """تسجيل زمن دالة غير محفوظة مؤقتاً"""
+    def decorator(func):
+        name = stage or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, category, rows_in=_rows_in(args)) as s:
+                result = func(*args, **kwargs)
+                s.set_output(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def show_chart(name, fig, **kwargs):
+    """st.plotly_chart مع تسجيل زمن إرسال المخطط"""
+    with span(f"render:{name}", 'chart'):
+        return st.plotly_chart(fig, **kwargs)
+
+
+def show_table(name, data, **kwargs):
+    """st.dataframe مع تسجيل زمن العرض وعدد الصفوف"""
+    # Styler يحتفظ بالجدول الأصلي في .data
+    rows = count_rows(data if isinstance(data, (pd.DataFrame, pd.Series)) else getattr(data, 'data', None))
+    with span(f"render:{name}", 'table', rows_in=rows):
+        return st.dataframe(data, **kwargs)
+
+
+def render_perf_panel():
+    """إنهاء قياس التشغيل الحالي وتسجيله وعرض لوحة الأداء في الشريط الجانبي عند تفعيلها"""
+    run = st.session_state.pop(PERF_RUN_KEY, None)
+    if run is None:
+        return
+    log_path, trace_path = _record_run(run)
+
+    with st.sidebar:
+        if trace_path:
+            with open(trace_path, 'rb') as f:
+                st.download_button("🧭 تحميل Chrome trace", f.read(), file_name=os.path.basename(trace_path),
+                                   mime='application/json', key="perf_trace_download",
+                                   help="افتحه في chrome://tracing أو ui.perfetto.dev")
+
+        if not st.toggle("⏱️ الأداء", key="perf_panel_visible", help="زمن كل مرحلة في آخر تشغيل للصفحة"):
+            return
+
+        spans_df = run.to_frame()
+        cache_counts = spans_df['cache'].value_counts()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("الزمن الكلي", f"{run.total_ms:,.0f} ms")
+        col2.metric("Cache hit", int(cache_counts.get('hit', 0)))
+        col3.metric("Cache miss", int(cache_counts.get('miss', 0)))
+
+        if spans_df.empty:
+            st.caption("لم يتم تسجيل مراحل في هذا التشغيل")
+            return
+
+        spans_df['stage'] = ['  ' * depth + stage for depth, stage in zip(spans_df['depth'], spans_df['stage'])]
+        st.dataframe(
+            spans_df[['stage', 'category', 'ms', 'rows_in', 'rows_out', 'cache']],
+            use_container_width=True,
+            hide_index=True,
+            column_config={'ms': st.column_config.NumberColumn('ms', format="%.1f")}
+        )
+
+        by_category = spans_df[spans_df['depth'] == 0].groupby('category')['ms'].sum().sort_values(ascending=False)
+        st.caption(" | ".join(f"{category}: {ms:,.0f} ms" for category, ms in by_category.items()))
+        if log_path:
+            st.caption(f"📝 السجل: {log_path}")
+        elif get_perf_log_path():
+            st.caption("⚠️ تعذر كتابة سجل الأداء")
+
+
+def render_cache_admin():
+    """إحصائيات الذاكرة المؤقتة لكل namespace مع مسح namespace واحد أو الكل"""
+    names = namespaces()
+    if not names:
+        st.caption("لا توجد دوال محفوظة مؤقتاً في هذه العملية بعد")
+        return
+
+    # أزرار المسح أولاً حتى تعكس الإحصائيات المعروضة نتيجة المسح
+    columns = st.columns(len(names) + 1)
+    for column, namespace in zip(columns, names):
+        if column.button(f"🧹 {namespace}", key=f"cache_invalidate_{namespace}", use_container_width=True):
+            st.toast(f"تم مسح {invalidate(namespace):,} عنصر من {namespace}")
+    if columns[-1].button("🧹 الكل", key="cache_invalidate_all", use_container_width=True):
+        st.toast(f"تم مسح {invalidate():,} عنصر")
+
+    stats = cache_stats()
+    by_namespace = stats.groupby('namespace')[['entries', 'bytes', 'hits', 'misses', 'evictions', 'expirations']].sum()
+    lookups = by_namespace['hits'] + by_namespace['misses']
+    by_namespace['hit_rate'] = (by_namespace['hits'] / lookups.where(lookups > 0)).round(3)
+    by_namespace['size_mb'] = (by_namespace.pop('bytes') / (1024 * 1024)).round(2)
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("العناصر", f"{int(stats['entries'].sum()):,}")
+    col2.metric("الحجم", f"{stats['bytes'].sum() / (1024 * 1024):,.1f} MB")
+    col3.metric("Hit / Miss", f"{int(stats['hits'].sum()):,} / {int(stats['misses'].sum()):,}")
+    col4.metric("Evictions", f"{int((stats['evictions'] + stats['expirations']).sum()):,}")
+
+    st.dataframe(by_namespace.reset_index(), use_container_width=True, hide_index=True)
+    with st.expander("تفاصيل كل دالة"):
+        details = stats.assign(size_kb=(stats['bytes'] / 1024).round(1)).drop(columns='bytes')
+        st.dataframe(details, use_container_width=True, hide_index=True)
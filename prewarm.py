@@ -0,0 +1,203 @@
+# prewarm.py - تجهيز بيانات صفحات الشركات وذاكرتها المؤقتة في الخلفية بعد تسجيل الدخول
+"""
+بعد تسجيل الدخول في الصفحة الرئيسية يبدأ start_prewarm خيطاً في الخلفية (مرة واحدة لكل
+مجموعة تشغيلات) يقرأ آخر نتائج المعالجة الدفعية لكل شركة، ويضيفها للسجل المشترك
+(shipping_core.registry)، ويحسب التحليلات الأساسية في نفس جداول الذاكرة المؤقتة التي
+تستخدمها الصفحات (نفس namespace واسم الدالة والمعاملات عند الفتح بدون فلاتر).
+
+عند أول فتح لصفحة شركة بدون بيانات محفوظة تستخدم adopt_prewarmed هذه النتائج، فتجد
+التحليلات محسوبة مسبقاً.
+
+SHIPPING_PREWARM=0 يعطل التجهيز.
+"""
+import logging
+import os
+import threading
+import time
+
+import streamlit as st
+
+from shipping_core import aramex as aramex_core
+from shipping_core import niceone as niceone_core
+from shipping_core import sla as sla_core
+from shipping_core import smsa as samsa_core
+from shipping_core.artifacts import get_artifacts_root, list_runs, read_table
+from shipping_core.cache import warm
+from shipping_core.cities import aliases_version
+from shipping_core.instrumentation import append_jsonl, finish_run, span, start_run
+from shipping_core.pipeline import refresh_city_aliases
+from shipping_core.registry import get_registry
+from hub_summary import CARRIER_KEYS
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ENV = 'SHIPPING_PREWARM'
+
+# مالك الجداول المجهزة في السجل المشترك (لا يُحذف مع الجلسات المغلقة)
+PREWARM_OWNER = 'prewarm'
+
+CARRIERS = ('niceone', 'aramex', 'smsa')
+
+_STATUS_LABELS = {'running': '⏳', 'ready': '✅', 'error': '❌'}
+
+_lock = threading.Lock()
+_worker = None
+_warmed_runs = None
+_status = {}    # carrier -> {'status', 'run', 'tables', 'rows', 'warmed', 'ms', 'error'}
+
+
+def prewarm_enabled():
+    return os.environ.get(PREWARM_ENV, '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+# ==================== التحليلات الأساسية لكل شركة ====================
+# الأسماء والمعاملات مطابقة لاستدعاءات الدوال المحفوظة في صفحات pages/ عند الفتح بدون فلاتر
+
+def _warm_aramex(tables):
+    df, sla_df = tables['processed'], tables.get('sla')
+    df_with_sla = aramex_core.add_sla_and_fds_columns(df, sla_df)
+    df_active = df_with_sla[~df_with_sla['للاستثناء']] if 'للاستثناء' in df_with_sla.columns else df_with_sla
+    return [
+        warm('aramex', 'analyze_cities_performance_enhanced', aramex_core.analyze_cities_performance_enhanced,
+             df_active),
+        warm('aramex', 'analyze_weekly_trends_enhanced', aramex_core.analyze_weekly_trends_enhanced, df_active),
+        warm('aramex', 'analyze_delayed_shipments', aramex_core.analyze_delayed_shipments, df_active, sla_df),
+    ]
+
+
+def _warm_smsa(tables):
+    df, sla_df = tables['processed'], tables.get('sla')
+    return [
+        warm('smsa', 'analyze_delivery_performance_fast', samsa_core.analyze_delivery_performance_fast, df),
+        warm('smsa', 'analyze_cities_performance_samsa', samsa_core.analyze_cities_performance_samsa, df),
+        warm('smsa', 'calculate_performance_metrics', samsa_core.calculate_performance_metrics, df, sla_df),
+        warm('smsa', 'calculate_weekly_metrics', samsa_core.calculate_weekly_metrics, df),
+    ]
+
+
+def _warm_niceone(tables):
+    # analyze_attempts تعدل الجدول المدخل، لذلك تعمل على نسخة
+    df = tables['processed']
+    return [warm('niceone', 'analyze_attempts', lambda frame: niceone_core.analyze_attempts(frame.copy()), df)]
+
+
+_WARMERS = {'aramex': _warm_aramex, 'smsa': _warm_smsa, 'niceone': _warm_niceone}
+
+
+# ==================== الخيط العامل ====================
+
+def _latest_runs(root):
+    """آخر تشغيل دفعي لكل شركة {carrier: run}"""
+    runs = {}
+    for carrier in CARRIERS:
+        carrier_runs = list_runs(carrier, root)
+        if carrier_runs and 'processed' in carrier_runs[0]['tables']:
+            runs[carrier] = carrier_runs[0]
+    return runs
+
+
+def _prewarm_carrier(carrier, run):
+    registry = get_registry()
+    start = time.perf_counter()
+    with span(f"prewarm:{carrier}", 'pipeline', rows_in=run.get('rows')) as s:
+        tables = refresh_city_aliases(carrier, run, {table: read_table(run['path'], table) for table in run['tables']})
+        # نفس تسميات ونسخ SLA المستخدمة عند حفظ الجداول في الصفحات حتى تتشارك نفس النسخة
+        sla_version = sla_core.sla_version(tables.get('sla')) if carrier == 'smsa' else None
+        handles = {table: registry.share(df, carrier='SLA' if table == 'sla' else CARRIER_KEYS[carrier],
+                                         sla_version=sla_version if table == 'processed' else None,
+                                         index=table == 'processed')
+                   for table, df in tables.items()}
+        registry.bind(PREWARM_OWNER, carrier, list(handles.values()))
+        warmed = _WARMERS[carrier](tables)
+        s.set_output(tables['processed'])
+    return {
+        'status': 'ready',
+        'run': run['run_name'],
+        'tables': handles,
+        'rows': len(tables['processed']),
+        'warmed': sum(warmed),
+        'ms': (time.perf_counter() - start) * 1000,
+    }
+
+
+def _prewarm(runs):
+    run = start_run('prewarm')
+    for carrier, carrier_run in runs.items():
+        try:
+            result = _prewarm_carrier(carrier, carrier_run)
+        except Exception as e:
+            logger.warning("تعذر تجهيز بيانات %s: %s", carrier, e)
+            result = {'status': 'error', 'run': carrier_run['run_name'], 'error': str(e)}
+        with _lock:
+            _status[carrier] = result
+    finish_run(run)
+    append_jsonl(run)
+    logger.info("اكتمل تجهيز بيانات %s في %.0f ms", ', '.join(runs), run.total_ms)
+
+
+def start_prewarm(root=None):
+    """بدء التجهيز في الخلفية إذا ظهرت تشغيلات دفعية جديدة - يرجع True إذا بدأ خيط جديد"""
+    global _worker, _warmed_runs
+    if not prewarm_enabled():
+        return False
+
+    runs = _latest_runs(root or get_artifacts_root())
+    # تغير الأسماء البديلة يمسح التحليلات المجهزة (shipping_core.cities.add_alias) فتُجهز من جديد
+    run_paths = ({carrier: run['path'] for carrier, run in runs.items()}, aliases_version())
+    with _lock:
+        if not runs or run_paths == _warmed_runs or (_worker is not None and _worker.is_alive()):
+            return False
+        _warmed_runs = run_paths
+        for carrier, run in runs.items():
+            if _status.get(carrier, {}).get('run') != run['run_name']:
+                _status[carrier] = {'status': 'running', 'run': run['run_name']}
+        _worker = threading.Thread(target=_prewarm, args=(runs,), name='shipping-prewarm', daemon=True)
+        _worker.start()
+    return True
+
+
+def prewarm_status():
+    """حالة التجهيز لكل شركة {carrier: status}"""
+    with _lock:
+        return {carrier: dict(status) for carrier, status in _status.items()}
+
+
+# ==================== استخدام النتائج في الصفحات ====================
+
+def adopt_prewarmed(carrier):
+    """جداول آخر تشغيل دفعي المجهزة للشركة عند أول فتح لصفحتها في الجلسة - أو None
+
+    تُستخدم مرة واحدة لكل جلسة حتى لا تعود البيانات بعد مسحها.
+    """
+    adopted = st.session_state.setdefault('prewarm_adopted', set())
+    if carrier in adopted:
+        return None
+
+    with _lock:
+        status = _status.get(carrier)
+    if not status or status['status'] != 'ready':
+        return None
+
+    registry = get_registry()
+    tables = {table: registry.resolve(handle) for table, handle in status['tables'].items()}
+    if tables.get('processed') is None:
+        return None
+    adopted.add(carrier)
+    return tables
+
+
+def render_prewarm_status():
+    """سطر مختصر بحالة تجهيز بيانات الشركات"""
+    status = prewarm_status()
+    if not status:
+        return
+    parts = []
+    for carrier in CARRIERS:
+        item = status.get(carrier)
+        if item is None:
+            continue
+        label = f"{_STATUS_LABELS.get(item['status'], '')} {carrier}"
+        if item['status'] == 'ready':
+            label += f" ({item['rows']:,} شحنة، {item['ms']:,.0f} ms)"
+        parts.append(label)
+    st.caption("⚡ تجهيز آخر نتائج دفعية: " + " | ".join(parts))
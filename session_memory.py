@@ -0,0 +1,170 @@
+# session_memory.py - تسجيل البيانات المحفوظة في session state ضمن حدود الذاكرة (shipping_core.memory)
+import pandas as pd
+import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from shipping_core.memory import SpilledFrame, format_bytes, get_ledger
+from shipping_core.registry import DatasetHandle, get_registry
+from prewarm import PREWARM_OWNER
+
+# مفاتيح session state التي تحتوي على جداول كاملة
+DATASET_LABELS = {
+    'aramex_saved_data': 'Aramex',
+    'samsa_saved_data': 'SMSA',
+    'niceone_saved_data': 'NiceOne',
+    'sla_saved_data': 'SLA',
+    'shared_shipping_data': 'البيانات المشتركة',
+}
+
+
+def _session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else 'local'
+
+
+def _prune_closed_sessions(ledger):
+    """حذف بيانات الجلسات المغلقة من السجل وتحرير مراجعها للجداول المشتركة"""
+    if runtime.exists():
+        instance = runtime.get_instance()
+        ledger.prune(instance.is_active_session)
+        # الجداول المجهزة في الخلفية تبقى حتى تستخدمها الجلسات
+        get_registry().prune(lambda owner: owner == PREWARM_OWNER or instance.is_active_session(owner))
+
+
+def _share_frames(owner, key, container, sla_version):
+    """استبدال الجداول في القاموس بمراجع للسجل المشترك وربطها بالجلسة"""
+    registry = get_registry()
+    handles = []
+    for field, value in container.items():
+        if isinstance(value, pd.DataFrame):
+            container[field] = value = registry.share(value, carrier=DATASET_LABELS.get(key, key),
+                                                      sla_version=sla_version)
+        if isinstance(value, DatasetHandle):
+            handles.append(value)
+    registry.bind(owner, key, handles)
+
+
+def _resolve_frames(data):
+    """استبدال المراجع بالجداول المشتركة (مع استعادة المنقول منها إلى القرص)"""
+    registry = get_registry()
+    for field, value in data.items():
+        if isinstance(value, DatasetHandle):
+            data[field] = registry.resolve(value)
+    return data
+
+
+def _notify(spilled):
+    for _, name, nbytes in spilled:
+        st.toast(f"💾 تم نقل {DATASET_LABELS.get(name, name)} ({format_bytes(nbytes)}) إلى القرص لتوفير الذاكرة")
+
+
+def _enforce_budgets(ledger, owner, key):
+    """تطبيق حدود الجلسة والعملية على البيانات في session state والجداول المشتركة المرتبطة بها معاً
+
+    السجل يحسب القواميس فقط (الجداول فيها مراجع)، لذلك تُطبق الحدود على الجداول المشتركة بالمتبقي منها.
+    """
+    registry = get_registry()
+    spilled = [item for item in ledger.enforce(owner, protect=(owner, key)) if item[0] == owner]
+    handles = registry.enforce(ledger.session_budget - ledger.usage(owner), owner, protect=[(owner, key)])
+    handles += [handle for handle in registry.enforce(ledger.process_budget - ledger.usage(), protect=[(owner, key)])
+                if registry.owns(owner, handle)]
+    _notify(spilled + [(owner, handle.carrier, handle.nbytes) for handle in handles])
+
+
+def track_dataset(key, sla_version=None):
+    """تسجيل البيانات المحفوظة في st.session_state[key] بعد حفظها وتطبيق حدود الذاكرة - يرجع الحجم
+
+    الجداول تنتقل إلى السجل المشترك (shipping_core.registry) ويبقى في الجلسة مرجع لها فقط،
+    و sla_version يميز الجداول التي تمت معالجتها بجدول SLA معين.
+    """
+    ledger = get_ledger()
+    owner = _session_id()
+    _prune_closed_sessions(ledger)
+    _share_frames(owner, key, st.session_state[key], sla_version)
+    nbytes = ledger.register(owner, key, st.session_state[key])
+    _enforce_budgets(ledger, owner, key)
+    return nbytes
+
+
+def use_dataset(key):
+    """استرجاع البيانات المحفوظة مع استعادتها من القرص إذا تم نقلها - يرجع None إذا لم توجد"""
+    container = st.session_state.get(key)
+    if container is None:
+        return None
+
+    ledger = get_ledger()
+    owner = _session_id()
+    if not ledger.is_registered(owner, key, container):
+        # بيانات محفوظة مباشرة في session state بدون track_dataset
+        track_dataset(key)
+    data = ledger.checkout(owner, key)
+    _enforce_budgets(ledger, owner, key)
+    return _resolve_frames(data)
+
+
+def has_dataset(key, field, non_empty=False):
+    """هل تحتوي البيانات المحفوظة في st.session_state[key] على field - بدون استعادة الجداول
+
+    الإجابة من المرجع (DatasetHandle) أو الملف المنقول، فلا يُقرأ جدول من القرص لمجرد التحقق.
+    non_empty يتطلب قيمة بصفوف.
+    """
+    container = st.session_state.get(key)
+    if not container or field not in container:
+        return False
+    if not non_empty:
+        return True
+    value = container[field]
+    if isinstance(value, (DatasetHandle, SpilledFrame)):
+        return value.rows > 0
+    return value is not None and len(value) > 0
+
+
+def untrack_dataset(key):
+    """إزالة البيانات من السجل وتحرير مراجعها عند مسحها"""
+    owner = _session_id()
+    get_ledger().unregister(owner, key)
+    get_registry().bind(owner, key, [])
+
+
+def dataset_size(key):
+    """الحجم الفعلي للبيانات بالبايت (بما فيه الجداول المشتركة المرتبطة بها) أو None"""
+    size = get_ledger().size(_session_id(), key)
+    if size is None:
+        return None
+    container = st.session_state.get(key) or {}
+    return size + sum(value.nbytes for value in container.values() if isinstance(value, DatasetHandle))
+
+
+def render_memory_status():
+    """عرض استهلاك ذاكرة الجلسة والعملية مقارنة بالحدود"""
+    ledger = get_ledger()
+    registry = get_registry()
+    owner = _session_id()
+    session_used = ledger.usage(owner) + registry.usage(owner)
+    process_used = ledger.usage() + registry.usage()
+
+    st.markdown("### 🧠 الذاكرة")
+    st.progress(min(session_used / ledger.session_budget, 1.0),
+                text=f"الجلسة: {format_bytes(session_used)} / {format_bytes(ledger.session_budget)}")
+    st.progress(min(process_used / ledger.process_budget, 1.0),
+                text=f"الخادم: {format_bytes(process_used)} / {format_bytes(ledger.process_budget)}")
+
+    report = ledger.report(owner)
+    if not report.empty:
+        report['dataset'] = report['dataset'].map(lambda key: DATASET_LABELS.get(key, key))
+        st.dataframe(report[['dataset', 'memory_mb', 'state', 'idle_s']], hide_index=True, use_container_width=True)
+
+    shared = registry.report()
+    if not shared.empty:
+        st.caption(f"🔗 جداول مشتركة بين الجلسات: {len(shared)} ({format_bytes(registry.usage())}) | "
+                   f"تم توفير {format_bytes(registry.stats['saved_bytes'])} بإعادة الاستخدام")
+        st.dataframe(shared[['carrier', 'rows', 'memory_mb', 'state', 'refs', 'sessions', 'idle_s']],
+                     hide_index=True, use_container_width=True)
+
+    events = registry.events_frame()
+    if not events.empty:
+        stats = registry.stats
+        st.caption(f"💾 نقل للقرص: {stats['spills']} ({stats['spill_ms']:,.0f} ms) | "
+                   f"استعادة: {stats['reloads']} ({stats['reload_ms']:,.0f} ms)")
+        st.dataframe(events.iloc[::-1], hide_index=True, use_container_width=True)
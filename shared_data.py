@@ -1,9 +1,9 @@
 # shared_data.py - مدير البيانات المشتركة بين الصفحات
 import streamlit as st
 import pandas as pd
-import pickle
 import os
 from datetime import datetime
+from session_memory import has_dataset, track_dataset, use_dataset
 
 class SharedDataManager:
     """مدير البيانات المشتركة بين جميع صفحات النظام"""
@@ -44,6 +44,7 @@ class SharedDataManager:
         st.session_state[self.data_key]['upload_times'][company_name.lower()] = datetime.now()
         st.session_state[self.data_key]['data_sources'][company_name.lower()] = source
         st.session_state[self.data_key]['last_updated'] = datetime.now()
+        track_dataset(self.data_key)
         
         # إظهار رسالة نجاح
         st.success(f"✅ تم حفظ بيانات {company_name} بنجاح! ستبقى متاحة في جميع الصفحات.")
@@ -51,7 +52,7 @@ class SharedDataManager:
     def get_company_data(self, company_name):
         """استرجاع بيانات شركة معينة"""
         company_key = f"{company_name.lower()}_data"
-        return st.session_state[self.data_key].get(company_key, None)
+        return use_dataset(self.data_key).get(company_key, None)
     
     def get_branch_files(self, company_name):
         """استرجاع ملفات فروع شركة معينة"""
@@ -71,8 +72,7 @@ class SharedDataManager:
     
     def has_company_data(self, company_name):
         """التحقق من وجود بيانات لشركة معينة"""
-        data = self.get_company_data(company_name)
-        return data is not None and len(data) > 0
+        return has_dataset(self.data_key, f"{company_name.lower()}_data", non_empty=True)
     
     def clear_company_data(self, company_name):
         """مسح بيانات شركة معينة"""
@@ -89,6 +89,7 @@ class SharedDataManager:
         
         if company_lower in st.session_state[self.data_key]['data_sources']:
             del st.session_state[self.data_key]['data_sources'][company_lower]
+        track_dataset(self.data_key)
         
         st.success(f"✅ تم مسح بيانات {company_name}")
     
@@ -107,6 +108,7 @@ class SharedDataManager:
             'branch_files': {},
             'last_updated': None
         }
+        track_dataset(self.data_key)
         st.success("✅ تم مسح جميع البيانات")
     
     def get_all_companies_status(self):
@@ -0,0 +1,43 @@
+# shipment_search.py - بحث فوري عن شحنة في بيانات كل الشركات من الصفحة الرئيسية
+import streamlit as st
+
+from perf_panel import show_table
+from shipping_core.instrumentation import span
+from shipping_core.lookup import KEY_LABELS
+from shipping_core.registry import get_registry
+
+# عدد الصفوف المعروضة لكل جدول (رقم هاتف قد يطابق مئات الشحنات)
+MAX_RESULTS = 200
+
+
+def render_shipment_search(companies_data):
+    """مربع بحث برقم الشحنة أو الطلب أو الهاتف أو المرجع أو اسم وعنوان المستلم في كل الجداول المحملة
+    (فهرس hash للمعرفات وفهرس مقلوب للنص لكل جدول)"""
+    registry = get_registry()
+    indexed = registry.indexed()
+    st.markdown("### 🔎 البحث عن شحنة")
+    if not indexed:
+        st.info("📋 لا توجد بيانات محملة للبحث - ارفع بيانات أي شركة أو انتظر تجهيز آخر نتائج دفعية")
+        return
+
+    col1, col2 = st.columns([3, 1])
+    value = col1.text_input("رقم الشحنة أو الطلب أو الهاتف أو المرجع أو اسم وعنوان المستلم",
+                            key="hub_shipment_search",
+                            placeholder="مثال: 40000000001 أو 0551234567 أو احمد حي النسيم").strip()
+    kinds = col2.multiselect("البحث في", list(KEY_LABELS), format_func=KEY_LABELS.get, key="hub_search_kinds")
+    st.caption(f"{len(indexed)} جدول مفهرس ({sum(handle.rows for handle in indexed):,} شحنة)")
+    if not value:
+        return
+
+    with span('hub_search', 'analysis'):
+        results = registry.search(value, kinds or None)
+    if not results:
+        st.warning(f"لا توجد شحنات مطابقة لـ {value}")
+        return
+
+    for handle, rows in results:
+        company = companies_data.get(handle.carrier, {})
+        st.markdown(f"**{company.get('logo', '📦')} {company.get('name', handle.carrier)}** - {len(rows):,} شحنة")
+        if len(rows) > MAX_RESULTS:
+            st.caption(f"عرض أول {MAX_RESULTS:,} شحنة")
+        show_table(f"search:{handle.carrier}", rows.head(MAX_RESULTS), use_container_width=True, hide_index=True)
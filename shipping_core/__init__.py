@@ -0,0 +1,10 @@
+# shipping_core - مكتبة التحليل الأساسية (pandas/numpy فقط) بدون Streamlit
+"""
+مكتبة معالجة وتحليل بيانات الشحن المستخدمة في صفحات لوحة التحكم.
+
+لا تعتمد على Streamlit أو session state، لذلك يمكن استيرادها من سكربتات
+المعالجة الدفعية والاختبارات وقياس الأداء.
+"""
+from shipping_core import kernels, instrumentation, tracing, memory, cache, text_index, lookup, registry, common, sla, cities, regions, schema, engine, aramex, smsa, niceone, adapters, summary, warehouse, history, snapshots, artifacts, pipeline, synthetic
+
+__all__ = ['kernels', 'instrumentation', 'tracing', 'memory', 'cache', 'text_index', 'lookup', 'registry', 'common', 'sla', 'cities', 'regions', 'schema', 'engine', 'aramex', 'smsa', 'niceone', 'adapters', 'summary', 'warehouse', 'history', 'snapshots', 'artifacts', 'pipeline', 'synthetic']
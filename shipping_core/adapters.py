@@ -0,0 +1,35 @@
+# shipping_core/adapters.py - سجل محولات شركات الشحن إلى الجدول الموحد (shipping_core.schema)
+"""
+كل شركة تعرّف to_canonical(df, sla_df=None) في وحدتها، تأخذ ناتج المعالجة الخاصة بها
+وترجع جدولاً موحداً، وتعريفات المؤشرات الخاصة بالشركة (مقام SLA و FDS والمستثنى) تظهر
+هناك فقط. بعد ذلك تُحسب المؤشرات لجميع الشركات بمحرك واحد (shipping_core.engine).
+
+إضافة شركة جديدة (مثل DHL) تحتاج محولاً واحداً فقط:
+
+    @register_adapter('dhl')
+    def dhl_to_canonical(df, sla_df=None):
+        return conform(pd.DataFrame({'حالة_التسليم': ..., ...}, index=df.index), 'dhl')
+"""
+from shipping_core import aramex, niceone, smsa
+
+ADAPTERS = {
+    'aramex': aramex.to_canonical,
+    'smsa': smsa.to_canonical,
+    'niceone': niceone.to_canonical,
+}
+
+
+def register_adapter(carrier):
+    """تسجيل محول شركة شحن - المحول: func(df, sla_df=None) -> جدول موحد"""
+    def decorator(func):
+        ADAPTERS[carrier] = func
+        return func
+    return decorator
+
+
+def to_canonical(carrier, df, sla_df=None):
+    """تحويل بيانات الشركة إلى الجدول الموحد بمحولها المسجل"""
+    adapter = ADAPTERS.get(carrier)
+    if adapter is None:
+        raise ValueError(f"شركة غير معروفة: {carrier}")
+    return adapter(df, sla_df)
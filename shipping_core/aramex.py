@@ -0,0 +1,673 @@
+# shipping_core/aramex.py - معالجة وتحليل بيانات Aramex مع SLA و FDS
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from shipping_core.cities import map_sla_days
+from shipping_core.common import safe_date_conversion
+from shipping_core import engine
+from shipping_core.kernels import fast_paths_enabled
+from shipping_core.schema import OTHER, conform, source_column
+
+logger = logging.getLogger(__name__)
+
+
+def process_aramex_data(df):
+    """معالجة بيانات Aramex الرئيسية مع التصنيف الجديد للحالات"""
+
+    # خريطة الأعمدة
+    column_mapping = {
+        'AWB': 'رقم_الشحنة',
+        'Status': 'الحالة',
+        'Destination City': 'المدينة_الوجهة',
+        'Origin City': 'المدينة_المنشأ',
+        'Pickup Date (Creation Date)': 'تاريخ_الاستلام',
+        'First Out For Delivery': 'المحاولة_الأولى',
+        '2nd Delivery Attempt': 'المحاولة_الثانية',
+        '3rd Delivery Attempt': 'المحاولة_الثالثة',
+        'Total Delivery Attempts': 'إجمالي_المحاولات',
+        'Last Attempted Delivery Action Date': 'تاريخ_آخر_محاولة',
+        'Expected Delivery Date': 'التاريخ_المتوقع_للتسليم',
+        'Transit Days': 'أيام_النقل',
+        'Weight': 'الوزن',
+        'COD Value': 'المبلغ_المستحق',
+        'Destination city tier': 'مستوى_المدينة',
+        'Destination Country': 'الدولة_الوجهة',
+        'Consignee Reference 1': 'المرجع_الشحنة_1',
+        'Delivery Date': 'تاريخ_التسليم'
+    }
+
+    # إعادة تسمية الأعمدة
+    df = df.rename(columns={k: v for k, v in column_mapping.items() if k in df.columns})
+
+    # معالجة التواريخ المحسنة
+    date_columns = ['تاريخ_الاستلام', 'المحاولة_الأولى', 'المحاولة_الثانية', 'المحاولة_الثالثة', 'تاريخ_التسليم']
+    for col in date_columns:
+        if col in df.columns:
+            df[col] = safe_date_conversion(df[col], col)
+
+    # معالجة الأرقام
+    numeric_columns = ['إجمالي_المحاولات', 'أيام_النقل', 'الوزن', 'المبلغ_المستحق']
+    for col in numeric_columns:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    # التصنيف الجديد لحالة التسليم
+    if 'الحالة' in df.columns:
+        status_upper = df['الحالة'].astype(str).str.upper().str.strip()
+
+        # ✅ تم التسليم (Delivered)
+        delivered_statuses = [
+            'DELIVERED', 'SHIPMENT DELIVERED', 'PAID', 'SHIPMENT DELIVERED OK'
+        ]
+
+        # 🚚 جاري التسليم (In Progress)
+        in_progress_statuses = [
+            'EXCEPTION', 'FORWARD TO DELIVERY WAREHOUSE', 'HAL', 'HELD AT CUSTOMS',
+            'HELD FOR PICKUP', 'IN PROGRESS', 'OUT FOR DELIVERY', 'SHIPMENT OUT FOR DELIVERY',
+            'SORTING', 'TRANSIT', 'PENDING', 'PROCESSING', 'IN TRANSIT', 'DEPOSITED',
+            'EXPIRED', 'RECEIVED-INBOUND TEAM', 'LOCKED', 'NOT-DELIVERED', 'NOT-DEPOSITED',
+            'R-WAITING', 'R-DEPOSITED', 'IN-TRANSIT-R', 'PICKED UP', 'AWAITING CONSIGNEE FOR COLLECTION',
+            'NO RESPONSE', 'INCORRECT PHONE', 'AT DESTINATION FACILITY', 'LEFT ORIGIN',
+            'STILL AT ORIGIN', 'AT HUB FACILITY', 'INCORRECT ADDRESS', 'SHIPMENT STORED AT WAREHOUSE',
+            'SHIPMENT CONFISCATED', 'CUSTOMER NOT AVAILABLE', 'CUSTOMER CONTACT ATTEMPTS COMPLETED',
+            'ATTEMPTED TO DELIVER', 'REDIRECT UNDER A NEW SHIPMENT', 'UNDER DELIVERY',
+            'ADDRESS INFORMATION NEEDED, CONTACT DHL', 'ARRIVED AT DELIVERY FACILITY',
+            'AWAITING COLLECTION BY RECIPIENT AS REQUESTED', 'CLEARANCE DELAY CD',
+            'CLEARANCE PROCESSING COMPLETE', 'CLOSED SHIPMENT', 'CUSTOMS STATUS UPDATED',
+            'DELIVERY ARRANGED, NO DETAILS EXPECTED', 'DEPARTED FACILITY',
+            'FORWARDED FOR DELIVERY – DETAILS EXPECTED', 'PROCESSED AT DHL LOCATION',
+            'RECIPIENT REFUSED DELIVERY', 'SCHEDULED FOR DELIVERY AS AGREED',
+            'SCHEDULED FOR DELIVERY ND', 'SHIPMENT HELD – AVAILABLE UPON RECEIPT OF PAYMENT',
+            'SHIPMENT ON HOLD', 'WITH DELIVERY COURIER', 'DATA RECEIVED', 'ARRIVED', 'SHIPPED',
+            'ADDRESS ACQUIRED', 'CUSTOMER NOT ANSWERING'
+        ]
+
+        # 🔁 مرتجع (Returned)
+        returned_statuses = [
+            'RETURN TO SHIPPER', 'RETURNED', 'REFUSED', 'OTHER FINAL STATUS',
+            'CANCELLED', 'CANCELED', 'NOTRECEIVED', 'SHIPMENT REFUSED',
+            'CUSTOMER HAS REFUSED THE SHIPMENT', 'RETURNED TO SHIPPER SHIPMENT NOT DELIVERED',
+            'UNABLE TO LOCATE', 'TO BE RETURN TO SHIPPER', 'SKELETON RECORD TERMINATED',
+            'TERMINATED'
+        ]
+
+        # ❌ استرجاع (Lost/Partial Return)
+        lost_statuses = ['LOST', 'PICKUP']
+
+        # إنشاء الشروط للتصنيف
+        delivered_condition = status_upper.isin(delivered_statuses)
+        in_progress_condition = status_upper.isin(in_progress_statuses)
+        returned_condition = status_upper.isin(returned_statuses)
+        lost_condition = status_upper.isin(lost_statuses)
+
+        # تطبيق التصنيف
+        df['حالة_التسليم'] = np.select(
+            [delivered_condition, in_progress_condition, returned_condition, lost_condition],
+            ['تم التسليم', 'قيد التوصيل', 'مرتجع', 'استرجاع'],
+            default='أخرى'
+        )
+
+    # تحديد الشحنات المستثناة
+    if 'المرجع_الشحنة_1' in df.columns:
+        df['للاستثناء'] = df['المرجع_الشحنة_1'].astype(str).str.contains('_return', na=False, case=False)
+    else:
+        df['للاستثناء'] = False
+
+    # حساب أيام المحاولة الأولى
+    if 'تاريخ_الاستلام' in df.columns and 'المحاولة_الأولى' in df.columns:
+        mask = df['تاريخ_الاستلام'].notna() & df['المحاولة_الأولى'].notna()
+        if mask.sum() > 0:
+            try:
+                days_diff = (df.loc[mask, 'المحاولة_الأولى'] - df.loc[mask, 'تاريخ_الاستلام']).dt.days
+                df['أيام_للمحاولة_الأولى'] = np.nan
+                df.loc[mask, 'أيام_للمحاولة_الأولى'] = days_diff
+                valid_mask = (df['أيام_للمحاولة_الأولى'] >= 0) & (df['أيام_للمحاولة_الأولى'] <= 365)
+                df.loc[~valid_mask, 'أيام_للمحاولة_الأولى'] = np.nan
+            except Exception:
+                logger.warning("لم يتم حساب أيام المحاولة الأولى بسبب مشكلة في التواريخ", exc_info=True)
+                df['أيام_للمحاولة_الأولى'] = np.nan
+
+    return df
+
+
+def add_sla_and_fds_columns(df, sla_df=None):
+    """إضافة أعمدة SLA وحسابات FDS"""
+
+    # نسخ البيانات
+    df_enhanced = df.copy()
+
+    # إضافة الأعمدة الجديدة
+    df_enhanced['SLA_أيام'] = np.nan
+    df_enhanced['حالة_SLA_محاولة_أولى'] = 'غير محدد'
+    df_enhanced['تسليم_من_أول_محاولة'] = False
+    df_enhanced['ضمن_SLA'] = False
+    df_enhanced['مؤهل_FDS'] = False
+
+    # إضافة معلومات SLA إذا توفرت
+    if sla_df is not None and len(sla_df) > 0:
+        # دمج بيانات SLA (مع مطابقة اختلاف كتابة المدن)
+        df_enhanced['SLA_أيام'] = map_sla_days(df_enhanced['المدينة_الوجهة'], sla_df)
+
+    # حساب حالة SLA للمحاولة الأولى
+    if 'أيام_للمحاولة_الأولى' in df_enhanced.columns:
+        if fast_paths_enabled() and _can_vectorize_sla_status(df_enhanced):
+            _first_attempt_sla_status_fast(df_enhanced)
+        else:
+            _first_attempt_sla_status_legacy(df_enhanced)
+
+    # تحديد الشحنات المُسلمة من أول محاولة
+    if 'تاريخ_التسليم' in df_enhanced.columns and 'المحاولة_الأولى' in df_enhanced.columns:
+        # التحقق من تطابق تاريخ التسليم مع تاريخ المحاولة الأولى (نفس اليوم)
+        delivery_mask = (
+            df_enhanced['حالة_التسليم'] == 'تم التسليم'
+        ) & (
+            df_enhanced['تاريخ_التسليم'].notna()
+        ) & (
+            df_enhanced['المحاولة_الأولى'].notna()
+        ) & (
+            df_enhanced['تاريخ_التسليم'].dt.date == df_enhanced['المحاولة_الأولى'].dt.date
+        )
+
+        df_enhanced.loc[delivery_mask, 'تسليم_من_أول_محاولة'] = True
+    else:
+        # البديل: استخدام عدد المحاولات = 1
+        if 'إجمالي_المحاولات' in df_enhanced.columns:
+            delivery_mask = (
+                df_enhanced['حالة_التسليم'] == 'تم التسليم'
+            ) & (
+                df_enhanced['إجمالي_المحاولات'] == 1
+            )
+
+            df_enhanced.loc[delivery_mask, 'تسليم_من_أول_محاولة'] = True
+
+    # تحديد الشحنات المؤهلة لـ FDS
+    fds_mask = (
+        df_enhanced['تسليم_من_أول_محاولة'] == True
+    ) & (
+        df_enhanced['ضمن_SLA'] == True
+    )
+
+    df_enhanced.loc[fds_mask, 'مؤهل_FDS'] = True
+
+    return df_enhanced
+
+
+def _first_attempt_sla_status_legacy(df_enhanced):
+    """حالة SLA للمحاولة الأولى صفاً بصف (التنفيذ الأصلي)"""
+    for idx, row in df_enhanced.iterrows():
+        days_to_first = row['أيام_للمحاولة_الأولى']
+        sla_days = row['SLA_أيام']
+
+        if pd.notna(days_to_first):
+            if pd.notna(sla_days):
+                if days_to_first <= sla_days:
+                    df_enhanced.at[idx, 'حالة_SLA_محاولة_أولى'] = 'في SLA' if days_to_first == sla_days else 'قبل SLA'
+                    df_enhanced.at[idx, 'ضمن_SLA'] = True
+                else:
+                    df_enhanced.at[idx, 'حالة_SLA_محاولة_أولى'] = 'بعد SLA'
+            else:
+                # استخدام SLA افتراضي = 2 أيام
+                default_sla = 2
+                if days_to_first <= default_sla:
+                    df_enhanced.at[idx, 'حالة_SLA_محاولة_أولى'] = 'ضمن افتراضي'
+                    df_enhanced.at[idx, 'ضمن_SLA'] = True
+                else:
+                    df_enhanced.at[idx, 'حالة_SLA_محاولة_أولى'] = 'بعد افتراضي'
+
+
+def _can_vectorize_sla_status(df_enhanced):
+    """المسار السريع يتطلب فهرساً فريداً وأعمدة رقمية عادية (iterrows يكتب بالفهرس)"""
+    if not df_enhanced.index.is_unique:
+        return False
+    for col in ('أيام_للمحاولة_الأولى', 'SLA_أيام'):
+        dtype = df_enhanced[col].dtype
+        if isinstance(dtype, pd.api.extensions.ExtensionDtype) or not pd.api.types.is_numeric_dtype(dtype):
+            return False
+        if pd.api.types.is_bool_dtype(dtype):
+            return False
+    return True
+
+
+def _first_attempt_sla_status_fast(df_enhanced):
+    """حالة SLA للمحاولة الأولى بعمليات على الأعمدة - نفس نتائج التنفيذ الأصلي"""
+    default_sla = 2
+    days_to_first = df_enhanced['أيام_للمحاولة_الأولى'].to_numpy()
+    sla_days = df_enhanced['SLA_أيام'].to_numpy()
+
+    has_days = ~pd.isna(days_to_first)
+    has_sla = ~pd.isna(sla_days)
+    with_sla = has_days & has_sla
+    with_default = has_days & ~has_sla
+
+    with np.errstate(invalid='ignore'):
+        within_sla = with_sla & (days_to_first <= sla_days)
+        on_sla = within_sla & (days_to_first == sla_days)
+        within_default = with_default & (days_to_first <= default_sla)
+
+    df_enhanced['حالة_SLA_محاولة_أولى'] = np.select(
+        [on_sla, within_sla, with_sla, within_default, with_default],
+        ['في SLA', 'قبل SLA', 'بعد SLA', 'ضمن افتراضي', 'بعد افتراضي'],
+        default='غير محدد'
+    ).astype(object)
+    df_enhanced['ضمن_SLA'] = within_sla | within_default
+
+
+def analyze_delivery_attempts_with_fds(df):
+    """تحليل محاولات التوصيل مع FDS"""
+    analysis = {}
+
+    if 'حالة_التسليم' not in df.columns:
+        return {}
+
+    total_shipments = len(df)
+
+    if total_shipments == 0:
+        return {}
+
+    # حساب DR (Delivery Rate)
+    delivered_shipments = len(df[df['حالة_التسليم'] == 'تم التسليم'])
+    dr_rate = (delivered_shipments / total_shipments * 100)
+    analysis['DR'] = round(dr_rate, 1)
+
+    # حساب FDS (مع SLA)
+    if 'مؤهل_FDS' in df.columns:
+        fds_count = len(df[df['مؤهل_FDS'] == True])
+        fds_rate = (fds_count / total_shipments * 100)
+        analysis['FDS'] = round(fds_rate, 1)
+        analysis['عدد_FDS'] = fds_count
+
+    # حساب SLA Rate الإجمالي
+    if 'ضمن_SLA' in df.columns:
+        sla_compliant_count = len(df[df['ضمن_SLA'] == True])
+        sla_rate = (sla_compliant_count / total_shipments * 100)
+        analysis['SLA_Rate'] = round(sla_rate, 1)
+        analysis['عدد_SLA_ملتزم'] = sla_compliant_count
+
+    # تحليل حسب عدد المحاولات (للمسلم فقط)
+    delivered_df = df[df['حالة_التسليم'] == 'تم التسليم']
+
+    if len(delivered_df) > 0 and 'إجمالي_المحاولات' in delivered_df.columns:
+        delivered_df = delivered_df[delivered_df['إجمالي_المحاولات'].notna()]
+        delivered_df = delivered_df[delivered_df['إجمالي_المحاولات'] > 0]
+
+        total_delivered_shipments = len(delivered_df)
+
+        if total_delivered_shipments > 0:
+            attempt_counts = delivered_df['إجمالي_المحاولات'].value_counts().sort_index()
+
+            percentages = {
+                'المحاولة 1': 0,
+                'المحاولة 2': 0,
+                'المحاولة 3': 0,
+                'أكثر من 3 محاولات': 0
+            }
+
+            for attempt, count in attempt_counts.items():
+                percentage = (count / total_delivered_shipments) * 100
+
+                if attempt == 1:
+                    percentages['المحاولة 1'] = percentage
+                elif attempt == 2:
+                    percentages['المحاولة 2'] = percentage
+                elif attempt == 3:
+                    percentages['المحاولة 3'] = percentage
+                elif attempt > 3:
+                    percentages['أكثر من 3 محاولات'] += percentage
+
+            for key, value in percentages.items():
+                analysis[key] = round(value, 1)
+
+    return analysis
+
+
+def analyze_weekly_trends_enhanced(df):
+    """تحليل الاتجاهات الأسبوعية للأداء مع FDS"""
+    if 'تاريخ_الاستلام' not in df.columns or len(df) == 0:
+        return pd.DataFrame()
+
+    if fast_paths_enabled() and _can_vectorize_weekly_trends(df):
+        return _weekly_trends_fast(df)
+    return _weekly_trends_legacy(df)
+
+
+def _weekly_trends_legacy(df):
+    df_with_dates = df[df['تاريخ_الاستلام'].notna()].copy()
+
+    if len(df_with_dates) == 0:
+        return pd.DataFrame()
+
+    try:
+        df_with_dates['تاريخ_الاستلام'] = pd.to_datetime(df_with_dates['تاريخ_الاستلام'])
+        df_with_dates['بداية_الأسبوع'] = df_with_dates['تاريخ_الاستلام'].dt.to_period('W').dt.start_time
+        df_with_dates['رقم_الأسبوع'] = df_with_dates['تاريخ_الاستلام'].dt.isocalendar().week
+    except Exception as e:
+        return pd.DataFrame()
+
+    weekly_analysis = []
+
+    for week_start, week_data in df_with_dates.groupby('بداية_الأسبوع'):
+        total_shipments = len(week_data)
+
+        if total_shipments == 0:
+            continue
+
+        # DR Rate
+        delivered_count = (week_data['حالة_التسليم'] == 'تم التسليم').sum() if 'حالة_التسليم' in week_data.columns else 0
+        dr_rate = (delivered_count / total_shipments * 100)
+
+        # FDS
+        fds_count = 0
+        if 'مؤهل_FDS' in week_data.columns:
+            fds_count = (week_data['مؤهل_FDS'] == True).sum()
+        fds_rate = (fds_count / total_shipments * 100)
+
+        # SLA Rate
+        sla_count = 0
+        if 'ضمن_SLA' in week_data.columns:
+            sla_count = (week_data['ضمن_SLA'] == True).sum()
+        sla_rate = (sla_count / total_shipments * 100)
+
+        # Pending Rate
+        pending_count = (week_data['حالة_التسليم'] == 'قيد التوصيل').sum() if 'حالة_التسليم' in week_data.columns else 0
+        pending_rate = (pending_count / total_shipments * 100)
+
+        week_number = week_data['رقم_الأسبوع'].iloc[0] if len(week_data) > 0 else 0
+        week_label = f"W{week_number}-{week_start.year}"
+
+        weekly_analysis.append({
+            'الأسبوع': week_label,
+            'رقم_الأسبوع_الرقمي': week_number,
+            'تاريخ_البداية': week_start,
+            'إجمالي_الشحنات': total_shipments,
+            'DR': round(dr_rate, 1),
+            'FDS': round(fds_rate, 1),
+            'SLA_Rate': round(sla_rate, 1),
+            'Pending': round(pending_rate, 1)
+        })
+
+    result_df = pd.DataFrame(weekly_analysis)
+
+    if len(result_df) > 0:
+        result_df = result_df.sort_values('تاريخ_البداية').reset_index(drop=True)
+
+    return result_df
+
+
+def _can_vectorize_weekly_trends(df):
+    """المسار السريع يتطلب تواريخ استلام محولة وأعمدة الحالة و FDS و SLA"""
+    return (pd.api.types.is_datetime64_any_dtype(df['تاريخ_الاستلام'])
+            and all(col in df.columns for col in ('حالة_التسليم', 'مؤهل_FDS', 'ضمن_SLA')))
+
+
+def _weekly_trends_fast(df):
+    """نفس _weekly_trends_legacy بعدادات محرك المؤشرات المشترك (groupby واحد لكل الأسابيع)"""
+    # الجدول المُمرر محدد مسبقاً للتحليل، لذلك لا يُستثنى منه شيء هنا
+    frame = to_canonical(df).assign(مستثنى=False)
+    frame = frame[frame['تاريخ_الأساس'].notna()]
+    if len(frame) == 0:
+        return pd.DataFrame()
+
+    starts = engine.week_starts(frame)
+    counts = engine.kpi_counts(frame, by=starts)
+    week_numbers = frame['تاريخ_الأساس'].dt.isocalendar().week.groupby(starts.to_numpy()).first()
+    total = counts['volume']
+
+    result_df = pd.DataFrame({
+        'الأسبوع': [f"W{week}-{start.year}" for start, week in zip(counts.index, week_numbers)],
+        'رقم_الأسبوع_الرقمي': week_numbers.to_numpy(),
+        'تاريخ_البداية': counts.index,
+        'إجمالي_الشحنات': total.to_numpy(),
+        'DR': (counts['delivered'] / total * 100).round(1).to_numpy(),
+        'FDS': (counts['fds_met'] / total * 100).round(1).to_numpy(),
+        'SLA_Rate': (counts['sla_met'] / total * 100).round(1).to_numpy(),
+        'Pending': (counts['pending'] / total * 100).round(1).to_numpy(),
+    })
+    return result_df
+
+
+def analyze_cities_performance_enhanced(df, city_filter=None, country_filter=None):
+    """تحليل أداء المدن مع FDS"""
+    if 'المدينة_الوجهة' not in df.columns or len(df) == 0:
+        return pd.DataFrame()
+
+    df_filtered = df.copy()
+    if city_filter and city_filter != 'الكل':
+        df_filtered = df_filtered[df_filtered['المدينة_الوجهة'] == city_filter]
+    if country_filter and country_filter != 'الكل' and 'الدولة_الوجهة' in df.columns:
+        df_filtered = df_filtered[df_filtered['الدولة_الوجهة'] == country_filter]
+
+    if len(df_filtered) == 0:
+        return pd.DataFrame()
+
+    # تجميع البيانات حسب المدينة
+    city_stats = []
+
+    for city, city_data in df_filtered.groupby('المدينة_الوجهة'):
+        total_shipments = len(city_data)
+
+        if total_shipments == 0:
+            continue
+
+        # حساب المؤشرات
+        delivered_count = (city_data['حالة_التسليم'] == 'تم التسليم').sum() if 'حالة_التسليم' in city_data.columns else 0
+        dr_rate = (delivered_count / total_shipments * 100)
+
+        # FDS
+        fds_count = (city_data['مؤهل_FDS'] == True).sum() if 'مؤهل_FDS' in city_data.columns else 0
+        fds_rate = (fds_count / total_shipments * 100)
+
+        # SLA Rate
+        sla_count = 0
+        if 'ضمن_SLA' in city_data.columns:
+            sla_count = (city_data['ضمن_SLA'] == True).sum()
+        sla_rate = (sla_count / total_shipments * 100)
+
+        # Pending Rate
+        pending_count = (city_data['حالة_التسليم'] == 'قيد التوصيل').sum() if 'حالة_التسليم' in city_data.columns else 0
+        pending_rate = (pending_count / total_shipments * 100)
+
+        # متوسط الأيام
+        avg_days = city_data['أيام_للمحاولة_الأولى'].mean() if 'أيام_للمحاولة_الأولى' in city_data.columns else 0
+
+        # متوسط المحاولات
+        avg_attempts = city_data['إجمالي_المحاولات'].mean() if 'إجمالي_المحاولات' in city_data.columns else 0
+
+        # SLA المحدد للمدينة
+        city_sla = city_data['SLA_أيام'].iloc[0] if 'SLA_أيام' in city_data.columns and city_data['SLA_أيام'].notna().any() else 'غير محدد'
+
+        # الدولة
+        country = city_data['الدولة_الوجهة'].iloc[0] if 'الدولة_الوجهة' in city_data.columns else 'غير محدد'
+
+        city_stats.append({
+            'المدينة': city,
+            'الدولة': country,
+            'إجمالي_الشحنات': total_shipments,
+            'SLA_أيام': city_sla,
+            'DR': round(dr_rate, 1),
+            'FDS': round(fds_rate, 1),
+            'SLA_Rate': round(sla_rate, 1),
+            'Pending': round(pending_rate, 1),
+            'متوسط_الأيام': round(avg_days, 1) if pd.notna(avg_days) else 0,
+            'متوسط_المحاولات': round(avg_attempts, 1) if pd.notna(avg_attempts) else 0
+        })
+
+    result_df = pd.DataFrame(city_stats)
+
+    if len(result_df) > 0:
+        result_df = result_df.sort_values('إجمالي_الشحنات', ascending=False)
+
+    return result_df
+
+
+def analyze_other_statuses(df):
+    """تحليل الحالات غير المصنفة"""
+    if 'حالة_التسليم' not in df.columns or 'الحالة' not in df.columns:
+        return pd.DataFrame()
+
+    other_shipments = df[df['حالة_التسليم'] == 'أخرى'].copy()
+
+    if len(other_shipments) == 0:
+        return pd.DataFrame()
+
+    status_analysis = other_shipments['الحالة'].value_counts().reset_index()
+    status_analysis.columns = ['الحالة_الأصلية', 'عدد_الشحنات']
+    status_analysis['النسبة_المئوية'] = (status_analysis['عدد_الشحنات'] / len(other_shipments) * 100).round(2)
+
+    return status_analysis
+
+
+def analyze_delayed_shipments(df, sla_df=None):
+    """تحليل الشحنات المتأخرة مع SLA"""
+    if len(df) == 0:
+        return pd.DataFrame()
+
+    # تصفية الشحنات قيد التوصيل فقط
+    pending_shipments = df[df['حالة_التسليم'] == 'قيد التوصيل'].copy() if 'حالة_التسليم' in df.columns else df.copy()
+
+    if len(pending_shipments) == 0:
+        return pd.DataFrame()
+
+    # تصفية الشحنات التي لها تاريخ استلام
+    pending_shipments = pending_shipments[pending_shipments['تاريخ_الاستلام'].notna()].copy()
+
+    if len(pending_shipments) == 0:
+        return pd.DataFrame()
+
+    # حساب الأيام منذ الاستلام
+    today = datetime.now()
+    pending_shipments['أيام_منذ_الاستلام'] = (today - pending_shipments['تاريخ_الاستلام']).dt.days
+
+    # تصفية الشحنات التي مضى عليها أكثر من 0 أيام
+    pending_shipments = pending_shipments[pending_shipments['أيام_منذ_الاستلام'] >= 0]
+
+    if len(pending_shipments) == 0:
+        return pd.DataFrame()
+
+    # إضافة معلومات SLA إذا توفرت
+    if sla_df is not None and len(sla_df) > 0:
+        # دمج بيانات SLA (مع مطابقة اختلاف كتابة المدن)
+        pending_shipments['SLA_أيام'] = map_sla_days(pending_shipments['المدينة_الوجهة'], sla_df)
+
+        # تحديد الشحنات المتأخرة (تجاوزت SLA)
+        pending_shipments['متأخر'] = (
+            pending_shipments['SLA_أيام'].notna() &
+            (pending_shipments['أيام_منذ_الاستلام'] > pending_shipments['SLA_أيام'])
+        )
+
+        # تصفية الشحنات المتأخرة فقط
+        delayed_shipments = pending_shipments[pending_shipments['متأخر']].copy()
+
+        if len(delayed_shipments) > 0:
+            # حساب أيام التأخير
+            delayed_shipments['أيام_التأخير'] = (
+                delayed_shipments['أيام_منذ_الاستلام'] - delayed_shipments['SLA_أيام']
+            )
+    else:
+        # إذا لم تتوفر بيانات SLA، اعتبر الشحنات متأخرة بعد 3 أيام (افتراضي)
+        default_sla = 3
+        pending_shipments['SLA_أيام'] = default_sla
+        pending_shipments['متأخر'] = pending_shipments['أيام_منذ_الاستلام'] > default_sla
+
+        delayed_shipments = pending_shipments[pending_shipments['متأخر']].copy()
+
+        if len(delayed_shipments) > 0:
+            delayed_shipments['أيام_التأخير'] = (
+                delayed_shipments['أيام_منذ_الاستلام'] - default_sla
+            )
+
+    if len(delayed_shipments) == 0:
+        return pd.DataFrame()
+
+    # إضافة تصنيف شدة التأخير
+    def classify_delay_severity(days):
+        if days <= 2:
+            return 'تأخير بسيط'
+        elif days <= 5:
+            return 'تأخير متوسط'
+        elif days <= 10:
+            return 'تأخير شديد'
+        else:
+            return 'تأخير حرج'
+
+    delayed_shipments['شدة_التأخير'] = delayed_shipments['أيام_التأخير'].apply(classify_delay_severity)
+
+    # تحديد الأعمدة المطلوبة للعرض مع إضافة عمود أيام التأخير عن SLA
+    display_columns = ['رقم_الشحنة', 'المدينة_الوجهة', 'الدولة_الوجهة', 'تاريخ_الاستلام',
+                      'أيام_منذ_الاستلام', 'SLA_أيام', 'أيام_التأخير_عن_SLA', 'أيام_التأخير', 'شدة_التأخير', 'الحالة']
+
+    # إضافة عمود أيام التأخير عن SLA (الحساب الصحيح)
+    if len(delayed_shipments) > 0:
+        # حساب تاريخ انتهاء SLA (تاريخ الاستلام + عدد أيام SLA)
+        today = datetime.now()
+
+        # حساب الأيام التي تجاوزت SLA
+        delayed_shipments['تاريخ_انتهاء_SLA'] = delayed_shipments['تاريخ_الاستلام'] + pd.to_timedelta(delayed_shipments['SLA_أيام'], unit='D')
+        delayed_shipments['أيام_التأخير_عن_SLA'] = (today - delayed_shipments['تاريخ_انتهاء_SLA']).dt.days
+
+        # التأكد من أن القيم موجبة فقط (للشحنات المتأخرة فعلاً)
+        delayed_shipments['أيام_التأخير_عن_SLA'] = delayed_shipments['أيام_التأخير_عن_SLA'].clip(lower=0)
+
+    # التأكد من وجود الأعمدة
+    available_columns = [col for col in display_columns if col in delayed_shipments.columns]
+
+    result = delayed_shipments[available_columns].copy()
+
+    # ترتيب حسب أيام التأخير (الأكثر تأخيراً أولاً)
+    result = result.sort_values('أيام_التأخير', ascending=False)
+
+    return result
+
+
+def analyze_delay_summary(delayed_df):
+    """تحليل ملخص الشحنات المتأخرة"""
+    if len(delayed_df) == 0:
+        return {}
+
+    summary = {
+        'إجمالي_المتأخرة': len(delayed_df),
+        'متوسط_أيام_التأخير': delayed_df['أيام_التأخير'].mean(),
+        'أقصى_تأخير': delayed_df['أيام_التأخير'].max(),
+        'أقل_تأخير': delayed_df['أيام_التأخير'].min()
+    }
+
+    # تحليل حسب شدة التأخير
+    if 'شدة_التأخير' in delayed_df.columns:
+        severity_counts = delayed_df['شدة_التأخير'].value_counts()
+        for severity, count in severity_counts.items():
+            summary[f'عدد_{severity}'] = count
+            summary[f'نسبة_{severity}'] = (count / len(delayed_df) * 100)
+
+    # تحليل حسب المدن
+    if 'المدينة_الوجهة' in delayed_df.columns:
+        city_counts = delayed_df['المدينة_الوجهة'].value_counts()
+        summary['أكثر_المدن_تأخيراً'] = city_counts.head(5).to_dict()
+
+    return summary
+
+
+def to_canonical(df, sla_df=None):
+    """الجدول الموحد (shipping_core.schema) من بيانات process_aramex_data - تُضاف أعمدة SLA و FDS إذا لم تكن موجودة
+
+    SLA و FDS على كل الشحنات (SLA افتراضي يومان للمدن بدون SLA)، والمستثنى = مرتجعات العميل.
+    """
+    if 'مؤهل_FDS' not in df.columns:
+        df = add_sla_and_fds_columns(df, sla_df)
+    return conform(pd.DataFrame({
+        'رقم_الشحنة': source_column(df, 'رقم_الشحنة'),
+        'المدينة_الوجهة': source_column(df, 'المدينة_الوجهة'),
+        'المنطقة': source_column(df, 'الدولة_الوجهة'),
+        'تاريخ_الأساس': source_column(df, 'تاريخ_الاستلام', pd.NaT),
+        'تاريخ_أول_محاولة': source_column(df, 'المحاولة_الأولى', pd.NaT),
+        'تاريخ_التسليم': source_column(df, 'تاريخ_التسليم', pd.NaT),
+        'حالة_التسليم': source_column(df, 'حالة_التسليم', OTHER),
+        'مستثنى': source_column(df, 'للاستثناء', False),
+        'SLA_أيام': source_column(df, 'SLA_أيام'),
+        'أيام_المحاولة_الأولى': source_column(df, 'أيام_للمحاولة_الأولى'),
+        'له_SLA': True,
+        'ضمن_SLA': source_column(df, 'ضمن_SLA', False) == True,
+        'أساس_FDS': True,
+        'FDS': source_column(df, 'مؤهل_FDS', False) == True,
+    }, index=df.index), 'aramex')
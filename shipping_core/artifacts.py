@@ -0,0 +1,119 @@
+# shipping_core/artifacts.py - كتابة وقراءة نتائج المعالجة الدفعية (Parquet + manifest)
+import json
+import logging
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from shipping_core.common import get_file_hash
+
+logger = logging.getLogger(__name__)
+
+# متغير البيئة الذي يحدد مجلد النتائج المشترك بين الأداة الدفعية ولوحة التحكم
+ARTIFACTS_DIR_ENV = 'SHIPPING_ARTIFACTS_DIR'
+DEFAULT_ARTIFACTS_DIR = 'artifacts'
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def get_artifacts_root():
+    """مجلد النتائج الافتراضي"""
+    return os.environ.get(ARTIFACTS_DIR_ENV, DEFAULT_ARTIFACTS_DIR)
+
+
+def make_run_name(path):
+    """اسم مجلد التشغيل: اسم الملف + وقت المعالجة + بداية hash محتواه
+
+    حتى لا تستبدل معالجة ملف بنفس الاسم تشغيلاً سابقاً تعرضه لوحة التحكم.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    content_hash = (get_file_hash(path) or '')[:8]
+    return '_'.join(part for part in (stem, datetime.now().strftime('%Y%m%d_%H%M%S'), content_hash) if part)
+
+
+def make_arrow_safe(df):
+    """تحويل الأعمدة النصية مختلطة الأنواع إلى نص حتى تقبلها Parquet"""
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        inferred = pd.api.types.infer_dtype(df[col], skipna=True)
+        if inferred in ('mixed', 'mixed-integer'):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    df.columns = [str(col) for col in df.columns]
+    return df
+
+
+def _write_table(df, path):
+    """كتابة جدول واحد بصيغة Parquet"""
+    try:
+        df.to_parquet(path, index=False)
+    except Exception:
+        logger.debug("إعادة كتابة %s بعد توحيد الأنواع", path)
+        make_arrow_safe(df).to_parquet(path, index=False)
+
+
+def write_artifacts(output_dir, carrier, run_name, tables, metadata=None):
+    """كتابة جداول تشغيل واحد في <output_dir>/<carrier>/<run_name> مع ملف manifest
+
+    tables: قاموس {اسم_الجدول: DataFrame}، والجداول الفارغة أو None لا تُكتب.
+    """
+    run_dir = os.path.join(output_dir, carrier, run_name)
+    os.makedirs(run_dir, exist_ok=True)
+
+    written = {}
+    for name, df in tables.items():
+        if df is None or len(df) == 0:
+            continue
+        file_name = f"{name}.parquet"
+        _write_table(df, os.path.join(run_dir, file_name))
+        written[name] = {'file': file_name, 'rows': int(len(df))}
+
+    manifest = {
+        'carrier': carrier,
+        'run_name': run_name,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'tables': written,
+    }
+    manifest.update(metadata or {})
+
+    with open(os.path.join(run_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
+
+    return run_dir
+
+
+def read_manifest(run_dir):
+    """قراءة ملف manifest لتشغيل واحد أو None إذا لم يوجد"""
+    try:
+        with open(os.path.join(run_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    manifest['path'] = run_dir
+    return manifest
+
+
+def list_runs(carrier, root=None):
+    """قائمة التشغيلات المتاحة لشركة شحن مرتبة من الأحدث"""
+    carrier_dir = os.path.join(root or get_artifacts_root(), carrier)
+    if not os.path.isdir(carrier_dir):
+        return []
+
+    runs = []
+    for name in os.listdir(carrier_dir):
+        manifest = read_manifest(os.path.join(carrier_dir, name))
+        if manifest is not None:
+            runs.append(manifest)
+
+    runs.sort(key=lambda run: run.get('created_at', ''), reverse=True)
+    return runs
+
+
+def read_table(run_dir, table, columns=None):
+    """قراءة جدول من تشغيل محفوظ أو None إذا لم يُكتب"""
+    path = os.path.join(run_dir, f"{table}.parquet")
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path, columns=columns)
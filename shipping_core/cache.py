@@ -0,0 +1,251 @@
+# shipping_core/cache.py - ذاكرة مؤقتة للعملية مقسمة إلى namespaces مع إحصائيات hit/miss/eviction
+"""
+كل دالة محفوظة مؤقتاً لها جدول (CacheTable) داخل namespace (مثل 'aramex' أو 'charts').
+الجدول LRU بحد أقصى اختياري لعدد العناصر (max_entries) ومدة صلاحية اختيارية (ttl بالثواني)،
+ويحسب الإصابات (hits) والحسابات (misses) والإخراج بسبب الحد (evictions) أو انتهاء الصلاحية
+(expirations) والحجم الفعلي لكل عنصر.
+
+القيم تُحفظ مسلسلة (pickle) مثل st.cache_data، لذلك كل استدعاء يرجع نسخة مستقلة
+ولا يؤثر تعديلها على القيمة المحفوظة، وحجم العنصر هو حجم النسخة المسلسلة.
+
+    @cached('aramex', ttl=300)
+    def analyze(df): ...
+
+    warm('aramex', 'analyze', analyze_impl, df)   # حساب مسبق بنفس مفتاح analyze(df)
+    invalidate('aramex')      # مسح namespace واحد فقط
+    cache_stats()             # جدول الإحصائيات لكل دالة
+"""
+import functools
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+import pandas as pd
+
+_tables = {}
+_registry_lock = threading.Lock()
+
+STATS_COLUMNS = ['namespace', 'name', 'entries', 'bytes', 'hits', 'misses', 'hit_rate',
+                 'evictions', 'expirations', 'invalidations', 'max_entries', 'ttl']
+
+
+def _update_hash(hasher, value):
+    """إضافة قيمة إلى البصمة بشكل ثابت بغض النظر عن نوعها"""
+    if isinstance(value, pd.DataFrame):
+        hasher.update(b'DataFrame')
+        hasher.update(repr([str(col) for col in value.columns]).encode('utf-8'))
+        hasher.update(repr([str(dtype) for dtype in value.dtypes]).encode('utf-8'))
+        try:
+            hasher.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        except TypeError:
+            hasher.update(value.to_csv().encode('utf-8'))
+    elif isinstance(value, pd.Series):
+        hasher.update(b'Series')
+        hasher.update(str(value.name).encode('utf-8'))
+        hasher.update(str(value.dtype).encode('utf-8'))
+        try:
+            hasher.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        except TypeError:
+            hasher.update(value.to_csv().encode('utf-8'))
+    elif isinstance(value, dict):
+        hasher.update(b'dict')
+        for key in sorted(value, key=str):
+            _update_hash(hasher, key)
+            _update_hash(hasher, value[key])
+    elif isinstance(value, (list, tuple)):
+        hasher.update(b'seq')
+        for item in value:
+            _update_hash(hasher, item)
+    elif hasattr(value, 'getvalue'):
+        # ملفات مرفوعة (UploadedFile / BytesIO) - البصمة من المحتوى
+        hasher.update(b'file')
+        hasher.update(str(getattr(value, 'name', '')).encode('utf-8'))
+        hasher.update(value.getvalue())
+    elif hasattr(value, '__dict__') and type(value).__repr__ is object.__repr__:
+        # كائنات بدون repr ثابت (مثل ملفات الفروع المحلية) - البصمة من خصائصها
+        hasher.update(type(value).__qualname__.encode('utf-8'))
+        _update_hash(hasher, vars(value))
+    else:
+        hasher.update(repr(value).encode('utf-8'))
+
+
+def fingerprint(*parts, **options):
+    """حساب بصمة للجداول والمعاملات"""
+    hasher = hashlib.md5()
+    for part in parts:
+        _update_hash(hasher, part)
+    _update_hash(hasher, options)
+    return hasher.hexdigest()
+
+
+def _ttl_seconds(ttl):
+    if isinstance(ttl, timedelta):
+        return ttl.total_seconds()
+    return float(ttl) if ttl is not None else None
+
+
+class CacheTable:
+    """ذاكرة مؤقتة لدالة واحدة داخل namespace"""
+
+    def __init__(self, namespace, name, max_entries=None, ttl=None):
+        self.namespace = namespace
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = _ttl_seconds(ttl)
+        self._entries = OrderedDict()   # key -> (payload, created)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def configure(self, max_entries=None, ttl=None):
+        """تحديث الحدود (الدوال في الصفحات يُعاد تعريفها مع كل تشغيل)"""
+        with self._lock:
+            self.max_entries = max_entries
+            self.ttl = _ttl_seconds(ttl)
+            self._evict()
+
+    def get(self, key):
+        """يرجع (True, نسخة من القيمة) عند الإصابة أو (False, None)"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and self.ttl is not None and time.monotonic() - item[1] > self.ttl:
+                self._drop(key)
+                self.counters['expirations'] += 1
+                item = None
+            if item is None:
+                self.counters['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            payload = item[0]
+        return True, pickle.loads(payload)
+
+    def contains(self, key):
+        """هل القيمة محفوظة وصالحة (بدون تسجيل hit/miss)"""
+        with self._lock:
+            item = self._entries.get(key)
+            return item is not None and (self.ttl is None or time.monotonic() - item[1] <= self.ttl)
+
+    def put(self, key, value):
+        """حفظ القيمة مسلسلة - يرجع حجمها بالبايت"""
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (payload, time.monotonic())
+            self._bytes += len(payload)
+            self._evict()
+        return len(payload)
+
+    def clear(self):
+        """مسح جميع العناصر - يرجع عددها"""
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            self.counters['invalidations'] += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                'namespace': self.namespace,
+                'name': self.name,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                **self.counters,
+                'hit_rate': round(self.counters['hits'] / lookups, 3) if lookups else None,
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+            }
+
+    def entry_sizes(self):
+        """حجم كل عنصر بالبايت بترتيب الاستخدام (الأقدم أولاً)"""
+        with self._lock:
+            return [len(payload) for payload, _ in self._entries.values()]
+
+    def _drop(self, key):
+        payload, _ = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def _evict(self):
+        if self.max_entries is None:
+            return
+        while len(self._entries) > self.max_entries:
+            key = next(iter(self._entries))
+            self._drop(key)
+            self.counters['evictions'] += 1
+
+
+def get_table(namespace, name, max_entries=None, ttl=None):
+    """الجدول المسجل للدالة (يُنشأ عند أول استخدام ويحتفظ بمحتواه عند إعادة التعريف)"""
+    with _registry_lock:
+        table = _tables.get((namespace, name))
+        if table is None:
+            table = _tables[(namespace, name)] = CacheTable(namespace, name, max_entries, ttl)
+            return table
+    if table.max_entries != max_entries or table.ttl != _ttl_seconds(ttl):
+        table.configure(max_entries, ttl)
+    return table
+
+
+def cached(namespace, name=None, max_entries=None, ttl=None):
+    """حفظ نتائج الدالة مؤقتاً حسب بصمة المعاملات"""
+    def decorator(func):
+        table = get_table(namespace, name or func.__qualname__, max_entries, ttl)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = fingerprint(*args, **kwargs)
+            found, value = table.get(key)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            table.put(key, value)
+            return value
+
+        wrapper.cache_table = table
+        wrapper.clear = table.clear
+        return wrapper
+    return decorator
+
+
+def warm(namespace, name, func, *args, **kwargs):
+    """حساب نتيجة func(*args, **kwargs) مسبقاً في جدول الدالة name بنفس مفتاح استدعائها من cached
+
+    لا يغير حدود الجدول إذا كان موجوداً (الحدود تحددها الدالة المسجلة بـ cached).
+    يرجع False إذا كانت النتيجة محفوظة مسبقاً.
+    """
+    with _registry_lock:
+        table = _tables.get((namespace, name))
+        if table is None:
+            table = _tables[(namespace, name)] = CacheTable(namespace, name)
+    key = fingerprint(*args, **kwargs)
+    if table.contains(key):
+        return False
+    table.put(key, func(*args, **kwargs))
+    return True
+
+
+def namespaces():
+    with _registry_lock:
+        return sorted({namespace for namespace, _ in _tables})
+
+
+def invalidate(namespace=None, name=None):
+    """مسح namespace (أو دالة واحدة داخله، أو كل الذاكرة المؤقتة إذا لم يحدد) - يرجع عدد العناصر الممسوحة"""
+    with _registry_lock:
+        tables = [table for (ns, table_name), table in _tables.items()
+                  if (namespace is None or ns == namespace) and (name is None or table_name == name)]
+    return sum(table.clear() for table in tables)
+
+
+def cache_stats(namespace=None):
+    """جدول الإحصائيات لكل دالة محفوظة"""
+    with _registry_lock:
+        tables = [table for (ns, _), table in sorted(_tables.items()) if namespace is None or ns == namespace]
+    return pd.DataFrame([table.stats() for table in tables], columns=STATS_COLUMNS)
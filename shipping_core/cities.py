@@ -0,0 +1,256 @@
+# shipping_core/cities.py - مطابقة أسماء مدن الشحنات مع مدن ملف SLA رغم اختلاف الكتابة
+"""
+مدن الشحنات تُطابق مع مدن SLA على مراحل لكل مدينة مختلفة مرة واحدة (وليس لكل شحنة):
+
+1. exact: نفس الاسم.
+2. normalized: نفس الاسم بعد التوحيد (حالة الأحرف، المسافات والرموز، "Al"/"ال" في البداية،
+   أشكال الحروف العربية) - "AL KHOBAR" و "Khobar" و "al-khobar".
+3. alias: نفس المجموعة في جدول الأسماء البديلة (عربي/إنجليزي وكتابات شائعة) - "الرياض" و
+   "Riyadh". الجدول يجمع BUILTIN_ALIASES مع ملف JSON دائم (SHIPPING_CITY_ALIASES، الافتراضي
+   city_aliases.json) تُضاف إليه الأسماء المعتمدة من صفحة SMSA بـ add_alias.
+4. fuzzy: أعلى تشابه في الحروف الثلاثية (Dice) فوق MIN_SIMILARITY، من فهرس مقلوب للحروف
+   الثلاثية لمدن SLA بدلاً من مقارنة كل مدينة بكل مدينة. الأرقام في الاسمين يجب أن تتطابق.
+   الأسماء القصيرة لا تتجاوز الحد بخطأ حرف واحد ("Jedah" 0.73، "Damam") فتحتاج اسماً بديلاً.
+
+SHIPPING_FUZZY_CITIES=0 يعطل المرحلتين 3 و 4 (مطابقة الاسم والتوحيد فقط).
+
+    resolver = CityResolver(sla_df['المدينة'])
+    resolver.resolve(['RIYADH', 'الرياض', 'Khamis Mushit'])  # normalized، alias، fuzzy (0.80)
+    map_sla_days(df['المدينة_الوجهة'], sla_df)               # أيام SLA لكل شحنة
+"""
+import json
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from shipping_core.cache import invalidate
+from shipping_core.text_index import normalize_text
+
+logger = logging.getLogger(__name__)
+
+ALIASES_ENV = 'SHIPPING_CITY_ALIASES'
+DEFAULT_ALIASES_FILE = 'city_aliases.json'
+FUZZY_ENV = 'SHIPPING_FUZZY_CITIES'
+
+# أقل تشابه Dice بين الحروف الثلاثية للمطابقة التلقائية
+MIN_SIMILARITY = 0.75
+# أقل تشابه لعرض اقتراح في صفحة SMSA
+MIN_SUGGESTION = 0.4
+
+NGRAM = 3
+
+# namespaces الذاكرة المؤقتة التي تحتوي نتائج مطابقة المدن (تُمسح عند إضافة اسم بديل)
+SLA_NAMESPACES = ('smsa', 'aramex')
+
+METHOD_LABELS = {'exact': 'مطابق', 'normalized': 'بعد التوحيد', 'alias': 'اسم بديل', 'fuzzy': 'تشابه',
+                 None: 'غير مطابق'}
+
+# الاسم المعتمد -> كتابات أخرى لنفس المدينة
+BUILTIN_ALIASES = {
+    'Riyadh': ['الرياض', 'Ar Riyadh', 'Riyad'],
+    'Jeddah': ['جدة', 'Jiddah', 'Jedda'],
+    'Dammam': ['الدمام'],
+    'Makkah': ['مكة', 'مكة المكرمة', 'Mecca', 'Makka', 'Makkah Al Mukarramah'],
+    'Madinah': ['المدينة', 'المدينة المنورة', 'Medina', 'Madina', 'Madinah Al Munawwarah'],
+    'Khobar': ['الخبر'],
+    'Taif': ['الطائف'],
+    'Tabuk': ['تبوك', 'Tabouk'],
+    'Abha': ['أبها'],
+    'Buraidah': ['بريدة', 'Buraydah', 'Buraida'],
+    'Hail': ['حائل', 'Hael'],
+    'Jazan': ['جازان', 'جيزان', 'Jizan', 'Gizan'],
+    'Najran': ['نجران'],
+    'Al Ahsa': ['الأحساء', 'Al Hasa', 'Hasa'],
+    'Hofuf': ['الهفوف', 'Hufuf'],
+    'Yanbu': ['ينبع'],
+    'Khamis Mushait': ['خميس مشيط', 'Khamis Mushayt'],
+    'Jubail': ['الجبيل'],
+    'Qatif': ['القطيف'],
+    'Al Kharj': ['الخرج'],
+    'Hafar Al Batin': ['حفر الباطن', 'Hafr Al Batin'],
+    'Al Baha': ['الباحة'],
+    'Arar': ['عرعر'],
+    'Sakaka': ['سكاكا'],
+    'Unaizah': ['عنيزة', 'Unayzah', 'Onaiza'],
+    'Al Qunfudhah': ['القنفذة', 'Qunfudah'],
+    'Bisha': ['بيشة'],
+    'Dhahran': ['الظهران'],
+    'Al Majmaah': ['المجمعة'],
+    'Rabigh': ['رابغ'],
+    'Al Ula': ['العلا'],
+    'Qassim': ['القصيم', 'Al Qassim', 'Gassim'],
+}
+
+_NON_WORD = re.compile(r'[\W_]+')
+_DIGITS = re.compile(r'\d+')
+
+_aliases_lock = threading.Lock()
+
+
+def fuzzy_enabled():
+    return os.environ.get(FUZZY_ENV, '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def get_aliases_path():
+    return os.environ.get(ALIASES_ENV, DEFAULT_ALIASES_FILE)
+
+
+def aliases_version(path=None):
+    """نسخة ملف الأسماء البديلة (وقت التعديل) - None إذا لم يوجد"""
+    try:
+        return os.stat(path or get_aliases_path()).st_mtime_ns
+    except OSError:
+        return None
+
+
+def strip_article(key):
+    """حذف "al"/"ال" من بداية مفتاح موحد إذا بقي بعدها أكثر من حرفين"""
+    for prefix in ('al', 'ال'):
+        if key.startswith(prefix) and len(key) > len(prefix) + 2:
+            return key[len(prefix):]
+    return key
+
+
+def normalize_city(name):
+    """مفتاح المدينة للمطابقة: حروف وأرقام فقط بعد توحيد الكتابة وبدون "al"/"ال" في البداية"""
+    return strip_article(_NON_WORD.sub('', normalize_text(name)))
+
+
+def load_aliases(path=None):
+    """الأسماء البديلة المحفوظة {الاسم كما في الشحنات: اسم المدينة في SLA}"""
+    path = path or get_aliases_path()
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return {str(name): str(target) for name, target in json.load(f).items()}
+    except (OSError, ValueError, AttributeError) as e:
+        logger.warning("تجاهل ملف أسماء المدن البديلة %s: %s", path, e)
+        return {}
+
+
+def add_alias(name, target, path=None):
+    """حفظ اسم بديل دائم لمدينة - يُطبق في المطابقات التالية
+
+    تُمسح نتائج SLA_NAMESPACES المحفوظة مؤقتاً لأن مفاتيحها الجداول فقط وليس ملف الأسماء.
+    """
+    path = path or get_aliases_path()
+    with _aliases_lock:
+        aliases = load_aliases(path)
+        aliases[str(name)] = str(target)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(aliases, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    for namespace in SLA_NAMESPACES:
+        invalidate(namespace)
+    logger.info("اسم بديل للمدينة %s ← %s", name, target)
+
+
+def _alias_groups(aliases):
+    """مفتاح كل كتابة -> مفتاح مجموعتها"""
+    groups = {}
+    for canonical, variants in BUILTIN_ALIASES.items():
+        group = normalize_city(canonical)
+        groups[group] = group
+        for variant in variants:
+            groups[normalize_city(variant)] = group
+    for name, target in aliases.items():
+        target_key = normalize_city(target)
+        group = groups.get(target_key, target_key)
+        groups[normalize_city(name)] = group
+        groups.setdefault(target_key, group)
+    return groups
+
+
+def _ngrams(key):
+    padded = f"#{key}#"
+    return {padded[i:i + NGRAM] for i in range(max(len(padded) - NGRAM + 1, 1))}
+
+
+class CityResolver:
+    """مطابقة أسماء المدن مع مدن SLA - يُبنى مرة واحدة لكل ملف SLA"""
+
+    def __init__(self, sla_cities, aliases=None, fuzzy=None):
+        self.fuzzy = fuzzy_enabled() if fuzzy is None else fuzzy
+        self.cities = pd.unique(pd.Series(sla_cities, dtype=object).dropna().astype(str))
+        self._exact = set(self.cities)
+        keys = [normalize_city(city) for city in self.cities]
+        self._by_key = {}
+        for key, city in zip(keys, self.cities):
+            self._by_key.setdefault(key, city)
+
+        self._groups = _alias_groups(load_aliases() if aliases is None else aliases) if self.fuzzy else {}
+        self._by_group = {}
+        for key, city in zip(keys, self.cities):
+            self._by_group.setdefault(self._groups.get(key, key), city)
+
+        # فهرس مقلوب: حرف ثلاثي -> مدن SLA التي تحتويه
+        self._gram_counts = np.array([len(_ngrams(key)) for key in keys], dtype=np.intp)
+        self._digits = np.array([' '.join(_DIGITS.findall(key)) for key in keys], dtype=object)
+        postings = {}
+        for i, key in enumerate(keys):
+            for gram in _ngrams(key):
+                postings.setdefault(gram, []).append(i)
+        self._postings = {gram: np.array(ids, dtype=np.intp) for gram, ids in postings.items()}
+
+    def _similar(self, key):
+        """أقرب مدينة SLA بالحروف الثلاثية - (موضعها، التشابه) أو (None، 0)"""
+        grams = _ngrams(key)
+        hits = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not hits:
+            return None, 0.0
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.cities))
+        scores = 2 * shared / (len(grams) + self._gram_counts)
+        scores[self._digits != ' '.join(_DIGITS.findall(key))] = 0
+        best = int(np.argmax(scores))
+        if scores[best] == 0 or (scores == scores[best]).sum() > 1:
+            return None, float(scores[best])
+        return best, float(scores[best])
+
+    def resolve_one(self, name):
+        """(مدينة SLA، طريقة المطابقة، التشابه) - مدينة SLA = None إذا لم تُطابق"""
+        if name in self._exact:
+            return name, 'exact', 1.0
+        key = normalize_city(name)
+        if key in self._by_key:
+            return self._by_key[key], 'normalized', 1.0
+        if not self.fuzzy or not key:
+            return None, None, 0.0
+        group = self._groups.get(key)
+        if group is not None and group in self._by_group:
+            return self._by_group[group], 'alias', 1.0
+        best, score = self._similar(key)
+        if best is not None and score >= MIN_SIMILARITY:
+            return self.cities[best], 'fuzzy', score
+        return None, None, score
+
+    def resolve(self, names):
+        """مطابقة قائمة مدن مختلفة - جدول (city، sla_city، method، score)"""
+        rows = [(name, *self.resolve_one(str(name))) for name in names]
+        return pd.DataFrame(rows, columns=['city', 'sla_city', 'method', 'score'])
+
+    def suggest(self, name):
+        """أقرب مدينة SLA لمدينة غير مطابقة ولو تحت حد المطابقة التلقائية - (المدينة، التشابه) أو None"""
+        best, score = self._similar(normalize_city(name))
+        return (self.cities[best], score) if best is not None and score >= MIN_SUGGESTION else None
+
+
+def map_sla_days(cities, sla_df, resolver=None):
+    """أيام SLA لكل شحنة حسب مدينتها - كل مدينة مختلفة تُطابق مرة واحدة ثم تُنشر للشحنات بالأكواد"""
+    codes, uniques = pd.factorize(cities)
+    resolver = resolver or CityResolver(sla_df['المدينة'])
+    days = sla_df.drop_duplicates('المدينة', keep='last')
+    days = pd.Series(days['SLA_أيام'].to_numpy(), index=days['المدينة'].astype(str))
+    resolved = pd.Series([resolver.resolve_one(str(name))[0] for name in uniques], dtype=object)
+    # الموضع -1 (مدينة مفقودة) لا يوجد في resolved فيصبح NaN
+    result = resolved.map(days).reindex(codes)
+    index = cities.index if isinstance(cities, pd.Series) else None
+    return pd.Series(result.to_numpy(), index=index, name='SLA_أيام')
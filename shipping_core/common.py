@@ -0,0 +1,85 @@
+# shipping_core/common.py - دوال مساعدة مشتركة بين شركات الشحن
+import glob
+import hashlib
+import logging
+import os
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def fix_duplicate_columns(df):
+    """إصلاح الأعمدة المكررة"""
+    columns = df.columns.tolist()
+    new_columns = []
+    column_counts = {}
+
+    for col in columns:
+        clean_col = str(col).strip()
+        if clean_col in column_counts:
+            column_counts[clean_col] += 1
+            new_col_name = f"{clean_col}_{column_counts[clean_col]}"
+        else:
+            column_counts[clean_col] = 0
+            new_col_name = clean_col
+        new_columns.append(new_col_name)
+
+    df.columns = new_columns
+    return df
+
+
+def safe_date_conversion(series, column_name=None):
+    """تحويل آمن وسريع للتواريخ"""
+    if series is None or len(series) == 0:
+        return pd.Series(dtype='datetime64[ns]')
+
+    # محاولة التحويل المباشر أولاً (الأسرع)
+    try:
+        converted = pd.to_datetime(series, errors='coerce')
+        if not converted.isna().all():
+            return converted
+    except Exception:
+        pass
+
+    # محاولة معالجة الأرقام (Excel serial dates)
+    try:
+        numeric_series = pd.to_numeric(series, errors='coerce')
+        valid_mask = (numeric_series >= 1) & (numeric_series <= 50000)
+        if valid_mask.any():
+            converted = pd.to_datetime(numeric_series, errors='coerce', origin='1899-12-30', unit='D')
+            current_year = datetime.now().year
+            reasonable_mask = (converted.dt.year >= 2020) & (converted.dt.year <= current_year + 1)
+            if reasonable_mask.any():
+                return converted
+    except Exception:
+        pass
+
+    logger.debug("تعذر تحويل العمود %s إلى تواريخ", column_name)
+    return pd.Series([pd.NaT] * len(series), dtype='datetime64[ns]')
+
+
+def get_file_hash(file_path):
+    """حساب hash للملف لتتبع التغييرات"""
+    try:
+        with open(file_path, 'rb') as f:
+            return hashlib.md5(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def find_latest_files(folder_path, pattern="*.xlsx"):
+    """البحث عن أحدث الملفات في المجلد"""
+    try:
+        files = glob.glob(os.path.join(folder_path, pattern))
+        if not files:
+            files = glob.glob(os.path.join(folder_path, "*.xls"))
+        if not files:
+            files = glob.glob(os.path.join(folder_path, "*.csv"))
+
+        # ترتيب حسب تاريخ التعديل
+        files.sort(key=os.path.getmtime, reverse=True)
+        return files
+    except OSError:
+        return []
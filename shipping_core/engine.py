@@ -0,0 +1,100 @@
+# shipping_core/engine.py - محرك مؤشرات موحد (DR و FDS و SLA و Pending) على الجدول الموحد للشحنات
+"""
+جميع المؤشرات تُحسب بعملية groupby واحدة على أعمدة منطقية في الجدول الموحد
+(shipping_core.schema)، لذلك أي تحسين هنا يشمل جميع الشركات:
+
+    frame = to_canonical('smsa', processed)
+    overall_kpis(frame)                      # {'volume': ..., 'dr': ..., 'fds': ..., ...}
+    kpis(frame, by='المدينة_الوجهة')         # جدول لكل مدينة
+    weekly_kpis(frame)                       # جدول لكل أسبوع (حسب تاريخ_الأساس)
+
+النسب بالمئة مقربة لرقم عشري واحد، و None عندما يكون المقام صفراً (مثل SLA بدون ملف SLA).
+الصفوف المستثناة لا تدخل في أي مؤشر.
+"""
+import pandas as pd
+
+from shipping_core.schema import DELIVERED, PENDING, RETURNED
+
+COUNT_COLUMNS = ['volume', 'delivered', 'pending', 'returned', 'sla_base', 'sla_met', 'fds_base', 'fds_met']
+RATE_COLUMNS = ['dr', 'fds', 'sla', 'pending_rate']
+
+
+def _rates(numerator, denominator):
+    """نسب مئوية مقربة (نفس round في التنفيذات السابقة) أو None عند المقام صفر"""
+    return pd.Series([round(float(n) / d * 100, 1) if d else None
+                      for n, d in zip(numerator.tolist(), denominator.tolist())],
+                     index=numerator.index, dtype=object)
+
+
+def _indicators(frame):
+    """أعمدة 0/1 لكل عداد في COUNT_COLUMNS"""
+    status = frame['حالة_التسليم']
+    return pd.DataFrame({
+        'volume': 1,
+        'delivered': (status == DELIVERED),
+        'pending': (status == PENDING),
+        'returned': (status == RETURNED),
+        'sla_base': frame['له_SLA'],
+        'sla_met': frame['له_SLA'] & frame['ضمن_SLA'],
+        'fds_base': frame['أساس_FDS'],
+        'fds_met': frame['أساس_FDS'] & frame['FDS'],
+    }, index=frame.index).astype('int64')
+
+
+def active(frame):
+    """الصفوف الداخلة في المؤشرات (بدون المستثنى)"""
+    return frame[~frame['مستثنى']]
+
+
+def kpi_counts(frame, by=None):
+    """عدادات المؤشرات لكل مجموعة (by: اسم عمود أو Series بنفس الفهرس) أو للجدول كاملاً"""
+    # اختيار بالموضع وليس بالفهرس حتى يعمل مع الفهارس المكررة
+    keep = ~frame['مستثنى'].to_numpy()
+    indicators = _indicators(frame[keep])
+    if by is None:
+        return indicators.sum().to_frame().T
+    keys = frame[by] if isinstance(by, str) else by
+    return indicators.groupby(keys[keep].to_numpy(), sort=True).sum().rename_axis(keys.name)
+
+
+def with_rates(counts):
+    """إضافة النسب المئوية إلى جدول العدادات"""
+    counts = counts.copy()
+    counts['dr'] = _rates(counts['delivered'], counts['volume'])
+    counts['fds'] = _rates(counts['fds_met'], counts['fds_base'])
+    counts['sla'] = _rates(counts['sla_met'], counts['sla_base'])
+    counts['pending_rate'] = _rates(counts['pending'], counts['volume'])
+    return counts
+
+
+def kpis(frame, by=None):
+    """العدادات والنسب لكل مجموعة"""
+    return with_rates(kpi_counts(frame, by))
+
+
+def overall_kpis(frame):
+    """مؤشرات الجدول كاملاً كقاموس"""
+    row = kpis(frame).iloc[0]
+    return {
+        'volume': int(row['volume']),
+        'delivered': int(row['delivered']),
+        'dr': row['dr'],
+        'fds': row['fds'],
+        'sla': row['sla'],
+        'pending': row['pending_rate'],
+    }
+
+
+def week_starts(frame):
+    """بداية الأسبوع (الاثنين) لكل صف حسب تاريخ_الأساس"""
+    return frame['تاريخ_الأساس'].dt.to_period('W').dt.start_time
+
+
+def weekly_kpis(frame):
+    """مؤشرات كل أسبوع مرتبة زمنياً - الصفوف بدون تاريخ لا تدخل"""
+    frame = frame[frame['تاريخ_الأساس'].notna()]
+    weekly = kpis(frame, by=week_starts(frame))
+    weekly.index.name = 'week_start'
+    weekly = weekly.reset_index()
+    weekly.insert(0, 'week', [f"W{start.isocalendar().week}-{start.year}" for start in weekly['week_start']])
+    return weekly
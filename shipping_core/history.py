@@ -0,0 +1,348 @@
+# shipping_core/history.py - سجل شحنات عمودي بملفات numpy مقسمة حسب الشركة والأسبوع وتُقرأ بـ memory-map
+"""
+لاتجاهات عدة سنوات (عشرات الملايين من الشحنات) يُحفظ الجدول الموحد (shipping_core.schema)
+كعمود لكل ملف .npy، مقسماً حسب الشركة وأسبوع ISO لتاريخ الأساس:
+
+    <SHIPPING_HISTORY_DIR>/<carrier>/<2025-W07>/meta.json        عدد الصفوف وبداية الأسبوع
+                                              /status.npy         رموز int8 لحالة التسليم
+                                              /city.npy           رموز int32 (-1 = مفقود)
+                                              /city.values.npy    قاموس قيم المدينة في الجزء
+                                              /base_date.npy ...  باقي الأعمدة بنوعها
+
+الشحنات بدون تاريخ أساس في الجزء "undated". الملفات تُفتح بـ np.load(mmap_mode='r')
+وتُغلف في pandas بدون نسخ، لذلك يقرأ حساب المؤشرات الأجزاء والأعمدة التي يحتاجها فقط:
+
+    store = get_history_store()             # None إذا لم يُحدد SHIPPING_HISTORY_DIR
+    store.append('aramex', frame)           # دمج مع الأسابيع الموجودة (آخر حالة لكل رقم شحنة)
+    store.weekly_kpis('aramex', start='2023-01-01')
+    store.city_kpis('aramex', start='2025-01-01', end='2025-03-31')
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from shipping_core.engine import kpi_counts, with_rates
+from shipping_core.instrumentation import span
+from shipping_core.schema import SCHEMA, STORAGE_NAMES
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DIR_ENV = 'SHIPPING_HISTORY_DIR'
+
+UNDATED = 'undated'
+META_FILE = 'meta.json'
+
+# قفل ملف لكل شركة حتى لا تكتب عمليتان (مثل batch_process --workers) نفس الأسابيع معاً
+LOCK_FILE = '.lock'
+LOCK_TIMEOUT_SECONDS = 120
+STALE_LOCK_SECONDS = 600
+
+# أعمدة نصية بترميز القاموس (رموز int32 + قيم الجزء)
+_STRING_COLUMNS = [col for col, dtype in SCHEMA.items() if dtype == 'object']
+_STATUS_DTYPE = SCHEMA['حالة_التسليم']
+
+# الأعمدة التي يحتاجها engine.kpi_counts
+KPI_COLUMNS = ['حالة_التسليم', 'مستثنى', 'له_SLA', 'ضمن_SLA', 'أساس_FDS', 'FDS']
+
+
+def get_history_dir():
+    """مجلد السجل - None إذا كان معطلاً"""
+    return os.environ.get(HISTORY_DIR_ENV, '').strip() or None
+
+
+def partition_key(week_start):
+    """اسم الجزء لأسبوع يبدأ الاثنين: 2025-W07"""
+    iso = week_start.isocalendar()
+    return f"{iso.year}-W{iso.week:02d}"
+
+
+def _column_path(path, col, suffix='npy'):
+    return os.path.join(path, f"{STORAGE_NAMES[col]}.{suffix}")
+
+
+@contextmanager
+def _file_lock(directory):
+    """قفل بملف يُنشأ بـ O_EXCL (يعمل على كل الأنظمة) مع إزالة الأقفال القديمة"""
+    os.makedirs(directory, exist_ok=True)
+    lock_path = os.path.join(directory, LOCK_FILE)
+    deadline = time.monotonic() + LOCK_TIMEOUT_SECONDS
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > STALE_LOCK_SECONDS:
+                    logger.warning("إزالة قفل قديم: %s", lock_path)
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"انتهت مهلة انتظار القفل: {lock_path}")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+
+def _write_partition(path, frame, week_start):
+    """كتابة جزء في مجلد مؤقت ثم استبداله دفعة واحدة"""
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex[:8]}"
+    os.makedirs(tmp_path)
+    for col in SCHEMA:
+        if col == 'الشركة':
+            continue
+        values = frame[col]
+        if col in _STRING_COLUMNS:
+            codes, uniques = pd.factorize(values)
+            np.save(_column_path(tmp_path, col), codes.astype('int32'))
+            np.save(_column_path(tmp_path, col, 'values.npy'), np.asarray(uniques.astype(str), dtype=str))
+        elif col == 'حالة_التسليم':
+            np.save(_column_path(tmp_path, col), values.cat.codes.to_numpy('int8'))
+        else:
+            np.save(_column_path(tmp_path, col), values.to_numpy())
+
+    meta = {'rows': int(len(frame)), 'week_start': week_start.strftime('%Y-%m-%d') if week_start is not None else None}
+    with open(os.path.join(tmp_path, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    old_path = None
+    if os.path.exists(path):
+        old_path = f"{path}.old-{uuid.uuid4().hex[:8]}"
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    if old_path:
+        shutil.rmtree(old_path, ignore_errors=True)
+
+
+def _read_column(path, col):
+    """عمود من جزء بدون نسخ (memory-map) - النصوص والحالة كـ Categorical على الرموز"""
+    values = np.load(_column_path(path, col), mmap_mode='r')
+    if col in _STRING_COLUMNS:
+        categories = np.load(_column_path(path, col, 'values.npy'))
+        return pd.Categorical.from_codes(values, categories=pd.Index(categories, dtype=object), validate=False)
+    if col == 'حالة_التسليم':
+        return pd.Categorical.from_codes(values, dtype=_STATUS_DTYPE, validate=False)
+    return values
+
+
+def _dedupe(frame):
+    """آخر حالة لكل رقم شحنة - والصفوف بدون رقم بتجزئة محتواها حتى لا تتكرر عند إعادة حفظ نفس الملف"""
+    awb = frame['رقم_الشحنة']
+    missing = awb.isna().to_numpy()
+    keep = ~awb.duplicated(keep='last').to_numpy()
+    if missing.any():
+        content = pd.util.hash_pandas_object(frame[missing], index=False)
+        keep[missing] = ~content.duplicated(keep='last').to_numpy()
+    return frame[keep]
+
+
+class HistoryStore:
+    """سجل الشحنات العمودي في مجلد root"""
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def _carrier_dir(self, carrier):
+        return os.path.join(self.root, carrier)
+
+    def partitions(self, carrier, start=None, end=None):
+        """أجزاء الشركة مرتبة زمنياً [{key, week_start, rows, path}] - مع تصفية الأسابيع حسب الفترة
+
+        الجزء بدون تاريخ يُضاف في النهاية عندما لا تُحدد فترة فقط.
+        """
+        directory = self._carrier_dir(carrier)
+        if not os.path.isdir(directory):
+            return []
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+
+        parts = []
+        for key in sorted(os.listdir(directory)):
+            meta_path = os.path.join(directory, key, META_FILE)
+            if '.' in key or not os.path.exists(meta_path):
+                continue
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            week_start = pd.Timestamp(meta['week_start']) if meta['week_start'] else None
+            if week_start is None:
+                if start is not None or end is not None:
+                    continue
+            elif ((start is not None and week_start + pd.Timedelta(days=7) <= start)
+                  or (end is not None and week_start > end)):
+                continue
+            parts.append({'key': key, 'week_start': week_start, 'rows': meta['rows'],
+                          'path': os.path.join(directory, key)})
+        parts.sort(key=lambda part: (part['week_start'] is None, part['week_start'] or pd.Timestamp(0)))
+        return parts
+
+    def read_partition(self, partition, columns=None, start=None, end=None):
+        """أعمدة جزء كـ DataFrame بدون نسخ - مع تصفية الصفوف إذا كان الجزء على حدود الفترة"""
+        columns = [col for col in (columns or SCHEMA) if col != 'الشركة']
+        week_start = partition['week_start']
+        clip = week_start is not None and (
+            (start is not None and week_start < pd.Timestamp(start))
+            or (end is not None and week_start + pd.Timedelta(days=7) > pd.Timestamp(end) + pd.Timedelta(days=1)))
+        read_columns = columns + ['تاريخ_الأساس'] if clip and 'تاريخ_الأساس' not in columns else columns
+
+        frame = pd.DataFrame({col: _read_column(partition['path'], col) for col in read_columns}, copy=False)
+        if clip:
+            days = frame['تاريخ_الأساس'].dt.normalize()
+            mask = pd.Series(True, index=frame.index)
+            if start is not None:
+                mask &= days >= pd.Timestamp(start)
+            if end is not None:
+                mask &= days <= pd.Timestamp(end)
+            frame = frame.loc[mask.to_numpy(), columns]
+        return frame
+
+    def read(self, carrier, columns=None, start=None, end=None):
+        """الجدول الموحد للشركة في الفترة (ينسخ عند الدمج - للتحليل على أجزاء كثيرة استخدم scan)"""
+        frames = [self.read_partition(part, columns, start, end) for part in self.partitions(carrier, start, end)]
+        if not frames:
+            return pd.DataFrame(columns=[col for col in (columns or SCHEMA) if col != 'الشركة'])
+        frame = pd.concat(frames, ignore_index=True)
+        for col in frame.columns:
+            if col in _STRING_COLUMNS:
+                frame[col] = frame[col].astype(object)
+        return frame
+
+    def scan(self, carrier, columns, start=None, end=None):
+        """(partition, DataFrame) لكل جزء في الفترة بالأعمدة المطلوبة فقط"""
+        for part in self.partitions(carrier, start, end):
+            yield part, self.read_partition(part, columns, start, end)
+
+    def append(self, carrier, frame):
+        """إضافة جدول موحد للسجل - يعيد كتابة الأسابيع التي تظهر فيه فقط ويرجع عدد الصفوف"""
+        if len(frame) == 0:
+            return 0
+        directory = self._carrier_dir(carrier)
+        with span(f"history:{carrier}", 'output', rows_in=len(frame)), self._lock, _file_lock(directory):
+            start = time.perf_counter()
+            week_starts = frame['تاريخ_الأساس'].dt.to_period('W').dt.start_time
+            for week_start, rows in frame.groupby(week_starts.to_numpy(), sort=False, dropna=False):
+                week_start = week_start if pd.notna(week_start) else None
+                key = partition_key(week_start) if week_start is not None else UNDATED
+                path = os.path.join(directory, key)
+                if os.path.exists(os.path.join(path, META_FILE)):
+                    existing = self.read_partition({'path': path, 'week_start': week_start})
+                    existing = existing.assign(**{col: existing[col].astype(object) for col in _STRING_COLUMNS})
+                    rows = pd.concat([existing, rows.drop(columns='الشركة')], ignore_index=True)
+                _write_partition(path, _dedupe(rows), week_start)
+
+        logger.info("إضافة %s شحنة من %s إلى السجل العمودي في %.0f ms", f"{len(frame):,}", carrier,
+                    (time.perf_counter() - start) * 1000)
+        return len(frame)
+
+    def _filter_mask(self, frame, filters):
+        """شرط الفلاتر على رموز الأعمدة النصية (مقارنة أرقام بدل النصوص)"""
+        mask = np.ones(len(frame), dtype=bool)
+        for col, value in filters.items():
+            if value is None or value == 'الكل':
+                continue
+            values = frame[col]
+            if col in _STRING_COLUMNS:
+                code = values.cat.categories.get_indexer([value])[0]
+                mask &= values.cat.codes.to_numpy() == code if code >= 0 else False
+            else:
+                mask &= (values == value).to_numpy()
+        return mask
+
+    def weekly_kpis(self, carrier, start=None, end=None, **filters):
+        """مؤشرات كل أسبوع (نفس أعمدة engine.weekly_kpis) - جزء واحد لكل أسبوع بدون تجميع
+
+        filters: أعمدة الجدول الموحد النصية، مثل {'المدينة_الوجهة': 'Riyadh'}.
+        """
+        rows = []
+        with span(f"history:weekly:{carrier}", 'analysis') as s:
+            for part, frame in self.scan(carrier, KPI_COLUMNS + list(filters), start, end):
+                if part['week_start'] is None:
+                    continue
+                mask = self._filter_mask(frame, filters)
+                counts = kpi_counts(frame if mask.all() else frame[mask]).iloc[0]
+                rows.append({'week_start': part['week_start'], **counts.to_dict()})
+            s.set_output(rows)
+
+        weekly = pd.DataFrame(rows)
+        if weekly.empty:
+            return weekly
+        weekly = weekly[weekly['volume'] > 0].reset_index(drop=True)
+        weekly = with_rates(weekly)
+        weekly.insert(0, 'week', [f"W{start.isocalendar().week}-{start.year}" for start in weekly['week_start']])
+        return weekly
+
+    def city_kpis(self, carrier, start=None, end=None, by='المدينة_الوجهة', **filters):
+        """مؤشرات لكل مدينة (أو عمود نصي آخر) على كل الأجزاء - تجميع رموز كل جزء ثم دمج المجاميع"""
+        totals = []
+        with span(f"history:{by}:{carrier}", 'analysis'):
+            for part, frame in self.scan(carrier, KPI_COLUMNS + [by] + list(filters), start, end):
+                mask = self._filter_mask(frame, filters)
+                keys = frame[by].cat
+                counts = kpi_counts(frame[mask], by=keys.codes[mask])
+                counts = counts[counts.index >= 0]
+                counts.index = keys.categories[counts.index]
+                totals.append(counts)
+
+        if not totals:
+            return pd.DataFrame()
+        counts = pd.concat(totals).groupby(level=0, sort=True).sum()
+        counts.index.name = by
+        return with_rates(counts)
+
+    def summary(self):
+        """عدد الأجزاء والشحنات وأول وآخر أسبوع والحجم على القرص لكل شركة"""
+        rows = []
+        if os.path.isdir(self.root):
+            for carrier in sorted(os.listdir(self.root)):
+                parts = self.partitions(carrier)
+                if not parts:
+                    continue
+                dated = [part['week_start'] for part in parts if part['week_start'] is not None]
+                rows.append({
+                    'carrier': carrier,
+                    'partitions': len(parts),
+                    'shipments': sum(part['rows'] for part in parts),
+                    'first_week': min(dated).date() if dated else None,
+                    'last_week': max(dated).date() if dated else None,
+                    'bytes': sum(entry.stat().st_size for part in parts for entry in os.scandir(part['path'])),
+                })
+        return pd.DataFrame(rows)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_history_store():
+    """سجل الشحنات العمودي المشترك للعملية - None إذا لم يُحدد SHIPPING_HISTORY_DIR"""
+    root = get_history_dir()
+    if root is None:
+        return None
+    with _stores_lock:
+        if root not in _stores:
+            _stores[root] = HistoryStore(root)
+        return _stores[root]
+
+
+def append_history(carrier, frame):
+    """إضافة جدول موحد للسجل إن كان مفعلاً - يرجع عدد الصفوف ولا يوقف المعالجة عند الفشل"""
+    store = get_history_store()
+    if store is None:
+        return 0
+    try:
+        return store.append(carrier, frame)
+    except (OSError, TimeoutError, ValueError) as e:
+        logger.warning("تعذر إضافة بيانات %s إلى السجل العمودي: %s", carrier, e)
+        return 0
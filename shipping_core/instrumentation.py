@@ -0,0 +1,229 @@
+# shipping_core/instrumentation.py - قياس زمن مراحل التشغيل (spans) وتسجيلها كـ JSONL
+"""
+كل تشغيل (rerun) للصفحة يبدأ بـ start_run وينتهي بـ finish_run، وكل مرحلة داخله
+تُقاس بـ span. خارج أي تشغيل تكون span بدون أثر تقريباً، لذلك يمكن استخدامها
+في المكتبة والسكربتات الدفعية بدون إعداد.
+
+    run = start_run('aramex')
+    with span('process_aramex_data', 'enrichment', rows_in=len(df)) as s:
+        result = process(df)
+        s.set_output(result)
+    finish_run(run)
+    append_jsonl(run)
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ملف السجل المحلي لتحليل الأداء لاحقاً
+PERF_LOG_ENV = 'SHIPPING_PERF_LOG'
+DEFAULT_PERF_LOG = os.path.join('logs', 'perf.jsonl')
+
+# تصنيفات المراحل المعروضة في لوحة الأداء وملفات التتبع
+CATEGORIES = ('pipeline', 'ingestion', 'enrichment', 'analysis', 'section', 'chart', 'table', 'output')
+
+_state = threading.local()
+_log_lock = threading.Lock()
+
+
+def get_perf_log_path():
+    """مسار ملف سجل الأداء"""
+    return os.environ.get(PERF_LOG_ENV, DEFAULT_PERF_LOG)
+
+
+def count_rows(value):
+    """عدد صفوف الجدول أو السلسلة - None لباقي الأنواع"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(len(value))
+    if isinstance(value, tuple) and value and isinstance(value[0], (pd.DataFrame, pd.Series)):
+        return int(len(value[0]))
+    return None
+
+
+class Span:
+    """مرحلة واحدة مقاسة داخل التشغيل
+
+    ts_us (وقت البداية بالميكروثانية منذ epoch) و pid و tid تسمح بدمج مراحل
+    الخيوط والعمليات المتوازية في ملف trace واحد.
+    """
+
+    __slots__ = ('stage', 'category', 'rows_in', 'rows_out', 'cache', 'depth', 'start_ms', 'ms',
+                 'ts_us', 'pid', 'tid', 'thread', '_start')
+
+    def __init__(self, stage, category, rows_in=None, depth=0, start_ms=0.0):
+        self.stage = stage
+        self.category = category
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.cache = None
+        self.depth = depth
+        self.start_ms = start_ms
+        self.ms = None
+        self.ts_us = time.time_ns() // 1000
+        self.pid = os.getpid()
+        self.tid = threading.get_native_id()
+        self.thread = threading.current_thread().name
+        self._start = time.perf_counter()
+
+    def set_output(self, result):
+        """تسجيل عدد صفوف الناتج"""
+        self.rows_out = count_rows(result)
+
+    def to_dict(self):
+        return {
+            'stage': self.stage,
+            'category': self.category,
+            'ms': round(self.ms, 2) if self.ms is not None else None,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'cache': self.cache,
+            'depth': self.depth,
+            'start_ms': round(self.start_ms, 2),
+            'ts_us': self.ts_us,
+            'pid': self.pid,
+            'tid': self.tid,
+            'thread': self.thread,
+        }
+
+
+class Run:
+    """تشغيل واحد للصفحة مع المراحل المسجلة بترتيب بدايتها"""
+
+    def __init__(self, page):
+        self.page = page
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = datetime.now().isoformat(timespec='milliseconds')
+        self.spans = []
+        self.total_ms = None
+        self.finished = False
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def to_frame(self):
+        """جدول المراحل لعرضه في لوحة الأداء"""
+        return pd.DataFrame([s.to_dict() for s in self.spans],
+                            columns=['stage', 'category', 'ms', 'rows_in', 'rows_out', 'cache', 'depth', 'start_ms'])
+
+    def records(self):
+        """سجل JSON لكل مرحلة مع معرف التشغيل"""
+        base = {'run_id': self.run_id, 'page': self.page, 'started_at': self.started_at,
+                'run_ms': round(self.total_ms, 2) if self.total_ms is not None else None}
+        return [{**base, **s.to_dict()} for s in self.spans]
+
+
+def current_run():
+    """التشغيل النشط في الخيط الحالي أو None"""
+    return getattr(_state, 'run', None)
+
+
+def _stack():
+    """المراحل المفتوحة في الخيط الحالي"""
+    stack = getattr(_state, 'stack', None)
+    if stack is None:
+        stack = _state.stack = []
+    return stack
+
+
+def start_run(page):
+    """بدء تشغيل جديد في الخيط الحالي"""
+    run = Run(page)
+    _state.run = run
+    _state.stack = []
+    return run
+
+
+def finish_run(run=None):
+    """إنهاء التشغيل وحساب الزمن الكلي - يرجع التشغيل"""
+    run = run or current_run()
+    if run is None:
+        return None
+    if not run.finished:
+        run.total_ms = (time.perf_counter() - run._start) * 1000
+        run.finished = True
+    if current_run() is run:
+        _state.run = None
+    return run
+
+
+@contextmanager
+def span(stage, category='analysis', rows_in=None, cached=False):
+    """قياس مرحلة داخل التشغيل الحالي
+
+    cached=True للدوال المحفوظة في الذاكرة المؤقتة: تُسجل كـ hit ما لم يتم
+    استدعاء mark_cache_miss من داخل الدالة.
+    """
+    run = current_run()
+    if run is None:
+        yield Span(stage, category, rows_in)
+        return
+
+    stack = _stack()
+    s = Span(stage, category, rows_in, depth=len(stack),
+             start_ms=(time.perf_counter() - run._start) * 1000)
+    if cached:
+        s.cache = 'hit'
+    with run._lock:
+        run.spans.append(s)
+    stack.append(s)
+    try:
+        yield s
+    finally:
+        s.ms = (time.perf_counter() - s._start) * 1000
+        stack.pop()
+
+
+def timed_call(category, func, *args, **kwargs):
+    """استدعاء func داخل مرحلة باسمها مع عدد صفوف المدخل الأول والناتج"""
+    with span(func.__name__, category, rows_in=count_rows(args[0]) if args else None) as s:
+        result = func(*args, **kwargs)
+        s.set_output(result)
+    return result
+
+
+def mark_cache_miss():
+    """تسجيل أن أقرب مرحلة محفوظة مؤقتاً تم حسابها فعلاً"""
+    if current_run() is None:
+        return
+    for s in reversed(_stack()):
+        if s.cache is not None:
+            s.cache = 'miss'
+            return
+
+
+def append_jsonl(run, path=None):
+    """إضافة مراحل التشغيل إلى ملف السجل - يرجع المسار أو None عند الفشل
+
+    SHIPPING_PERF_LOG= (قيمة فارغة) يعطل التسجيل.
+    """
+    path = path or get_perf_log_path()
+    records = run.records()
+    if not path or not records:
+        return None
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lines = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        with _log_lock, open(path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+    except OSError as e:
+        logger.warning("تعذر كتابة سجل الأداء %s: %s", path, e)
+        return None
+    return path
+
+
+def read_jsonl(path=None):
+    """قراءة سجل الأداء كجدول"""
+    path = path or get_perf_log_path()
+    if not path or not os.path.exists(path):
+        return pd.DataFrame()
+    return pd.read_json(path, lines=True)
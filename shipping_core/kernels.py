@@ -0,0 +1,41 @@
+# shipping_core/kernels.py - التحكم في المسارات السريعة (vectorized) للحسابات الثقيلة
+"""
+كل دالة لها مسار سريع تحتفظ بالتنفيذ الأصلي (legacy) وتختار بينهما حسب هذا المفتاح.
+التطابق بين المسارين يتم فحصه بـ equivalence_check.py قبل تفعيل أي مسار جديد.
+
+لتعطيل المسارات السريعة والعودة للتنفيذ الأصلي:
+    SHIPPING_FAST_PATHS=0 streamlit run main_dashboard.py
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+FAST_PATHS_ENV = 'SHIPPING_FAST_PATHS'
+
+_state = threading.local()
+_default_enabled = os.environ.get(FAST_PATHS_ENV, '1').strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def fast_paths_enabled():
+    """هل المسارات السريعة مفعلة في الخيط الحالي"""
+    return getattr(_state, 'enabled', _default_enabled)
+
+
+def set_fast_paths(enabled):
+    """تفعيل أو تعطيل المسارات السريعة لكل الخيوط التي لم تحدد قيمة خاصة بها"""
+    global _default_enabled
+    _default_enabled = bool(enabled)
+
+
+@contextmanager
+def fast_paths(enabled):
+    """تفعيل أو تعطيل المسارات السريعة مؤقتاً داخل الخيط الحالي"""
+    previous = getattr(_state, 'enabled', None)
+    _state.enabled = bool(enabled)
+    try:
+        yield
+    finally:
+        if previous is None:
+            del _state.enabled
+        else:
+            _state.enabled = previous
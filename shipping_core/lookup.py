@@ -0,0 +1,142 @@
+# shipping_core/lookup.py - فهرس بحث فوري برقم الشحنة أو الهاتف أو المرجع لجدول شركة شحن
+"""
+ShipmentIndex يُبنى مرة واحدة لكل جدول (عند إضافته للسجل المشترك shipping_core.registry)
+من أعمدة المعرفات الموجودة فيه (LOOKUP_COLUMNS). كل نوع مفتاح يُحفظ كـ pandas Index
+بالقيم الفريدة (جدول hash) مع مواضع الصفوف مرتبة حسب القيمة، فالبحث عن قيمة هو get_loc
+واحد ثم شريحة من المواضع بدون مرور على الجدول.
+
+أرقام الهواتف تُوحد قبل الفهرسة والبحث (أرقام فقط بدون 966 أو 0 في البداية)، فيطابق
+0551234567 و +966 55 123 4567 نفس الشحنات. أسماء وعناوين المستلمين تُفهرس بفهرس مقلوب
+(shipping_core.text_index) ويُبحث فيها بنوع المفتاح 'text'.
+
+    index = build_index(df)            # None إذا لم يحتوِ الجدول على أعمدة معرفات
+    positions = index.lookup('40000000001')
+    df.iloc[positions]
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from shipping_core.schema import awb_strings
+from shipping_core.text_index import TEXT_COLUMNS, build_text_index
+
+# عمود المعرف -> نوع المفتاح
+LOOKUP_COLUMNS = {
+    'رقم_الشحنة': 'awb',
+    'رقم التتبع': 'awb',
+    'رقم الطلب': 'order',
+    'المرجع_الشحنة_1': 'reference',
+    'هاتف_المستلم': 'phone',
+    'هاتف العميل': 'phone',
+}
+
+KEY_LABELS = {'awb': 'رقم الشحنة', 'order': 'رقم الطلب', 'reference': 'المرجع', 'phone': 'الهاتف',
+              'text': 'الاسم أو العنوان'}
+
+# الأرقام السعودية بمفتاح الدولة (966XXXXXXXXX) كأعداد صحيحة
+_PHONE_PREFIX = 966 * 10 ** 9
+
+
+def normalize_key(value, kind):
+    """توحيد قيمة بحث واحدة - None إذا كانت فارغة"""
+    text = str(value).strip().upper()
+    if kind == 'phone':
+        text = re.sub(r'^(?:00)?966', '', re.sub(r'\D', '', text)).lstrip('0')
+    return text or None
+
+
+def normalize_keys(values, kind):
+    """توحيد عمود معرفات للفهرسة بنفس قواعد normalize_key - المفقود يبقى مفقوداً
+
+    الأعمدة الرقمية (أو العشرية بقيم صحيحة من Excel) تبقى أعداداً صحيحة لأن فهرستها أسرع.
+    """
+    if pd.api.types.is_float_dtype(values.dtype) and (values.dropna() % 1 == 0).all():
+        values = values.astype('Int64')
+    if pd.api.types.is_integer_dtype(values.dtype):
+        if kind == 'phone':
+            local = ((values < _PHONE_PREFIX) | (values >= _PHONE_PREFIX + 10 ** 9)).fillna(True)
+            values = values.where(local, values - _PHONE_PREFIX)
+        return values
+
+    values = awb_strings(values).astype(object)
+    values = values.where(values.isna(), values.astype(str).str.strip().str.upper())
+    if kind == 'phone':
+        values = (values.str.replace(r'\D', '', regex=True)
+                  .str.replace(r'^(?:00)?966', '', regex=True)
+                  .str.lstrip('0'))
+    return values.where(values.notna() & (values != ''), None)
+
+
+class _KeyIndex:
+    """مواضع الصفوف لكل قيمة فريدة في عمود معرفات واحد"""
+
+    __slots__ = ('kind', 'numeric', 'uniques', 'positions', 'bounds')
+
+    def __init__(self, values, kind):
+        keys = normalize_keys(values, kind)
+        codes, uniques = pd.factorize(keys)
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        start = np.searchsorted(sorted_codes, 0)
+        self.kind = kind
+        self.numeric = pd.api.types.is_integer_dtype(keys.dtype)
+        self.uniques = pd.Index(uniques)
+        self.positions = order[start:]
+        self.bounds = np.searchsorted(sorted_codes[start:], np.arange(len(uniques) + 1))
+
+    def lookup(self, key):
+        if self.numeric:
+            if not key.isdigit():
+                return self.positions[:0]
+            key = int(key)
+        try:
+            code = self.uniques.get_loc(key)
+        except KeyError:
+            return self.positions[:0]
+        return self.positions[self.bounds[code]:self.bounds[code + 1]]
+
+    @property
+    def nbytes(self):
+        return int(self.positions.nbytes + self.bounds.nbytes + self.uniques.memory_usage(deep=True))
+
+
+class ShipmentIndex:
+    """فهرس المعرفات لجدول واحد - المواضع موضعية (iloc) في الجدول الذي بُني منه"""
+
+    def __init__(self, frame):
+        self.rows = len(frame)
+        self.indexes = {col: _KeyIndex(frame[col], kind) for col, kind in LOOKUP_COLUMNS.items()
+                        if col in frame.columns}
+        self.text = build_text_index(frame)
+
+    @property
+    def columns(self):
+        return list(self.indexes) + (self.text.columns if self.text is not None else [])
+
+    def lookup(self, value, kinds=None):
+        """مواضع الصفوف المطابقة للقيمة في كل أعمدة المعرفات والنص (أو أنواع kinds فقط) مرتبة وبدون تكرار"""
+        keys = {}
+        found = []
+        for index in self.indexes.values():
+            if kinds is not None and index.kind not in kinds:
+                continue
+            if index.kind not in keys:
+                keys[index.kind] = normalize_key(value, index.kind)
+            if keys[index.kind] is not None:
+                found.append(index.lookup(keys[index.kind]))
+        if self.text is not None and (kinds is None or 'text' in kinds):
+            found.append(self.text.search(value))
+        return np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.intp)
+
+    @property
+    def nbytes(self):
+        text_bytes = self.text.nbytes if self.text is not None else 0
+        return sum(index.nbytes for index in self.indexes.values()) + text_bytes
+
+
+def build_index(frame):
+    """فهرس المعرفات والنص للجدول أو None إذا لم يحتوِ على أي عمود من LOOKUP_COLUMNS أو TEXT_COLUMNS"""
+    if not any(col in frame.columns for col in [*LOOKUP_COLUMNS, *TEXT_COLUMNS]):
+        return None
+    return ShipmentIndex(frame)
@@ -0,0 +1,334 @@
+# shipping_core/memory.py - حساب الذاكرة الفعلية للبيانات المحفوظة وحدود الذاكرة لكل جلسة وللعملية
+"""
+كل مجموعة بيانات محفوظة (قاموس يحتوي على جداول مثل main_df و sla_df) تُسجل في
+MemoryLedger مع حجمها الفعلي (memory_usage(deep=True)) ووقت آخر استخدام.
+عند تجاوز حد الجلسة أو حد العملية يتم نقل جداول الأقدم استخداماً (LRU) إلى القرص
+واستعادتها تلقائياً عند طلبها مرة أخرى.
+
+الجداول المنقولة تُكتب كملفات parquet مضغوطة (zstd)، وإذا لم تُسترجع مطابقة تماماً
+(أعمدة object بأنواع مختلطة مثلاً) تُكتب كـ pickle مضغوط بدون فقد.
+
+الحدود (MB) من متغيرات البيئة:
+    SHIPPING_SESSION_MEMORY_MB (الافتراضي 1024)
+    SHIPPING_PROCESS_MEMORY_MB (الافتراضي 4096)
+    SHIPPING_SPILL_DIR         (الافتراضي مجلد مؤقت للعملية)
+"""
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+SESSION_BUDGET_ENV = 'SHIPPING_SESSION_MEMORY_MB'
+PROCESS_BUDGET_ENV = 'SHIPPING_PROCESS_MEMORY_MB'
+SPILL_DIR_ENV = 'SHIPPING_SPILL_DIR'
+
+DEFAULT_SESSION_BUDGET_MB = 1024
+DEFAULT_PROCESS_BUDGET_MB = 4096
+
+MB = 1024 * 1024
+
+
+def deep_memory_bytes(value):
+    """الحجم الفعلي في الذاكرة بما فيه محتوى الأعمدة النصية (object)"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, SpilledFrame):
+        return 0
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(deep_memory_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(deep_memory_bytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def format_bytes(size):
+    """عرض الحجم بوحدة مناسبة"""
+    for unit in ('B', 'KB', 'MB'):
+        if abs(size) < 1024:
+            return f"{size:,.0f} {unit}" if unit == 'B' else f"{size:,.1f} {unit}"
+        size /= 1024
+    return f"{size:,.2f} GB"
+
+
+def _budget_from_env(name, default_mb):
+    try:
+        return int(float(os.environ.get(name, default_mb)) * MB)
+    except ValueError:
+        logger.warning("قيمة غير صالحة لـ %s، استخدام %s MB", name, default_mb)
+        return default_mb * MB
+
+
+def get_spill_dir():
+    """مجلد ملفات الجداول المنقولة إلى القرص"""
+    return os.environ.get(SPILL_DIR_ENV) or os.path.join(tempfile.gettempdir(), 'shipping_spill', str(os.getpid()))
+
+
+def _same_frame(frame, reloaded):
+    return (reloaded.columns.equals(frame.columns) and reloaded.dtypes.equals(frame.dtypes)
+            and reloaded.index.equals(frame.index) and reloaded.equals(frame))
+
+
+class SpilledFrame:
+    """جدول تم نقله إلى القرص - يحل محل الجدول داخل قاموس البيانات حتى تتم استعادته"""
+
+    __slots__ = ('path', 'rows', 'nbytes', 'format', 'disk_bytes', 'write_ms', 'read_ms')
+
+    def __init__(self, path, rows, nbytes, format='pickle', disk_bytes=None, write_ms=None):
+        self.path = path
+        self.rows = rows
+        self.nbytes = nbytes
+        self.format = format
+        self.disk_bytes = disk_bytes
+        self.write_ms = write_ms
+        self.read_ms = None
+
+    @classmethod
+    def write(cls, frame, directory=None):
+        """كتابة الجدول كـ parquet مضغوط (أو pickle مضغوط إذا لم يُسترجع مطابقاً)"""
+        directory = directory or get_spill_dir()
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, uuid.uuid4().hex)
+        start = time.perf_counter()
+
+        path, format = base + '.parquet', 'parquet'
+        try:
+            frame.to_parquet(path, compression='zstd')
+            if not _same_frame(frame, pd.read_parquet(path)):
+                raise ValueError("parquet لا يسترجع الجدول مطابقاً")
+        except (ValueError, TypeError, NotImplementedError) as e:
+            logger.debug("استخدام pickle بدلاً من parquet: %s", e)
+            if os.path.exists(path):
+                os.remove(path)
+            path, format = base + '.pkl.zst', 'pickle'
+            with pa.CompressedOutputStream(path, 'zstd') as f:
+                pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        write_ms = (time.perf_counter() - start) * 1000
+        return cls(path, len(frame), deep_memory_bytes(frame), format, os.path.getsize(path), write_ms)
+
+    def load(self):
+        start = time.perf_counter()
+        if self.format == 'parquet':
+            frame = pd.read_parquet(self.path)
+        else:
+            with pa.input_stream(self.path, compression='zstd') as f:
+                frame = pickle.load(f)
+        self.read_ms = (time.perf_counter() - start) * 1000
+        return frame
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __repr__(self):
+        return f"SpilledFrame({self.path!r}, rows={self.rows}, format={self.format})"
+
+
+class _Entry:
+    __slots__ = ('container', 'nbytes', 'last_access', 'spilled')
+
+    def __init__(self, container, nbytes):
+        self.container = container
+        self.nbytes = nbytes
+        self.last_access = time.monotonic()
+        self.spilled = False
+
+
+class MemoryLedger:
+    """سجل مجموعات البيانات المحفوظة لكل مالك (جلسة) مع حدود الذاكرة والنقل إلى القرص"""
+
+    def __init__(self, session_budget=None, process_budget=None, spill_dir=None):
+        self.session_budget = session_budget if session_budget is not None else \
+            _budget_from_env(SESSION_BUDGET_ENV, DEFAULT_SESSION_BUDGET_MB)
+        self.process_budget = process_budget if process_budget is not None else \
+            _budget_from_env(PROCESS_BUDGET_ENV, DEFAULT_PROCESS_BUDGET_MB)
+        self.spill_dir = spill_dir or get_spill_dir()
+        self._entries = {}
+        self._lock = threading.RLock()
+        self.stats = {'spills': 0, 'restores': 0, 'spilled_bytes': 0, 'spill_ms': 0.0, 'restore_ms': 0.0}
+
+    # ---------- التسجيل ----------
+
+    def register(self, owner, name, container):
+        """تسجيل قاموس بيانات (أو استبداله) وحساب حجمه - يرجع الحجم بالبايت"""
+        with self._lock:
+            previous = self._entries.get((owner, name))
+            if previous is not None:
+                if previous.container is not container:
+                    self._remove_spill_files(previous.container)
+                elif previous.spilled:
+                    # نفس القاموس بعد تعديله - استعادة الجداول قبل إعادة حساب الحجم
+                    self._restore(previous)
+            nbytes = deep_memory_bytes(container)
+            self._entries[(owner, name)] = _Entry(container, nbytes)
+        return nbytes
+
+    def is_registered(self, owner, name, container):
+        """هل القاموس الحالي هو المسجل (وليس قاموساً استبدله المستدعي مباشرة)"""
+        with self._lock:
+            entry = self._entries.get((owner, name))
+            return entry is not None and entry.container is container
+
+    def unregister(self, owner, name):
+        with self._lock:
+            entry = self._entries.pop((owner, name), None)
+            if entry is not None:
+                self._remove_spill_files(entry.container)
+
+    def drop_owner(self, owner):
+        """حذف كل بيانات مالك (جلسة انتهت)"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == owner]:
+                self.unregister(*key)
+
+    def prune(self, is_active):
+        """حذف بيانات المالكين غير النشطين - is_active(owner) -> bool"""
+        with self._lock:
+            owners = {owner for owner, _ in self._entries}
+            for owner in owners:
+                if not is_active(owner):
+                    self.drop_owner(owner)
+
+    # ---------- الاستخدام ----------
+
+    def checkout(self, owner, name):
+        """استعادة الجداول المنقولة للقرص وتحديث وقت الاستخدام
+
+        يرجع نسخة سطحية من القاموس بجداول في الذاكرة، حتى لا يتأثر المستدعي
+        بنقل الجداول إلى القرص من خيط آخر أثناء استخدامها.
+        """
+        with self._lock:
+            entry = self._entries.get((owner, name))
+            if entry is None:
+                return None
+            if entry.spilled:
+                self._restore(entry)
+            entry.last_access = time.monotonic()
+            return dict(entry.container)
+
+    def enforce(self, owner=None, protect=None):
+        """نقل الأقدم استخداماً إلى القرص حتى تعود الجلسة والعملية ضمن الحدود
+
+        protect: (مالك، اسم) لا يتم نقله (البيانات المستخدمة حالياً).
+        يرجع قائمة [(مالك، اسم، حجم)] للبيانات المنقولة.
+        """
+        spilled = []
+        with self._lock:
+            if owner is not None:
+                spilled += self._spill_until(lambda key: key[0] == owner, self.session_budget, protect)
+            spilled += self._spill_until(lambda key: True, self.process_budget, protect)
+        return spilled
+
+    # ---------- التقارير ----------
+
+    def usage(self, owner=None):
+        """الحجم في الذاكرة (بدون المنقول للقرص) لمالك أو للعملية"""
+        with self._lock:
+            return sum(entry.nbytes for key, entry in self._entries.items()
+                       if not entry.spilled and (owner is None or key[0] == owner))
+
+    def size(self, owner, name):
+        """الحجم المسجل لمجموعة بيانات أو None"""
+        with self._lock:
+            entry = self._entries.get((owner, name))
+            return entry.nbytes if entry is not None else None
+
+    def report(self, owner=None):
+        """جدول بمجموعات البيانات وأحجامها وحالتها"""
+        now = time.monotonic()
+        with self._lock:
+            rows = [{
+                'owner': key[0],
+                'dataset': key[1],
+                'memory_mb': round(entry.nbytes / MB, 2),
+                'state': 'disk' if entry.spilled else 'memory',
+                'idle_s': round(now - entry.last_access, 1),
+            } for key, entry in self._entries.items() if owner is None or key[0] == owner]
+        return pd.DataFrame(rows, columns=['owner', 'dataset', 'memory_mb', 'state', 'idle_s'])
+
+    # ---------- داخلي ----------
+
+    def _spill_until(self, selects, budget, protect):
+        spilled = []
+        candidates = sorted(
+            ((key, entry) for key, entry in self._entries.items()
+             if selects(key) and not entry.spilled and key != protect),
+            key=lambda item: item[1].last_access
+        )
+        total = sum(entry.nbytes for key, entry in self._entries.items() if selects(key) and not entry.spilled)
+        for key, entry in candidates:
+            if total <= budget:
+                break
+            if self._spill(key, entry):
+                total -= entry.nbytes
+                spilled.append((key[0], key[1], entry.nbytes))
+        if total > budget:
+            logger.warning("الذاكرة %s تتجاوز الحد %s بعد نقل البيانات القابلة للنقل",
+                           format_bytes(total), format_bytes(budget))
+        return spilled
+
+    def _spill(self, key, entry):
+        """نقل جداول القاموس إلى القرص بدون فقد للأنواع"""
+        replaced = {}
+        try:
+            for field, value in entry.container.items():
+                if isinstance(value, pd.DataFrame):
+                    replaced[field] = SpilledFrame.write(value, self.spill_dir)
+        except Exception as e:
+            logger.warning("تعذر نقل %s إلى القرص: %s", key[1], e)
+            for spilled_frame in replaced.values():
+                spilled_frame.remove()
+            return False
+        if not replaced:
+            return False
+
+        entry.container.update(replaced)
+        entry.spilled = True
+        write_ms = sum(spilled_frame.write_ms for spilled_frame in replaced.values())
+        self.stats['spills'] += 1
+        self.stats['spilled_bytes'] += entry.nbytes
+        self.stats['spill_ms'] += write_ms
+        logger.info("تم نقل %s (%s) إلى القرص في %.0f ms", key[1], format_bytes(entry.nbytes), write_ms)
+        return True
+
+    def _restore(self, entry):
+        read_ms = 0.0
+        for field, value in list(entry.container.items()):
+            if isinstance(value, SpilledFrame):
+                entry.container[field] = value.load()
+                read_ms += value.read_ms
+                value.remove()
+        entry.spilled = False
+        self.stats['restores'] += 1
+        self.stats['restore_ms'] += read_ms
+
+    def _remove_spill_files(self, container):
+        for value in container.values():
+            if isinstance(value, SpilledFrame):
+                value.remove()
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger():
+    """السجل المشترك للعملية"""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = MemoryLedger()
+        return _ledger
@@ -0,0 +1,383 @@
+# shipping_core/niceone.py - معالجة بيانات NiceOne والفروع وتحليل المحاولات
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from shipping_core.common import fix_duplicate_columns
+from shipping_core.kernels import fast_paths_enabled
+from shipping_core.schema import DELIVERED, OTHER, PENDING, RETURNED, conform, source_column
+from shipping_core.synthetic import generate_niceone
+
+logger = logging.getLogger(__name__)
+
+
+def process_column_names(df):
+    """توحيد أسماء أعمدة ملف NiceOne الرئيسي حسب ترتيبها"""
+    if len(df.columns) > 0 and (df.columns[0] == '#' or 'Unnamed' in str(df.columns[0])):
+        df = df.drop(df.columns[0], axis=1)
+
+    expected_columns = [
+        'رقم الطلب', 'رقم التتبع', 'اسم العميل', 'هاتف العميل',
+        'موقع العميل', 'المطلوب تحصيله', 'السبب', 'حالة الطلب',
+        'رقم ورقة التشغيل', 'الرقم التعريفي', 'اسم المندوب',
+        'تاريخ استلام الشحنة', 'تاريخ الشحن'
+    ]
+
+    current_columns = df.columns.tolist()
+    new_column_names = {}
+
+    for i, col in enumerate(current_columns):
+        if i < len(expected_columns):
+            new_column_names[col] = expected_columns[i]
+
+    df = df.rename(columns=new_column_names)
+    return df
+
+
+def prepare_main_data(df):
+    """تجهيز الملف الرئيسي: إصلاح الأعمدة وتوحيد أسمائها وتحويل مبلغ التحصيل"""
+    df = fix_duplicate_columns(df)
+    df = process_column_names(df)
+    df = df.dropna(how='all')
+
+    if 'المطلوب تحصيله' in df.columns:
+        df['المطلوب تحصيله'] = pd.to_numeric(df['المطلوب تحصيله'], errors='coerce').fillna(0)
+
+    return df
+
+
+def read_main_file(source, file_name=None):
+    """قراءة الملف الرئيسي (CSV أو Excel) من مسار أو ملف مرفوع وتجهيزه"""
+    file_name = file_name or getattr(source, 'name', None) or os.fspath(source)
+    if file_name.endswith('.csv'):
+        df = pd.read_csv(source, encoding='utf-8')
+    else:
+        df = pd.read_excel(source)
+    return prepare_main_data(df)
+
+
+def _convert_receive_date(date_val):
+    """تحويل تاريخ الاستلام إلى date (نص أو تاريخ أو رقم Excel تسلسلي)"""
+    try:
+        if pd.isna(date_val):
+            return None
+        if isinstance(date_val, pd.Timestamp) or hasattr(date_val, 'date'):
+            return pd.to_datetime(date_val).date()
+        elif isinstance(date_val, (int, float)) and date_val > 40000:
+            excel_epoch = pd.Timestamp('1899-12-30')
+            return (excel_epoch + pd.Timedelta(days=date_val)).date()
+        else:
+            return pd.to_datetime(date_val, errors='coerce').date()
+    except:
+        return None
+
+
+def _convert_ship_date(date_val):
+    """تحويل تاريخ الشحن (DD/MM/YYYY غالباً) إلى date"""
+    try:
+        if pd.isna(date_val):
+            return None
+        if isinstance(date_val, str) and '/' in date_val:
+            parts = date_val.split('/')
+            if len(parts) == 3:
+                return pd.to_datetime(f"{parts[2]}-{parts[1]}-{parts[0]}", errors='coerce').date()
+        return pd.to_datetime(date_val, errors='coerce').date()
+    except:
+        return None
+
+
+def _determine_attempt_type(row):
+    """نوع المحاولة لصف واحد"""
+    try:
+        status = str(row.get('حالة الطلب', '')).strip()
+        if not ('Delivered' in status and 'Confirmed' in status):
+            return 'غير مسلم'
+
+        receive_date = row['تاريخ_استلام_محول']
+        ship_date = row['تاريخ_شحن_محول']
+
+        if pd.isna(receive_date) or pd.isna(ship_date):
+            return 'تاريخ مفقود'
+
+        if receive_date == ship_date:
+            return 'المحاولة الأولى'
+        elif ship_date > receive_date:
+            return 'محاولة إضافية'
+        else:
+            return 'تاريخ شحن قبل الاستلام'
+
+    except:
+        return 'خطأ في المعالجة'
+
+
+def analyze_attempts(df):
+    """تحديد نوع محاولة التسليم وحالة التسليم لكل طلب"""
+    if 'تاريخ استلام الشحنة' in df.columns and 'تاريخ الشحن' in df.columns:
+        if fast_paths_enabled() and _can_vectorize_attempts(df):
+            _analyze_attempts_fast(df)
+        else:
+            _analyze_attempts_legacy(df)
+
+    else:
+        df['نوع_المحاولة'] = 'عمود التاريخ مفقود'
+        df['حالة_مسلم'] = 'غير محدد'
+
+    return df
+
+
+def _analyze_attempts_legacy(df):
+    """تحويل التواريخ وتحديد نوع المحاولة صفاً بصف (التنفيذ الأصلي)"""
+    df['تاريخ_استلام_محول'] = df['تاريخ استلام الشحنة'].apply(_convert_receive_date)
+    df['تاريخ_شحن_محول'] = df['تاريخ الشحن'].apply(_convert_ship_date)
+
+    df['نوع_المحاولة'] = df.apply(_determine_attempt_type, axis=1)
+    df['حالة_مسلم'] = df['حالة الطلب'].astype(str).apply(
+        lambda x: 'مسلم' if 'Delivered' in x and 'Confirmed' in x else 'غير مسلم'
+    )
+
+
+# صيغ النصوص التي يتم تحويلها دفعة واحدة، وأي قيمة أخرى تمر على دوال التحويل الأصلية
+_ISO_UTC_PATTERN = r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{3}Z$'
+_DMY_PATTERN = r'^(\d{1,2})/(\d{1,2})/(\d{4})$'
+
+
+def _can_vectorize_attempts(df):
+    """المسار السريع يتطلب فهرساً فريداً وعمود حالة الطلب وجدولاً غير فارغ"""
+    return len(df) > 0 and df.index.is_unique and df.columns.is_unique and 'حالة الطلب' in df.columns
+
+
+def _dates_to_objects(series, converted, converter):
+    """دمج التواريخ المحولة دفعة واحدة مع تحويل باقي القيم بالدالة الأصلية
+
+    converted: datetime64 بنفس فهرس series، وقيمه NaT للصفوف التي تحتاج التحويل الأصلي.
+    """
+    result = np.asarray(converted.dt.date, dtype=object)
+    fallback = converted.isna().to_numpy()
+    if fallback.any():
+        result[fallback] = [converter(value) for value in series.to_numpy()[fallback]]
+    return result
+
+
+def _fast_receive_dates(series):
+    """تحويل تاريخ الاستلام: أعمدة التاريخ ونصوص ISO بتوقيت UTC دفعة واحدة"""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        result = np.asarray(series.dt.date, dtype=object)
+        result[series.isna().to_numpy()] = None
+        return result
+
+    is_iso = series.astype(str).str.match(_ISO_UTC_PATTERN) & series.map(type).eq(str)
+    converted = pd.to_datetime(series.where(is_iso), format='%Y-%m-%dT%H:%M:%S.%fZ', errors='coerce')
+    return _dates_to_objects(series, converted, _convert_receive_date)
+
+
+def _fast_ship_dates(series):
+    """تحويل تاريخ الشحن: أعمدة التاريخ ونصوص DD/MM/YYYY دفعة واحدة"""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        result = np.asarray(series.dt.date, dtype=object)
+        result[series.isna().to_numpy()] = None
+        return result
+
+    if series.dtype != object:
+        converted = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    else:
+        is_text = series.map(type).eq(str)
+        parts = series.where(is_text).str.extract(_DMY_PATTERN).astype(float)
+        parts.columns = ['day', 'month', 'year']
+        converted = pd.to_datetime(parts[['year', 'month', 'day']], errors='coerce')
+    return _dates_to_objects(series, converted, _convert_ship_date)
+
+
+def _analyze_attempts_fast(df):
+    """تحويل التواريخ وتحديد نوع المحاولة بعمليات على الأعمدة - نفس نتائج التنفيذ الأصلي"""
+    receive_dates = _fast_receive_dates(df['تاريخ استلام الشحنة'])
+    ship_dates = _fast_ship_dates(df['تاريخ الشحن'])
+
+    # عمود بلا أي تاريخ صالح يتحول تلقائياً إلى datetime64 في apply - نترك هذه الحالة للتنفيذ الأصلي
+    receive_series = pd.Series(receive_dates, index=df.index, dtype=object)
+    ship_series = pd.Series(ship_dates, index=df.index, dtype=object)
+    if receive_series.isna().all() or ship_series.isna().all():
+        _analyze_attempts_legacy(df)
+        return
+
+    receive_ns = pd.to_datetime(receive_series, errors='coerce')
+    ship_ns = pd.to_datetime(ship_series, errors='coerce')
+    if (receive_ns.isna() != receive_series.isna()).any() or (ship_ns.isna() != ship_series.isna()).any():
+        _analyze_attempts_legacy(df)
+        return
+
+    status = df['حالة الطلب'].astype(str)
+    delivered = (status.str.contains('Delivered', regex=False) & status.str.contains('Confirmed', regex=False)).to_numpy()
+    missing = (receive_ns.isna() | ship_ns.isna()).to_numpy()
+    same_day = (receive_ns == ship_ns).to_numpy()
+    later = (ship_ns > receive_ns).to_numpy()
+
+    df['تاريخ_استلام_محول'] = receive_series
+    df['تاريخ_شحن_محول'] = ship_series
+    df['نوع_المحاولة'] = np.select(
+        [~delivered, missing, same_day, later],
+        ['غير مسلم', 'تاريخ مفقود', 'المحاولة الأولى', 'محاولة إضافية'],
+        default='تاريخ شحن قبل الاستلام'
+    ).astype(object)
+    df['حالة_مسلم'] = np.where(delivered, 'مسلم', 'غير مسلم').astype(object)
+
+
+def _read_branch_file(source, file_name):
+    """قراءة ملف فرع واحد مع تجربة محركات Excel المناسبة"""
+    if file_name.endswith('.xlsx'):
+        return pd.read_excel(source, engine='openpyxl')
+    if file_name.endswith('.xls'):
+        # محاولة قراءة ملف xls قديم، وإذا فشل xlrd نجرب openpyxl
+        try:
+            return pd.read_excel(source, engine='xlrd')
+        except Exception:
+            return pd.read_excel(source, engine='openpyxl')
+    return pd.read_excel(source)
+
+
+def load_branch_data(branch_files):
+    """قراءة ملفات الفروع ودمجها مع الإبقاء على أحدث فرع لكل رقم تتبع
+
+    يرجع (جدول_الفروع, عدد_الملفات_الناجحة, قائمة_الأخطاء). يقبل مسارات الملفات
+    أو كائنات ملفات مرفوعة لها خاصية name.
+    """
+    all_branch_data = []
+    success_count = 0
+    error_files = []
+
+    if not branch_files:
+        return pd.DataFrame(), success_count, error_files
+
+    for file in branch_files:
+        file_name = str(file)
+        try:
+            if isinstance(file, (str, os.PathLike)):
+                source = os.fspath(file)
+                file_name = os.path.basename(source)
+            elif hasattr(file, '_file_path'):
+                # للتحديث التلقائي
+                source = file._file_path
+                file_name = file.name
+            else:
+                # للرفع اليدوي
+                source = file
+                file_name = file.name if hasattr(file, 'name') else str(file)
+
+            try:
+                df_branch = _read_branch_file(source, file_name)
+            except Exception as read_error:
+                error_files.append(f"{file_name}: {str(read_error)}")
+                continue
+
+            # معالجة البيانات إذا تم قراءة الملف بنجاح
+            if df_branch is not None and not df_branch.empty:
+                branch_number = re.search(r'(\d+)', file_name)
+                branch_id = branch_number.group(1) if branch_number else 'unknown'
+
+                # معالجة أعمدة الملف
+                if len(df_branch.columns) >= 3:
+                    # التعامل مع أعمدة مختلفة
+                    if len(df_branch.columns) >= 4:
+                        df_branch.columns = ['#', 'Reference_ID', 'Branch_Name', 'Branch_Date']
+                        df_branch = df_branch.drop(df_branch.columns[0], axis=1)
+                    else:
+                        df_branch.columns = ['Reference_ID', 'Branch_Name', 'Branch_Date']
+
+                    df_branch['Branch_ID'] = branch_id
+                    df_branch = df_branch.dropna(subset=['Reference_ID'])
+
+                    # تنظيف البيانات
+                    df_branch['Reference_ID'] = df_branch['Reference_ID'].astype(str)
+                    df_branch['Branch_Date'] = pd.to_datetime(df_branch['Branch_Date'], errors='coerce')
+
+                    all_branch_data.append(df_branch)
+                    success_count += 1
+
+        except Exception as e:
+            error_files.append(f"{file_name}: خطأ عام - {str(e)}")
+
+    # دمج البيانات
+    if all_branch_data:
+        try:
+            combined_branches = pd.concat(all_branch_data, ignore_index=True)
+            combined_branches = combined_branches.sort_values(['Reference_ID', 'Branch_Date'], ascending=[True, False])
+            latest_branches = combined_branches.groupby('Reference_ID').first().reset_index()
+            return latest_branches, success_count, error_files
+        except Exception as e:
+            logger.exception("خطأ في دمج بيانات الفروع")
+            error_files.append(f"خطأ في دمج بيانات الفروع: {str(e)}")
+
+    return pd.DataFrame(), success_count, error_files
+
+
+def merge_with_branches(main_df, branch_df):
+    """ربط الطلبات بالفروع عبر رقم التتبع - الطلبات غير المرتبطة تُنسب للمستودع WH"""
+    if branch_df.empty:
+        main_df['فرع_الشحنة'] = 'WH'
+        main_df['تاريخ_الفرع'] = None
+        return main_df
+
+    main_df['رقم التتبع_str'] = main_df['رقم التتبع'].astype(str)
+    branch_df['Reference_ID_str'] = branch_df['Reference_ID'].astype(str)
+
+    merged_df = main_df.merge(
+        branch_df[['Reference_ID_str', 'Branch_Name', 'Branch_Date', 'Branch_ID']],
+        left_on='رقم التتبع_str',
+        right_on='Reference_ID_str',
+        how='left'
+    )
+
+    merged_df['فرع_الشحنة'] = merged_df['Branch_Name'].fillna('WH')
+    merged_df['تاريخ_الفرع'] = merged_df['Branch_Date']
+
+    columns_to_drop = ['رقم التتبع_str', 'Reference_ID_str', 'Branch_Name', 'Branch_Date', 'Branch_ID']
+    merged_df = merged_df.drop([col for col in columns_to_drop if col in merged_df.columns], axis=1)
+
+    return merged_df
+
+
+def create_sample_data():
+    """إنشاء بيانات تجريبية للعرض عند عدم وجود ملف"""
+    start = (datetime.now() - timedelta(days=30)).date()
+    df = generate_niceone(200, seed=42, start=start, serial_rate=0, include_index=False)
+    df['فرع_الشحنة'] = np.random.default_rng(42).choice(['WH', 'Aqiq', 'Labn', 'Naseem', 'Tabuk'], size=len(df))
+    return df
+
+
+def to_canonical(df, sla_df=None):
+    """الجدول الموحد (shipping_core.schema) من ناتج analyze_attempts (يتم التحليل على نسخة إذا لم يكن محللاً)
+
+    لا يوجد SLA، و FDS = التسليم من المحاولة الأولى من الشحنات المستلمة والمشحونة في نفس اليوم.
+    """
+    if 'نوع_المحاولة' not in df.columns:
+        df = analyze_attempts(df.copy())
+
+    # الحالات قليلة التكرار - فحص النصوص مرة واحدة لكل حالة مختلفة
+    codes, statuses = pd.factorize(source_column(df, 'حالة الطلب', '').astype(str))
+    statuses = pd.Series(statuses)
+    delivered_like = statuses.str.contains('Delivered', regex=False) | statuses.str.contains('confirmed', regex=False)
+    pending_like = ~delivered_like & (statuses.str.contains('Progress', regex=False)
+                                      | statuses.str.contains('pending', regex=False))
+    failed_like = ~delivered_like & ~pending_like & statuses.str.contains('failed', case=False, regex=False)
+    pending = pending_like.to_numpy()[codes]
+    failed = failed_like.to_numpy()[codes]
+    delivered = (source_column(df, 'حالة_مسلم', '') == 'مسلم').to_numpy()
+
+    receive_dates = pd.to_datetime(source_column(df, 'تاريخ_استلام_محول', pd.NaT), errors='coerce')
+    ship_dates = pd.to_datetime(source_column(df, 'تاريخ_شحن_محول', pd.NaT), errors='coerce')
+    same_day = (receive_dates == ship_dates) & receive_dates.notna() & ship_dates.notna()
+
+    return conform(pd.DataFrame({
+        'رقم_الشحنة': source_column(df, 'رقم التتبع'),
+        'المدينة_الوجهة': source_column(df, 'موقع العميل'),
+        'الفرع': source_column(df, 'فرع_الشحنة'),
+        'تاريخ_الأساس': ship_dates,
+        'تاريخ_التسليم': ship_dates.where(delivered),
+        'حالة_التسليم': np.select([delivered, pending, failed], [DELIVERED, PENDING, RETURNED], default=OTHER),
+        'أيام_المحاولة_الأولى': (ship_dates - receive_dates).dt.days,
+        'أساس_FDS': same_day,
+        'FDS': source_column(df, 'نوع_المحاولة', '') == 'المحاولة الأولى',
+    }, index=df.index), 'niceone')
@@ -0,0 +1,190 @@
+# shipping_core/pipeline.py - خطوات المعالجة الكاملة لكل شركة شحن (نفس خطوات لوحات التحكم)
+import logging
+import os
+
+import pandas as pd
+
+from shipping_core import aramex, niceone, sla, smsa, summary
+from shipping_core.adapters import to_canonical
+from shipping_core.artifacts import make_run_name, read_manifest, write_artifacts
+from shipping_core.cities import aliases_version
+from shipping_core.history import append_history, get_history_dir
+from shipping_core.instrumentation import finish_run, span, start_run, timed_call
+from shipping_core.snapshots import get_snapshot_keep, keep_snapshot
+from shipping_core.warehouse import get_warehouse_path, store_history
+
+logger = logging.getLogger(__name__)
+
+CARRIERS = ('aramex', 'smsa', 'niceone')
+
+# أسماء الأوراق التي تحتوي عادة على بيانات الشحنات في ملفات Samsa
+SMSA_SHEET_KEYWORDS = ['data', 'detail', 'بيانات', 'تفاصيل', 'shipment', 'شحنات']
+
+
+def read_sla_file(path, flexible=False):
+    """قراءة ملف SLA ومعالجته - ملفات Samsa تستخدم الاكتشاف المرن للأعمدة"""
+    with span('read_sla_file', 'ingestion') as s:
+        df = pd.read_excel(path)
+        s.set_output(df)
+    return timed_call('enrichment', sla.process_sla_data, df, flexible=flexible)
+
+
+def read_aramex_file(path):
+    """قراءة ملف Aramex من ورقة Detailed Data إن وجدت"""
+    if str(path).endswith('.csv'):
+        df = pd.read_csv(path)
+    else:
+        excel_file = pd.ExcelFile(path)
+        sheet_name = 'Detailed Data' if 'Detailed Data' in excel_file.sheet_names else excel_file.sheet_names[0]
+        df = pd.read_excel(excel_file, sheet_name=sheet_name)
+    return df.dropna(how='all')
+
+
+def read_smsa_file(path):
+    """قراءة ملف Samsa واختيار ورقة البيانات حسب اسمها"""
+    if str(path).endswith('.csv'):
+        return pd.read_csv(path)
+
+    excel_file = pd.ExcelFile(path)
+    target_sheet = 0
+    for sheet in excel_file.sheet_names:
+        if any(keyword in sheet.lower() for keyword in SMSA_SHEET_KEYWORDS):
+            target_sheet = sheet
+            break
+    return pd.read_excel(excel_file, sheet_name=target_sheet)
+
+
+def run_aramex(path, sla_df=None):
+    """معالجة ملف Aramex وحساب الجداول الأسبوعية والمدن والشحنات المتأخرة"""
+    raw = timed_call('ingestion', read_aramex_file, path)
+    processed = timed_call('enrichment', aramex.process_aramex_data, raw)
+
+    df_with_sla = timed_call('enrichment', aramex.add_sla_and_fds_columns, processed, sla_df)
+    if 'للاستثناء' in df_with_sla.columns:
+        df_with_sla = df_with_sla[~df_with_sla['للاستثناء']]
+
+    return {
+        'processed': processed,
+        'weekly': timed_call('analysis', aramex.analyze_weekly_trends_enhanced, df_with_sla),
+        'cities': timed_call('analysis', aramex.analyze_cities_performance_enhanced, df_with_sla),
+        'delayed': timed_call('analysis', aramex.analyze_delayed_shipments, df_with_sla, sla_df),
+        'summary': timed_call('output', summary.aramex_summary, df_with_sla),
+    }
+
+
+def run_smsa(path, sla_df=None):
+    """معالجة ملف Samsa وحساب الجداول الأسبوعية والمدن والشحنات المتأخرة عن SLA"""
+    raw = timed_call('ingestion', read_smsa_file, path)
+    processed = timed_call('enrichment', smsa.process_samsa_data, raw, sla_df)
+
+    delayed = pd.DataFrame()
+    if 'حالة_SLA_محاولة_أولى' in processed.columns:
+        df_active = processed[~processed.get('مستثنى', False)]
+        delayed = df_active[df_active['حالة_SLA_محاولة_أولى'] == 'بعد SLA']
+
+    return {
+        'processed': processed,
+        'weekly': timed_call('analysis', smsa.calculate_weekly_metrics, processed),
+        'cities': timed_call('analysis', smsa.analyze_cities_performance_samsa, processed),
+        'performance': timed_call('analysis', smsa.calculate_performance_metrics, processed, sla_df),
+        'delayed': delayed,
+        'summary': timed_call('output', summary.smsa_summary, processed),
+    }
+
+
+def run_niceone(path, branch_files=None):
+    """معالجة ملف NiceOne مع ملفات الفروع وتحليل المحاولات"""
+    df = timed_call('ingestion', niceone.read_main_file, path)
+
+    branch_df, _, error_files = timed_call('ingestion', niceone.load_branch_data, branch_files or [])
+    for error in error_files:
+        logger.warning("ملف فرع: %s", error)
+    df = timed_call('enrichment', niceone.merge_with_branches, df, branch_df)
+
+    processed = timed_call('enrichment', niceone.analyze_attempts, df)
+    delayed = processed[processed['نوع_المحاولة'] == 'محاولة إضافية']
+
+    return {
+        'processed': processed,
+        'delayed': delayed,
+        'summary': timed_call('output', summary.niceone_summary, processed),
+    }
+
+
+PIPELINES = {
+    'aramex': run_aramex,
+    'smsa': run_smsa,
+    'niceone': run_niceone,
+}
+
+
+def process_file(carrier, path, output_dir, reference=None, reference_name=None, publish=True):
+    """تشغيل خطوات شركة الشحن على ملف واحد وكتابة النتائج
+
+    reference: جدول SLA لـ Aramex و Samsa، أو قائمة ملفات الفروع لـ NiceOne.
+    يرجع مسار مجلد النتائج. مناسبة للتشغيل داخل عملية منفصلة.
+    ملخص المؤشرات يُحفظ في manifest ويُكتب في مجلد الملخصات للصفحة الرئيسية (publish=False يترك
+    الكتابة للمستدعي بـ publish_run_summary حتى لا تتسابق العمليات المتوازية)، ونسخة من البيانات في مجلد
+    النسخ (SHIPPING_SNAPSHOTS_DIR)، والشحنات في المخزن التاريخي (SHIPPING_WAREHOUSE) والسجل
+    العمودي (SHIPPING_HISTORY_DIR) إذا كانا محددين.
+    """
+    source = os.path.splitext(os.path.basename(path))[0]
+    run_name = make_run_name(path)
+    with span(f"{carrier}:{source}", 'pipeline'):
+        tables = PIPELINES[carrier](path, reference)
+        run_summary = tables.pop('summary')
+        if publish:
+            summary.write_summary(run_summary, source=source)
+        if get_snapshot_keep() or get_warehouse_path() or get_history_dir():
+            sla_df = reference if carrier != 'niceone' else None
+            frame = to_canonical(carrier, tables['processed'], sla_df)
+            keep_snapshot(carrier, frame, source)
+            store_history(carrier, frame, source)
+            append_history(carrier, frame)
+
+        # إرفاق جدول SLA حتى تتمكن لوحة التحكم من استعادته مع البيانات
+        if carrier != 'niceone' and reference is not None:
+            tables['sla'] = reference
+
+        metadata = {
+            'source_file': os.path.abspath(path),
+            'reference_file': reference_name,
+            'rows': int(len(tables['processed'])),
+            'aliases_version': aliases_version(),
+            'summary': run_summary,
+        }
+        with span('write_artifacts', 'output', rows_in=metadata['rows']):
+            return write_artifacts(output_dir, carrier, run_name, tables, metadata)
+
+
+def publish_run_summary(run_dir):
+    """كتابة ملخص تشغيل محفوظ للصفحة الرئيسية - يرجع المسار أو None إذا لم يحتو manifest على ملخص"""
+    manifest = read_manifest(run_dir)
+    if not manifest or not manifest.get('summary'):
+        return None
+    source = os.path.splitext(os.path.basename(manifest.get('source_file') or ''))[0] or manifest['run_name']
+    return summary.write_summary(manifest['summary'], source=source)
+
+
+def refresh_city_aliases(carrier, run, tables):
+    """إعادة تطبيق SLA على جداول تشغيل محفوظ إذا تغير ملف أسماء المدن البديلة بعد كتابته
+
+    جدول Samsa المعالج يحتوي أيام SLA لكل شحنة (جدول Aramex يُطابق مع SLA عند العرض).
+    """
+    if carrier != 'smsa' or tables.get('processed') is None or tables.get('sla') is None:
+        return tables
+    if run.get('aliases_version') == aliases_version():
+        return tables
+    logger.info("إعادة مطابقة مدن SLA لتشغيل %s بعد تغير الأسماء البديلة", run.get('run_name'))
+    return dict(tables, processed=timed_call('enrichment', smsa.update_sla_calculations,
+                                             tables['processed'], tables['sla']))
+
+
+def process_file_traced(carrier, path, output_dir, reference=None, reference_name=None, publish=True):
+    """process_file مع تسجيل المراحل داخل العملية - يرجع (مسار_النتائج, سجلات_المراحل)"""
+    run = start_run(f"{carrier}:{os.path.basename(path)}")
+    try:
+        run_dir = process_file(carrier, path, output_dir, reference, reference_name, publish)
+    finally:
+        finish_run(run)
+    return run_dir, run.records()
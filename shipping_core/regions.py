@@ -0,0 +1,205 @@
+# shipping_core/regions.py - استنتاج المنطقة الإدارية من مدينة أو عنوان المستلم بقاموس أماكن
+"""
+قاموس أماكن (REGION_PLACES): كل منطقة إدارية مع مدنها ومحافظاتها بالعربي والإنجليزي (وكتابات
+المدن البديلة من shipping_core.cities). يُضاف إليه ملف JSON اختياري (SHIPPING_REGION_GAZETTEER)
+بنفس الشكل {المنطقة: [أماكن]} للأحياء أو المدن غير الموجودة.
+
+كل اسم مكان يُحفظ في جدول hash بمفتاح كلماته الموحدة متصلة (مع وبدون "Al"/"ال")، والنص يُقسم
+إلى كلمات وتُبحث كل كلمة وكل كلمتين وثلاث متتالية في الجدول. إذا ذُكر أكثر من مكان يُعتمد آخرها
+في النص (المدينة تأتي عادة بعد الشارع والحي: "طريق مكة، الرياض")، والأطول عند التساوي.
+
+النصوص تُعالج مرة واحدة لكل نص مختلف، والنتائج تبقى في ذاكرة العملية حتى يتغير القاموس.
+
+    resolve_regions(df['عنوان_المستلم'])    # المنطقة لكل صف أو None
+    infer_regions(df)                       # عمود Region ثم المدينة ثم العنوان ثم "غير محدد"
+"""
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from shipping_core.cities import BUILTIN_ALIASES, strip_article
+from shipping_core.text_index import tokenize_many, tokenize
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_ENV = 'SHIPPING_REGION_GAZETTEER'
+
+UNKNOWN_REGION = 'غير محدد'
+
+# عدد النصوص المختلفة المحفوظة نتائجها (تُمسح كلها عند الامتلاء)
+CACHE_SIZE = 500_000
+
+# المنطقة الإدارية -> المدن والمحافظات (كتابات المدن في BUILTIN_ALIASES تُضاف تلقائياً)
+REGION_PLACES = {
+    'الرياض': ['Riyadh', 'منطقة الرياض', 'Al Kharj', 'Al Majmaah', 'الدوادمي', 'Dawadmi', 'الزلفي', 'Zulfi',
+               'عفيف', 'Afif', 'الدرعية', 'Diriyah', 'وادي الدواسر', 'Wadi Ad Dawasir', 'شقراء', 'Shaqra',
+               'القويعية', 'Al Quwayiyah', 'السليل', 'As Sulayyil', 'حوطة بني تميم', 'Hawtat Bani Tamim',
+               'الأفلاج', 'Al Aflaj', 'المزاحمية', 'Muzahmiyah', 'ثادق', 'Thadiq', 'حريملاء', 'Huraymila',
+               'ضرما', 'Dhurma'],
+    'مكة المكرمة': ['Makkah', 'منطقة مكة المكرمة', 'Jeddah', 'Taif', 'Al Qunfudhah', 'Rabigh', 'الليث', 'Al Lith',
+                    'الجموم', 'Al Jumum', 'خليص', 'Khulais', 'تربة', 'Turabah', 'رنية', 'Ranyah'],
+    'المدينة المنورة': ['Madinah', 'منطقة المدينة المنورة', 'Yanbu', 'Al Ula', 'خيبر', 'Khaybar', 'الحناكية',
+                        'Al Hinakiyah', 'مهد الذهب', 'Mahd Al Dhahab'],
+    'القصيم': ['Qassim', 'منطقة القصيم', 'Buraidah', 'Unaizah', 'الرس', 'Ar Rass', 'البكيرية', 'Al Bukayriyah',
+               'المذنب', 'Al Mithnab', 'البدائع', 'Al Badaya', 'رياض الخبراء', 'Riyadh Al Khabra'],
+    'الشرقية': ['المنطقة الشرقية', 'Eastern Province', 'Ash Sharqiyah', 'Dammam', 'Khobar', 'Dhahran', 'Al Ahsa',
+                'Hofuf', 'المبرز', 'Mubarraz', 'Jubail', 'Qatif', 'Hafar Al Batin', 'الخفجي', 'Khafji',
+                'رأس تنورة', 'Ras Tanura', 'بقيق', 'Abqaiq', 'سيهات', 'Saihat', 'صفوى', 'Safwa', 'تاروت', 'Tarut',
+                'النعيرية', 'Al Nairyah', 'قرية العليا', 'Qaryat Al Ulya'],
+    'عسير': ['Asir', 'Aseer', 'منطقة عسير', 'Abha', 'Khamis Mushait', 'Bisha', 'النماص', 'Al Namas', 'محايل',
+             'Muhayil', 'سراة عبيدة', 'Sarat Abidah', 'أحد رفيدة', 'Ahad Rafidah', 'رجال ألمع', 'Rijal Alma',
+             'تثليث', 'Tathleeth', 'ظهران الجنوب', 'Dhahran Al Janub'],
+    'تبوك': ['Tabuk', 'منطقة تبوك', 'ضباء', 'Duba', 'الوجه', 'Al Wajh', 'أملج', 'Umluj', 'تيماء', 'Tayma',
+             'حقل', 'Haql'],
+    'حائل': ['Hail', 'منطقة حائل', 'بقعاء', 'Baqaa', 'الغزالة', 'Al Ghazalah', 'الشنان', 'Ash Shinan'],
+    'الحدود الشمالية': ['Northern Borders', 'Arar', 'رفحاء', 'Rafha', 'طريف', 'Turaif', 'العويقيلة',
+                        'Al Uwayqilah'],
+    'جازان': ['Jazan', 'منطقة جازان', 'صبيا', 'Sabya', 'أبو عريش', 'Abu Arish', 'صامطة', 'Samtah', 'بيش', 'Baish',
+              'فرسان', 'Farasan', 'أحد المسارحة', 'Ahad Al Masarihah'],
+    'نجران': ['Najran', 'منطقة نجران', 'شرورة', 'Sharurah', 'حبونا', 'Hubuna', 'بدر الجنوب', 'Badr Al Janub'],
+    'الباحة': ['Al Baha', 'منطقة الباحة', 'بلجرشي', 'Baljurashi', 'المندق', 'Al Mandaq', 'المخواة', 'Al Makhwah'],
+    'الجوف': ['الجوف', 'Al Jouf', 'Al Jawf', 'منطقة الجوف', 'Sakaka', 'دومة الجندل', 'Dumat Al Jandal', 'القريات',
+              'Qurayyat', 'طبرجل', 'Tabarjal'],
+}
+
+# أسماء لا تصلح كمكان داخل عنوان ("المدينة الصناعية" ليست المدينة المنورة) - تُطابق إذا كانت النص كله فقط
+_AMBIGUOUS = {'المدينة'}
+
+_state = {'version': None, 'gazetteer': None, 'cache': {}}
+
+
+def get_gazetteer_path():
+    return os.environ.get(GAZETTEER_ENV, '')
+
+
+def load_gazetteer(path=None):
+    """الأماكن الإضافية من ملف JSON {المنطقة: [أماكن]} - قاموس فارغ إذا لم يوجد الملف"""
+    path = get_gazetteer_path() if path is None else path
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return {str(region): [str(place) for place in places] for region, places in json.load(f).items()}
+    except (OSError, ValueError, AttributeError, TypeError) as e:
+        logger.warning("تجاهل ملف قاموس المناطق %s: %s", path, e)
+        return {}
+
+
+def build_gazetteer(extra=None):
+    """جداول hash لأسماء الأماكن: keys (كلمات الاسم الموحدة متصلة -> المنطقة)، first_words (أول كلمة
+    في الأسماء متعددة الكلمات)، max_words، whole (الأسماء التي تُطابق كنص كامل فقط)"""
+    places = {region: list(names) for region, names in REGION_PLACES.items()}
+    for region, names in (extra or {}).items():
+        places.setdefault(region, []).extend(names)
+
+    keys, whole, first_words, max_words = {}, {}, set(), 1
+    for region, names in places.items():
+        names = [region, *names]
+        names += [alias for name in names for alias in BUILTIN_ALIASES.get(name, [])]
+        for name in names:
+            words = tokenize(name)
+            if not words:
+                continue
+            if name in _AMBIGUOUS:
+                whole.setdefault(''.join(words), region)
+                continue
+            if len(words) > 1:
+                first_words.add(words[0])
+                max_words = max(max_words, len(words))
+            key = strip_article(''.join(words))
+            for variant in (''.join(words), key, f'al{key}', f'ال{key}'):
+                keys.setdefault(variant, region)
+    return {'keys': keys, 'whole': whole, 'first_words': first_words, 'max_words': max_words}
+
+
+def _gazetteer():
+    """القاموس الحالي - يُعاد بناؤه (وتُمسح النتائج المحفوظة) عند تغير ملف الأماكن الإضافية"""
+    path = get_gazetteer_path()
+    version = (path, os.path.getmtime(path) if path and os.path.exists(path) else None)
+    if _state['version'] != version:
+        _state.update(version=version, gazetteer=build_gazetteer(load_gazetteer(path)), cache={})
+    return _state
+
+
+def _scan(texts, gazetteer):
+    """المنطقة لكل نص (None إذا لم يُذكر مكان معروف) - كل النصوص تُقسم كسلسلة واحدة"""
+    tokens, lengths = tokenize_many(texts)
+    owner = np.repeat(np.arange(len(texts)), lengths)
+    # الكلمات تتكرر كثيراً بين العناوين فيُبحث عن كل كلمة مختلفة مرة واحدة
+    codes, vocabulary = pd.factorize(tokens)
+    vocabulary = pd.Series(vocabulary, dtype=object)
+    word_regions = vocabulary.map(gazetteer['keys']).to_numpy()
+
+    starts = np.flatnonzero(pd.notna(word_regions)[codes])
+    hits = [pd.DataFrame({'owner': owner[starts], 'end': starts + 1, 'words': 1,
+                          'region': word_regions[codes[starts]]})]
+
+    # الأسماء متعددة الكلمات تُبحث فقط من مواضع كلماتها الأولى
+    candidates = np.flatnonzero(vocabulary.isin(gazetteer['first_words']).to_numpy()[codes])
+    for words in range(2, gazetteer['max_words'] + 1):
+        candidates = candidates[candidates + words <= len(tokens)]
+        candidates = candidates[owner[candidates] == owner[candidates + words - 1]]
+        grams = tokens[candidates]
+        for offset in range(1, words):
+            grams = grams + tokens[candidates + offset]
+        regions = pd.Series(grams, dtype=object).map(gazetteer['keys'])
+        found = regions.notna().to_numpy()
+        hits.append(pd.DataFrame({'owner': owner[candidates[found]], 'end': candidates[found] + words,
+                                  'words': words, 'region': regions.to_numpy()[found]}))
+
+    result = np.full(len(texts), None, dtype=object)
+    hits = pd.concat(hits, ignore_index=True)
+    if len(hits):
+        # آخر مكان في النص، والأطول عند نفس النهاية
+        last = hits.sort_values(['owner', 'end', 'words']).drop_duplicates('owner', keep='last')
+        result[last['owner'].to_numpy()] = last['region'].to_numpy()
+
+    # نص من كلمة واحدة غامضة ("المدينة" كاسم مدينة)
+    single = np.flatnonzero((lengths == 1) & pd.isna(result))
+    if len(single) and gazetteer['whole']:
+        positions = np.concatenate(([0], np.cumsum(lengths)[:-1]))[single]
+        result[single] = pd.Series(tokens[positions], dtype=object).map(gazetteer['whole']).to_numpy()
+        result[pd.isna(result)] = None
+    return result
+
+
+def resolve_regions(values):
+    """المنطقة لكل قيمة (اسم مدينة أو عنوان) - None إذا لم يُذكر مكان معروف
+
+    كل نص مختلف يُبحث مرة واحدة، والنصوص التي سبق بحثها تُؤخذ من ذاكرة العملية.
+    """
+    values = pd.Series(values)
+    state = _gazetteer()
+    cache = state['cache']
+    codes, uniques = pd.factorize(values)
+    uniques = [str(text) for text in uniques]
+
+    unique_regions = np.array([cache.get(text, '') for text in uniques], dtype=object)
+    new = np.flatnonzero(unique_regions == '')
+    if len(new):
+        texts = [uniques[i] for i in new]
+        unique_regions[new] = _scan(texts, state['gazetteer'])
+        if len(cache) + len(texts) > CACHE_SIZE:
+            cache.clear()
+        cache.update(zip(texts, unique_regions[new]))
+
+    regions = np.append(unique_regions, None)[codes]
+    return pd.Series(regions, index=values.index, dtype=object)
+
+
+def infer_regions(frame, sources=('المدينة_الوجهة', 'عنوان_المستلم'), given='المنطقة'):
+    """عمود المنطقة: قيمة given من الملف إن وجدت، وإلا أول منطقة معروفة من أعمدة sources بالترتيب"""
+    if given in frame.columns:
+        regions = frame[given].astype(object)
+        regions = regions.where(regions.notna() & (regions.astype(str).str.strip() != ''), None)
+    else:
+        regions = pd.Series(None, index=frame.index, dtype=object)
+    for col in sources:
+        missing = regions.isna().to_numpy()
+        if col not in frame.columns or not missing.any():
+            continue
+        regions[missing] = resolve_regions(frame[col][missing]).to_numpy()
+    return regions.fillna(UNKNOWN_REGION)
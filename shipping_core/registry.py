@@ -0,0 +1,421 @@
+# shipping_core/registry.py - سجل مشترك للعملية للجداول المعالجة بين جلسات المستخدمين
+"""
+الجداول المعالجة (بعد process_*_data) لا تتغير بعد حفظها، لذلك تُحفظ مرة واحدة في
+DatasetRegistry مفهرسة ببصمة المحتوى ونسخة SLA المستخدمة في المعالجة، وتحتفظ كل جلسة
+بـ DatasetHandle صغير بدلاً من نسخة كاملة. عشرة مستخدمين يفتحون نفس ملف Aramex يكلفون
+نسخة واحدة في الذاكرة.
+
+كل (جلسة، اسم) يرتبط بمجموعة handles عبر bind، والجدول يُحذف عند فك ارتباط آخر جلسة به.
+
+    handle = registry.share(df, carrier='aramex')
+    registry.bind(session_id, 'aramex_saved_data', [handle])
+    df = registry.resolve(handle)
+    registry.bind(session_id, 'aramex_saved_data', [])   # تحرير
+
+الجداول غير المستخدمة لمدة SHIPPING_IDLE_SPILL_SECONDS (الافتراضي 600، و 0 يعطل النقل)
+تُنقل إلى القرص بـ spill_idle من خيط في الخلفية (كل IDLE_CHECK_SECONDS على الأكثر وليس مع كل
+استخدام للبيانات) كملفات مضغوطة وتُستعاد تلقائياً عند resolve، مع تسجيل زمن
+النقل والاستعادة في events. و enforce ينقل الأقدم استخداماً عند تجاوز حد ذاكرة الجلسة أو العملية
+(shipping_core.memory)، لأن الجداول المحفوظة في الجلسات مراجع للسجل وليست ضمن حجمها.
+
+كل جدول جديد يُفهرس مرة واحدة (shipping_core.lookup) بأرقام الشحنات والطلبات والهواتف والمراجع
+وأسماء وعناوين المستلمين، و search يبحث في كل الجداول المشتركة بدون المرور على صفوفها:
+
+    registry.search('0551234567')     # [(handle, الصفوف المطابقة)]
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+import pandas as pd
+
+from shipping_core.cache import fingerprint
+from shipping_core.instrumentation import span
+from shipping_core.lookup import build_index
+from shipping_core.memory import SpilledFrame, deep_memory_bytes, format_bytes
+
+logger = logging.getLogger(__name__)
+
+IDLE_SPILL_ENV = 'SHIPPING_IDLE_SPILL_SECONDS'
+DEFAULT_IDLE_SPILL_SECONDS = 600
+# أقصى مدة بين فحصين للجداول غير المستخدمة في الخلفية
+IDLE_CHECK_SECONDS = 60
+
+# عدد عمليات النقل والاستعادة المحفوظة للعرض
+MAX_EVENTS = 50
+
+_EVENT_LABELS = {'spill': 'نقل إلى القرص', 'reload': 'استعادة'}
+
+
+def get_idle_spill_seconds():
+    """مدة عدم الاستخدام قبل نقل الجدول إلى القرص - None إذا كان النقل معطلاً"""
+    try:
+        seconds = float(os.environ.get(IDLE_SPILL_ENV, DEFAULT_IDLE_SPILL_SECONDS))
+    except ValueError:
+        logger.warning("قيمة غير صالحة لـ %s، استخدام %s ثانية", IDLE_SPILL_ENV, DEFAULT_IDLE_SPILL_SECONDS)
+        seconds = DEFAULT_IDLE_SPILL_SECONDS
+    return seconds if seconds > 0 else None
+
+
+class DatasetHandle:
+    """مرجع صغير لجدول مشترك - يُحفظ في session state بدلاً من الجدول"""
+
+    __slots__ = ('content_hash', 'sla_version', 'carrier', 'rows', 'nbytes')
+
+    def __init__(self, content_hash, sla_version, carrier, rows, nbytes):
+        self.content_hash = content_hash
+        self.sla_version = sla_version
+        self.carrier = carrier
+        self.rows = rows
+        self.nbytes = nbytes
+
+    @property
+    def key(self):
+        return (self.content_hash, self.sla_version)
+
+    def __eq__(self, other):
+        return isinstance(other, DatasetHandle) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"DatasetHandle({self.carrier}, {self.content_hash[:8]}, sla={self.sla_version}, rows={self.rows})"
+
+
+class _SharedDataset:
+    __slots__ = ('handle', 'frame', 'index', 'spilled', 'last_access', 'pending')
+
+    def __init__(self, handle, frame):
+        self.handle = handle
+        self.frame = frame
+        # ShipmentIndex - يبقى في الذاكرة حتى إذا نُقل الجدول إلى القرص
+        self.index = None
+        # SpilledFrame عندما يكون الجدول على القرص (frame = None)
+        self.spilled = None
+        self.last_access = time.monotonic()
+        # جدول أضيف بـ share ولم يُربط بعد - لا يُحذف قبل bind
+        self.pending = True
+
+
+class DatasetRegistry:
+    """الجداول المشتركة مع عدد المراجع لكل جدول"""
+
+    def __init__(self):
+        self._datasets = {}     # key -> _SharedDataset
+        self._bindings = {}     # (owner, name) -> [handles]
+        self._lock = threading.RLock()
+        self.stats = {'shared': 0, 'deduplicated': 0, 'released': 0, 'saved_bytes': 0,
+                      'spills': 0, 'reloads': 0, 'spill_ms': 0.0, 'reload_ms': 0.0}
+        self.events = deque(maxlen=MAX_EVENTS)
+        self._stop = threading.Event()
+        self._spiller = None
+
+    def share(self, frame, carrier=None, sla_version=None, index=True):
+        """إضافة جدول للسجل أو إرجاع مرجع النسخة الموجودة بنفس المحتوى
+
+        index=False للجداول المشتقة (المتأخرة، المدن ...) حتى لا تتكرر الشحنات في نتائج البحث.
+        """
+        content_hash = fingerprint(frame)
+        with self._lock:
+            dataset = self._datasets.get((content_hash, sla_version))
+            if dataset is not None:
+                self.stats['deduplicated'] += 1
+                if dataset.frame is not frame:
+                    self.stats['saved_bytes'] += dataset.handle.nbytes
+                return dataset.handle
+
+            handle = DatasetHandle(content_hash, sla_version, carrier, len(frame), deep_memory_bytes(frame))
+            self._datasets[handle.key] = dataset = _SharedDataset(handle, frame)
+            self.stats['shared'] += 1
+            logger.info("جدول مشترك جديد %s (%s)", handle, format_bytes(handle.nbytes))
+
+        if index:
+            # الفهرسة خارج القفل حتى لا تنتظر الجلسات الأخرى
+            with span(f"index:{carrier}", 'ingestion', rows_in=len(frame)):
+                dataset.index = build_index(frame)
+        return handle
+
+    def bind(self, owner, name, handles):
+        """ربط (جلسة، اسم) بمجموعة handles بدلاً من السابقة وحذف الجداول بدون مراجع"""
+        with self._lock:
+            if handles:
+                self._bindings[(owner, name)] = list(handles)
+                for handle in handles:
+                    dataset = self._datasets.get(handle.key)
+                    if dataset is not None:
+                        dataset.pending = False
+            else:
+                self._bindings.pop((owner, name), None)
+            self._collect()
+
+    def resolve(self, handle):
+        """الجدول المشترك (نسخة سطحية - للقراءة فقط) أو None إذا تم تحريره
+
+        الجدول المنقول إلى القرص يُستعاد أولاً.
+        """
+        with self._lock:
+            dataset = self._datasets.get(handle.key)
+            if dataset is None:
+                return None
+            dataset.last_access = time.monotonic()
+            frame, spilled = dataset.frame, dataset.spilled
+
+        if frame is None:
+            frame = self._reload(dataset, spilled)
+        # النسخة السطحية تمنع تعديل الأعمدة أو أسمائها في الجدول المشترك دون نسخ البيانات
+        return frame.copy(deep=False)
+
+    def search(self, value, kinds=None):
+        """الصفوف المطابقة لرقم شحنة أو طلب أو هاتف أو مرجع أو كلمات الاسم والعنوان في كل الجداول
+        المفهرسة - [(handle, rows)]
+
+        الجداول بنفس المحتوى (بنسخ SLA مختلفة) تظهر مرة واحدة، و kinds يحدد أنواع المفاتيح
+        (shipping_core.lookup.KEY_LABELS).
+        """
+        with self._lock:
+            datasets = [dataset for dataset in self._datasets.values() if dataset.index is not None]
+        results = []
+        searched = set()
+        for dataset in datasets:
+            if dataset.handle.content_hash in searched:
+                continue
+            searched.add(dataset.handle.content_hash)
+            positions = dataset.index.lookup(value, kinds)
+            if not len(positions):
+                continue
+            frame = self.resolve(dataset.handle)
+            if frame is not None:
+                results.append((dataset.handle, frame.iloc[positions]))
+        return results
+
+    def indexed(self):
+        """مراجع الجداول المفهرسة (بدون تكرار المحتوى)"""
+        with self._lock:
+            handles = {dataset.handle.content_hash: dataset.handle for dataset in self._datasets.values()
+                       if dataset.index is not None}
+        return list(handles.values())
+
+    def spill_idle(self, idle_seconds=None, directory=None):
+        """نقل الجداول غير المستخدمة منذ idle_seconds إلى القرص - يرجع عدد الجداول المنقولة"""
+        idle_seconds = idle_seconds if idle_seconds is not None else get_idle_spill_seconds()
+        if idle_seconds is None:
+            return 0
+
+        now = time.monotonic()
+        with self._lock:
+            candidates = [(dataset, dataset.last_access) for dataset in self._datasets.values()
+                          if dataset.frame is not None and now - dataset.last_access > idle_seconds]
+        if not candidates:
+            return 0
+
+        with span('spill_idle', 'output', rows_in=sum(dataset.handle.rows for dataset, _ in candidates)):
+            return sum(self._spill(dataset, last_access, directory) for dataset, last_access in candidates)
+
+    def start_idle_spiller(self, interval=None):
+        """بدء خيط في الخلفية يستدعي spill_idle كل interval ثانية - يرجع True إذا بدأ خيط جديد"""
+        idle_seconds = get_idle_spill_seconds()
+        if idle_seconds is None:
+            return False
+        with self._lock:
+            if self._spiller is not None and self._spiller.is_alive():
+                return False
+            interval = interval or min(idle_seconds, IDLE_CHECK_SECONDS)
+            self._spiller = threading.Thread(target=self._spill_loop, args=(interval,), name='shipping-idle-spill',
+                                             daemon=True)
+            self._spiller.start()
+        return True
+
+    def enforce(self, budget, owner=None, protect=(), directory=None):
+        """نقل الجداول الأقدم استخداماً إلى القرص حتى يعود حجم الجداول المرتبطة بجلسة (أو كل الجداول)
+        ضمن budget بالبايت - يرجع مراجع الجداول المنقولة
+
+        protect: أسماء (جلسة، اسم) لا تُنقل جداولها (البيانات المستخدمة حالياً).
+        """
+        with self._lock:
+            keys = self._bound_keys(owner)
+            protected = {handle.key for name in protect for handle in self._bindings.get(name, ())}
+            resident = [dataset for key, dataset in self._datasets.items()
+                        if key in keys and dataset.frame is not None]
+            total = sum(dataset.handle.nbytes for dataset in resident)
+            candidates = sorted(((dataset, dataset.last_access) for dataset in resident
+                                 if dataset.handle.key not in protected), key=lambda item: item[1])
+        if total <= budget:
+            return []
+
+        spilled = []
+        with span('spill_budget', 'output', rows_in=sum(dataset.handle.rows for dataset, _ in candidates)):
+            for dataset, last_access in candidates:
+                if total <= budget:
+                    break
+                if self._spill(dataset, last_access, directory):
+                    total -= dataset.handle.nbytes
+                    spilled.append(dataset.handle)
+        if total > budget:
+            logger.warning("الجداول المشتركة %s تتجاوز الحد %s بعد نقل الجداول القابلة للنقل",
+                           format_bytes(total), format_bytes(budget))
+        return spilled
+
+    def release_owner(self, owner):
+        """تحرير كل مراجع جلسة انتهت"""
+        with self._lock:
+            for key in [key for key in self._bindings if key[0] == owner]:
+                del self._bindings[key]
+            self._collect()
+
+    def prune(self, is_active):
+        """تحرير مراجع الجلسات غير النشطة - is_active(owner) -> bool"""
+        with self._lock:
+            for owner in {owner for owner, _ in self._bindings}:
+                if not is_active(owner):
+                    self.release_owner(owner)
+
+    def refcounts(self):
+        """عدد المراجع لكل جدول"""
+        with self._lock:
+            return Counter(handle.key for handles in self._bindings.values() for handle in handles)
+
+    def usage(self, owner=None):
+        """حجم الجداول المشتركة في الذاكرة (بدون المنقول للقرص) - أو الجداول المرتبطة بجلسة"""
+        with self._lock:
+            return sum(self._datasets[key].handle.nbytes for key in self._bound_keys(owner)
+                       if key in self._datasets and self._datasets[key].frame is not None)
+
+    def owns(self, owner, handle):
+        """هل الجدول مرتبط بالجلسة"""
+        with self._lock:
+            return handle.key in self._bound_keys(owner)
+
+    def events_frame(self):
+        """آخر عمليات النقل والاستعادة مع زمن كل منها"""
+        with self._lock:
+            return pd.DataFrame(list(self.events), columns=['time', 'carrier', 'action', 'ms', 'memory_mb',
+                                                            'disk_mb', 'format'])
+
+    def report(self):
+        """جدول بالجداول المشتركة وعدد الجلسات المرتبطة بكل منها"""
+        now = time.monotonic()
+        with self._lock:
+            refs = self.refcounts()
+            owners = {}
+            for (owner, _), handles in self._bindings.items():
+                for handle in handles:
+                    owners.setdefault(handle.key, set()).add(owner)
+            rows = [{
+                'carrier': dataset.handle.carrier,
+                'content_hash': dataset.handle.content_hash[:12],
+                'sla_version': dataset.handle.sla_version,
+                'rows': dataset.handle.rows,
+                'memory_mb': round(dataset.handle.nbytes / (1024 * 1024), 2),
+                'state': 'disk' if dataset.frame is None else 'memory',
+                'refs': refs.get(key, 0),
+                'sessions': len(owners.get(key, ())),
+                'idle_s': round(now - dataset.last_access, 1),
+            } for key, dataset in self._datasets.items()]
+        return pd.DataFrame(rows, columns=['carrier', 'content_hash', 'sla_version', 'rows', 'memory_mb',
+                                           'state', 'refs', 'sessions', 'idle_s'])
+
+    def close(self):
+        """إيقاف خيط النقل وحذف ملفات الجداول المنقولة للقرص عند إنهاء العملية"""
+        self._stop.set()
+        with self._lock:
+            for dataset in self._datasets.values():
+                if dataset.spilled is not None:
+                    dataset.spilled.remove()
+
+    def _spill_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.spill_idle()
+            except Exception as e:
+                logger.warning("تعذر نقل الجداول غير المستخدمة إلى القرص: %s", e)
+
+    def _bound_keys(self, owner):
+        """مفاتيح الجداول المرتبطة بجلسة - أو كل الجداول إذا لم تحدد"""
+        if owner is None:
+            return set(self._datasets)
+        return {handle.key for (bound_owner, _), bound in self._bindings.items()
+                if bound_owner == owner for handle in bound}
+
+    def _spill(self, dataset, last_access, directory=None):
+        """نقل جدول إلى القرص إذا لم يُستخدم أو يُحرر أثناء الكتابة - يرجع True عند النقل"""
+        # الكتابة خارج القفل حتى لا تتوقف الجلسات الأخرى
+        try:
+            spilled = SpilledFrame.write(dataset.frame, directory)
+        except Exception as e:
+            logger.warning("تعذر نقل %s إلى القرص: %s", dataset.handle, e)
+            return False
+        with self._lock:
+            current = self._datasets.get(dataset.handle.key)
+            if current is not dataset or dataset.frame is None or dataset.last_access != last_access:
+                # تم استخدام الجدول أو تحريره أثناء الكتابة
+                spilled.remove()
+                return False
+            dataset.frame, dataset.spilled = None, spilled
+            self.stats['spills'] += 1
+            self.stats['spill_ms'] += spilled.write_ms
+            self._log_event(dataset, 'spill', spilled.write_ms, spilled)
+        return True
+
+    def _reload(self, dataset, spilled):
+        try:
+            with span(f"reload:{dataset.handle.carrier}", 'ingestion', rows_in=dataset.handle.rows):
+                frame = spilled.load()
+        except OSError:
+            # خيط آخر استعاد الجدول وحذف الملف
+            with self._lock:
+                if dataset.frame is None:
+                    raise
+                return dataset.frame
+        with self._lock:
+            if dataset.frame is not None:
+                # استعادة متزامنة من خيط آخر
+                return dataset.frame
+            dataset.frame, dataset.spilled = frame, None
+            self.stats['reloads'] += 1
+            self.stats['reload_ms'] += spilled.read_ms
+            self._log_event(dataset, 'reload', spilled.read_ms, spilled)
+        spilled.remove()
+        return frame
+
+    def _log_event(self, dataset, action, ms, spilled):
+        self.events.append({
+            'time': datetime.now().strftime('%H:%M:%S'),
+            'carrier': dataset.handle.carrier,
+            'action': action,
+            'ms': round(ms, 1),
+            'memory_mb': round(dataset.handle.nbytes / (1024 * 1024), 2),
+            'disk_mb': round(spilled.disk_bytes / (1024 * 1024), 2),
+            'format': spilled.format,
+        })
+        logger.info("%s %s في %.0f ms (%s في الذاكرة، %s على القرص)", _EVENT_LABELS[action], dataset.handle, ms,
+                    format_bytes(dataset.handle.nbytes), format_bytes(spilled.disk_bytes))
+
+    def _collect(self):
+        refs = self.refcounts()
+        for key in [key for key, dataset in self._datasets.items()
+                    if refs.get(key, 0) == 0 and not dataset.pending]:
+            dataset = self._datasets.pop(key)
+            if dataset.spilled is not None:
+                dataset.spilled.remove()
+            self.stats['released'] += 1
+            logger.info("تحرير الجدول المشترك %s", dataset.handle)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """السجل المشترك للعملية"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DatasetRegistry()
+            _registry.start_idle_spiller()
+            atexit.register(_registry.close)
+        return _registry
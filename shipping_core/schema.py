@@ -0,0 +1,127 @@
+# shipping_core/schema.py - الجدول الموحد للشحنات المشترك بين جميع شركات الشحن
+"""
+كل شركة شحن تنتج أعمدة مختلفة بعد المعالجة (process_aramex_data و process_samsa_data و
+analyze_attempts)، لذلك يحول محول كل شركة (shipping_core.adapters) بياناتها إلى جدول
+موحد بنفس الأعمدة والأنواع (to_canonical في وحدة كل شركة)، ويحسب محرك المؤشرات (shipping_core.engine) DR و FDS و SLA
+و Pending على هذا الجدول لجميع الشركات بنفس الطريقة.
+
+تعريفات المؤشرات الخاصة بكل شركة (مثل مقام FDS) تُحدد في المحول كأعمدة منطقية:
+  له_SLA / ضمن_SLA       : مقام وبسط نسبة SLA
+  أساس_FDS / FDS          : مقام وبسط نسبة FDS
+  مستثنى                  : صفوف خارج جميع المؤشرات (مرتجعات العميل، الالتقاط...)
+"""
+import numpy as np
+import pandas as pd
+
+# حالات التسليم الموحدة
+DELIVERED = 'تم التسليم'
+PENDING = 'قيد التوصيل'
+RETURNED = 'مرتجع'
+LOST = 'استرجاع'
+OTHER = 'أخرى'
+DELIVERY_STATUSES = (DELIVERED, PENDING, RETURNED, LOST, OTHER)
+
+# الأعمدة الموحدة وأنواعها بالترتيب
+SCHEMA = {
+    'الشركة': 'category',
+    'رقم_الشحنة': 'object',
+    'المدينة_الوجهة': 'object',
+    'المنطقة': 'object',
+    'الفرع': 'object',
+    'تاريخ_الأساس': 'datetime64[ns]',
+    'تاريخ_أول_محاولة': 'datetime64[ns]',
+    'تاريخ_التسليم': 'datetime64[ns]',
+    'حالة_التسليم': pd.CategoricalDtype(DELIVERY_STATUSES),
+    'مستثنى': 'bool',
+    'SLA_أيام': 'float64',
+    'أيام_المحاولة_الأولى': 'float64',
+    'له_SLA': 'bool',
+    'ضمن_SLA': 'bool',
+    'أساس_FDS': 'bool',
+    'FDS': 'bool',
+}
+
+# أسماء الأعمدة في التخزين (SQLite وملفات السجل) - أسماء ASCII تصلح كأسماء ملفات
+STORAGE_NAMES = {
+    'الشركة': 'carrier',
+    'رقم_الشحنة': 'awb',
+    'المدينة_الوجهة': 'city',
+    'المنطقة': 'region',
+    'الفرع': 'branch',
+    'تاريخ_الأساس': 'base_date',
+    'تاريخ_أول_محاولة': 'first_attempt_date',
+    'تاريخ_التسليم': 'delivered_date',
+    'حالة_التسليم': 'status',
+    'مستثنى': 'is_excluded',
+    'SLA_أيام': 'sla_days',
+    'أيام_المحاولة_الأولى': 'first_attempt_days',
+    'له_SLA': 'has_sla',
+    'ضمن_SLA': 'sla_met',
+    'أساس_FDS': 'fds_base',
+    'FDS': 'fds_met',
+}
+
+# الأعمدة التي يجب أن يحددها كل محول (الباقي له قيمة افتراضية)
+REQUIRED_COLUMNS = ('حالة_التسليم',)
+
+_DEFAULTS = {'مستثنى': False, 'له_SLA': False, 'ضمن_SLA': False, 'أساس_FDS': False, 'FDS': False}
+
+
+def source_column(df, col, default=np.nan):
+    """عمود من بيانات الشركة أو عمود بالقيمة الافتراضية إذا لم يكن موجوداً"""
+    return df[col] if col in df.columns else pd.Series(default, index=df.index)
+
+
+def awb_strings(values):
+    """أرقام الشحنات كنصوص (الأرقام المقروءة من Excel كأعداد عشرية بدون .0) مع بقاء المفقود"""
+    if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) in ('string', 'empty'):
+        return values
+    if pd.api.types.is_float_dtype(values.dtype) and (values.dropna() % 1 == 0).all():
+        values = values.astype('Int64')
+    return values.astype(object).where(values.isna(), values.astype(str))
+
+
+def empty_frame():
+    """جدول موحد فارغ"""
+    return conform(pd.DataFrame({'حالة_التسليم': pd.Series(dtype=object)}))
+
+
+def conform(df, carrier=None):
+    """إكمال الأعمدة الناقصة وتوحيد الأنواع وترتيب الأعمدة حسب SCHEMA
+
+    يرفع ValueError إذا لم يحدد المحول أحد REQUIRED_COLUMNS.
+    """
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"أعمدة مطلوبة مفقودة في الجدول الموحد: {', '.join(missing)}")
+
+    columns = {}
+    for col, dtype in SCHEMA.items():
+        if col == 'الشركة':
+            values = pd.Series(carrier if carrier is not None else df.get(col), index=df.index)
+        elif col in df.columns:
+            values = df[col]
+        elif col in _DEFAULTS:
+            values = pd.Series(_DEFAULTS[col], index=df.index)
+        else:
+            values = pd.Series(np.nan, index=df.index)
+
+        if col == 'رقم_الشحنة':
+            values = awb_strings(values)
+        elif dtype == 'bool':
+            values = values.fillna(False).astype(bool)
+        elif dtype == 'datetime64[ns]':
+            if not pd.api.types.is_datetime64_any_dtype(values.dtype):
+                values = pd.to_datetime(values, errors='coerce')
+            if values.dt.tz is not None:
+                values = values.dt.tz_localize(None)
+            values = values.astype('datetime64[ns]')
+        elif dtype == 'float64':
+            values = pd.to_numeric(values, errors='coerce').astype('float64')
+        elif isinstance(dtype, pd.CategoricalDtype):
+            values = values.where(values.isin(dtype.categories), OTHER).astype(dtype)
+        else:
+            values = values.astype(dtype)
+        columns[col] = values
+
+    return pd.DataFrame(columns, index=df.index)
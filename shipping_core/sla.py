@@ -0,0 +1,100 @@
+# shipping_core/sla.py - قراءة ملفات اتفاقية SLA وتطبيقها على الشحنات
+import logging
+
+import numpy as np
+import pandas as pd
+
+from shipping_core.cache import fingerprint
+from shipping_core.cities import aliases_version
+
+logger = logging.getLogger(__name__)
+
+CITY_KEYWORDS = ['city', 'مدينة', 'destination']
+DAYS_KEYWORDS = ['day', 'يوم', 'أيام', 'sla', 'target']
+
+# كلمات مفتاحية إضافية للاكتشاف المرن (ملفات Samsa)
+FLEXIBLE_CITY_KEYWORDS = CITY_KEYWORDS + ['مدن', 'cities', 'location', 'موقع']
+FLEXIBLE_DAYS_KEYWORDS = DAYS_KEYWORDS + ['days', 'هدف', 'ايام']
+
+
+def find_sla_columns(columns, flexible=False):
+    """اكتشاف عمودي المدينة والأيام في ملف SLA
+
+    يرجع (عمود_المدينة, عمود_الأيام, تم_استخدام_أول_عمودين).
+    الوضع العادي يأخذ آخر عمود مطابق، والوضع المرن يأخذ أول عمود مطابق
+    ويستخدم قائمة كلمات أوسع.
+    """
+    city_col = None
+    days_col = None
+
+    if flexible:
+        for col in columns:
+            col_lower = str(col).lower().strip()
+            if city_col is None and any(keyword in col_lower for keyword in FLEXIBLE_CITY_KEYWORDS):
+                city_col = col
+                continue
+            if days_col is None and any(keyword in col_lower for keyword in FLEXIBLE_DAYS_KEYWORDS):
+                days_col = col
+    else:
+        for col in columns:
+            col_lower = str(col).lower()
+            if any(keyword in col_lower for keyword in CITY_KEYWORDS):
+                city_col = col
+            elif any(keyword in col_lower for keyword in DAYS_KEYWORDS):
+                days_col = col
+
+    used_fallback = False
+    if city_col is None or days_col is None:
+        if len(columns) >= 2:
+            city_col = columns[0]
+            days_col = columns[1]
+            used_fallback = True
+
+    return city_col, days_col, used_fallback
+
+
+def build_sla_table(df, city_col, days_col, flexible=False):
+    """بناء جدول SLA الموحد (المدينة, SLA_أيام) من الأعمدة المكتشفة"""
+    cities_clean = df[city_col].astype(str).str.strip()
+    if flexible:
+        cities_clean = cities_clean.replace(['nan', 'NaN', 'None', ''], np.nan)
+
+    sla_clean = pd.DataFrame({
+        'المدينة': cities_clean,
+        'SLA_أيام': pd.to_numeric(df[days_col], errors='coerce')
+    })
+
+    sla_clean = sla_clean.dropna()
+    if flexible:
+        sla_clean = sla_clean[sla_clean['المدينة'].str.len() > 0]
+        sla_clean = sla_clean[sla_clean['SLA_أيام'] > 0]
+    else:
+        sla_clean = sla_clean[sla_clean['المدينة'] != '']
+
+    return sla_clean
+
+
+def process_sla_data(df, flexible=False):
+    """معالجة ملف SLA كاملاً - يرجع جدولاً فارغاً إذا لم تُكتشف الأعمدة"""
+    if df.empty:
+        logger.warning("ملف SLA فارغ")
+        return pd.DataFrame()
+
+    df.columns = df.columns.str.strip()
+    city_col, days_col, used_fallback = find_sla_columns(df.columns, flexible=flexible)
+
+    if not city_col or not days_col:
+        logger.warning("لم يتم العثور على أعمدة المدينة والأيام في ملف SLA: %s", list(df.columns))
+        return pd.DataFrame()
+
+    if used_fallback:
+        logger.info("تم استخدام العمودين '%s' للمدن و '%s' للأيام", city_col, days_col)
+
+    return build_sla_table(df, city_col, days_col, flexible=flexible)
+
+
+def sla_version(sla_df):
+    """بصمة قصيرة لجدول SLA وملف أسماء المدن البديلة تميز الجداول المعالجة بنسخ مختلفة - None بدون SLA"""
+    if sla_df is None or len(sla_df) == 0:
+        return None
+    return fingerprint(sla_df, aliases_version())[:12]
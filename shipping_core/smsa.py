@@ -0,0 +1,734 @@
+# shipping_core/smsa.py - معالجة وتحليل بيانات Samsa مع SLA و FDS
+import logging
+
+import numpy as np
+import pandas as pd
+
+from shipping_core.cities import map_sla_days
+from shipping_core.kernels import fast_paths_enabled
+from shipping_core.regions import infer_regions
+from shipping_core.schema import PENDING, conform, source_column
+
+logger = logging.getLogger(__name__)
+
+
+def update_sla_calculations(df, sla_df=None):
+    """إعادة حساب SLA بعد رفع ملف SLA"""
+    if sla_df is None or sla_df.empty:
+        return df
+
+    # تطبيق SLA على البيانات الرئيسية (مع مطابقة اختلاف كتابة المدن)
+    if 'المدينة_الوجهة' in df.columns:
+        df['SLA_أيام'] = map_sla_days(df['المدينة_الوجهة'], sla_df)
+
+    # إعادة حساب حالة SLA - باستخدام Creation date
+    if 'تاريخ_الإنشاء' in df.columns and 'تاريخ_أول_محاولة' in df.columns:
+        # إعادة حساب أيام المحاولة الأولى مع حساب الأيام الصحيح
+        df['أيام_المحاولة_الأولى'] = (
+            pd.to_datetime(df['تاريخ_أول_محاولة'].dt.date) -
+            pd.to_datetime(df['تاريخ_الإنشاء'].dt.date)
+        ).dt.days
+        df.loc[df['أيام_المحاولة_الأولى'] < 0, 'أيام_المحاولة_الأولى'] = np.nan
+
+        # حساب حالة SLA
+        def calculate_sla_status_safe(row):
+            try:
+                if pd.isna(row.get('أيام_المحاولة_الأولى')) or pd.isna(row.get('SLA_أيام')):
+                    return 'غير محدد'
+                elif row['أيام_المحاولة_الأولى'] < row['SLA_أيام']:
+                    return 'قبل SLA'
+                elif row['أيام_المحاولة_الأولى'] == row['SLA_أيام']:
+                    return 'في SLA'
+                else:
+                    return 'بعد SLA'
+            except:
+                return 'غير محدد'
+
+        df['حالة_SLA_محاولة_أولى'] = df.apply(calculate_sla_status_safe, axis=1)
+
+        # إعادة حساب تسليم أول محاولة ضمن SLA
+        if 'تاريخ_التسليم' in df.columns and 'حالة_التسليم' in df.columns:
+            try:
+                # الشرط الأساسي: تسليم في نفس يوم المحاولة الأولى
+                df['تسليم_أول_محاولة_أساسي'] = (
+                    (df['حالة_التسليم'] == 'تم التسليم') &
+                    (df['تاريخ_التسليم'].dt.date == df['تاريخ_أول_محاولة'].dt.date)
+                )
+
+                # FDS الحقيقي: التسليم من أول محاولة + ضمن SLA
+                df['تسليم_أول_محاولة'] = (
+                    df['تسليم_أول_محاولة_أساسي'] &
+                    df['حالة_SLA_محاولة_أولى'].isin(['قبل SLA', 'في SLA'])
+                )
+            except:
+                df['تسليم_أول_محاولة'] = False
+        else:
+            df['تسليم_أول_محاولة'] = False
+
+    return df
+
+
+def process_samsa_data(df, sla_df=None):
+    """معالجة بيانات Samsa بناءً على الأعمدة المحددة - مُحسّن للملف الحالي"""
+
+    # إزالة الصفوف والأعمدة الفارغة تماماً
+    df = df.dropna(how='all')
+    df = df.dropna(axis=1, how='all')
+
+    # البحث عن صف العناوين الصحيح
+    header_row = 0
+    max_search = min(20, len(df))
+
+    for i in range(max_search):
+        row_str = ' '.join(df.iloc[i].astype(str).str.lower())
+        keywords_count = sum(1 for keyword in ['awb', 'reference', 'shipper', 'consignee', 'status', 'pickup', 'delivery']
+                            if keyword in row_str)
+        if keywords_count >= 2:
+            header_row = i
+            break
+
+    # إعادة تعيين العناوين إذا لزم الأمر
+    if header_row > 0:
+        df.columns = df.iloc[header_row]
+        df = df.iloc[header_row + 1:].reset_index(drop=True)
+
+    # تنظيف أسماء الأعمدة
+    df.columns = df.columns.astype(str).str.strip().str.replace('\n', ' ')
+
+    # البحث الذكي عن الأعمدة - محسن للملف الحالي
+    column_mapping = {}
+
+    # البحث عن رقم الشحنة
+    for col in df.columns:
+        col_clean = str(col).strip()
+        if any(keyword in col_clean for keyword in ['AWB', 'awb', 'Reference', 'reference', 'Tracking']):
+            column_mapping[col] = 'رقم_الشحنة'
+            break
+
+    # البحث عن المدينة
+    for col in df.columns:
+        col_clean = str(col).strip()
+        if any(keyword in col_clean for keyword in ['Consignee City', 'City', 'city']):
+            column_mapping[col] = 'المدينة_الوجهة'
+            break
+
+    # البحث عن اسم المرسل
+    for col in df.columns:
+        col_clean = str(col).strip()
+        if any(keyword in col_clean for keyword in ['Shipper Name', 'Shipper']):
+            column_mapping[col] = 'اسم_المرسل'
+            break
+
+    # البحث عن اسم المستلم
+    for col in df.columns:
+        col_clean = str(col).strip()
+        if any(keyword in col_clean for keyword in ['Consignee Name', 'Consignee']):
+            column_mapping[col] = 'اسم_المستلم'
+            break
+
+    # البحث عن هاتف المستلم
+    for col in df.columns:
+        col_clean = str(col).strip()
+        if any(keyword in col_clean for keyword in ['Consignee Phone', 'Phone']):
+            column_mapping[col] = 'هاتف_المستلم'
+            break
+
+    # البحث عن العنوان
+    for col in df.columns:
+        col_clean = str(col).strip()
+        if any(keyword in col_clean for keyword in ['Consignee Address', 'Address']):
+            column_mapping[col] = 'عنوان_المستلم'
+            break
+
+    # البحث عن COD
+    for col in df.columns:
+        col_clean = str(col).strip()
+        if col_clean == 'COD':
+            column_mapping[col] = 'المبلغ_المستحق'
+            break
+
+    # البحث عن عدد القطع
+    for col in df.columns:
+        col_clean = str(col).strip()
+        if col_clean == 'PCs':
+            column_mapping[col] = 'عدد_القطع'
+            break
+
+    # البحث عن الوزن
+    for col in df.columns:
+        col_clean = str(col).strip()
+        if 'Weight' in col_clean:
+            column_mapping[col] = 'الوزن'
+            break
+
+    # البحث عن المحتويات
+    for col in df.columns:
+        col_clean = str(col).strip()
+        if col_clean == 'Contents':
+            column_mapping[col] = 'المحتويات'
+            break
+
+    # البحث عن التواريخ
+    for col in df.columns:
+        col_clean = str(col).strip()
+        if col_clean == 'Creation date':
+            column_mapping[col] = 'تاريخ_الإنشاء'
+        elif col_clean == 'Pickup date':
+            column_mapping[col] = 'تاريخ_الاستلام'
+        elif col_clean == 'First attempt':
+            column_mapping[col] = 'تاريخ_أول_محاولة'
+        elif col_clean == 'Delivery date':
+            column_mapping[col] = 'تاريخ_التسليم'
+
+    # البحث عن الحالة
+    for col in df.columns:
+        col_clean = str(col).strip()
+        if col_clean == 'Status':
+            column_mapping[col] = 'الحالة'
+            break
+
+    # البحث عن الشركة 3PL
+    for col in df.columns:
+        col_clean = str(col).strip()
+        if '3PL Company' in col_clean:
+            column_mapping[col] = 'شركة_3PL'
+            break
+
+    # البحث عن المنطقة
+    for col in df.columns:
+        col_clean = str(col).strip()
+        if col_clean == 'Region':
+            column_mapping[col] = 'المنطقة'
+            break
+
+    # إعادة تسمية الأعمدة
+    df = df.rename(columns=column_mapping)
+
+    # معالجة التواريخ
+    date_columns = ['تاريخ_الإنشاء', 'تاريخ_الاستلام', 'تاريخ_أول_محاولة', 'تاريخ_التسليم']
+    for col in date_columns:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce', dayfirst=True)
+
+    # معالجة الأرقام
+    numeric_columns = ['المبلغ_المستحق', 'عدد_القطع', 'الوزن']
+    for col in numeric_columns:
+        if col in df.columns:
+            if pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = pd.to_numeric(df[col], errors='coerce')
+            else:
+                temp_series = df[col].astype(str).str.replace(r'[^\d.-]', '', regex=True)
+                temp_series = temp_series.str.replace('٫', '.', regex=False)
+                df[col] = pd.to_numeric(temp_series, errors='coerce')
+
+    # إعداد SLA - فقط إذا تم رفع ملف SLA
+    sla_df_for_processing = sla_df if sla_df is not None else pd.DataFrame()
+
+    if 'تاريخ_الاستلام' in df.columns and 'تاريخ_أول_محاولة' in df.columns:
+        df['أيام_المحاولة_الأولى'] = (
+            pd.to_datetime(df['تاريخ_أول_محاولة'].dt.date) -
+            pd.to_datetime(df['تاريخ_الاستلام'].dt.date)
+        ).dt.days
+        df.loc[df['أيام_المحاولة_الأولى'] < 0, 'أيام_المحاولة_الأولى'] = np.nan
+
+        # حساب حالة SLA للمحاولة الأولى - فقط إذا كان هناك ملف SLA
+        if not sla_df_for_processing.empty and 'المدينة_الوجهة' in df.columns:
+            # تطبيق SLA على البيانات (مع مطابقة اختلاف كتابة المدن)
+            df['SLA_أيام'] = map_sla_days(df['المدينة_الوجهة'], sla_df_for_processing)
+
+            # حساب حالة SLA للمحاولة الأولى
+            def calculate_sla_status(row):
+                if pd.isna(row['أيام_المحاولة_الأولى']) or pd.isna(row['SLA_أيام']):
+                    return 'غير محدد'
+                elif row['أيام_المحاولة_الأولى'] < row['SLA_أيام']:
+                    return 'قبل SLA'
+                elif row['أيام_المحاولة_الأولى'] == row['SLA_أيام']:
+                    return 'في SLA'
+                else:
+                    return 'بعد SLA'
+
+            df['حالة_SLA_محاولة_أولى'] = df.apply(calculate_sla_status, axis=1)
+        else:
+            # إذا لم يتم رفع ملف SLA، لا نحسب حالة SLA
+            df['حالة_SLA_محاولة_أولى'] = 'غير محدد'
+            df['SLA_أيام'] = np.nan
+
+    # حساب أيام التوصيل مع حساب الأيام الصحيح - باستخدام Creation date
+    if 'تاريخ_الإنشاء' in df.columns and 'تاريخ_التسليم' in df.columns:
+        df['أيام_التوصيل'] = (
+            pd.to_datetime(df['تاريخ_التسليم'].dt.date) -
+            pd.to_datetime(df['تاريخ_الإنشاء'].dt.date)
+        ).dt.days
+    df.loc[df['أيام_التوصيل'] < 0, 'أيام_التوصيل'] = np.nan
+
+    # تحديد حالة التسليم
+    if 'الحالة' in df.columns:
+        status_str = df['الحالة'].astype(str).str.upper()
+
+        # تحديد الشحنات المستثناة
+        df['مستثنى'] = status_str.str.contains('PICKED UP|PICKUP|التقاط', na=False, regex=True)
+
+        # تصنيف الحالات
+        df['حالة_التسليم'] = np.select(
+            [
+                df['مستثنى'],
+                status_str.str.contains('DELIVERED|RECEIVED|تم التسليم|مستلم|استلم|COMPLETE', na=False),
+                status_str.str.contains('RETURN|مرتجع|رجع|ارجاع|REJECT|REFUSED|FAIL', na=False)
+            ],
+            ['مستثنى', 'تم التسليم', 'مرتجع'],
+            default='قيد التوصيل'
+        )
+    else:
+        df['مستثنى'] = False
+        if 'تاريخ_التسليم' in df.columns:
+            df['حالة_التسليم'] = df['تاريخ_التسليم'].apply(
+                lambda x: 'تم التسليم' if pd.notna(x) else 'قيد التوصيل'
+            )
+        else:
+            df['حالة_التسليم'] = 'قيد التوصيل'
+
+    # إضافة رقم الأسبوع - باستخدام Creation date
+    if 'تاريخ_الإنشاء' in df.columns:
+        df['رقم_الأسبوع'] = df['تاريخ_الإنشاء'].dt.isocalendar().week
+        df['الشهر'] = df['تاريخ_الإنشاء'].dt.month
+        df['السنة'] = df['تاريخ_الإنشاء'].dt.year
+    # تحديد FDS (First Delivery Success) مع مقارنة التواريخ فقط
+    if 'تاريخ_أول_محاولة' in df.columns and 'تاريخ_التسليم' in df.columns:
+        try:
+            # الشرط الأساسي: تم التسليم في نفس يوم المحاولة الأولى
+            df['تسليم_أول_محاولة_أساسي'] = (
+                (df['حالة_التسليم'] == 'تم التسليم') &
+                (df['تاريخ_التسليم'].dt.date == df['تاريخ_أول_محاولة'].dt.date)
+            )
+
+            # FDS الحقيقي: التسليم من أول محاولة + ضمن SLA
+            if not sla_df_for_processing.empty and 'حالة_SLA_محاولة_أولى' in df.columns:
+                df['تسليم_أول_محاولة'] = (
+                    df['تسليم_أول_محاولة_أساسي'] &
+                    df['حالة_SLA_محاولة_أولى'].isin(['قبل SLA', 'في SLA'])
+                )
+            else:
+                # إذا لم يكن هناك SLA، نستخدم الشرط الأساسي فقط
+                df['تسليم_أول_محاولة'] = df['تسليم_أول_محاولة_أساسي']
+        except:
+            df['تسليم_أول_محاولة'] = False
+    else:
+        df['تسليم_أول_محاولة'] = False
+
+    # المنطقة: عمود Region في الملف، وإلا من مدينة المستلم ثم عنوانه بقاموس الأماكن
+    df['المنطقة'] = infer_regions(df)
+
+    # التأكد من وجود رقم الشحنة
+    if 'رقم_الشحنة' not in df.columns:
+        # البحث عن أي عمود يحتوي على أرقام شحنات فريدة
+        found_awb_column = False
+        for col in df.columns:
+            col_str = str(col).lower()
+            # البحث عن كلمات مفتاحية لرقم الشحنة
+            if any(keyword in col_str for keyword in ['awb', 'tracking', 'shipment', 'waybill', 'reference', 'number']):
+                # التحقق من أن العمود يحتوي على قيم فريدة ومعقولة
+                unique_ratio = df[col].nunique() / len(df)
+                if unique_ratio > 0.8:  # 80% من القيم فريدة
+                    df['رقم_الشحنة'] = df[col].astype(str).str.strip()
+                    found_awb_column = True
+                    break
+
+        if not found_awb_column:
+            # إذا لم نجد عمود مناسب، نستخدم الفهرس مع تحذير
+            df['رقم_الشحنة'] = df.index.astype(str)
+
+    return df
+
+
+def calculate_performance_metrics(df, sla_df=None):
+    """حساب مؤشرات الأداء الجديدة حسب المدينة - فقط إذا كان هناك SLA"""
+    if 'المدينة_الوجهة' not in df.columns:
+        return pd.DataFrame()
+
+    # التحقق من وجود ملف SLA
+    if sla_df is None:
+        return pd.DataFrame()
+
+    # استثناء الشحنات المستثناة
+    df_active = df[~df.get('مستثنى', False)]
+
+    if len(df_active) == 0:
+        return pd.DataFrame()
+
+    # التحقق من وجود عمود SLA في البيانات
+    if 'SLA_أيام' not in df_active.columns:
+        return pd.DataFrame()
+
+    if fast_paths_enabled() and _can_vectorize_city_metrics(df_active):
+        metrics_list = _city_metrics_fast(df_active)
+    else:
+        metrics_list = _city_metrics_legacy(df_active)
+
+    if not metrics_list:
+        return pd.DataFrame()
+
+    return pd.DataFrame(metrics_list).sort_values('عدد_الشحنات', ascending=False)
+
+
+def calculate_weekly_metrics(df):
+    """حساب مؤشرات الأداء حسب الأسبوع"""
+    if 'رقم_الأسبوع' not in df.columns:
+        return pd.DataFrame()
+
+    # استثناء الشحنات المستثناة
+    df_active = df[~df.get('مستثنى', False)]
+
+    if len(df_active) == 0:
+        return pd.DataFrame()
+
+    if fast_paths_enabled() and _can_vectorize_weekly_metrics(df_active):
+        weekly_metrics = _weekly_metrics_fast(df_active)
+    else:
+        weekly_metrics = _weekly_metrics_legacy(df_active)
+
+    return pd.DataFrame(weekly_metrics)
+
+
+def _city_metrics_legacy(df_active):
+    """مؤشرات كل مدينة بحلقة على المدن (التنفيذ الأصلي)"""
+    metrics_list = []
+
+    for city in df_active['المدينة_الوجهة'].unique():
+        if pd.isna(city):
+            continue
+
+        city_df = df_active[df_active['المدينة_الوجهة'] == city]
+
+        # فلترة المدن التي لها SLA محدد فقط
+        city_df_with_sla = city_df[city_df['SLA_أيام'].notna()]
+
+        if len(city_df_with_sla) == 0:
+            continue
+
+        total_shipments = len(city_df_with_sla)
+
+        # حساب SLA نسبة (المحاولات في أو قبل SLA)
+        sla_compliant = 0
+        if 'حالة_SLA_محاولة_أولى' in city_df_with_sla.columns:
+            sla_compliant = len(city_df_with_sla[
+                city_df_with_sla['حالة_SLA_محاولة_أولى'].isin(['قبل SLA', 'في SLA'])
+            ])
+        sla_rate = (sla_compliant / total_shipments * 100) if total_shipments > 0 else 0
+
+        # حساب DR (معدل التسليم)
+        delivered_count = len(city_df_with_sla[city_df_with_sla.get('حالة_التسليم', '') == 'تم التسليم'])
+        dr = (delivered_count / total_shipments * 100) if total_shipments > 0 else 0
+
+        # حساب FDS (نجاح التسليم من أول محاولة)
+        # حساب FDS (نجاح التسليم من أول محاولة ضمن SLA)
+        fds_count = 0
+        if 'تسليم_أول_محاولة' in city_df_with_sla.columns:
+            # FDS = التسليم من أول محاولة + ضمن SLA من إجمالي شحنات المدينة
+            fds_count = len(city_df_with_sla[city_df_with_sla['تسليم_أول_محاولة'] == True])
+        fds = (fds_count / total_shipments * 100) if total_shipments > 0 else 0
+        # حساب Pending (الشحنات المعلقة)
+        pending_count = len(city_df_with_sla[city_df_with_sla.get('حالة_التسليم', '') == 'قيد التوصيل'])
+        pending_rate = (pending_count / total_shipments * 100) if total_shipments > 0 else 0
+
+        # الحصول على المنطقة
+        region = city_df_with_sla['المنطقة'].iloc[0] if 'المنطقة' in city_df_with_sla.columns and len(city_df_with_sla) > 0 else 'غير محدد'
+
+        # رقم الأسبوع الأكثر شيوعاً
+        week_number = 0
+        if 'رقم_الأسبوع' in city_df_with_sla.columns:
+            week_mode = city_df_with_sla['رقم_الأسبوع'].mode()
+            if len(week_mode) > 0:
+                week_number = int(week_mode.iloc[0])
+
+        # SLA المحدد لهذه المدينة
+        city_sla = city_df_with_sla['SLA_أيام'].iloc[0]
+        if pd.isna(city_sla):
+            continue
+
+        metrics_list.append({
+            'المدينة': city,
+            'المنطقة': region,
+            'عدد_الشحنات': total_shipments,
+            'SLA_المحدد': int(city_sla),
+            'SLA_نسبة': round(sla_rate, 1),
+            'DR': round(dr, 1),
+            'FDS': round(fds, 1),
+            'Pending': round(pending_rate, 1),
+            'رقم_الأسبوع': week_number
+        })
+
+    return metrics_list
+
+
+def _is_plain_numeric(series):
+    """عمود رقمي (وليس منطقياً) يمكن تجميعه ومقارنته مباشرة"""
+    return pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+
+
+def _can_vectorize_city_metrics(df_active):
+    """المسار السريع يتطلب أسماء مدن نصية (نفس المساواة في groupby والمقارنة) وعمود حالة التسليم"""
+    if 'حالة_التسليم' not in df_active.columns:
+        return False
+    if not _is_plain_numeric(df_active['SLA_أيام']):
+        return False
+    if 'رقم_الأسبوع' in df_active.columns and not _is_plain_numeric(df_active['رقم_الأسبوع']):
+        return False
+    return pd.api.types.infer_dtype(df_active['المدينة_الوجهة'], skipna=True) in ('string', 'empty')
+
+
+def _group_counts(mask, keys):
+    """عدد الصفوف المحققة للشرط في كل مجموعة"""
+    return mask.groupby(keys, sort=False).sum()
+
+
+def _weekly_mode(df, key):
+    """الأسبوع الأكثر تكراراً لكل مجموعة (الأصغر عند التساوي كما في Series.mode)"""
+    weeks = df[[key, 'رقم_الأسبوع']].dropna(subset=['رقم_الأسبوع'])
+    counts = weeks.groupby([key, 'رقم_الأسبوع'], sort=False).size().reset_index(name='n')
+    counts = counts.sort_values(['n', 'رقم_الأسبوع'], ascending=[False, True], kind='mergesort')
+    return counts.drop_duplicates(key).set_index(key)['رقم_الأسبوع']
+
+
+def _city_metrics_fast(df_active):
+    """مؤشرات كل مدينة بعمليات groupby - نفس ترتيب ونتائج التنفيذ الأصلي"""
+    city_col = 'المدينة_الوجهة'
+    df_with_sla = df_active[df_active['SLA_أيام'].notna() & df_active[city_col].notna()]
+    if len(df_with_sla) == 0:
+        return []
+
+    keys = df_with_sla[city_col]
+    totals = keys.groupby(keys, sort=False).size()
+
+    if 'حالة_SLA_محاولة_أولى' in df_with_sla.columns:
+        sla_compliant = _group_counts(df_with_sla['حالة_SLA_محاولة_أولى'].isin(['قبل SLA', 'في SLA']), keys)
+    else:
+        sla_compliant = None
+    delivered = _group_counts(df_with_sla['حالة_التسليم'] == 'تم التسليم', keys)
+    pending = _group_counts(df_with_sla['حالة_التسليم'] == 'قيد التوصيل', keys)
+    if 'تسليم_أول_محاولة' in df_with_sla.columns:
+        fds_counts = _group_counts(df_with_sla['تسليم_أول_محاولة'] == True, keys)
+    else:
+        fds_counts = None
+
+    first_rows = df_with_sla.groupby(city_col, sort=False).head(1).set_index(city_col)
+    week_modes = _weekly_mode(df_with_sla, city_col) if 'رقم_الأسبوع' in df_with_sla.columns else None
+
+    # نفس ترتيب ظهور المدن في البيانات
+    city_order = [city for city in df_active[city_col].unique() if city in totals.index]
+
+    metrics_list = []
+    for city in city_order:
+        total_shipments = int(totals[city])
+        sla_count = int(sla_compliant[city]) if sla_compliant is not None else 0
+        fds_count = int(fds_counts[city]) if fds_counts is not None else 0
+
+        region = first_rows.at[city, 'المنطقة'] if 'المنطقة' in first_rows.columns else 'غير محدد'
+        week_number = 0
+        if week_modes is not None and city in week_modes.index:
+            week_number = int(week_modes[city])
+
+        metrics_list.append({
+            'المدينة': city,
+            'المنطقة': region,
+            'عدد_الشحنات': total_shipments,
+            'SLA_المحدد': int(first_rows.at[city, 'SLA_أيام']),
+            'SLA_نسبة': round(sla_count / total_shipments * 100, 1),
+            'DR': round(int(delivered[city]) / total_shipments * 100, 1),
+            'FDS': round(fds_count / total_shipments * 100, 1),
+            'Pending': round(int(pending[city]) / total_shipments * 100, 1),
+            'رقم_الأسبوع': week_number
+        })
+
+    return metrics_list
+
+
+def _weekly_metrics_legacy(df_active):
+    """مؤشرات كل أسبوع بحلقة على الأسابيع (التنفيذ الأصلي)"""
+    weekly_metrics = []
+
+    for week in sorted(df_active['رقم_الأسبوع'].dropna().unique()):
+        week_df = df_active[df_active['رقم_الأسبوع'] == week]
+        total_shipments = len(week_df)
+
+        if total_shipments == 0:
+            continue
+
+        # حساب المؤشرات للأسبوع
+        sla_compliant = 0
+        if 'حالة_SLA_محاولة_أولى' in week_df.columns:
+            sla_compliant = len(week_df[
+                week_df['حالة_SLA_محاولة_أولى'].isin(['قبل SLA', 'في SLA'])
+            ])
+        sla_rate = (sla_compliant / total_shipments * 100) if total_shipments > 0 else 0
+
+        delivered_count = len(week_df[week_df['حالة_التسليم'] == 'تم التسليم'])
+        dr = (delivered_count / total_shipments * 100) if total_shipments > 0 else 0
+
+        fds_count = 0
+        if 'تسليم_أول_محاولة' in week_df.columns:
+            fds_count = len(week_df[week_df['تسليم_أول_محاولة'] == True])
+        fds = (fds_count / total_shipments * 100) if total_shipments > 0 else 0
+
+        pending_count = len(week_df[week_df['حالة_التسليم'] == 'قيد التوصيل'])
+        pending_rate = (pending_count / total_shipments * 100) if total_shipments > 0 else 0
+
+        weekly_metrics.append({
+            'الأسبوع': int(week),
+            'عدد_الشحنات': total_shipments,
+            'SLA_نسبة': round(sla_rate, 1),
+            'DR': round(dr, 1),
+            'FDS': round(fds, 1),
+            'Pending': round(pending_rate, 1)
+        })
+
+    return weekly_metrics
+
+
+def _can_vectorize_weekly_metrics(df_active):
+    """المسار السريع يتطلب رقم أسبوع رقمياً وعمود حالة التسليم"""
+    return 'حالة_التسليم' in df_active.columns and _is_plain_numeric(df_active['رقم_الأسبوع'])
+
+
+def _weekly_metrics_fast(df_active):
+    """مؤشرات كل أسبوع بعمليات groupby - نفس ترتيب ونتائج التنفيذ الأصلي"""
+    df_weeks = df_active[df_active['رقم_الأسبوع'].notna()]
+    if len(df_weeks) == 0:
+        return []
+
+    keys = df_weeks['رقم_الأسبوع']
+    totals = keys.groupby(keys, sort=True).size()
+
+    if 'حالة_SLA_محاولة_أولى' in df_weeks.columns:
+        sla_compliant = _group_counts(df_weeks['حالة_SLA_محاولة_أولى'].isin(['قبل SLA', 'في SLA']), keys)
+    else:
+        sla_compliant = None
+    delivered = _group_counts(df_weeks['حالة_التسليم'] == 'تم التسليم', keys)
+    pending = _group_counts(df_weeks['حالة_التسليم'] == 'قيد التوصيل', keys)
+    if 'تسليم_أول_محاولة' in df_weeks.columns:
+        fds_counts = _group_counts(df_weeks['تسليم_أول_محاولة'] == True, keys)
+    else:
+        fds_counts = None
+
+    weekly_metrics = []
+    for week, total_shipments in totals.items():
+        total_shipments = int(total_shipments)
+        sla_count = int(sla_compliant[week]) if sla_compliant is not None else 0
+        fds_count = int(fds_counts[week]) if fds_counts is not None else 0
+
+        weekly_metrics.append({
+            'الأسبوع': int(week),
+            'عدد_الشحنات': total_shipments,
+            'SLA_نسبة': round(sla_count / total_shipments * 100, 1),
+            'DR': round(int(delivered[week]) / total_shipments * 100, 1),
+            'FDS': round(fds_count / total_shipments * 100, 1),
+            'Pending': round(int(pending[week]) / total_shipments * 100, 1)
+        })
+
+    return weekly_metrics
+
+
+def analyze_delivery_performance_fast(df):
+    """تحليل أداء التوصيل لـ Samsa"""
+    analysis = {}
+
+    # استثناء الشحنات المستثناة من التحليل
+    df_active = df[~df.get('مستثنى', False)]
+
+    if 'حالة_التسليم' in df_active.columns:
+        # حساب معدلات التسليم
+        total = len(df_active)
+        status_counts = df_active['حالة_التسليم'].value_counts()
+
+        analysis['معدلات_الحالة'] = {}
+        for status in ['تم التسليم', 'قيد التوصيل', 'مرتجع']:
+            count = status_counts.get(status, 0)
+            analysis['معدلات_الحالة'][status] = {
+                'العدد': count,
+                'النسبة': round(count/total*100, 1) if total > 0 else 0
+            }
+
+    return analysis
+
+
+def analyze_cities_performance_samsa(df, city_filter=None, country_filter=None):
+    """تحليل أداء المدن لـ Samsa"""
+    if 'المدينة_الوجهة' not in df.columns:
+        return pd.DataFrame()
+
+    # تطبيق الفلاتر
+    df_filtered = df.copy()
+
+    # استثناء الشحنات المستثناة
+    df_filtered = df_filtered[~df_filtered.get('مستثنى', False)]
+
+    if city_filter and city_filter != 'الكل':
+        df_filtered = df_filtered[df_filtered['المدينة_الوجهة'] == city_filter]
+    if country_filter and country_filter != 'الكل' and 'الدولة_الوجهة' in df.columns:
+        df_filtered = df_filtered[df_filtered['الدولة_الوجهة'] == country_filter]
+
+    if len(df_filtered) == 0:
+        return pd.DataFrame()
+
+    agg_dict = {'رقم_الشحنة': 'count'}
+
+    if 'حالة_التسليم' in df_filtered.columns:
+        df_filtered['تم_التسليم'] = (df_filtered['حالة_التسليم'] == 'تم التسليم').astype(int)
+        agg_dict['تم_التسليم'] = 'sum'
+
+    if 'أيام_التوصيل' in df_filtered.columns and 'حالة_التسليم' in df_filtered.columns:
+        # حساب متوسط أيام التوصيل للشحنات المسلمة فقط
+        delivered_mask = df_filtered['حالة_التسليم'] == 'تم التسليم'
+        df_filtered['أيام_التوصيل_مسلم'] = df_filtered['أيام_التوصيل'].where(delivered_mask)
+        agg_dict['أيام_التوصيل_مسلم'] = lambda x: x.dropna().mean()
+
+    if 'أيام_المحاولة_الأولى' in df_filtered.columns:
+        agg_dict['أيام_المحاولة_الأولى'] = lambda x: x.dropna().mean()
+
+    # تجميع حسب المدينة
+    city_analysis = df_filtered.groupby('المدينة_الوجهة', observed=True).agg(agg_dict)
+
+    # إعادة تسمية الأعمدة
+    rename_dict = {'رقم_الشحنة': 'عدد_الشحنات'}
+    if 'تم_التسليم' in agg_dict:
+        rename_dict['تم_التسليم'] = 'المسلم'
+    if 'أيام_التوصيل_مسلم' in city_analysis.columns:
+        rename_dict['أيام_التوصيل_مسلم'] = 'متوسط_أيام_للتوصيل'
+    if 'أيام_المحاولة_الأولى' in city_analysis.columns:
+        rename_dict['أيام_المحاولة_الأولى'] = 'متوسط_أيام_المحاولة_الأولى'
+
+    city_analysis = city_analysis.rename(columns=rename_dict)
+
+    # حساب نسبة التسليم
+    if 'المسلم' in city_analysis.columns:
+        city_analysis['نسبة_التسليم'] = (city_analysis['المسلم'] / city_analysis['عدد_الشحنات'] * 100).round(1)
+
+    # تقريب القيم
+    for col in ['متوسط_أيام_للتوصيل', 'متوسط_أيام_المحاولة_الأولى']:
+        if col in city_analysis.columns:
+            city_analysis[col] = city_analysis[col].round(1)
+
+    return city_analysis.sort_values('عدد_الشحنات', ascending=False)
+
+
+def to_canonical(df, sla_df=None):
+    """الجدول الموحد (shipping_core.schema) من ناتج process_samsa_data
+
+    SLA و FDS على الشحنات التي لها SLA فقط، والمستثنى = الالتقاط.
+    """
+    has_sla = source_column(df, 'SLA_أيام').notna()
+    return conform(pd.DataFrame({
+        'رقم_الشحنة': source_column(df, 'رقم_الشحنة'),
+        'المدينة_الوجهة': source_column(df, 'المدينة_الوجهة'),
+        'المنطقة': source_column(df, 'المنطقة'),
+        'تاريخ_الأساس': source_column(df, 'تاريخ_الإنشاء', pd.NaT),
+        'تاريخ_أول_محاولة': source_column(df, 'تاريخ_أول_محاولة', pd.NaT),
+        'تاريخ_التسليم': source_column(df, 'تاريخ_التسليم', pd.NaT),
+        'حالة_التسليم': source_column(df, 'حالة_التسليم', PENDING),
+        'مستثنى': source_column(df, 'مستثنى', False),
+        'SLA_أيام': source_column(df, 'SLA_أيام'),
+        'أيام_المحاولة_الأولى': source_column(df, 'أيام_المحاولة_الأولى'),
+        'له_SLA': has_sla,
+        'ضمن_SLA': has_sla & source_column(df, 'حالة_SLA_محاولة_أولى', '').isin(['قبل SLA', 'في SLA']),
+        'أساس_FDS': has_sla,
+        'FDS': has_sla & (source_column(df, 'تسليم_أول_محاولة', False) == True),
+    }, index=df.index), 'smsa')
@@ -0,0 +1,190 @@
+# shipping_core/snapshots.py - نسخ محفوظة من بيانات كل شركة عند كل رفع ومقارنة أي نسختين
+"""
+كل حفظ لبيانات شركة (رفع ملف جديد أو معالجة دفعية) يحفظ الجدول الموحد (shipping_core.schema)
+كنسخة Parquet في <SHIPPING_SNAPSHOTS_DIR>/<carrier>/ مع ملف JSON صغير بوصفها، بدلاً من
+استبدال البيانات السابقة. يُحتفظ بآخر SHIPPING_SNAPSHOT_KEEP نسخة (الافتراضي 10، و 0 يعطل).
+
+diff_snapshots تربط نسختين برقم الشحنة (hash join واحد) وتحسب في نفس التمرير:
+انتقالات الحالة (قيد التوصيل ← تم التسليم ...)، الشحنات الجديدة والمحذوفة، الشحنات التي
+أصبحت متأخرة، وتغير المؤشرات.
+
+    save_snapshot('aramex', frame, source='aramex_march.xlsx')
+    old, new = list_snapshots('aramex')[1], list_snapshots('aramex')[0]
+    diff = diff_snapshots(load_snapshot(old), load_snapshot(new))
+    diff['transitions']      # من، إلى، الشحنات
+"""
+import json
+import logging
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from shipping_core.cache import fingerprint
+from shipping_core.engine import overall_kpis
+from shipping_core.schema import PENDING, conform
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOTS_DIR_ENV = 'SHIPPING_SNAPSHOTS_DIR'
+DEFAULT_SNAPSHOTS_DIR = 'snapshots'
+SNAPSHOT_KEEP_ENV = 'SHIPPING_SNAPSHOT_KEEP'
+DEFAULT_SNAPSHOT_KEEP = 10
+
+# أعمدة كل نسخة المستخدمة في المقارنة
+_DIFF_COLUMNS = ['رقم_الشحنة', 'المدينة_الوجهة', 'تاريخ_الأساس', 'حالة_التسليم', 'SLA_أيام', 'متأخر']
+
+DIFF_KPIS = {'volume': 'الشحنات', 'dr': 'DR', 'fds': 'FDS', 'sla': 'SLA', 'pending': 'Pending'}
+
+
+def get_snapshots_root():
+    return os.environ.get(SNAPSHOTS_DIR_ENV, DEFAULT_SNAPSHOTS_DIR)
+
+
+def get_snapshot_keep():
+    """عدد النسخ المحفوظة لكل شركة - 0 يعطل الحفظ"""
+    try:
+        return max(0, int(os.environ.get(SNAPSHOT_KEEP_ENV, DEFAULT_SNAPSHOT_KEEP)))
+    except ValueError:
+        logger.warning("قيمة غير صالحة لـ %s، استخدام %s", SNAPSHOT_KEEP_ENV, DEFAULT_SNAPSHOT_KEEP)
+        return DEFAULT_SNAPSHOT_KEEP
+
+
+def list_snapshots(carrier, root=None):
+    """نسخ الشركة من الأحدث للأقدم [{id, carrier, source, created_at, rows, content_hash, path}]"""
+    directory = os.path.join(root or get_snapshots_root(), carrier)
+    if not os.path.isdir(directory):
+        return []
+    snapshots = []
+    for name in os.listdir(directory):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("تجاهل وصف نسخة غير صالح %s: %s", name, e)
+            continue
+        snapshot['path'] = os.path.join(directory, snapshot['file'])
+        if os.path.exists(snapshot['path']):
+            snapshots.append(snapshot)
+    return sorted(snapshots, key=lambda snapshot: snapshot['id'], reverse=True)
+
+
+def save_snapshot(carrier, frame, source=None, root=None):
+    """حفظ الجدول الموحد كنسخة جديدة - يرجع وصف النسخة، أو None إذا طابقت آخر نسخة أو كان الحفظ معطلاً"""
+    keep = get_snapshot_keep()
+    if keep == 0 or len(frame) == 0:
+        return None
+
+    root = root or get_snapshots_root()
+    content_hash = fingerprint(frame)
+    snapshots = list_snapshots(carrier, root)
+    if snapshots and snapshots[0]['content_hash'] == content_hash:
+        return None
+
+    created_at = datetime.now()
+    snapshot_id = f"{created_at:%Y%m%d-%H%M%S-%f}-{content_hash[:8]}"
+    directory = os.path.join(root, carrier)
+    os.makedirs(directory, exist_ok=True)
+    frame.to_parquet(os.path.join(directory, f"{snapshot_id}.parquet"), index=False, compression='zstd')
+
+    snapshot = {
+        'id': snapshot_id,
+        'carrier': carrier,
+        'source': source,
+        'created_at': created_at.isoformat(timespec='seconds'),
+        'rows': int(len(frame)),
+        'content_hash': content_hash,
+        'file': f"{snapshot_id}.parquet",
+    }
+    with open(os.path.join(directory, f"{snapshot_id}.json"), 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False, indent=2)
+
+    for old in snapshots[keep - 1:]:
+        for path in (old['path'], os.path.join(directory, f"{old['id']}.json")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    logger.info("حفظ نسخة %s من %s (%s شحنة)", snapshot_id, carrier, f"{len(frame):,}")
+    return {**snapshot, 'path': os.path.join(directory, snapshot['file'])}
+
+
+def keep_snapshot(carrier, frame, source=None):
+    """حفظ نسخة إن كان الحفظ مفعلاً - لا يوقف المعالجة عند الفشل"""
+    try:
+        return save_snapshot(carrier, frame, source)
+    except (OSError, ValueError) as e:
+        logger.warning("تعذر حفظ نسخة من بيانات %s: %s", carrier, e)
+        return None
+
+
+def load_snapshot(snapshot):
+    """الجدول الموحد لنسخة"""
+    return conform(pd.read_parquet(snapshot['path']))
+
+
+def delayed_mask(frame, as_of=None):
+    """الشحنات المتأخرة عن SLA في نسخة: محاولة أولى خارج SLA، أو قيد التوصيل بدون محاولة
+    وعمرها حتى as_of (الافتراضي آخر تاريخ أساس في النسخة) تجاوز SLA"""
+    if as_of is None:
+        as_of = frame['تاريخ_الأساس'].max()
+    attempted = frame['أيام_المحاولة_الأولى'].notna()
+    late_attempt = attempted & ~frame['ضمن_SLA']
+    age = (as_of - frame['تاريخ_الأساس']).dt.days
+    waiting = ~attempted & (frame['حالة_التسليم'] == PENDING) & (age > frame['SLA_أيام'])
+    return ~frame['مستثنى'] & frame['له_SLA'] & (late_attempt | waiting)
+
+
+def _keyed(frame):
+    """أعمدة المقارنة للصفوف التي لها رقم شحنة (آخر صف لكل رقم)"""
+    frame = frame.assign(متأخر=delayed_mask(frame))
+    frame = frame[frame['رقم_الشحنة'].notna()]
+    return frame.loc[~frame['رقم_الشحنة'].duplicated(keep='last'), _DIFF_COLUMNS]
+
+
+def diff_snapshots(old, new):
+    """مقارنة نسختين من الجدول الموحد برقم الشحنة
+
+    يرجع قاموساً: matched و added و removed و changed (أعداد)، transitions (من، إلى، الشحنات)،
+    newly_delayed (شحنات متأخرة في الجديدة ولم تكن متأخرة أو موجودة في القديمة)، و kpis
+    (المؤشر، القديم، الجديد، التغير).
+    """
+    joined = _keyed(old).merge(_keyed(new), on='رقم_الشحنة', how='outer', suffixes=('_قديم', '_جديد'),
+                               indicator=True, sort=False)
+    side = joined['_merge'].to_numpy()
+    both = side == 'both'
+
+    old_status = joined['حالة_التسليم_قديم']
+    new_status = joined['حالة_التسليم_جديد']
+    changed = both & (old_status.cat.codes.to_numpy() != new_status.cat.codes.to_numpy())
+
+    transitions = (pd.DataFrame({'من': old_status[changed], 'إلى': new_status[changed]})
+                   .groupby(['من', 'إلى'], observed=True).size().rename('الشحنات')
+                   .sort_values(ascending=False).reset_index())
+
+    newly_delayed = joined['متأخر_جديد'].eq(True).to_numpy() & ~joined['متأخر_قديم'].eq(True).to_numpy()
+    delayed = joined.loc[newly_delayed, ['رقم_الشحنة', 'المدينة_الوجهة_جديد', 'تاريخ_الأساس_جديد',
+                                         'حالة_التسليم_قديم', 'حالة_التسليم_جديد', 'SLA_أيام_جديد']]
+    delayed = delayed.rename(columns={'المدينة_الوجهة_جديد': 'المدينة_الوجهة', 'تاريخ_الأساس_جديد': 'تاريخ_الأساس',
+                                      'SLA_أيام_جديد': 'SLA_أيام'}).reset_index(drop=True)
+
+    old_kpis, new_kpis = overall_kpis(old), overall_kpis(new)
+    kpis = pd.DataFrame([{
+        'المؤشر': label,
+        'القديم': old_kpis[name],
+        'الجديد': new_kpis[name],
+        'التغير': (round(new_kpis[name] - old_kpis[name], 1)
+                   if old_kpis[name] is not None and new_kpis[name] is not None else None),
+    } for name, label in DIFF_KPIS.items()])
+
+    return {
+        'matched': int(both.sum()),
+        'added': int((side == 'right_only').sum()),
+        'removed': int((side == 'left_only').sum()),
+        'changed': int(changed.sum()),
+        'transitions': transitions,
+        'newly_delayed': delayed,
+        'kpis': kpis,
+    }
@@ -0,0 +1,128 @@
+# shipping_core/summary.py - ملخص مؤشرات كل شركة شحن كملف JSON صغير للصفحة الرئيسية
+"""
+عند معالجة بيانات أي شركة (من لوحة التحكم أو batch_process.py) يُكتب ملخص صغير
+(حجم الشحنات و DR و FDS و SLA% و Pending واتجاه آخر أسبوع) في
+<SHIPPING_SUMMARIES_DIR>/<carrier>.json، حتى تعرض الصفحة الرئيسية مقارنة الشركات
+بقراءة ملفات JSON فقط بدون تحميل جداول الشحنات.
+
+المؤشرات بنفس تعريفات بطاقات KPI في صفحة كل شركة (بدون فلاتر)، وتُحسب لجميع الشركات
+بمحرك المؤشرات المشترك (shipping_core.engine) بعد تحويل البيانات للجدول الموحد.
+"""
+import json
+import logging
+import os
+from datetime import datetime
+
+from shipping_core.adapters import to_canonical
+from shipping_core.engine import overall_kpis, weekly_kpis
+
+logger = logging.getLogger(__name__)
+
+SUMMARIES_DIR_ENV = 'SHIPPING_SUMMARIES_DIR'
+DEFAULT_SUMMARIES_DIR = 'summaries'
+
+# عدد الأسابيع المحفوظة في الملخص لعرض الاتجاه
+TREND_WEEKS = 8
+
+KPI_NAMES = ('dr', 'fds', 'sla', 'pending')
+
+
+def get_summaries_dir():
+    """مجلد ملفات الملخص"""
+    return os.environ.get(SUMMARIES_DIR_ENV, DEFAULT_SUMMARIES_DIR)
+
+
+def _trend(weeks):
+    """آخر الأسابيع مع تغير مؤشرات آخر أسبوع عن الأسبوع السابق"""
+    weeks = weeks[-TREND_WEEKS:]
+    last_week = dict(weeks[-1]) if weeks else None
+    if last_week is not None and len(weeks) > 1:
+        previous = weeks[-2]
+        for name in KPI_NAMES:
+            if last_week.get(name) is not None and previous.get(name) is not None:
+                last_week[f"{name}_change"] = round(last_week[name] - previous[name], 1)
+    return last_week, weeks
+
+
+def canonical_summary(carrier, frame):
+    """ملخص الشركة من الجدول الموحد (shipping_core.schema) بمحرك المؤشرات المشترك"""
+    overall = overall_kpis(frame)
+    weeks = [{
+        'week': row['week'],
+        'volume': int(row['volume']),
+        'dr': row['dr'],
+        'fds': row['fds'],
+        'sla': row['sla'],
+        'pending': row['pending_rate'],
+    } for row in weekly_kpis(frame).to_dict('records')]
+
+    last_week, trend = _trend(weeks)
+    return {
+        'carrier': carrier,
+        'volume': overall['volume'],
+        'delivered': overall['delivered'],
+        **{name: overall[name] for name in KPI_NAMES},
+        'last_week': last_week,
+        'trend': trend,
+        'excluded': int(frame['مستثنى'].sum()),
+    }
+
+
+def aramex_summary(df_with_sla):
+    """ملخص Aramex من البيانات بعد add_sla_and_fds_columns"""
+    return summarize('aramex', df_with_sla)
+
+
+def smsa_summary(processed):
+    """ملخص Samsa من ناتج process_samsa_data - SLA و FDS على الشحنات التي لها SLA فقط"""
+    return summarize('smsa', processed)
+
+
+def niceone_summary(analyzed):
+    """ملخص NiceOne من ناتج analyze_attempts - FDS = التسليم من المحاولة الأولى (لا يوجد SLA)"""
+    return summarize('niceone', analyzed)
+
+
+def summarize(carrier, df, sla_df=None):
+    """ملخص الشركة من البيانات المحفوظة في لوحة التحكم (المحول يكمل المعالجة الناقصة)
+
+    Aramex: البيانات قبل أو بعد إضافة SLA، NiceOne: البيانات قبل أو بعد analyze_attempts.
+    """
+    return canonical_summary(carrier, to_canonical(carrier, df, sla_df))
+
+
+def write_summary(summary, source=None, directory=None):
+    """كتابة الملخص في <directory>/<carrier>.json (استبدال ذري) - يرجع المسار أو None عند الفشل"""
+    directory = directory or get_summaries_dir()
+    path = os.path.join(directory, f"{summary['carrier']}.json")
+    record = {**summary, 'source': source, 'updated_at': datetime.now().isoformat(timespec='seconds')}
+    try:
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, indent=2, default=str)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("تعذر كتابة ملخص %s: %s", summary['carrier'], e)
+        return None
+    return path
+
+
+def read_summary(carrier, directory=None):
+    """قراءة ملخص شركة أو None إذا لم يُكتب"""
+    path = os.path.join(directory or get_summaries_dir(), f"{carrier}.json")
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_summaries(carriers=('niceone', 'aramex', 'smsa'), directory=None):
+    """ملخصات الشركات المتاحة {carrier: summary}"""
+    summaries = {}
+    for carrier in carriers:
+        summary = read_summary(carrier, directory)
+        if summary is not None:
+            summaries[carrier] = summary
+    return summaries
@@ -0,0 +1,320 @@
+# shipping_core/synthetic.py - توليد بيانات تجريبية واقعية لملفات Aramex و Samsa و NiceOne
+"""
+جميع المولدات تعمل على مصفوفات numpy كاملة (بدون حلقات على الصفوف) حتى يمكن
+توليد ملايين الصفوف لاختبار مسارات القراءة والمعالجة الحقيقية.
+"""
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# أحجام البيانات القياسية لاختبارات الأداء
+SCALES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+    '5m': 5_000_000,
+}
+
+# الحد الأقصى لعدد الصفوف في ورقة Excel واحدة (بدون صف العناوين)
+EXCEL_MAX_ROWS = 1_048_575
+
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+
+DATE_FORMATS = ('datetime', 'iso', 'dmy', 'serial', 'mixed')
+
+CITIES = [
+    'Riyadh', 'Jeddah', 'Dammam', 'Makkah', 'Madinah', 'Khobar', 'Taif', 'Tabuk',
+    'Abha', 'Buraidah', 'Hail', 'Jazan', 'Najran', 'Al Ahsa', 'Yanbu', 'Khamis Mushait',
+    'Jubail', 'Qatif', 'Al Kharj', 'Hafar Al Batin', 'Al Baha', 'Arar', 'Sakaka',
+    'Unaizah', 'Al Qunfudhah', 'Bisha', 'Dhahran', 'Al Majmaah', 'Rabigh', 'Al Ula'
+]
+
+ARABIC_CITIES = ['الرياض', 'جدة', 'الدمام', 'مكة', 'المدينة', 'الخبر', 'الطائف', 'تبوك', 'أبها', 'بريدة']
+
+# مفردات الحالات كما تظهر في ملفات Aramex (مجموعة من كل تصنيف في process_aramex_data)
+ARAMEX_STATUSES = {
+    'delivered': ['Delivered', 'SHIPMENT DELIVERED', 'Shipment Delivered OK', 'PAID'],
+    'in_progress': ['Out For Delivery', 'IN TRANSIT', 'At Destination Facility', 'Held for Pickup',
+                    'Customer Not Available', 'NO RESPONSE', 'Incorrect Address', 'SORTING'],
+    'returned': ['Return to Shipper', 'RETURNED', 'Refused', 'Customer Has Refused The Shipment', 'Cancelled'],
+    'lost': ['LOST', 'PICKUP'],
+    'other': ['Awaiting Documents', 'Damaged', 'Under Investigation'],
+}
+ARAMEX_STATUS_WEIGHTS = {'delivered': 0.72, 'in_progress': 0.15, 'returned': 0.08, 'lost': 0.01, 'other': 0.04}
+
+SMSA_STATUSES = {
+    'delivered': ['Delivered', 'DELIVERED TO CONSIGNEE', 'Proof of Delivery Received'],
+    'in_progress': ['Out for Delivery', 'In Transit', 'Arrived at Delivery Facility', 'Consignee Not Available'],
+    'returned': ['Returned to Shipper', 'Refused by Consignee', 'Failed Delivery Attempt'],
+    'excluded': ['Picked Up', 'Awaiting Pickup'],
+}
+SMSA_STATUS_WEIGHTS = {'delivered': 0.7, 'in_progress': 0.17, 'returned': 0.08, 'excluded': 0.05}
+
+SMSA_REGIONS = ['Central', 'Western', 'Eastern', 'Southern', 'Northern']
+
+NICEONE_STATUSES = ['Delivered Confirmed', 'In Progress', 'Failed Delivery']
+NICEONE_STATUS_WEIGHTS = [0.8, 0.15, 0.05]
+NICEONE_NAMES = ['أحمد محمد', 'فاطمة علي', 'خالد سعد', 'نور الهدى', 'عمر يوسف']
+NICEONE_DRIVERS = ['أحمد عادل', 'محمد خالد', 'مرسال أمين', 'سعد الدوسري', 'فهد العتيبي']
+NICEONE_BRANCHES = ['Aqiq', 'Labn', 'Naseem', 'Tabuk', 'Olaya', 'Malqa']
+
+
+def parse_scale(value):
+    """تحويل '100k' أو '1m' أو رقم إلى عدد صفوف"""
+    text = str(value).strip().lower().replace(',', '').replace('_', '')
+    if text in SCALES:
+        return SCALES[text]
+    if text.endswith('k'):
+        return int(float(text[:-1]) * 1_000)
+    if text.endswith('m'):
+        return int(float(text[:-1]) * 1_000_000)
+    return int(text)
+
+
+def _weighted_cities(rng, n, cities=CITIES):
+    """اختيار المدن بتوزيع غير منتظم (المدن الكبيرة أكثر تكراراً)"""
+    weights = 1.0 / np.arange(1, len(cities) + 1)
+    return rng.choice(np.array(cities, dtype=object), size=n, p=weights / weights.sum())
+
+
+def _statuses(rng, n, vocabulary, weights):
+    """اختيار تصنيف الحالة ثم حالة عشوائية من مفرداته - يرجع (الحالات, التصنيفات)"""
+    groups = list(vocabulary)
+    probs = np.array([weights[group] for group in groups], dtype=float)
+    group_idx = rng.choice(len(groups), size=n, p=probs / probs.sum())
+
+    statuses = np.empty(n, dtype=object)
+    for i, group in enumerate(groups):
+        mask = group_idx == i
+        statuses[mask] = rng.choice(np.array(vocabulary[group], dtype=object), size=mask.sum())
+
+    return statuses, np.array(groups, dtype=object)[group_idx]
+
+
+def _random_timestamps(rng, n, start, days):
+    """تواريخ عشوائية خلال فترة محددة مع وقت خلال ساعات العمل"""
+    day_offsets = rng.integers(0, days, size=n)
+    seconds = rng.integers(8 * 3600, 20 * 3600, size=n)
+    return pd.Timestamp(start) + pd.to_timedelta(day_offsets, unit='D') + pd.to_timedelta(seconds, unit='s')
+
+
+def _add_days(timestamps, days, mask=None):
+    """إضافة أيام إلى التواريخ مع إرجاع NaT خارج القناع"""
+    result = pd.DatetimeIndex(timestamps) + pd.to_timedelta(days, unit='D')
+    if mask is not None:
+        result = result.where(mask)
+    return result
+
+
+def format_dates(timestamps, style, rng=None):
+    """تحويل التواريخ إلى صيغة ملفات التصدير
+
+    datetime: قيم تاريخ Excel، iso: نص YYYY-MM-DD HH:MM:SS، dmy: نص DD/MM/YYYY،
+    serial: أرقام Excel التسلسلية، mixed: خليط من الصيغ السابقة في نفس العمود.
+    """
+    timestamps = pd.DatetimeIndex(timestamps)
+    if style == 'datetime':
+        return timestamps
+    if style == 'iso':
+        return timestamps.strftime('%Y-%m-%d %H:%M:%S')
+    if style == 'dmy':
+        return timestamps.strftime('%d/%m/%Y')
+    if style == 'serial':
+        return np.round((timestamps - EXCEL_EPOCH) / pd.Timedelta(days=1), 5)
+    if style == 'mixed':
+        rng = rng or np.random.default_rng()
+        choice = rng.integers(0, 4, size=len(timestamps))
+        result = np.asarray(timestamps.astype(object))
+        for code, sub_style in enumerate(('iso', 'dmy', 'serial'), start=1):
+            mask = choice == code
+            result[mask] = np.asarray(format_dates(timestamps[mask], sub_style), dtype=object)
+        return result
+    raise ValueError(f"صيغة تاريخ غير معروفة: {style}")
+
+
+def generate_aramex(n, seed=0, start='2025-01-01', days=90, date_format='datetime', return_rate=0.03):
+    """توليد ملف Aramex بأعمدة ورقة 'Detailed Data'"""
+    rng = np.random.default_rng(seed)
+    statuses, groups = _statuses(rng, n, ARAMEX_STATUSES, ARAMEX_STATUS_WEIGHTS)
+
+    pickup = _random_timestamps(rng, n, start, days)
+    attempted = groups != 'other'
+    first_gap = rng.choice(np.arange(8), size=n, p=[0.08, 0.35, 0.25, 0.14, 0.08, 0.05, 0.03, 0.02])
+    first_attempt = _add_days(pickup, first_gap, attempted)
+
+    delivered = groups == 'delivered'
+    attempts = np.where(attempted, rng.choice([1, 2, 3], size=n, p=[0.78, 0.16, 0.06]), 0)
+    second_attempt = _add_days(first_attempt, rng.integers(1, 3, size=n), attempts >= 2)
+    third_attempt = _add_days(second_attempt, rng.integers(1, 3, size=n), attempts >= 3)
+    last_attempt = pd.Series(third_attempt).fillna(pd.Series(second_attempt)).fillna(pd.Series(first_attempt))
+    delivery = pd.DatetimeIndex(last_attempt).where(delivered)
+
+    references = np.char.add('ORD', rng.integers(100000, 999999, size=n).astype(str)).astype(object)
+    returns = rng.random(n) < return_rate
+    references[returns] = references[returns] + '_return'
+
+    df = pd.DataFrame({
+        'AWB': np.arange(40_000_000_000, 40_000_000_000 + n),
+        'Status': statuses,
+        'Origin City': 'Riyadh',
+        'Destination City': _weighted_cities(rng, n),
+        'Destination Country': rng.choice(['SA', 'AE', 'KW'], size=n, p=[0.94, 0.04, 0.02]),
+        'Destination city tier': rng.choice(['Tier 1', 'Tier 2', 'Tier 3'], size=n, p=[0.6, 0.3, 0.1]),
+        'Pickup Date (Creation Date)': format_dates(pickup, date_format, rng),
+        'First Out For Delivery': format_dates(first_attempt, date_format, rng),
+        '2nd Delivery Attempt': format_dates(second_attempt, date_format, rng),
+        '3rd Delivery Attempt': format_dates(third_attempt, date_format, rng),
+        'Total Delivery Attempts': attempts,
+        'Last Attempted Delivery Action Date': format_dates(last_attempt, date_format, rng),
+        'Delivery Date': format_dates(delivery, date_format, rng),
+        'Transit Days': first_gap,
+        'Weight': np.round(rng.gamma(2.0, 1.2, size=n), 2),
+        'COD Value': np.round(rng.uniform(0, 900, size=n), 2),
+        'Consignee Reference 1': references,
+    })
+    return df
+
+
+def generate_smsa(n, seed=0, start='2025-01-01', days=90, date_format='dmy'):
+    """توليد ملف Samsa بأسماء الأعمدة الأصلية"""
+    rng = np.random.default_rng(seed)
+    statuses, groups = _statuses(rng, n, SMSA_STATUSES, SMSA_STATUS_WEIGHTS)
+
+    creation = _random_timestamps(rng, n, start, days)
+    pickup = _add_days(creation, rng.choice([0, 1, 2], size=n, p=[0.6, 0.3, 0.1]), groups != 'excluded')
+    first_attempt = _add_days(pickup, rng.choice(np.arange(7), size=n, p=[0.1, 0.35, 0.25, 0.15, 0.08, 0.05, 0.02]),
+                              groups != 'excluded')
+    delivery = _add_days(first_attempt, rng.choice([0, 1, 2, 3], size=n, p=[0.75, 0.15, 0.07, 0.03]),
+                         groups == 'delivered')
+
+    cities = _weighted_cities(rng, n)
+    df = pd.DataFrame({
+        'AWB': np.arange(290_000_000_000, 290_000_000_000 + n),
+        'Shipper Name': 'NiceOne Trading',
+        'Consignee Name': rng.choice(np.array(NICEONE_NAMES, dtype=object), size=n),
+        'Consignee Phone': np.char.add('9665', rng.integers(10_000_000, 99_999_999, size=n).astype(str)),
+        'Consignee City': cities,
+        'Consignee Address': np.char.add('Street ', rng.integers(1, 500, size=n).astype(str)).astype(object) + ', ' + cities,
+        'COD': np.round(rng.uniform(0, 900, size=n), 2),
+        'PCs': rng.integers(1, 5, size=n),
+        'Weight(KG)': np.round(rng.gamma(2.0, 1.2, size=n), 2),
+        'Contents': 'Cosmetics',
+        'Creation date': format_dates(creation, date_format, rng),
+        'Pickup date': format_dates(pickup, date_format, rng),
+        'First attempt': format_dates(first_attempt, date_format, rng),
+        'Delivery date': format_dates(delivery, date_format, rng),
+        'Status': statuses,
+        '3PL Company': 'SMSA',
+        'Region': rng.choice(np.array(SMSA_REGIONS, dtype=object), size=n),
+    })
+    return df
+
+
+def generate_niceone(n, seed=0, start='2025-01-01', days=30, serial_rate=0.05, include_index=True):
+    """توليد الملف الرئيسي لـ NiceOne (الأعمدة العربية كما في التصدير الأصلي)
+
+    جزء من تواريخ الاستلام يُكتب كأرقام Excel تسلسلية كما يحدث في الملفات الفعلية.
+    """
+    rng = np.random.default_rng(seed)
+    receive = pd.DatetimeIndex(pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, size=n), unit='D'))
+    extra_attempt = rng.random(n) >= 0.7
+    ship = _add_days(receive, np.where(extra_attempt, rng.integers(1, 5, size=n), 0))
+
+    receive_values = np.asarray(receive.strftime('%Y-%m-%dT%H:%M:%S.000Z'), dtype=object)
+    serial = rng.random(n) < serial_rate
+    receive_values[serial] = np.asarray((receive[serial] - EXCEL_EPOCH) / pd.Timedelta(days=1))
+
+    row_ids = np.arange(n)
+    df = pd.DataFrame({
+        'رقم الطلب': np.char.add('960037', (64000 + row_ids).astype(str)),
+        'رقم التتبع': np.char.add('273', (19000 + row_ids).astype(str)),
+        'اسم العميل': rng.choice(np.array(NICEONE_NAMES, dtype=object), size=n),
+        'هاتف العميل': np.char.add('96656', rng.integers(1_000_000, 9_999_999, size=n).astype(str)),
+        'موقع العميل': _weighted_cities(rng, n, ARABIC_CITIES) + ', المملكة العربية السعودية',
+        'المطلوب تحصيله': np.round(rng.uniform(50, 800, size=n), 2),
+        'السبب': 'Order Purchase',
+        'حالة الطلب': rng.choice(np.array(NICEONE_STATUSES, dtype=object), size=n, p=NICEONE_STATUS_WEIGHTS),
+        'رقم ورقة التشغيل': np.char.add('611511', (4 + row_ids % 3).astype(str)),
+        'الرقم التعريفي': rng.integers(700, 900, size=n),
+        'اسم المندوب': rng.choice(np.array(NICEONE_DRIVERS, dtype=object), size=n),
+        'تاريخ استلام الشحنة': receive_values,
+        'تاريخ الشحن': ship.strftime('%d/%m/%Y'),
+    })
+
+    if include_index:
+        df.insert(0, '#', row_ids + 1)
+    return df
+
+
+def generate_niceone_branches(main_df, seed=0, coverage=0.6, branches=NICEONE_BRANCHES):
+    """توليد ملفات الفروع لأرقام تتبع من الملف الرئيسي - يرجع {اسم_الملف: DataFrame}"""
+    rng = np.random.default_rng(seed)
+    tracking = main_df['رقم التتبع'].to_numpy()
+    covered = tracking[rng.random(len(tracking)) < coverage]
+    branch_idx = rng.integers(0, len(branches), size=len(covered))
+    branch_dates = pd.Timestamp('2025-01-01') + pd.to_timedelta(rng.integers(0, 60, size=len(covered)), unit='D')
+
+    files = {}
+    for i, branch in enumerate(branches):
+        mask = branch_idx == i
+        files[f"branch_{i + 1}_{branch}.xlsx"] = pd.DataFrame({
+            '#': np.arange(1, mask.sum() + 1),
+            'Reference ID': covered[mask],
+            'Branch Name': branch,
+            'Date': branch_dates[mask],
+        })
+    return files
+
+
+def generate_sla(cities=CITIES, seed=0):
+    """توليد ملف SLA (المدينة، عدد الأيام) - المدن الكبيرة بأيام أقل"""
+    rng = np.random.default_rng(seed)
+    base_days = np.where(np.arange(len(cities)) < 5, 1, 2)
+    return pd.DataFrame({
+        'City': cities,
+        'SLA Days': base_days + rng.integers(0, 3, size=len(cities)),
+    })
+
+
+def write_export(df, path, sheet_name='Sheet1'):
+    """كتابة ملف تصدير بصيغة csv أو xlsx حسب الامتداد"""
+    if path.endswith('.csv'):
+        df.to_csv(path, index=False, encoding='utf-8')
+    else:
+        if len(df) > EXCEL_MAX_ROWS:
+            raise ValueError(f"عدد الصفوف {len(df):,} أكبر من حد Excel ({EXCEL_MAX_ROWS:,}) - استخدم csv")
+        df.to_excel(path, index=False, sheet_name=sheet_name)
+    return path
+
+
+def write_dataset(carrier, rows, output_dir, file_format='csv', seed=0, date_format=None):
+    """توليد ملف شركة شحن وكتابته مع ملفاته المرجعية (SLA أو الفروع) - يرجع قائمة المسارات"""
+    os.makedirs(output_dir, exist_ok=True)
+    label = f"{carrier}_{rows:,}".replace(',', '_')
+    path = os.path.join(output_dir, f"{label}.{file_format}")
+    written = []
+
+    if carrier == 'aramex':
+        df = generate_aramex(rows, seed=seed, date_format=date_format or 'datetime')
+        written.append(write_export(df, path, sheet_name='Detailed Data'))
+        written.append(write_export(generate_sla(seed=seed), os.path.join(output_dir, 'aramex_sla.xlsx')))
+    elif carrier == 'smsa':
+        df = generate_smsa(rows, seed=seed, date_format=date_format or 'dmy')
+        written.append(write_export(df, path))
+        written.append(write_export(generate_sla(seed=seed + 1), os.path.join(output_dir, 'smsa_sla.xlsx')))
+    elif carrier == 'niceone':
+        df = generate_niceone(rows, seed=seed)
+        written.append(write_export(df, path))
+        branch_dir = os.path.join(output_dir, f"{label}_branches")
+        os.makedirs(branch_dir, exist_ok=True)
+        for name, branch_df in generate_niceone_branches(df, seed=seed).items():
+            written.append(write_export(branch_df, os.path.join(branch_dir, name)))
+    else:
+        raise ValueError(f"شركة شحن غير معروفة: {carrier}")
+
+    logger.info("تم توليد %s (%s صف)", path, f"{rows:,}")
+    return written
@@ -0,0 +1,153 @@
+# shipping_core/text_index.py - فهرس مقلوب للبحث النصي في أسماء وعناوين المستلمين
+"""
+TextIndex يُبنى مرة واحدة لكل نسخة جدول (مع فهرس المعرفات في shipping_core.lookup) من أعمدة
+النص الحر الموجودة فيه (TEXT_COLUMNS). كل نص يُوحد (أشكال الألف والهمزة، ى، ة، التشكيل
+والتطويل) ويُقسم إلى كلمات، ثم تُحفظ لكل كلمة مواضع الصفوف التي تحتويها مرتبة حسب الكلمة.
+
+البحث بعدة كلمات يرجع الصفوف التي تحتوي كل الكلمات (في أي عمود نصي)، وكل كلمة في
+الاستعلام تطابق الكلمات التي تبدأ بها ("الريا" تطابق "الرياض")، والكلمات المبدوءة بـ "ال"
+تُفهرس أيضاً بدونها ("رياض" تطابق "الرياض").
+
+    index = build_text_index(df)       # None إذا لم يحتوِ الجدول على أعمدة نصية
+    positions = index.search('احمد حي النسيم')
+    df.iloc[positions]
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# أعمدة النص الحر للبحث
+TEXT_COLUMNS = ['اسم_المستلم', 'عنوان_المستلم', 'اسم العميل', 'موقع العميل']
+
+# أقل طول لكلمة في الاستعلام لمطابقة بداية الكلمات (الأقصر تطابق الكلمة كاملة فقط)
+MIN_PREFIX_LENGTH = 2
+
+# أشكال الحروف الموحدة (الهمزات على الألف والياء والواو، الألف المقصورة، التاء المربوطة) والأرقام العربية
+_LETTER_MAP = [('أ', 'ا'), ('إ', 'ا'), ('آ', 'ا'), ('ٱ', 'ا'), ('ى', 'ي'), ('ئ', 'ي'), ('ؤ', 'و'), ('ة', 'ه')]
+_LETTER_MAP += [(chr(0x0660 + digit), str(digit)) for digit in range(10)]
+_DIACRITICS = re.compile('[\u064b-\u065f\u0670\u0640]')
+_WORD = re.compile(r'\w+')
+# فاصل النصوص عند توحيدها كسلسلة واحدة
+_SEPARATOR = '\x01'
+_NON_WORD = re.compile(r'[^\w\x01]+')
+
+
+def normalize_text(text):
+    """توحيد النص للفهرسة والبحث: التشكيل والتطويل وأشكال الحروف والأرقام"""
+    text = str(text)
+    for source, target in _LETTER_MAP:
+        text = text.replace(source, target)
+    return _DIACRITICS.sub('', text).lower()
+
+
+def tokenize(text):
+    """كلمات النص بعد التوحيد"""
+    return _WORD.findall(normalize_text(text))
+
+
+def tokenize_many(texts):
+    """كلمات كل النصوص متتالية مع عدد كلمات كل نص - النصوص تُوحد وتُقسم كسلسلة واحدة"""
+    joined = normalize_text(_SEPARATOR.join(map(str, texts)))
+    tokens = np.array(_NON_WORD.sub(' ', joined).replace(_SEPARATOR, f' {_SEPARATOR} ').split() + [_SEPARATOR],
+                      dtype=object)
+    separators = np.flatnonzero(tokens == _SEPARATOR)
+    lengths = np.diff(separators, prepend=-1) - 1
+    if len(texts) == 0:
+        return tokens[:0], lengths[:0]
+    return np.delete(tokens, separators), lengths
+
+
+def _ranges(starts, lengths):
+    """دمج النطاقات [start, start + length) في مصفوفة مواضع واحدة"""
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.intp)
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return offsets + np.arange(total)
+
+
+class TextIndex:
+    """كلمة -> مواضع الصفوف (iloc) التي تحتويها في أي عمود نصي"""
+
+    def __init__(self, frame):
+        self.rows = len(frame)
+        self.columns = [col for col in TEXT_COLUMNS if col in frame.columns]
+        row_ids, word_positions, words = [], [], []
+        for col in self.columns:
+            # النصوص المكررة (أسماء ومدن) تُقسم مرة واحدة
+            codes, uniques = pd.factorize(frame[col])
+            tokens, lengths = tokenize_many(uniques)
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) + sum(map(len, words))
+            words.append(tokens)
+
+            # كل صف يأخذ كلمات نصه
+            rows = np.flatnonzero(codes >= 0)
+            row_lengths = lengths[codes[rows]]
+            row_ids.append(np.repeat(rows, row_lengths))
+            word_positions.append(_ranges(starts[codes[rows]], row_lengths))
+
+        row_ids = np.concatenate(row_ids) if row_ids else np.empty(0, dtype=np.intp)
+        token_ids, vocabulary = pd.factorize(np.concatenate(words) if words else np.empty(0, dtype=object))
+        token_ids = token_ids[np.concatenate(word_positions)] if word_positions else token_ids
+
+        # الكلمات المبدوءة بـ "ال" تُفهرس أيضاً بدونها
+        aliases = [(i, word[2:]) for i, word in enumerate(vocabulary) if word.startswith('ال') and len(word) > 4]
+        if aliases:
+            alias_of = np.full(len(vocabulary), -1, dtype=np.intp)
+            alias_of[[i for i, _ in aliases]] = np.arange(len(aliases)) + len(vocabulary)
+            codes, vocabulary = pd.factorize(np.concatenate([vocabulary, [alias for _, alias in aliases]]))
+            extra = alias_of[token_ids] >= 0
+            row_ids = np.concatenate([row_ids, row_ids[extra]])
+            token_ids = codes[np.concatenate([token_ids, alias_of[token_ids[extra]]])]
+
+        # ترتيب الكلمات أبجدياً حتى تكون الكلمات المبدوءة بنفس الحروف متجاورة
+        order = np.argsort(np.asarray(vocabulary, dtype=object), kind='stable')
+        rank = np.empty(len(order), dtype=np.intp)
+        rank[order] = np.arange(len(order))
+        self.words = np.asarray(vocabulary, dtype=object)[order]
+
+        ranked = rank[token_ids]
+        postings = np.lexsort((row_ids, ranked))
+        ranked, rows = ranked[postings], row_ids[postings]
+        # نفس الكلمة مرتين في الصف (أو في الاسم والعنوان) تُحفظ مرة واحدة
+        keep = np.ones(len(rows), dtype=bool)
+        keep[1:] = (ranked[1:] != ranked[:-1]) | (rows[1:] != rows[:-1])
+        self.positions = rows[keep]
+        self.bounds = np.searchsorted(ranked[keep], np.arange(len(order) + 1))
+
+    def _term_rows(self, term):
+        if len(term) >= MIN_PREFIX_LENGTH:
+            first = np.searchsorted(self.words, term)
+            last = np.searchsorted(self.words, term + '\uffff')
+        else:
+            first = np.searchsorted(self.words, term)
+            last = first + int(first < len(self.words) and self.words[first] == term)
+        if first == last:
+            return self.positions[:0]
+        rows = self.positions[self.bounds[first]:self.bounds[last]]
+        return rows if last - first == 1 else np.unique(rows)
+
+    def search(self, query):
+        """مواضع الصفوف التي تحتوي كل كلمات الاستعلام مرتبة"""
+        terms = dict.fromkeys(tokenize(query))
+        if not terms:
+            return np.empty(0, dtype=np.intp)
+        found = None
+        # الكلمات الأقل صفوفاً أولاً حتى يصغر التقاطع بسرعة
+        for rows in sorted((self._term_rows(term) for term in terms), key=len):
+            found = rows if found is None else np.intersect1d(found, rows, assume_unique=True)
+            if not len(found):
+                break
+        return found
+
+    @property
+    def nbytes(self):
+        return int(self.positions.nbytes + self.bounds.nbytes + sum(len(word) * 2 + 50 for word in self.words))
+
+
+def build_text_index(frame):
+    """الفهرس النصي للجدول أو None إذا لم يحتوِ على أي عمود من TEXT_COLUMNS"""
+    if not any(col in frame.columns for col in TEXT_COLUMNS):
+        return None
+    return TextIndex(frame)
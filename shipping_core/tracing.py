@@ -0,0 +1,114 @@
+# shipping_core/tracing.py - تصدير مراحل التشغيل بصيغة Chrome trace-event JSON
+"""
+الملفات الناتجة تُفتح في chrome://tracing أو https://ui.perfetto.dev لعرض المراحل
+المتداخلة لكل عملية وخيط على خط زمني واحد.
+
+التفعيل:
+    SHIPPING_TRACE=1 streamlit run main_dashboard.py      # أو ?trace=1 في رابط الصفحة
+    python batch_process.py ... --trace traces/batch.json
+"""
+import json
+import logging
+import os
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+TRACE_ENV = 'SHIPPING_TRACE'
+TRACES_DIR_ENV = 'SHIPPING_TRACES_DIR'
+DEFAULT_TRACES_DIR = 'traces'
+
+_TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+
+def tracing_enabled(value=None):
+    """هل التتبع مفعل - value قيمة خارجية (مثل معامل الرابط) وإلا متغير البيئة"""
+    if value is None:
+        value = os.environ.get(TRACE_ENV, '')
+    return str(value).strip().lower() in _TRUE_VALUES
+
+
+def get_traces_dir():
+    """مجلد ملفات التتبع"""
+    return os.environ.get(TRACES_DIR_ENV, DEFAULT_TRACES_DIR)
+
+
+def chrome_trace_events(records, process_names=None):
+    """تحويل سجلات المراحل (Run.records) إلى أحداث Chrome trace
+
+    كل مرحلة حدث كامل (ph=X) بزمن البداية والمدة بالميكروثانية، مع أحداث
+    metadata لأسماء العمليات والخيوط.
+    """
+    process_names = process_names or {}
+    events = []
+    threads = {}
+    processes = {}
+
+    for record in records:
+        if record.get('ms') is None or record.get('ts_us') is None:
+            continue
+        pid, tid = record['pid'], record['tid']
+        processes.setdefault(pid, process_names.get(pid) or record.get('page') or f"pid {pid}")
+        threads.setdefault((pid, tid), record.get('thread') or f"tid {tid}")
+
+        args = {key: record[key] for key in ('rows_in', 'rows_out', 'cache', 'run_id') if record.get(key) is not None}
+        events.append({
+            'name': record['stage'],
+            'cat': record['category'],
+            'ph': 'X',
+            'ts': record['ts_us'],
+            'dur': max(int(round(record['ms'] * 1000)), 1),
+            'pid': pid,
+            'tid': tid,
+            'args': args,
+        })
+
+    metadata = [
+        {'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': name}}
+        for pid, name in processes.items()
+    ]
+    metadata += [
+        {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+        for (pid, tid), name in threads.items()
+    ]
+    return metadata + sorted(events, key=lambda event: event['ts'])
+
+
+def to_chrome_trace(records, process_names=None, metadata=None):
+    """ملف trace كامل (JSON Object Format)"""
+    return {
+        'traceEvents': chrome_trace_events(records, process_names),
+        'displayTimeUnit': 'ms',
+        'otherData': metadata or {},
+    }
+
+
+def write_chrome_trace(records, path, process_names=None, metadata=None):
+    """كتابة ملف trace - يرجع المسار"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(to_chrome_trace(records, process_names, metadata), f, ensure_ascii=False)
+    return path
+
+
+def default_trace_path(name, run_id=None):
+    """traces/<name>_<وقت>_<run_id>.json"""
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    parts = [name, stamp] + ([run_id] if run_id else [])
+    return os.path.join(get_traces_dir(), '_'.join(parts) + '.json')
+
+
+def export_run(run, path=None):
+    """كتابة تشغيل واحد كملف trace - يرجع المسار أو None عند الفشل"""
+    records = run.records()
+    if not records:
+        return None
+    path = path or default_trace_path(run.page, run.run_id)
+    try:
+        return write_chrome_trace(records, path, metadata={'page': run.page, 'run_id': run.run_id,
+                                                           'started_at': run.started_at})
+    except OSError as e:
+        logger.warning("تعذر كتابة ملف التتبع %s: %s", path, e)
+        return None
@@ -0,0 +1,395 @@
+# shipping_core/warehouse.py - مخزن SQLite محلي لسجل الشحنات التاريخي مع فهارس للبحث والتجميع
+"""
+الجداول المعالجة في session state تكفي لملف واحد، أما سجل عدة أشهر لكل شركة فيُحفظ في
+ملف SQLite واحد (SHIPPING_WAREHOUSE، المخزن معطل إذا لم يُحدد). كل تحميل يحول البيانات
+إلى الجدول الموحد (shipping_core.schema) ويكتبها دفعة واحدة، والشحنة المكررة (نفس الشركة
+ورقم الشحنة) تُستبدل بآخر حالة لها. الشحنة بدون رقم مفتاحها بصمة محتواها (مثل shipping_core.history)
+حتى لا تتكرر عند تحميل ملفات متداخلة.
+
+الفلاتر والتجميع تُنفذ داخل SQLite باستخدام الفهارس (رقم الشحنة، المدينة، يوم الأساس،
+حالة التسليم، الفرع) ويرجع فقط الناتج المجمع:
+
+    warehouse = get_warehouse()              # None إذا كان المخزن معطلاً
+    warehouse.load('aramex', frame, source='aramex_2025_03')
+    warehouse.kpis('aramex', '2025-01-01', '2025-03-31', by='week', city='الرياض')
+    warehouse.shipments('aramex', '2025-03-01', '2025-03-31', status='مرتجع', limit=200)
+
+الاتصالات مشتركة بين الجلسات عبر ConnectionPool (SHIPPING_WAREHOUSE_POOL، الافتراضي 4)
+ومفعل فيها WAL حتى لا تمنع القراءة أثناء التحميل.
+"""
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from shipping_core.cache import fingerprint
+from shipping_core.engine import COUNT_COLUMNS, with_rates
+from shipping_core.instrumentation import span
+from shipping_core.schema import DELIVERED, PENDING, RETURNED, STORAGE_NAMES
+
+logger = logging.getLogger(__name__)
+
+WAREHOUSE_ENV = 'SHIPPING_WAREHOUSE'
+POOL_SIZE_ENV = 'SHIPPING_WAREHOUSE_POOL'
+DEFAULT_POOL_SIZE = 4
+
+# عدد الصفوف في كل executemany أثناء التحميل
+INSERT_CHUNK_ROWS = 50_000
+
+# أعمدة الجدول الموحد وأسماؤها في SQLite
+COLUMNS = STORAGE_NAMES
+
+# row_key: رقم الشحنة، أو "h:" وبصمة الصف للشحنات بدون رقم (NULL لا يتكرر في UNIQUE)
+_SHIPMENTS_SQL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    carrier TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    awb TEXT,
+    city TEXT,
+    region TEXT,
+    branch TEXT,
+    base_date TEXT,
+    base_day TEXT,
+    first_attempt_date TEXT,
+    delivered_date TEXT,
+    status TEXT NOT NULL,
+    is_excluded INTEGER NOT NULL,
+    sla_days REAL,
+    first_attempt_days REAL,
+    has_sla INTEGER NOT NULL,
+    sla_met INTEGER NOT NULL,
+    fds_base INTEGER NOT NULL,
+    fds_met INTEGER NOT NULL,
+    batch_id INTEGER NOT NULL REFERENCES batches (batch_id),
+    UNIQUE (carrier, row_key)
+);
+"""
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id INTEGER PRIMARY KEY,
+    carrier TEXT NOT NULL,
+    source TEXT,
+    content_hash TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    loaded_at TEXT NOT NULL,
+    UNIQUE (carrier, content_hash)
+);
+""" + _SHIPMENTS_SQL.format(table='shipments') + """
+CREATE INDEX IF NOT EXISTS idx_shipments_awb ON shipments (carrier, awb);
+CREATE INDEX IF NOT EXISTS idx_shipments_day ON shipments (carrier, base_day);
+CREATE INDEX IF NOT EXISTS idx_shipments_city ON shipments (carrier, city, base_day);
+CREATE INDEX IF NOT EXISTS idx_shipments_status ON shipments (carrier, status, base_day);
+CREATE INDEX IF NOT EXISTS idx_shipments_branch ON shipments (carrier, branch, base_day);
+CREATE INDEX IF NOT EXISTS idx_shipments_region ON shipments (carrier, region, base_day);
+"""
+
+_INSERT_COLUMNS = list(COLUMNS.values()) + ['base_day', 'batch_id', 'row_key']
+
+# الفلاتر المسموحة -> عمود SQLite (كلها مفهرسة مع الشركة)
+FILTERS = {'awb': 'awb', 'city': 'city', 'region': 'region', 'branch': 'branch', 'status': 'status'}
+
+# التجميع المسموح -> تعبير SQL (الأسبوع يبدأ الاثنين مثل engine.week_starts)
+GROUPS = {
+    'day': 'base_day',
+    'week': "date(base_day, '-6 days', 'weekday 1')",
+    'month': 'substr(base_day, 1, 7)',
+    'city': 'city',
+    'region': 'region',
+    'branch': 'branch',
+    'status': 'status',
+}
+
+# عدادات engine.COUNT_COLUMNS كتعبيرات SQL
+_COUNT_SQL = {
+    'volume': 'COUNT(*)',
+    'delivered': f"SUM(status = '{DELIVERED}')",
+    'pending': f"SUM(status = '{PENDING}')",
+    'returned': f"SUM(status = '{RETURNED}')",
+    'sla_base': 'SUM(has_sla)',
+    'sla_met': 'SUM(has_sla AND sla_met)',
+    'fds_base': 'SUM(fds_base)',
+    'fds_met': 'SUM(fds_base AND fds_met)',
+}
+assert list(_COUNT_SQL) == COUNT_COLUMNS
+
+
+def get_warehouse_path():
+    """مسار ملف المخزن - None إذا كان معطلاً"""
+    return os.environ.get(WAREHOUSE_ENV, '').strip() or None
+
+
+def get_pool_size():
+    try:
+        return max(1, int(os.environ.get(POOL_SIZE_ENV, DEFAULT_POOL_SIZE)))
+    except ValueError:
+        logger.warning("قيمة غير صالحة لـ %s، استخدام %s", POOL_SIZE_ENV, DEFAULT_POOL_SIZE)
+        return DEFAULT_POOL_SIZE
+
+
+class ConnectionPool:
+    """اتصالات SQLite مشتركة بين الخيوط (جلسات Streamlit) بحد أقصى size"""
+
+    def __init__(self, path, size=DEFAULT_POOL_SIZE, timeout=30):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.stats = {'created': 0, 'reused': 0, 'waits': 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    def _acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+            self.stats['reused'] += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            self.stats['created'] += 1
+            return self._connect()
+
+        self.stats['waits'] += 1
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            # نفس نوع أخطاء SQLite حتى يعالجها المستدعون (store_history والصفحات) كقاعدة مشغولة
+            raise sqlite3.OperationalError(f"لا يوجد اتصال متاح بالمخزن خلال {self.timeout} ثانية") from None
+
+    @contextmanager
+    def connection(self):
+        """اتصال من المجموعة يعود إليها بعد الاستخدام"""
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _sql_values(series):
+    """قيم عمود كمصفوفة Python لـ executemany (التواريخ نصوص ISO والقيم المفقودة None)"""
+    missing = series.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        values = np.datetime_as_string(series.to_numpy('datetime64[s]'), unit='s').astype(object)
+    elif pd.api.types.is_bool_dtype(series.dtype):
+        values = series.to_numpy('int64').astype(object)
+    else:
+        values = series.to_numpy(object)
+    values[missing] = None
+    return values
+
+
+def _row_keys(frame, awb):
+    """مفتاح كل صف: رقم الشحنة، أو بصمة محتوى الصف إذا لم يوجد رقم"""
+    keys = awb.copy()
+    missing = np.array([value is None for value in awb], dtype=bool)
+    if missing.any():
+        hashes = pd.util.hash_pandas_object(frame.loc[missing, list(COLUMNS)], index=False).to_numpy()
+        keys[missing] = [f"h:{value:016x}" for value in hashes]
+    return keys
+
+
+def _migrate_row_key(conn):
+    """ترقية مخزن قديم (UNIQUE على رقم الشحنة) إلى row_key - الصفوف الحالية بدون رقم تبقى كما هي"""
+    columns = ', '.join(['carrier'] + [col for col in _INSERT_COLUMNS if col not in ('carrier', 'row_key')])
+    conn.executescript('BEGIN;' + _SHIPMENTS_SQL.format(table='shipments_keyed') + f"""
+        INSERT INTO shipments_keyed ({columns}, row_key)
+            SELECT {columns}, COALESCE(awb, 'row:' || rowid) FROM shipments;
+        DROP TABLE shipments;
+        ALTER TABLE shipments_keyed RENAME TO shipments;
+        COMMIT;
+    """)
+    logger.info("ترقية جدول الشحنات في المخزن إلى مفتاح row_key")
+
+
+def _to_rows(frame, batch_id):
+    """صفوف الإدخال من الجدول الموحد بترتيب _INSERT_COLUMNS"""
+    columns = {sql: _sql_values(frame[col]) for col, sql in COLUMNS.items()}
+    columns['base_day'] = np.array([value[:10] if value else None for value in columns['base_date']], dtype=object)
+    columns['batch_id'] = [batch_id] * len(frame)
+    columns['row_key'] = _row_keys(frame, columns['awb'])
+    return zip(*(columns[col] for col in _INSERT_COLUMNS))
+
+
+def _where(carrier, start=None, end=None, include_excluded=False, **filters):
+    """شرط WHERE ومعاملاته - start و end أيام (نص أو تاريخ) شاملة"""
+    clauses, params = ['carrier = ?'], [carrier]
+    if not include_excluded:
+        clauses.append('is_excluded = 0')
+    if start is not None:
+        clauses.append('base_day >= ?')
+        params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+    if end is not None:
+        clauses.append('base_day <= ?')
+        params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+    for name, value in filters.items():
+        if name not in FILTERS:
+            raise ValueError(f"فلتر غير معروف: {name}")
+        if value is None or value == 'الكل':
+            continue
+        if isinstance(value, (list, tuple, set)):
+            clauses.append(f"{FILTERS[name]} IN ({', '.join('?' * len(value))})")
+            params.extend(value)
+        else:
+            clauses.append(f"{FILTERS[name]} = ?")
+            params.append(value)
+    return ' AND '.join(clauses), params
+
+
+class Warehouse:
+    """مخزن الشحنات التاريخي في ملف SQLite واحد"""
+
+    def __init__(self, path, pool_size=DEFAULT_POOL_SIZE):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.connection() as conn:
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(shipments)')}
+            if columns and 'row_key' not in columns:
+                _migrate_row_key(conn)
+            conn.executescript(_SCHEMA_SQL)
+
+    def load(self, carrier, frame, source=None):
+        """تحميل جدول موحد للشركة - يرجع عدد الصفوف المكتوبة (0 إذا حُمل نفس المحتوى سابقاً)"""
+        content_hash = fingerprint(frame)
+        with span(f"warehouse:{carrier}", 'output', rows_in=len(frame)), self.pool.connection() as conn:
+            exists = conn.execute('SELECT 1 FROM batches WHERE carrier = ? AND content_hash = ?',
+                                  (carrier, content_hash)).fetchone()
+            if exists or len(frame) == 0:
+                return 0
+
+            start = time.perf_counter()
+            placeholders = ', '.join('?' * len(_INSERT_COLUMNS))
+            sql = f"INSERT OR REPLACE INTO shipments ({', '.join(_INSERT_COLUMNS)}) VALUES ({placeholders})"
+            with conn:
+                batch_id = conn.execute(
+                    'INSERT INTO batches (carrier, source, content_hash, rows, loaded_at) VALUES (?, ?, ?, ?, ?)',
+                    (carrier, source, content_hash, len(frame), datetime.now().isoformat(timespec='seconds')),
+                ).lastrowid
+                frame = frame.assign(الشركة=carrier)
+                for offset in range(0, len(frame), INSERT_CHUNK_ROWS):
+                    conn.executemany(sql, _to_rows(frame.iloc[offset:offset + INSERT_CHUNK_ROWS], batch_id))
+
+        logger.info("تحميل %s شحنة من %s إلى المخزن في %.0f ms", f"{len(frame):,}", source or carrier,
+                    (time.perf_counter() - start) * 1000)
+        return len(frame)
+
+    def query(self, sql, params=()):
+        """تنفيذ استعلام وإرجاع DataFrame"""
+        with self.pool.connection() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def date_range(self, carrier):
+        """أول وآخر يوم أساس للشركة - (None, None) إذا لم توجد بيانات"""
+        with self.pool.connection() as conn:
+            first, last = conn.execute('SELECT MIN(base_day), MAX(base_day) FROM shipments WHERE carrier = ?',
+                                       (carrier,)).fetchone()
+        return (pd.Timestamp(first).date() if first else None, pd.Timestamp(last).date() if last else None)
+
+    def distinct(self, carrier, name, limit=500):
+        """القيم المختلفة لفلتر (للقوائم المنسدلة)"""
+        column = FILTERS[name]
+        sql = (f"SELECT DISTINCT {column} FROM shipments WHERE carrier = ? AND {column} IS NOT NULL "
+               f"ORDER BY {column} LIMIT ?")
+        with self.pool.connection() as conn:
+            return [row[0] for row in conn.execute(sql, (carrier, limit))]
+
+    def kpis(self, carrier, start=None, end=None, by=None, **filters):
+        """عدادات ونسب المؤشرات (نفس engine.kpis) مجمعة داخل SQLite لكل by في GROUPS أو للفترة كاملة"""
+        where, params = _where(carrier, start, end, **filters)
+        counts = ', '.join(f"{expr} AS {name}" for name, expr in _COUNT_SQL.items())
+        if by is None:
+            sql = f"SELECT {counts} FROM shipments WHERE {where}"
+        else:
+            if by not in GROUPS:
+                raise ValueError(f"تجميع غير معروف: {by}")
+            sql = (f"SELECT {GROUPS[by]} AS {by}, {counts} FROM shipments WHERE {where} "
+                   f"GROUP BY 1 ORDER BY 1")
+
+        with span(f"warehouse:kpis:{by or 'all'}", 'analysis'):
+            result = self.query(sql, params)
+        if by is not None:
+            result = result.set_index(by)
+        result[COUNT_COLUMNS] = result[COUNT_COLUMNS].fillna(0).astype('int64')
+        return with_rates(result)
+
+    def shipments(self, carrier, start=None, end=None, limit=500, **filters):
+        """شحنات الفترة للتفاصيل (الأحدث أولاً) بحد أقصى limit صف"""
+        where, params = _where(carrier, start, end, include_excluded=True, **filters)
+        columns = ', '.join(f'{sql} AS "{name}"' for name, sql in COLUMNS.items() if sql != 'carrier')
+        sql = f"SELECT {columns} FROM shipments WHERE {where} ORDER BY base_day DESC LIMIT ?"
+        with span('warehouse:shipments', 'analysis'):
+            return self.query(sql, params + [int(limit)])
+
+    def summary(self):
+        """عدد الشحنات والدفعات لكل شركة وحجم الملف"""
+        sql = """
+            SELECT carrier, COUNT(*) AS shipments, MIN(base_day) AS first_day, MAX(base_day) AS last_day,
+                   (SELECT COUNT(*) FROM batches b WHERE b.carrier = s.carrier) AS batches
+            FROM shipments s GROUP BY carrier ORDER BY carrier
+        """
+        result = self.query(sql)
+        result.attrs['bytes'] = sum(os.path.getsize(self.path + suffix)
+                                    for suffix in ('', '-wal') if os.path.exists(self.path + suffix))
+        return result
+
+    def close(self):
+        self.pool.close()
+
+
+_warehouse = None
+_warehouse_lock = threading.Lock()
+
+
+def get_warehouse():
+    """المخزن المشترك للعملية - None إذا لم يُحدد SHIPPING_WAREHOUSE"""
+    global _warehouse
+    path = get_warehouse_path()
+    if path is None:
+        return None
+    with _warehouse_lock:
+        if _warehouse is None or _warehouse.path != path:
+            _warehouse = Warehouse(path, get_pool_size())
+            atexit.register(_warehouse.close)
+        return _warehouse
+
+
+def store_history(carrier, frame, source=None):
+    """إضافة جدول موحد للمخزن المشترك إن كان مفعلاً - يرجع عدد الصفوف ولا يوقف المعالجة عند الفشل"""
+    try:
+        warehouse = get_warehouse()
+        if warehouse is None:
+            return 0
+        return warehouse.load(carrier, frame, source)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning("تعذر تحميل بيانات %s إلى المخزن: %s", carrier, e)
+        return 0